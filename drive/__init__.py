@@ -0,0 +1,41 @@
+"""DRIVE identifies networks of individuals who share IBD segments around a
+target region. The in process interface is available from the package as
+drive.run and drive.Session. The interface imports pandas, numpy, and
+igraph so it is only imported the first time that it is accessed. This keeps
+the cli quick to start."""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .api import ClusterParameters, Results, Session, run
+
+# mapping of each exported name to the module that defines it
+_EXPORTS = {
+    "ClusterParameters": ".api",
+    "Results": ".api",
+    "Session": ".api",
+    "run": ".api",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """import the module that defines the name the first time the name is
+    accessed and then store it on the package so later lookups are
+    normal attribute lookups"""
+    module_name = _EXPORTS.get(name)
+
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(module_name, __name__), name)
+
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()).union(_EXPORTS))
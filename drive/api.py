@@ -0,0 +1,741 @@
+"""In process interface to DRIVE. The run function clusters the IBD segments
+around a single target and the Session class keeps the segments, the
+phenotype statuses, and the sample dictionary in memory so that many targets
+can be analyzed without reading the files again. Both return the networks
+and the pvalues as dataframes instead of writing files so notebooks and
+pipelines can loop over targets without starting a new process. The cluster,
+scan, and serve commands use the same functions to filter and cluster the
+segments"""
+
+import threading
+from dataclasses import dataclass, field, fields, replace
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from pandas import DataFrame
+
+from drive.cluster import ClusterHandler, cluster
+from drive.filters import IbdFilter, NoSegmentsError, SegmentIndex
+from drive.log import CustomLogger
+from drive.models import (
+    Data,
+    FileIndices,
+    Genes,
+    Network_Interface,
+    OverlapOptions,
+    PhenotypeIncidence,
+    PhenotypeMatrix,
+    SampleDictionary,
+    create_indices,
+)
+from drive.utilities.targets import split_target_string
+
+logger = CustomLogger.get_logger(__name__)
+
+# columns of the networks table. The names are the same as the columns of
+# the *.drive_networks.txt file
+NETWORK_COLUMNS = [
+    "clstID",
+    "n.total",
+    "n.haplotype",
+    "true.positive.n",
+    "true.positive",
+    "falst.postive",
+    "IDs",
+    "ID.haplotype",
+]
+
+# columns of the table with the counts and pvalue of each network and
+# phenotype. The names are the same as the long format output. The cluster
+# ids are not always unique so the network_index column has the row of the
+# network in the networks table
+PVALUE_COLUMNS = [
+    "network_index",
+    "clstID",
+    "phenotype",
+    "cases_in_network",
+    "excluded_in_network",
+    "network_size",
+    "pvalue",
+]
+
+
+@dataclass(frozen=True)
+class ClusterParameters:
+    """Parameters used to filter and cluster the segments. The defaults are
+    the defaults of the cluster command"""
+
+    min_cm: int = 3
+    segment_overlap: str = OverlapOptions.CONTAINS.value
+    step: int = 3
+    max_recheck: int = 5
+    max_network_size: int = 30
+    min_connected_threshold: float = 0.5
+    min_network_size: int = 2
+    segment_distribution_threshold: float = 0.2
+    hub_threshold: float = 0.01
+    recluster: bool = True
+
+    def __post_init__(self) -> None:
+        # the enum from the cli and the plain string are both accepted
+        object.__setattr__(
+            self, "segment_overlap", OverlapOptions(self.segment_overlap).value
+        )
+
+    def update(self, **parameters: Any) -> "ClusterParameters":
+        """Create a copy of the parameters with some values changed
+
+        Parameters
+        ----------
+        **parameters : Any
+            values of the parameters to change
+
+        Returns
+        -------
+        ClusterParameters
+            returns the new parameters
+
+        Raises
+        ------
+        ValueError
+            raises a ValueError if a parameter doesn't exist or if the
+            segment_overlap value is not contains or overlaps
+        """
+        names = [parameter.name for parameter in fields(self)]
+
+        unknown = sorted(set(parameters).difference(names))
+
+        if unknown:
+            raise ValueError(
+                f"Unknown parameters: {', '.join(unknown)}. Allowed parameters are {', '.join(names)}"  # noqa: E501
+            )
+
+        return replace(self, **parameters) if parameters else self
+
+    def create_cluster_handler(
+        self, haplotype_mappings: Dict[int, str]
+    ) -> ClusterHandler:
+        """Create the object that clusters the segments
+
+        Parameters
+        ----------
+        haplotype_mappings : Dict[int, str]
+            mapping of each idnum to its haplotype id
+
+        Returns
+        -------
+        ClusterHandler
+            returns a new handler. Every target needs its own handler
+            because the handler keeps track of the networks that are being
+            reclustered
+        """
+        return ClusterHandler(
+            self.min_connected_threshold,
+            self.max_network_size,
+            self.max_recheck,
+            self.step,
+            self.min_network_size,
+            self.segment_distribution_threshold,
+            self.hub_threshold,
+            haplotype_mappings,
+            self.recluster,
+        )
+
+
+@dataclass
+class Results:
+    """Networks found around a target. The networks table has a row for
+    every network and the pvalues table has a row for every network and
+    phenotype with a case in the network"""
+
+    target: Genes
+    networks: DataFrame
+    pvalues: DataFrame
+    segment_count: int = 0
+    haplotype_count: int = 0
+    network_objects: List[Network_Interface] = field(default_factory=list, repr=False)
+
+    def __str__(self) -> str:
+        """Custom string message used for debugging"""
+        return f"Results: target={self.target.chr}:{self.target.start}-{self.target.end}, segments={self.segment_count}, haplotypes={self.haplotype_count}, networks={self.networks.shape[0]}"  # noqa: E501
+
+
+def filter_segments(
+    ibd: Union[Path, Iterable[DataFrame]],
+    indices: FileIndices,
+    target: Genes,
+    parameters: ClusterParameters,
+    cohort_ids: Optional[List[str]] = None,
+    sample_dictionary: Optional[SampleDictionary] = None,
+) -> Optional[IbdFilter]:
+    """Keep the segments around the target that pass the filters
+
+    Parameters
+    ----------
+    ibd : Path | Iterable[DataFrame]
+        path to the ibd file or chunks of segments in the format of the ibd
+        program
+
+    indices : FileIndices
+        object with the indices of the columns in the ibd file
+
+    target : Genes
+        target region
+
+    parameters : ClusterParameters
+        parameters with the minimum centimorgan threshold and how the
+        segments have to overlap the target
+
+    cohort_ids : Optional[List[str]]
+        ids of the individuals in the cohort. If no ids are provided then
+        every individual is kept
+
+    sample_dictionary : Optional[SampleDictionary]
+        persistent dictionary used to give the haplotypes stable codes
+
+    Returns
+    -------
+    Optional[IbdFilter]
+        returns the filter with the segments that passed the filters or
+        None if no segments passed the filters
+    """
+    if isinstance(ibd, Path):
+        filter_obj = IbdFilter.load_file(ibd, indices, target, sample_dictionary)
+    else:
+        filter_obj = IbdFilter(
+            iter(ibd), indices, target, sample_dictionary=sample_dictionary
+        )
+
+    filter_obj.set_filter(parameters.segment_overlap)
+    try:
+        filter_obj.preprocess(parameters.min_cm, cohort_ids)
+    except NoSegmentsError as error:
+        logger.debug(str(error))
+
+        return None
+
+    return filter_obj
+
+
+def cluster_segments(
+    filter_obj: IbdFilter, parameters: ClusterParameters
+) -> List[Network_Interface]:
+    """Cluster the filtered segments
+
+    Parameters
+    ----------
+    filter_obj : IbdFilter
+        filter with the segments that passed the filters
+
+    parameters : ClusterParameters
+        parameters of the random walk and the reclustering
+
+    Returns
+    -------
+    List[Network_Interface]
+        returns the networks
+    """
+    hapid_inverted = {value: key for key, value in filter_obj.hapid_map.items()}
+
+    return cluster(
+        filter_obj,
+        parameters.create_cluster_handler(hapid_inverted),
+        filter_obj.indices.cM_indx,
+    )
+
+
+def parse_target(target: Union[str, Genes, Tuple[int, int, int]]) -> Genes:
+    """Convert a target string such as 10:1234-1234 or a tuple with the
+    chromosome, start, and end positions to a Genes tuple"""
+    if isinstance(target, str):
+        return split_target_string(target)
+
+    return Genes(*target)
+
+
+def load_phenotypes(
+    cases: Optional[Union[Path, str]] = None,
+    descriptions: Optional[Union[Path, str]] = None,
+    phenotypes: Optional[List[str]] = None,
+) -> Tuple[Optional[PhenotypeMatrix], Dict[str, Dict[str, str]]]:
+    """Read the phenotype file and the phenotype descriptions
+
+    Parameters
+    ----------
+    cases : Optional[Path | str]
+        path to the phenotype file
+
+    descriptions : Optional[Path | str]
+        path to the file with the description of each phecode
+
+    phenotypes : Optional[List[str]]
+        phenotypes to load. By default every phenotype is loaded
+
+    Returns
+    -------
+    Tuple[Optional[PhenotypeMatrix], Dict[str, Dict[str, str]]]
+        returns the status matrix, which is None if no phenotype file was
+        provided, and the descriptions
+    """
+    from drive.utilities.parser import (
+        load_phenotype_descriptions,
+        load_phenotype_matrix,
+    )
+
+    phenotype_matrix = (
+        load_phenotype_matrix(Path(cases), phenotypes=phenotypes) if cases else None
+    )
+
+    phenotype_descriptions = (
+        load_phenotype_descriptions(Path(descriptions)) if descriptions else {}
+    )
+
+    return phenotype_matrix, phenotype_descriptions
+
+
+@dataclass
+class Session:
+    """Segments, phenotype statuses, and sample dictionary that are loaded
+    once and reused for every target. The incidence matrices and status
+    counts of the phenotypes are also only computed once. A session can be
+    used by several threads at the same time"""
+
+    segment_index: SegmentIndex
+    phenotype_matrix: Optional[PhenotypeMatrix] = None
+    phenotype_descriptions: Dict[str, Dict[str, str]] = field(default_factory=dict)
+    sample_dictionary: Optional[SampleDictionary] = None
+    parameters: ClusterParameters = field(default_factory=ClusterParameters)
+    carriers: Dict[str, Dict[str, Any]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    phenotype_incidence: Optional[PhenotypeIncidence] = field(
+        default=None, init=False, repr=False
+    )
+    status_counts: Optional[Dict[str, Tuple[int, int, int]]] = field(
+        default=None, init=False, repr=False
+    )
+    _local: threading.local = field(
+        default_factory=threading.local, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        if self.phenotype_matrix is not None:
+            self.carriers = self.phenotype_matrix.carriers()
+
+            self.phenotype_incidence = PhenotypeIncidence.from_matrix(
+                self.phenotype_matrix
+            )
+
+            self.status_counts = self.phenotype_matrix.status_counts()
+
+    @classmethod
+    def load(
+        cls,
+        ibd: Union[Path, str, DataFrame, List[Union[Path, str]]],
+        ibd_format: str = "hapibd",
+        cases: Optional[Union[Path, str]] = None,
+        descriptions: Optional[Union[Path, str]] = None,
+        phenotypes: Optional[List[str]] = None,
+        sample_dictionary: Optional[Union[Path, str]] = None,
+        **parameters: Any,
+    ) -> "Session":
+        """Read the segments and the phenotypes
+
+        Parameters
+        ----------
+        ibd : Path | str | DataFrame | List[Path | str]
+            one or more ibd files or a dataframe of segments in the format
+            of the ibd program. The files can have one or more chromosomes
+
+        ibd_format : str
+            ibd program that identified the segments. Allowed values are
+            hapibd, ilash, germline, and rapid
+
+        cases : Optional[Path | str]
+            path to the phenotype file. Only the segments of individuals in
+            the file are kept
+
+        descriptions : Optional[Path | str]
+            path to the file with the description of each phecode
+
+        phenotypes : Optional[List[str]]
+            phenotypes to analyze. By default every phenotype is analyzed
+
+        sample_dictionary : Optional[Path | str]
+            directory with the sample dictionary. Every sample and
+            haplotype in the segments is added to the dictionary when the
+            session is loaded
+
+        **parameters : Any
+            default values of the ClusterParameters used by the session
+
+        Returns
+        -------
+        Session
+            returns the session with the loaded data
+        """
+        phenotype_matrix, phenotype_descriptions = load_phenotypes(
+            cases, descriptions, phenotypes
+        )
+
+        cohort_ids = phenotype_matrix.samples if phenotype_matrix is not None else []
+
+        indices = create_indices(ibd_format.lower())
+
+        if isinstance(ibd, DataFrame):
+            segment_index = SegmentIndex.from_segments([ibd], indices, cohort_ids)
+        else:
+            ibd_files = [ibd] if isinstance(ibd, (Path, str)) else ibd
+
+            segment_index = SegmentIndex.load(
+                [Path(ibd_file) for ibd_file in ibd_files], indices, cohort_ids
+            )
+
+        if sample_dictionary is not None:
+            dictionary_obj = SampleDictionary.load(sample_dictionary)
+            # every id is added when the session is loaded so the targets
+            # only look up codes and never write to the dictionary
+            dictionary_obj.samples.add(cohort_ids)
+
+            dictionary_obj.samples.add(segment_index.sample_ids())
+
+            dictionary_obj.haplotypes.add(segment_index.haplotype_ids())
+        else:
+            dictionary_obj = None
+
+        return cls(
+            segment_index,
+            phenotype_matrix,
+            phenotype_descriptions,
+            dictionary_obj,
+            ClusterParameters().update(**parameters),
+        )
+
+    @property
+    def chromosomes(self) -> List[int]:
+        """chromosomes with segments in the session"""
+        return list(self.segment_index.chromosomes)
+
+    @property
+    def _pvalues_plugin(self):
+        """Pvalues plugin of the current thread. Each thread has its own
+        plugin because the cache of binomial pvalues is not thread safe but
+        the cache is reused by every target that the thread analyzes"""
+        plugin = getattr(self._local, "pvalues", None)
+
+        if plugin is None:
+            from drive.plugins.pvalues import Pvalues
+
+            plugin = self._local.pvalues = Pvalues()
+
+        return plugin
+
+    def _tables(
+        self, networks: List[Network_Interface], data: Optional[Data]
+    ) -> Tuple[DataFrame, DataFrame]:
+        """create the networks and pvalues tables"""
+        network_rows = []
+
+        for network in networks:
+            members = sorted(network.members)
+
+            haplotypes = sorted(network.haplotypes)
+
+            row = [
+                network.clst_id,
+                len(members),
+                len(haplotypes),
+                network.true_positive_count,
+                network.true_positive_percent,
+                network.false_negative_count,
+                members,
+                haplotypes,
+            ]
+
+            if self.sample_dictionary is not None:
+                row.extend(
+                    [
+                        self.sample_dictionary.samples.codes(members).tolist(),
+                        self.sample_dictionary.haplotypes.codes(haplotypes).tolist(),
+                    ]
+                )
+
+            if self.carriers:
+                min_pvalue, min_phenotype, description = (
+                    network.min_pvalue_str.split("\t") + ["N/A"] * 3
+                )[:3]
+
+                row.extend(
+                    [
+                        np.nan if min_pvalue == "N/A" else float(min_pvalue),
+                        None if min_phenotype == "N/A" else min_phenotype,
+                        None if description == "N/A" else description,
+                    ]
+                )
+
+            network_rows.append(row)
+
+        columns = list(NETWORK_COLUMNS)
+
+        if self.sample_dictionary is not None:
+            columns.extend(["member_codes", "haplotype_codes"])
+
+        if self.carriers:
+            columns.extend(["min_pvalue", "min_phenotype", "min_phenotype_description"])
+
+        network_table = DataFrame(network_rows, columns=columns)
+
+        if data is None or data.network_counts is None:
+            return network_table, DataFrame(columns=PVALUE_COLUMNS)
+
+        network_counts = data.network_counts
+        # only the nonzero case counts are checked so the size of the table
+        # doesn't depend on the number of phenotypes
+        case_counts = network_counts.case_counts.tocoo()
+
+        # the product of the sparse matrices doesn't keep the phenotypes in
+        # order so the cells are sorted by network and then phenotype
+        order = np.lexsort((case_counts.col, case_counts.row))
+
+        rows, columns = case_counts.row[order], case_counts.col[order]
+
+        pvalue_table = DataFrame(
+            {
+                "network_index": rows,
+                "clstID": [network_counts.clst_ids[row] for row in rows],
+                "phenotype": [network_counts.phenotypes[column] for column in columns],
+                "cases_in_network": case_counts.data[order],
+                "excluded_in_network": np.asarray(
+                    network_counts.excluded_counts[rows, columns]
+                ).ravel(),
+                "network_size": network_counts.network_sizes[rows],
+                "pvalue": network_counts.pvalues[rows, columns],
+            }
+        )
+
+        return network_table, pvalue_table
+
+    def analyze(
+        self,
+        segments: Optional[Union[Path, Iterable[DataFrame]]],
+        target: Genes,
+        parameters: ClusterParameters,
+        cohort_ids: Optional[List[str]] = None,
+        sample_dictionary: Optional[SampleDictionary] = None,
+    ) -> Results:
+        """Filter and cluster the segments and determine the pvalues of the
+        networks
+
+        Parameters
+        ----------
+        segments : Optional[Path | Iterable[DataFrame]]
+            ibd file or chunks of segments to filter. If the value is None
+            then there are no segments around the target
+
+        target : Genes
+            target region
+
+        parameters : ClusterParameters
+            parameters used to filter and cluster the segments
+
+        cohort_ids : Optional[List[str]]
+            ids of the individuals in the cohort if the segments have not
+            been restricted to the cohort yet
+
+        sample_dictionary : Optional[SampleDictionary]
+            dictionary that the filter adds the ids of the segments to
+
+        Returns
+        -------
+        Results
+            returns the networks and pvalues
+        """
+        filter_obj = (
+            filter_segments(
+                segments,
+                self.segment_index.indices,
+                target,
+                parameters,
+                cohort_ids,
+                sample_dictionary,
+            )
+            if segments is not None
+            else None
+        )
+
+        if filter_obj is None:
+            networks_table, pvalues_table = self._tables([], None)
+
+            return Results(target, networks_table, pvalues_table)
+
+        networks = cluster_segments(filter_obj, parameters)
+
+        if self.carriers and networks:
+            # the incidence matrices and status counts are shared by every
+            # target so only the networks of this target are counted
+            data = Data(
+                networks,
+                Path(""),
+                self.carriers,
+                self.phenotype_descriptions,
+                phenotype_matrix=self.phenotype_matrix,
+                phenotype_incidence=self.phenotype_incidence,
+                status_counts=self.status_counts,
+            )
+
+            self._pvalues_plugin.process(networks, data)
+        else:
+            data = None
+
+        networks_table, pvalues_table = self._tables(networks, data)
+
+        return Results(
+            target,
+            networks_table,
+            pvalues_table,
+            filter_obj.ibd_pd.shape[0],
+            filter_obj.ibd_vs.shape[0],
+            networks,
+        )
+
+    def run(
+        self, target: Union[str, Genes, Tuple[int, int, int]], **parameters: Any
+    ) -> Results:
+        """Cluster the segments around the target
+
+        Parameters
+        ----------
+        target : str | Genes | Tuple[int, int, int]
+            target region formatted as chromosome:start-end or a tuple with
+            the chromosome, start, and end positions
+
+        **parameters : Any
+            values of the ClusterParameters to use for this target instead
+            of the defaults of the session
+
+        Returns
+        -------
+        Results
+            returns the networks and pvalues
+
+        Raises
+        ------
+        ValueError
+            raises a ValueError if a parameter is not valid or if the
+            chromosome of the target was not loaded
+        """
+        target = parse_target(target)
+
+        parameters = self.parameters.update(**parameters)
+
+        candidates = self.segment_index.select(target)
+
+        # the filter requires the target chromosome in the segments so
+        # targets without any candidate segments are empty
+        return self.analyze(
+            [candidates] if not candidates.empty else None, target, parameters
+        )
+
+    def run_many(
+        self, targets: Iterable[Union[str, Genes, Tuple[int, int, int]]], **parameters
+    ) -> Iterator[Results]:
+        """Cluster the segments around each target in order
+
+        Parameters
+        ----------
+        targets : Iterable[str | Genes | Tuple[int, int, int]]
+            target regions
+
+        **parameters : Any
+            values of the ClusterParameters used for every target
+
+        Yields
+        ------
+        Results
+            networks and pvalues of each target
+        """
+        for target in targets:
+            yield self.run(target, **parameters)
+
+
+def run(
+    ibd: Union[Path, str, DataFrame],
+    target: Union[str, Genes, Tuple[int, int, int]],
+    ibd_format: str = "hapibd",
+    cases: Optional[Union[Path, str]] = None,
+    descriptions: Optional[Union[Path, str]] = None,
+    phenotypes: Optional[List[str]] = None,
+    sample_dictionary: Optional[Union[Path, str]] = None,
+    **parameters: Any,
+) -> Results:
+    """Cluster the IBD segments around a single target. The ibd file is read
+    in chunks so only the segments around the target are kept in memory.
+    A Session should be used to analyze several targets
+
+    Parameters
+    ----------
+    ibd : Path | str | DataFrame
+        ibd file or a dataframe of segments in the format of the ibd program
+
+    target : str | Genes | Tuple[int, int, int]
+        target region formatted as chromosome:start-end or a tuple with the
+        chromosome, start, and end positions
+
+    ibd_format : str
+        ibd program that identified the segments. Allowed values are
+        hapibd, ilash, germline, and rapid
+
+    cases : Optional[Path | str]
+        path to the phenotype file
+
+    descriptions : Optional[Path | str]
+        path to the file with the description of each phecode
+
+    phenotypes : Optional[List[str]]
+        phenotypes to analyze. By default every phenotype is analyzed
+
+    sample_dictionary : Optional[Path | str]
+        directory with the sample dictionary. New samples and haplotypes
+        are added to the dictionary
+
+    **parameters : Any
+        values of the ClusterParameters
+
+    Returns
+    -------
+    Results
+        returns the networks and pvalues
+    """
+    target = parse_target(target)
+
+    phenotype_matrix, phenotype_descriptions = load_phenotypes(
+        cases, descriptions, phenotypes
+    )
+
+    cohort_ids = phenotype_matrix.samples if phenotype_matrix is not None else []
+
+    dictionary_obj = (
+        SampleDictionary.load(sample_dictionary)
+        if sample_dictionary is not None
+        else None
+    )
+
+    if dictionary_obj is not None:
+        dictionary_obj.samples.add(cohort_ids)
+
+    session = Session(
+        SegmentIndex(create_indices(ibd_format.lower())),
+        phenotype_matrix,
+        phenotype_descriptions,
+        dictionary_obj,
+        ClusterParameters().update(**parameters),
+    )
+
+    return session.analyze(
+        [ibd] if isinstance(ibd, DataFrame) else Path(ibd),
+        target,
+        session.parameters,
+        cohort_ids,
+        dictionary_obj,
+    )
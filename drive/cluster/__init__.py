@@ -1 +1,7 @@
-from .cluster import ClusterHandler, cluster
+from .cluster import (
+    ClusterHandler,
+    ReclusterPool,
+    cluster,
+    scan_clusters,
+    stream_clusters,
+)
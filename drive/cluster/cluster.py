@@ -1,13 +1,19 @@
 import itertools
 import logging
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Set, Tuple
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
 import igraph as ig
+import numpy as np
 from pandas import DataFrame
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
+from drive.filters import WindowFilter
 from drive.log import CustomLogger
-from drive.models import Filter, Network, Network_Interface
+from drive.models import Filter, Network, Network_Interface, SharedEdges
 
 # creating a logger
 logger: logging.Logger = CustomLogger.get_logger(__name__)
@@ -31,6 +37,11 @@ class ClusterHandler:
     check_times: int = 0
     recheck_clsts: Dict[int, List[Network_Interface]] = field(default_factory=dict)
     final_clusters: List[Network_Interface] = field(default_factory=list)
+    emitted_count: int = 0
+    network_count: int = 0
+    # number of clustering rounds that have finished. The first pass is
+    # the first round and every recheck is another round
+    completed_rounds: int = 0
 
     @staticmethod
     def generate_graph(
@@ -346,33 +357,60 @@ class ClusterHandler:
 
                 self.final_clusters.append(network)
 
-    def redo_clustering(
+                self.network_count += 1
+
+    def pop_finalized(self, retain: bool = True) -> List[Network_Interface]:
+        """Return the networks that were finalized since the last call
+
+        Parameters
+        ----------
+        retain : bool
+            whether the networks should be kept in the final_clusters
+            attribute after they are returned. If this value is False
+            then the final_clusters list is cleared so that the
+            networks can be garbage collected once the caller is done
+            with them.
+
+        Returns
+        -------
+        List[Network_Interface]
+            returns a list of the networks that have been added to
+            final_clusters since the previous call
+        """
+        finalized = self.final_clusters[self.emitted_count :]
+
+        if retain:
+            self.emitted_count = len(self.final_clusters)
+        else:
+            self.final_clusters = []
+            self.emitted_count = 0
+
+        return finalized
+
+    def walk_network(
         self,
         network: Network_Interface,
-        ibd_pd: DataFrame,
-    ) -> None:
-        """Method that will redo the clustering, if the
-        networks were too large or did not show a high degree
-        of connectedness
+        redopd: DataFrame,
+    ) -> Tuple[ig.Graph, ig.VertexClustering]:
+        """Perform the random walk on the edges of a single network that
+        needs to be reclustered. This method only reads the parameters of
+        the handler so it can run in a worker process
 
         Parameters
         ----------
-        network : Network_InterFace
-            object that represents each cluster. These objects have information
-            about the cluster id, number and ratio of edges, true_positive_percent,
-            false_negative_edges, false_negative_count
+        network : Network_Interface
+            network that is reclustered
 
-        ibd_pd : pd.DataFrame
-            DataFrame that has information about the edges that a pair shares
-        """
-        # pulling the id from the original cluster
-        original_id = network.clst_id
+        redopd : DataFrame
+            DataFrame with the columns idnum1, idnum2, and cm for the edges
+            between the haplotypes of the network
 
-        # filters for the specific cluster
-        redopd = ibd_pd[
-            (ibd_pd["idnum1"].isin(network.haplotypes))
-            & (ibd_pd["idnum2"].isin(network.haplotypes))
-        ]
+        Returns
+        -------
+        Tuple[ig.Graph, ig.VertexClustering]
+            returns the graph of the network and the clusters found by the
+            random walk
+        """
         # We are going to generate a new Networks object using the redo graph
         redo_networks = ClusterHandler.generate_graph(redopd)
         # performing the random walk
@@ -433,18 +471,363 @@ class ClusterHandler:
             )
             redo_walktrap_clusters = redo_walktrap.as_clustering()
 
+        return redo_networks, redo_walktrap_clusters
+
+    def gather_reclustering(
+        self,
+        network: Network_Interface,
+        redo_networks: ig.Graph,
+        redo_walktrap_clusters: ig.VertexClustering,
+    ) -> None:
+        """Gather the networks found by reclustering a network
+
+        Parameters
+        ----------
+        network : Network_Interface
+            network that was reclustered
+
+        redo_networks : ig.Graph
+            graph of the network that was reclustered
+
+        redo_walktrap_clusters : ig.VertexClustering
+            clusters found by the random walk on the graph
+        """
         # Filter to the clusters that are llarger than the minimum size
         allclst = self.filter_cluster_size(redo_walktrap_clusters.sizes())
 
         self.gather_cluster_info(
-            redo_networks, allclst, redo_walktrap_clusters, original_id
+            redo_networks, allclst, redo_walktrap_clusters, network.clst_id
+        )
+
+    def redo_clustering(
+        self,
+        network: Network_Interface,
+        ibd_pd: DataFrame,
+    ) -> None:
+        """Method that will redo the clustering, if the
+        networks were too large or did not show a high degree
+        of connectedness
+
+        Parameters
+        ----------
+        network : Network_InterFace
+            object that represents each cluster. These objects have information
+            about the cluster id, number and ratio of edges, true_positive_percent,
+            false_negative_edges, false_negative_count
+
+        ibd_pd : pd.DataFrame
+            DataFrame that has information about the edges that a pair shares
+        """
+        # filters for the specific cluster
+        redopd = ibd_pd[
+            (ibd_pd["idnum1"].isin(network.haplotypes))
+            & (ibd_pd["idnum2"].isin(network.haplotypes))
+        ]
+
+        self.gather_reclustering(network, *self.walk_network(network, redopd))
+
+
+def _recluster_network(
+    cluster_obj: ClusterHandler,
+    network: Network_Interface,
+    shared_edges: SharedEdges,
+) -> Tuple[ig.Graph, ig.VertexClustering]:
+    """Perform the random walk of a network in a worker process. The worker
+    receives a handle to the shared edges and selects the edges of the
+    network from the shared block
+
+    Parameters
+    ----------
+    cluster_obj : ClusterHandler
+        handler with the parameters of the random walk
+
+    network : Network_Interface
+        network that is reclustered
+
+    shared_edges : SharedEdges
+        edges in the shared memory block
+
+    Returns
+    -------
+    Tuple[ig.Graph, ig.VertexClustering]
+        returns the graph of the network and the clusters found by the
+        random walk
+    """
+    rows = np.flatnonzero(
+        np.isin(shared_edges["idnum1"], network.haplotypes)
+        & np.isin(shared_edges["idnum2"], network.haplotypes)
+    )
+
+    redopd = DataFrame(
+        {column: shared_edges[column][rows] for column in ["idnum1", "idnum2", "cm"]},
+        index=rows,
+    )
+
+    return cluster_obj.walk_network(network, redopd)
+
+
+@dataclass
+class ReclusterPool:
+    """Pool of worker processes that recluster the networks of each round in
+    parallel. The edges are copied into a shared memory block once and the
+    workers attach to the block instead of receiving a copy of the edges
+    with every network. The networks are gathered in the order of the round
+    so the results are the same as reclustering the networks one at a time"""
+
+    shared_edges: SharedEdges
+    executor: Executor
+
+    @classmethod
+    def create(cls, ibd_edges: DataFrame, workers: int) -> "ReclusterPool":
+        """Copy the edges into shared memory and start the worker processes
+
+        Parameters
+        ----------
+        ibd_edges : DataFrame
+            segments used in the clustering with the columns hapid1, hapid2,
+            idnum1, idnum2, start, end, and cm
+
+        workers : int
+            number of worker processes
+
+        Returns
+        -------
+        ReclusterPool
+            returns the pool with the shared edges
+        """
+        shared_edges = SharedEdges.from_edges(ibd_edges)
+
+        logger.verbose(
+            f"Reclustering networks with {workers} worker processes that share the {len(shared_edges)} edges in the block {shared_edges.handle.name}"  # noqa: E501
+        )
+
+        return cls(shared_edges, ProcessPoolExecutor(max_workers=workers))
+
+    def map(
+        self, cluster_obj: ClusterHandler, networks: List[Network_Interface]
+    ) -> Iterator[Tuple[ig.Graph, ig.VertexClustering]]:
+        """Perform the random walk of every network in the worker processes
+
+        Parameters
+        ----------
+        cluster_obj : ClusterHandler
+            handler with the parameters of the random walk
+
+        networks : List[Network_Interface]
+            networks of the round that are reclustered
+
+        Returns
+        -------
+        Iterator[Tuple[ig.Graph, ig.VertexClustering]]
+            returns the graph and the clusters of each network in the order
+            of the networks
+        """
+        # the workers only need the parameters of the handler so the
+        # networks and the haplotype mappings are not sent with every task
+        worker_obj = replace(
+            cluster_obj, haplotype_mappings={}, recheck_clsts={}, final_clusters=[]
+        )
+
+        futures = [
+            self.executor.submit(
+                _recluster_network, worker_obj, network, self.shared_edges
+            )
+            for network in networks
+        ]
+
+        return (future.result() for future in futures)
+
+    def close(self) -> None:
+        """Stop the worker processes and unlink the shared memory block"""
+        # networks that haven't started are cancelled if the run failed
+        if sys.version_info >= (3, 9):
+            self.executor.shutdown(cancel_futures=True)
+        else:
+            self.executor.shutdown()
+
+        self.shared_edges.close()
+
+    def __enter__(self) -> "ReclusterPool":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+
+def _walk_networks(
+    ibd_pd: DataFrame,
+    network_graph: Optional[ig.Graph],
+    cluster_obj: ClusterHandler,
+    retain: bool,
+    round_callback: Optional[Callable[[ClusterHandler], None]] = None,
+    pool: Optional[ReclusterPool] = None,
+) -> Iterator[List[Network_Interface]]:
+    """Generator that performs the random walk on the graph of the segments
+    and then reclusters the networks that need it. Each batch of networks is
+    yielded as soon as it is finalized
+
+    Parameters
+    ----------
+    ibd_pd : DataFrame
+        dataframe with the columns idnum1, idnum2, and cm for every edge
+
+    network_graph : Optional[ig.Graph]
+        graph of the segments where the vertices are ordered by their idnum.
+        The graph is only used for the first pass so it can be None if the
+        cluster_obj has already completed the first pass
+
+    cluster_obj : ClusterHandler
+        Object that contains information about how the random walk
+        needs to be performed. A handler that was restored from a
+        checkpoint continues from the round after its completed rounds
+
+    retain : bool
+        whether or not the finalized networks should also be kept in
+        the final_clusters attribute of the cluster_obj
+
+    round_callback : Optional[Callable[[ClusterHandler], None]]
+        function that is called with the cluster_obj after the first pass
+        and after every round of reclustering, such as the method that
+        writes the checkpoint
+
+    pool : Optional[ReclusterPool]
+        pool of worker processes that recluster the networks of each round.
+        The networks are reclustered one at a time if no pool is provided
+
+    Yields
+    ------
+    List[Network_Interface]
+        list of networks that were finalized in the most recent
+        clustering step. The list can be empty.
+    """
+    if cluster_obj.completed_rounds == 0:
+        random_walk_results = cluster_obj.random_walk(network_graph)
+
+        allclst = cluster_obj.filter_cluster_size(random_walk_results.sizes())
+
+        cluster_obj.gather_cluster_info(network_graph, allclst, random_walk_results)
+
+        cluster_obj.completed_rounds += 1
+
+        if round_callback is not None:
+            round_callback(cluster_obj)
+
+    yield cluster_obj.pop_finalized(retain)
+
+    while (
+        cluster_obj.check_times < cluster_obj.max_rechecks
+        and len(cluster_obj.recheck_clsts.get(cluster_obj.check_times, [])) > 0
+    ):
+        cluster_obj.check_times += 1
+        logger.verbose(f"recheck: {cluster_obj.check_times}")
+
+        _ = cluster_obj.recheck_clsts.setdefault(cluster_obj.check_times, [])
+
+        networks = cluster_obj.recheck_clsts.get(cluster_obj.check_times - 1)
+
+        if pool is None:
+            for network in networks:
+                cluster_obj.redo_clustering(
+                    network,
+                    ibd_pd,
+                )
+
+                yield cluster_obj.pop_finalized(retain)
+        else:
+            for network, walk_results in zip(networks, pool.map(cluster_obj, networks)):
+                cluster_obj.gather_reclustering(network, *walk_results)
+
+                yield cluster_obj.pop_finalized(retain)
+
+        cluster_obj.completed_rounds += 1
+
+        if round_callback is not None:
+            round_callback(cluster_obj)
+
+
+def stream_clusters(
+    filter_obj: Filter,
+    cluster_obj: ClusterHandler,
+    centimorgan_indx: int,
+    retain: bool = True,
+    round_callback: Optional[Callable[[ClusterHandler], None]] = None,
+    pool: Optional[ReclusterPool] = None,
+) -> Iterator[List[Network_Interface]]:
+    """Generator that performs the clustering using igraph and yields
+    each batch of networks as soon as they are finalized. The first
+    batch has the networks from the first pass of the clustering and
+    every following batch has the networks finalized while
+    reclustering a single network.
+
+    Parameters
+    ----------
+    filter_obj : Filter
+        Filter object that has two attributes: ibd_pd and ibd_vs. These
+        attributes are two dataframes that have information about the
+        edges and information about the vertices.
+
+    cluster_obj : ClusterHandler
+        Object that contains information about how the random walk
+        needs to be performed.
+
+    centimorgan_indx : int
+        index of the column in the ibd file that has the segment length
+        in centimorgans
+
+    retain : bool
+        whether or not the finalized networks should also be kept in
+        the final_clusters attribute of the cluster_obj. Setting this
+        to False lowers the peak memory because networks are only
+        referenced by the consumer of the generator.
+
+    round_callback : Optional[Callable[[ClusterHandler], None]]
+        function that is called with the cluster_obj after the first pass
+        and after every round of reclustering
+
+    pool : Optional[ReclusterPool]
+        pool of worker processes that recluster the networks of each round
+
+    Yields
+    ------
+    List[Network_Interface]
+        list of networks that were finalized in the most recent
+        clustering step. The list can be empty.
+    """
+    filter_obj.ibd_pd = filter_obj.ibd_pd.rename(columns={centimorgan_indx: "cm"})
+    # filtering the edges dataframe to the correct columns
+    ibd_pd = filter_obj.ibd_pd.loc[:, ["idnum1", "idnum2", "cm"]]
+
+    ibd_vs = filter_obj.ibd_vs.reset_index(drop=True)
+
+    # Generate the first pass networks. A handler restored from a checkpoint
+    # has already clustered the graph so the graph isn't needed
+    if cluster_obj.completed_rounds == 0:
+        network_graph = cluster_obj.generate_graph(
+            ibd_pd,
+            ibd_vs,
         )
+    else:
+        network_graph = None
+
+    yield from _walk_networks(
+        ibd_pd, network_graph, cluster_obj, retain, round_callback, pool
+    )
+
+    # logginng the number of segments, haplotypes, and clusters
+    # identified in the analysis
+    logger.info(
+        f"Identified {ibd_pd.shape[0]} IBD segments from {ibd_vs.shape[0]} haplotypes"
+    )
+
+    logger.info(f"Identified {cluster_obj.network_count} IBD clusters")
 
 
 def cluster(
     filter_obj: Filter,
     cluster_obj: ClusterHandler,
     centimorgan_indx: int,
+    round_callback: Optional[Callable[[ClusterHandler], None]] = None,
+    pool: Optional[ReclusterPool] = None,
 ) -> List[Network_Interface]:
     """Main function that will perform the clustering using igraph
 
@@ -460,49 +843,329 @@ def cluster(
         needs to be performed. It will use the construct networks and return those
         values in a list.
 
-    min_network_size : int
-        threshold so we can filter networks that are >= the threshold
+    centimorgan_indx : int
+        index of the column in the ibd file that has the segment length
+        in centimorgans
+
+    round_callback : Optional[Callable[[ClusterHandler], None]]
+        function that is called with the cluster_obj after the first pass
+        and after every round of reclustering
+
+    pool : Optional[ReclusterPool]
+        pool of worker processes that recluster the networks of each round
+
+    Returns
+    -------
+    List[Network_Interface]
+        returns a list of all the networks identified in the analysis
+    """
+    for _ in stream_clusters(
+        filter_obj,
+        cluster_obj,
+        centimorgan_indx,
+        round_callback=round_callback,
+        pool=pool,
+    ):
+        pass
+
+    return cluster_obj.final_clusters
+
+
+@dataclass
+class ComponentCache:
+    """Class that clusters every connected component of a window on its own
+    and keeps the networks found in each component. A component that has no
+    haplotypes from segments that were added or removed since the previous
+    window has exactly the same segments as a component of the previous
+    window so its networks are reused instead of clustering it again.
+    Components are identified by their smallest haplotype id"""
+
+    create_cluster_obj: Callable[[Dict[int, str]], ClusterHandler]
+    networks: Dict[str, List[Network_Interface]] = field(default_factory=dict)
+    reused_count: int = 0
+    clustered_count: int = 0
+
+    @staticmethod
+    def _group(labels: np.ndarray, group_count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Sort the positions of the labels by label while keeping the order
+        of positions with the same label
+
+        Parameters
+        ----------
+        labels : np.ndarray
+            component of each element
+
+        group_count : int
+            number of components
 
         Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            returns the sorted positions and the boundaries of each
+            component in the sorted positions
+        """
+        order = np.argsort(labels, kind="stable")
+
+        boundaries = np.searchsorted(labels[order], np.arange(group_count + 1))
+
+        return order, boundaries
+
+    @staticmethod
+    def _component_graph(
+        idnum1: np.ndarray,
+        idnum2: np.ndarray,
+        centimorgans: np.ndarray,
+        vertex_attributes: Dict[str, List],
+    ) -> ig.Graph:
+        """Create the graph of a component. The haplotypes of the component
+        are already numbered from 0 so the graph is created directly from
+        the edge list. This gives the same graph as generate_graph without
+        creating dataframes for every component
+
+        Parameters
+        ----------
+        idnum1 : np.ndarray
+            integer id of the first haplotype of each edge
+
+        idnum2 : np.ndarray
+            integer id of the second haplotype of each edge
+
+        centimorgans : np.ndarray
+            length of each segment
+
+        vertex_attributes : Dict[str, List]
+            values of each vertex attribute ordered by the integer id
+
+        Returns
+        -------
+        ig.Graph
+            returns the undirected graph where each vertex is named by its
+            integer id and each edge has the cm attribute
+        """
+        vertex_count = len(next(iter(vertex_attributes.values())))
+
+        return ig.Graph(
+            n=vertex_count,
+            edges=np.column_stack((idnum1, idnum2)).tolist(),
+            directed=False,
+            vertex_attrs={"name": list(range(vertex_count)), **vertex_attributes},
+            edge_attrs={"cm": centimorgans.tolist()},
+        )
+
+    def cluster_window(self, window: WindowFilter) -> List[Network_Interface]:
+        """Cluster the components of the window that changed since the
+        previous window and reuse the networks of the other components
+
+        Parameters
+        ----------
+        window : WindowFilter
+            filter object with the segments in the window. The centimorgan
+            column of the segments has to already be named cm
+
+        Returns
+        -------
+        List[Network_Interface]
+            returns the networks in the window. The cluster ids have the
+            form component_clusterid where the component is the index of
+            the component in the window
+        """
+        # the columns are pulled out once because creating dataframes for
+        # every component is slower than clustering small components
+        idnum1 = window.ibd_pd["idnum1"].to_numpy()
+
+        idnum2 = window.ibd_pd["idnum2"].to_numpy()
+
+        centimorgans = window.ibd_pd["cm"].to_numpy()
+
+        haplotypes = window.ibd_vs["hapID"].to_numpy()
+
+        vertex_columns = {
+            column: window.ibd_vs[column].to_numpy()
+            for column in window.ibd_vs.columns
+            if column != "idnum"
+        }
+
+        graph = coo_matrix(
+            (np.ones(len(idnum1), dtype=np.int8), (idnum1, idnum2)),
+            shape=(len(haplotypes), len(haplotypes)),
+        )
+
+        component_count, labels = connected_components(graph, directed=False)
+
+        # the smallest haplotype of each component doesn't depend on how the
+        # haplotypes of the window are numbered
+        haplotype_order = np.argsort(haplotypes)
+
+        _, first_positions = np.unique(labels[haplotype_order], return_index=True)
+
+        keys = haplotypes[haplotype_order[first_positions]]
+
+        if window.changed_haplotypes is None:
+            changed = np.ones(component_count, dtype=bool)
+        else:
+            changed = (
+                np.bincount(
+                    labels,
+                    weights=np.isin(haplotypes, list(window.changed_haplotypes)),
+                    minlength=component_count,
+                )
+                > 0
+            )
+
+        component_sizes = np.bincount(labels, minlength=component_count)
+
+        edge_order, edge_boundaries = self._group(labels[idnum1], component_count)
+
+        vertex_order, vertex_boundaries = self._group(labels, component_count)
+
+        min_cluster_size = self.create_cluster_obj({}).min_cluster_size
+
+        # the haplotypes of each component are renumbered from 0 in the same
+        # order as the window so that a component is numbered the same way
+        # in every window that it is in
+        local_ids = np.empty(len(haplotypes), dtype=np.int64)
+
+        component_networks: Dict[str, List[Network_Interface]] = {}
+
+        networks = []
+
+        for component, key in enumerate(keys.tolist()):
+            if not changed[component] and key in self.networks:
+                found_networks = self.networks[key]
+
+                self.reused_count += 1
+            elif component_sizes[component] <= min_cluster_size:
+                # the component is too small to have any networks
+                found_networks = []
+            else:
+                edge_rows = edge_order[
+                    edge_boundaries[component] : edge_boundaries[component + 1]
+                ]
+
+                vertex_rows = vertex_order[
+                    vertex_boundaries[component] : vertex_boundaries[component + 1]
+                ]
+
+                local_ids[vertex_rows] = np.arange(len(vertex_rows))
+
+                component_pd = DataFrame(
+                    {
+                        "idnum1": local_ids[idnum1[edge_rows]],
+                        "idnum2": local_ids[idnum2[edge_rows]],
+                        "cm": centimorgans[edge_rows],
+                    }
+                )
+
+                component_graph = self._component_graph(
+                    component_pd["idnum1"].to_numpy(),
+                    component_pd["idnum2"].to_numpy(),
+                    centimorgans[edge_rows],
+                    {
+                        column: values[vertex_rows].tolist()
+                        for column, values in vertex_columns.items()
+                    },
+                )
+
+                cluster_obj = self.create_cluster_obj(
+                    dict(enumerate(haplotypes[vertex_rows].tolist()))
+                )
+
+                found_networks = []
+
+                for batch in _walk_networks(
+                    component_pd, component_graph, cluster_obj, retain=False
+                ):
+                    found_networks.extend(batch)
+
+                self.clustered_count += 1
+
+            component_networks[key] = found_networks
+
+            # the networks are copied because the plugins add the pvalues
+            # to the networks of each window
+            networks.extend(
+                replace(network, clst_id=f"{component}_{network.clst_id}")
+                for network in found_networks
+            )
+
+        self.networks = component_networks
+
+        return networks
+
+
+def scan_clusters(
+    windows: Iterable[WindowFilter],
+    create_cluster_obj: Callable[[Dict[int, str]], ClusterHandler],
+    centimorgan_indx: int,
+    incremental: bool = False,
+) -> Iterator[Tuple[WindowFilter, List[Network_Interface]]]:
+    """Cluster the segments in each window of a scan. Every window is
+    clustered independently so the cluster ids of the networks are prefixed
+    with the window label to keep them unique across the scan
+
+    Parameters
+    ----------
+    windows : Iterable[WindowFilter]
+        filter objects with the segments in each window such as the
+        drive.filters.SlidingWindows object
+
+    create_cluster_obj : Callable[[Dict[int, str]], ClusterHandler]
+        function that returns a new ClusterHandler for each window. The
+        function is called with the mapping from the integer id of each
+        haplotype in the window to the haplotype string
+
+    centimorgan_indx : int
+        index of the column in the ibd file that has the segment length
+        in centimorgans
+
+    incremental : bool
+        whether to cluster each connected component of a window on its own
+        so that the networks of components that did not change since the
+        previous window can be reused. The random walk of a component does
+        not depend on the rest of the window but the number of communities
+        chosen from the walk does so the networks can differ slightly from
+        clustering the whole window at once
+
+    Yields
+    ------
+    Tuple[WindowFilter, List[Network_Interface]]
+        the window and the networks identified in the window. Windows
+        without any segments have no networks
     """
-    filter_obj.ibd_pd = filter_obj.ibd_pd.rename(columns={centimorgan_indx: "cm"})
-    # filtering the edges dataframe to the correct columns
-    ibd_pd = filter_obj.ibd_pd.loc[:, ["idnum1", "idnum2", "cm"]]
+    component_cache = ComponentCache(create_cluster_obj)
 
-    ibd_vs = filter_obj.ibd_vs.reset_index(drop=True)
+    for window in windows:
+        if window.ibd_pd.empty:
+            logger.verbose(f"No IBD segments found in the window {window.label}")
 
-    # Generate the first pass networks
-    network_graph = cluster_obj.generate_graph(
-        ibd_pd,
-        ibd_vs,
-    )
+            # none of the components carry over to the next window
+            component_cache.networks = {}
 
-    random_walk_results = cluster_obj.random_walk(network_graph)
+            yield window, []
 
-    allclst = cluster_obj.filter_cluster_size(random_walk_results.sizes())
+            continue
 
-    cluster_obj.gather_cluster_info(network_graph, allclst, random_walk_results)
+        logger.verbose(
+            f"Clustering {window.ibd_pd.shape[0]} IBD segments in the window {window.label}"  # noqa: E501
+        )
 
-    while (
-        cluster_obj.check_times < cluster_obj.max_rechecks
-        and len(cluster_obj.recheck_clsts.get(cluster_obj.check_times, [])) > 0
-    ):
-        cluster_obj.check_times += 1
-        logger.verbose(f"recheck: {cluster_obj.check_times}")
+        if incremental:
+            window.ibd_pd = window.ibd_pd.rename(columns={centimorgan_indx: "cm"})
 
-        _ = cluster_obj.recheck_clsts.setdefault(cluster_obj.check_times, [])
+            networks = component_cache.cluster_window(window)
+        else:
+            haplotype_mappings = {value: key for key, value in window.hapid_map.items()}
 
-        for network in cluster_obj.recheck_clsts.get(cluster_obj.check_times - 1):
-            cluster_obj.redo_clustering(
-                network,
-                ibd_pd,
+            networks = cluster(
+                window, create_cluster_obj(haplotype_mappings), centimorgan_indx
             )
-    # logginng the number of segments, haplotypes, and clusters
-    # identified in the analysis
-    logger.info(
-        f"Identified {network_graph.ecount()} IBD segments from {network_graph.vcount()} haplotypes"
-    )
 
-    logger.info(f"Identified {len(cluster_obj.final_clusters)} IBD clusters")
+        for network in networks:
+            network.clst_id = f"{window.label}_{network.clst_id}"
 
-    return cluster_obj.final_clusters
+        yield window, networks
+
+    if incremental:
+        logger.info(
+            f"Clustered {component_cache.clustered_count} connected components and reused the networks of {component_cache.reused_count} components that did not change between windows"  # noqa: E501
+        )
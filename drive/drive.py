@@ -1,169 +1,743 @@
 import json
-import re
+import sys
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
 
 import typer
+from typer.core import TyperGroup
 
-import drive.factory as factory
-from drive.cluster import ClusterHandler, cluster
-from drive.filters import IbdFilter
 from drive.log import CustomLogger
-from drive.models import Data, FormatTypes, Genes, OverlapOptions, create_indices
+from drive.models.choices import CompressionOptions, FormatTypes, OverlapOptions
 from drive.utilities.callbacks import check_input_exists, check_json_path
-from drive.utilities.parser import PhenotypeFileParser, load_phenotype_descriptions
+from drive.utilities.targets import split_scan_region, split_target_string
 
-app = typer.Typer(add_completion=False)
+# the modules used in the analysis import pandas, numpy, scipy, and igraph.
+# They are only imported once the arguments have been parsed so that
+# commands like --help and invocations with invalid arguments return
+# quickly
+if TYPE_CHECKING:
+    from pandas import DataFrame
 
+    from drive.factory.factory import AnalysisObj
+    from drive.filters import IbdFilter, WindowFilter
+    from drive.models import (
+        CarrierStore,
+        Data,
+        FileIndices,
+        Network_Interface,
+        PhenotypeMatrix,
+        SampleDictionary,
+    )
+
+
+class DefaultCommandGroup(TyperGroup):
+    """Group of commands that runs the cluster command if the first argument
+    is not the name of a command. This keeps commands like 'drive -i ...'
+    working now that there is more than one command"""
+
+    default_command = "cluster"
+
+    def parse_args(self, ctx: typer.Context, args: List[str]) -> List[str]:
+        if args and args[0] not in self.commands and args[0] != "--help":
+            args = [self.default_command, *args]
+
+        return super().parse_args(ctx, args)
+
+
+app = typer.Typer(add_completion=False, cls=DefaultCommandGroup)
+
+# options that are shared by the commands. Typer copies the settings of each
+# option when the command is created so the same option can be the default
+# value of a parameter in several commands
+INPUT_FILE_OPTION = typer.Option(
+    ..., "-i", "--input", help="IBD input file", callback=check_input_exists
+)
+
+IBD_FORMAT_OPTION = typer.Option(
+    FormatTypes.HAPIBD.value,
+    "-f",
+    "--format",
+    help="IBD file format. Allowed values are hapibd, ilash, germline, rapid",
+)
+
+OUTPUT_OPTION = typer.Option(..., "-o", "--output", help="output file prefix")
+
+MIN_CM_OPTION = typer.Option(3, "-m", "--min-cm", help="minimum centimorgan threshold.")
+
+STEP_OPTION = typer.Option(3, "-k", "--step", help="steps for random walk")
+
+MAX_CHECK_OPTION = typer.Option(
+    5,
+    "--max-recheck",
+    help="Maximum number of times to re-perform the clustering. This value will not be used if the flag --no-recluster is used.",  # noqa: E501
+)
+
+CASE_FILE_OPTION = typer.Option(
+    None,
+    "-c",
+    "--cases",
+    help="A file containing individuals who are cases. This file expects for there to be two columns. The first column will have individual ids and the second has status where cases are indicated by a 1 and control are indicated by a 0.",  # noqa: E501
+)
+
+DESCRIPTIONS_OPTION = typer.Option(
+    None,
+    "-d",
+    "--descriptions",
+    help="tab delimited text file that has descriptions for each phecode. this file should have two columns called phecode and phenotype",  # noqa: E501
+)
+
+MAX_NETWORK_SIZE_OPTION = typer.Option(
+    30, "--max-network-size", help="maximum network size allowed"
+)
+
+MIN_CONNECTED_THRESHOLD_OPTION = typer.Option(
+    0.5,
+    "--min-connected-threshold",
+    help="minimum connectedness ratio required for the network",
+)
+
+MIN_NETWORK_SIZE_OPTION = typer.Option(
+    2,
+    "--min-network-size",
+    help="This argument sets the minimun network size that we allow. All networks smaller than this size will be filtered out. If the user wishes to keep all networks they can set this to 0",  # noqa: E501
+)
+
+SEGMENT_DISTRIBUTION_THRESHOLD_OPTION = typer.Option(
+    0.2,
+    "--segment-distribution-threshold",
+    help="Threshold to filter the network length to remove hub individuals",
+)
+
+HUB_THRESHOLD_OPTION = typer.Option(
+    0.01,
+    "--hub-threshold",
+    help="Threshold to determine what percentage of hubs to keep",
+)
+
+JSON_CONFIG_OPTION = typer.Option(
+    None,
+    "--json-config",
+    "-j",
+    help="path to the json config file",
+    callback=check_json_path,
+)
+
+RECLUSTER_OPTION = typer.Option(
+    True,
+    help="whether or not the user wishes the program to automically recluster based on things lik hub threshold, max network size and how connected the graph is. ",  # noqa: E501
+)
+
+VERBOSE_OPTION = typer.Option(
+    0,
+    "--verbose",
+    "-v",
+    help="verbose flag indicating if the user wants more information",
+    count=True,
+)
+
+LOG_TO_CONSOLE_OPTION = typer.Option(
+    False,
+    "--log-to-console",
+    help="Optional flag to log to only the console or also a file",
+    is_flag=True,
+)
+
+LOG_FILENAME_OPTION = typer.Option(
+    "drive.log", "--log-filename", help="Name for the log output file."
+)
+
+COMPRESSION_OPTION = typer.Option(
+    None,
+    "--compression",
+    help="Compression used for the output files of plugins that support it. Allowed values are none, gzip, and zstd. This value overrides the value in the config file.",  # noqa: E501
+)
+
+PHENOTYPES_OPTION = typer.Option(
+    None,
+    "--phenotypes",
+    help="Comma separated list of phenotypes from the phenotype file to analyze. By default every phenotype is analyzed.",  # noqa: E501
+)
 
-def split_target_string(chromo_pos_str: str) -> Genes:
-    """Function that will split the target string provided by the user.
+PLUGIN_THREADS_OPTION = typer.Option(
+    None,
+    "--plugin-threads",
+    help="Number of plugins that can run at the same time. Plugins only run at the same time if they don't read or write the same data. This value overrides the plugin_threads value in the config file. By default the plugins are run one at a time.",  # noqa: E501
+    min=1,
+)
+
+SAMPLE_DICTIONARY_OPTION = typer.Option(
+    None,
+    "--sample-dictionary",
+    help="Directory with the sample dictionary of the project. Every sample and haplotype gets a stable integer code that is the same in every run that uses the directory. New samples are appended to the dictionary.",  # noqa: E501
+)
+
+
+def load_network_phenotypes(
+    case_file: Path, phenotypes: Optional[List[str]], individuals: Iterable[str]
+) -> "PhenotypeMatrix":
+    """Load the phenotype statuses for only the individuals that can be in
+    the networks. The case, control, and exclusion counts still come from
+    the whole cohort
 
     Parameters
     ----------
-    chromo_pos_str : str
-        String that has the region of interest in base pairs.
-        This string will look like 10:1234-1234 where the
-        first number is the chromosome number, then the start
-        position, and then the end position of the region of
-        interest.
+    case_file : Path
+        path to the phenotype file
+
+    phenotypes : Optional[List[str]]
+        phenotypes to load. If no value is provided then every phenotype
+        is loaded
+
+    individuals : Iterable[str]
+        ids of the individuals whose statuses are loaded
 
     Returns
     -------
-    Genes
-        returns a namedtuple that has the chromosome number,
-        the start position, and the end position
+    PhenotypeMatrix
+        returns the individuals x phenotypes int8 status matrix
+    """
+    from drive.utilities.parser import load_phenotype_matrix
 
-    Raises
-    ------
-    ValueError
-        raises a value error if the string was formatted any
-        other way than chromosome:start_position-end_position.
-        Also raises a value error if the start position is
-        larger than the end position
+    phenotype_matrix = load_phenotype_matrix(
+        case_file, phenotypes=phenotypes, individuals=individuals
+    )
+
+    logger = CustomLogger.get_logger(__name__)
+
+    logger.info(
+        f"identified {len(phenotype_matrix.phenotypes)} phenotypes within the file {case_file}. Loaded the statuses for {len(phenotype_matrix.samples)} individuals"  # noqa: E501
+    )
+
+    return phenotype_matrix
+
+
+def get_carriers(
+    phenotype_matrix: Optional["PhenotypeMatrix"],
+    carrier_store: Optional["CarrierStore"],
+) -> Mapping[str, Dict[str, Set[str]]]:
+    """Create the lazy mapping of carriers for the plugins from whichever
+    source of phenotype statuses was loaded
+
+    Parameters
+    ----------
+    phenotype_matrix : Optional[PhenotypeMatrix]
+        status matrix parsed from the phenotype file
+
+    carrier_store : Optional[CarrierStore]
+        bit packed statuses loaded from the phenotype cache
+
+    Returns
+    -------
+    Mapping[str, Dict[str, Set[str]]]
+        returns a mapping from each phenotype to the sets of cases,
+        controls, and excluded individuals. The mapping is empty if no
+        phenotype file was provided
+    """
+    if carrier_store is not None:
+        return carrier_store.carriers()
+    elif phenotype_matrix is not None:
+        return phenotype_matrix.carriers()
+    else:
+        return {}
+
+
+def setup_logger(
+    output_dir: Path,
+    log_filename: str,
+    verbose: int,
+    log_to_console: bool,
+    **inputs: Any,
+) -> CustomLogger:
+    """Create and configure the logger and record the inputs of the command
+
+    Parameters
+    ----------
+    output_dir : Path
+        directory that the log file is written to
+
+    log_filename : str
+        name of the log file
+
+    verbose : int
+        number of times that the verbose flag was used
+
+    log_to_console : bool
+        whether to only log to the console
+
+    inputs : Any
+        values of the command line options that are recorded in the log
+
+    Returns
+    -------
+    CustomLogger
+        returns the configured logger
+    """
+    logger = CustomLogger.create_logger()
+
+    logger.configure(output_dir, log_filename, verbose, log_to_console)
+
+    logger.record_inputs(
+        log_to_console=log_to_console, log_filename=log_filename, **inputs
+    )
+
+    return logger
+
+
+def load_descriptions(phenotype_description_file: Optional[Path]) -> Dict[str, str]:
+    """Load the descriptions of each phenotype if the user provided a file
+
+    Parameters
+    ----------
+    phenotype_description_file : Optional[Path]
+        path to the phenotype descriptions file
+
+    Returns
+    -------
+    Dict[str, str]
+        returns a dictionary where the keys are the phecodes and the values
+        are the descriptions. The dictionary is empty if no file was provided
+    """
+    from drive.utilities.parser import load_phenotype_descriptions
+
+    logger = CustomLogger.get_logger(__name__)
+
+    if phenotype_description_file:
+        logger.verbose(
+            f"Using the phenotype descriptions file at: {phenotype_description_file}"
+        )
+        return load_phenotype_descriptions(phenotype_description_file)
+
+    logger.verbose("No phenotype descriptions provided")
+
+    return {}
+
+
+def load_phenotypes(
+    case_file: Optional[Path],
+    phenotypes: Optional[List[str]],
+    phenotype_cache: Optional[Path] = None,
+    lazy_load: bool = False,
+) -> Tuple[List[str], Optional["PhenotypeMatrix"], Optional["CarrierStore"]]:
+    """Load the phenotype statuses from the phenotype file, the phenotype
+    cache, or only the ids of the cohort if the statuses are loaded after
+    clustering
+
+    Parameters
+    ----------
+    case_file : Optional[Path]
+        path to the phenotype file
+
+    phenotypes : Optional[List[str]]
+        phenotypes to load. If no value is provided then every phenotype
+        is loaded
+
+    phenotype_cache : Optional[Path]
+        directory used to cache the parsed phenotype file
+
+    lazy_load : bool
+        whether to only read the ids of the cohort. The statuses are then
+        loaded with load_network_phenotypes
+
+    Returns
+    -------
+    Tuple[List[str], Optional[PhenotypeMatrix], Optional[CarrierStore]]
+        returns the ids of the individuals in the cohort, the status
+        matrix, and the carrier store. At most one of the status matrix and
+        the carrier store is loaded
     """
-    split_str = re.split(":|-", chromo_pos_str)
+    from drive.utilities.parser import (
+        load_carrier_store,
+        load_phenotype_matrix,
+        load_sample_ids,
+    )
+
+    logger = CustomLogger.get_logger(__name__)
+
+    if case_file and lazy_load:
+        cohort_ids = load_sample_ids(case_file)
+
+        logger.info(
+            f"identified {len(cohort_ids)} individuals within the file {case_file}. The phenotype statuses will be loaded after clustering"  # noqa: E501
+        )
 
-    if len(split_str) != 3:
-        error_msg = f"Expected the gene position string to be formatted like chromosome:start_position-end_position. Instead it was formatted as {chromo_pos_str}"  # noqa: E501
+        return cohort_ids, None, None
+    elif case_file and phenotype_cache is not None:
+        # the cached statuses are memory mapped so only the rows for the
+        # individuals in the networks are read from disk
+        carrier_store = load_carrier_store(case_file, phenotype_cache, phenotypes)
 
-        raise ValueError(error_msg)
+        logger.info(
+            f"identified {len(carrier_store.phenotypes)} phenotypes within the file {case_file}"  # noqa: E501
+        )
 
-    integer_split_str = [int(value) for value in split_str]
+        return carrier_store.samples, None, carrier_store
+    elif case_file:
+        phenotype_matrix = load_phenotype_matrix(case_file, phenotypes=phenotypes)
 
-    if integer_split_str[1] > integer_split_str[2]:
-        raise ValueError(
-            f"expected the start position of the target string to be <= the end position. Instead the start position was {integer_split_str[1]} and the end position was {integer_split_str[2]}"  # noqa: E501
+        logger.info(
+            f"identified {len(phenotype_matrix.phenotypes)} phenotypes within the file {case_file}"  # noqa: E501
         )
 
-    return Genes(*integer_split_str)
+        return phenotype_matrix.samples, phenotype_matrix, None
+
+    logger.info(
+        "No phenotype information provided. Only the clustering step of the analysis will be performed"  # noqa: E501
+    )
+
+    return [], None, None
 
 
-@app.command()
+def load_sample_dictionary(
+    sample_dictionary: Optional[Path], cohort_ids: Iterable[str]
+) -> Optional["SampleDictionary"]:
+    """Load the sample dictionary of the project and add the samples of the
+    phenotype file to it
+
+    Parameters
+    ----------
+    sample_dictionary : Optional[Path]
+        directory with the sample dictionary
+
+    cohort_ids : Iterable[str]
+        ids of the individuals in the phenotype file
+
+    Returns
+    -------
+    Optional[SampleDictionary]
+        returns the sample dictionary or None if no directory was provided
+    """
+    if sample_dictionary is None:
+        return None
+
+    from drive.models import SampleDictionary
+
+    dictionary_obj = SampleDictionary.load(sample_dictionary)
+    # the samples of the phenotype file are added to the sample dictionary
+    # first so that every sample in the cohort has a code even if it doesn't
+    # share a segment in this region
+    dictionary_obj.samples.add(cohort_ids)
+
+    CustomLogger.get_logger(__name__).verbose(
+        f"Using the sample dictionary: {dictionary_obj}"
+    )
+
+    return dictionary_obj
+
+
+def load_analysis_plugins(
+    json_path: Path, plugin_threads: Optional[int]
+) -> Tuple[List["AnalysisObj"], int]:
+    """Create the analysis plugins that are listed in the config file
+
+    Parameters
+    ----------
+    json_path : Path
+        path to the json config file
+
+    plugin_threads : Optional[int]
+        number of plugins that can run at the same time. If no value is
+        provided then the value in the config file is used
+
+    Returns
+    -------
+    Tuple[List[AnalysisObj], int]
+        returns the plugins in the order of the config file and the number
+        of plugins that can run at the same time
+    """
+    import drive.factory as factory
+
+    with open(json_path, encoding="utf-8") as json_config:
+        config = json.load(json_config)
+
+    # plugins from installed packages are only imported if the config file
+    # uses them. Plugin modules listed in the config file are imported now
+    factory.discover_plugins()
+
+    factory.load_plugins(config.get("plugins", []))
+
+    analysis_plugins = [factory.factory_create(item) for item in config["modules"]]
+
+    CustomLogger.get_logger(__name__).debug(
+        f"Using plugins: {', '.join([obj.name for obj in analysis_plugins])}"
+    )
+
+    return analysis_plugins, plugin_threads or config.get("plugin_threads", 1)
+
+
+def get_plugin_options(**options: Any) -> Dict[str, Any]:
+    """Collect the options from the command line that plugins can use. Only
+    options that the user provided are included so that plugins can fall
+    back on the values in the config file
+
+    Parameters
+    ----------
+    options : Any
+        values of the options. Options that are None are left out
+
+    Returns
+    -------
+    Dict[str, Any]
+        returns the options that were provided
+    """
+    return {key: value for key, value in options.items() if value is not None}
+
+
+def get_ibd_edges(
+    filter_obj: "IbdFilter",
+    indices: "FileIndices",
+    centimorgan_column: Optional[Union[int, str]] = None,
+) -> "DataFrame":
+    """Keep the columns of the filtered segments that plugins need to
+    report the edges of each network.
+
+    Parameters
+    ----------
+    filter_obj : IbdFilter
+        filter object with the segments that passed the filters in the
+        ibd_pd attribute
+
+    indices : FileIndices
+        object with the indices of the columns in the ibd file
+
+    centimorgan_column : Optional[Union[int, str]]
+        column with the segment length. The clustering renames the column
+        at the index indices.cM_indx to 'cm' so this value has to be 'cm'
+        if the segments have already been clustered. Defaults to
+        indices.cM_indx
+
+    Returns
+    -------
+    DataFrame
+        returns a dataframe with the columns hapid1, hapid2, idnum1, idnum2,
+        start, end, and cm for every segment used in the clustering. The
+        columns hapcode1 and hapcode2 are also kept if the filter used a
+        sample dictionary
+    """
+    if centimorgan_column is None:
+        centimorgan_column = indices.cM_indx
+
+    # the stable haplotype codes are only present if the filter used a
+    # sample dictionary
+    code_columns = [
+        column
+        for column in ["hapcode1", "hapcode2"]
+        if column in filter_obj.ibd_pd.columns
+    ]
+
+    return filter_obj.ibd_pd.loc[
+        :,
+        [
+            "hapid1",
+            "hapid2",
+            "idnum1",
+            "idnum2",
+            *code_columns,
+            indices.str_indx,
+            indices.end_indx,
+            centimorgan_column,
+        ],
+    ].rename(
+        columns={
+            indices.str_indx: "start",
+            indices.end_indx: "end",
+            centimorgan_column: "cm",
+        }
+    )
+
+
+def summarize_window(
+    window: "WindowFilter", networks: List["Network_Interface"]
+) -> str:
+    """Create the row of the scan summary file for a window
+
+    Parameters
+    ----------
+    window : WindowFilter
+        filter object with the segments in the window
+
+    networks : List[Network_Interface]
+        networks identified in the window
+
+    Returns
+    -------
+    str
+        returns a tab separated row with the window position, the number
+        of segments, haplotypes, and networks, the size of the largest
+        network, and the smallest pvalue in the window with its phenotype
+    """
+    min_pvalue, min_phenotype = "N/A", "N/A"
+
+    for network in networks:
+        pvalue, phenotype = (network.min_pvalue_str.split("\t") + ["N/A"] * 2)[:2]
+
+        if pvalue not in ("", "N/A") and (
+            min_pvalue == "N/A" or float(pvalue) < float(min_pvalue)
+        ):
+            min_pvalue, min_phenotype = pvalue, phenotype
+
+    largest_network = max((len(network.members) for network in networks), default=0)
+
+    return f"{window.window.chr}\t{window.window.start}\t{window.window.end}\t{window.ibd_pd.shape[0]}\t{window.ibd_vs.shape[0]}\t{len(networks)}\t{largest_network}\t{min_pvalue}\t{min_phenotype}\n"  # noqa: E501
+
+
+def scan_network_batches(
+    window_clusters: Iterable[Tuple["WindowFilter", List["Network_Interface"]]],
+    plugin_api: "Data",
+    indices: "FileIndices",
+    summary_file: TextIO,
+) -> Iterator[List["Network_Interface"]]:
+    """Pass the networks of each window to the plugins and write a row
+    to the scan summary file once the plugins have processed the window
+
+    Parameters
+    ----------
+    window_clusters : Iterable[Tuple[WindowFilter, List[Network_Interface]]]
+        windows and their networks such as the generator returned by
+        drive.cluster.scan_clusters
+
+    plugin_api : Data
+        data container shared by the plugins. The ibd_edges attribute is
+        replaced with the segments of each window
+
+    indices : FileIndices
+        object with the indices of the columns in the ibd file
+
+    summary_file : TextIO
+        opened scan summary file
+
+    Yields
+    ------
+    List[Network_Interface]
+        networks identified in each window
+    """
+    summary_file.write(
+        "chromosome\twindow_start\twindow_end\tsegments\thaplotypes\tnetworks\tlargest_network\tmin_pvalue\tmin_phenotype\n"  # noqa: E501
+    )
+
+    for window, networks in window_clusters:
+        # the clustering has already renamed the centimorgan column. Empty
+        # windows still get an empty table of segments because a shard can
+        # start with windows that don't have any segments
+        if not window.ibd_pd.empty:
+            plugin_api.ibd_edges = get_ibd_edges(window, indices, "cm")
+        elif plugin_api.ibd_edges is None:
+            plugin_api.ibd_edges = window.ibd_pd.reindex(
+                columns=["hapid1", "hapid2", "idnum1", "idnum2", "start", "end", "cm"]
+            )
+
+        yield networks
+
+        # the streaming plugins have processed the networks by the time the
+        # generator resumes so the pvalues are available for the summary
+        summary_file.write(summarize_window(window, networks))
+
+
+@app.command("cluster")
 def main(
-    input_file: Path = typer.Option(
-        ..., "-i", "--input", help="IBD input file", callback=check_input_exists
-    ),
-    ibd_format: FormatTypes = typer.Option(
-        FormatTypes.HAPIBD.value,
-        "-f",
-        "--format",
-        help="IBD file format. Allowed values are hapibd, ilash, germline, rapid",
-    ),
+    input_file: Path = INPUT_FILE_OPTION,
+    ibd_format: FormatTypes = IBD_FORMAT_OPTION,
     target: str = typer.Option(
         ...,
         "-t",
         "--target",
         help="Target region or position, chr:start-end or chr:pos",
     ),
-    output: Path = typer.Option(..., "-o", "--output", help="output file prefix"),
-    min_cm: int = typer.Option(
-        3, "-m", "--min-cm", help="minimum centimorgan threshold."
-    ),
-    step: int = typer.Option(3, "-k", "--step", help="steps for random walk"),
-    max_check: int = typer.Option(
-        5,
-        "--max-recheck",
-        help="Maximum number of times to re-perform the clustering. This value will not be used if the flag --no-recluster is used.",  # noqa: E501
-    ),
-    case_file: Optional[Path] = typer.Option(
-        None,
-        "-c",
-        "--cases",
-        help="A file containing individuals who are cases. This file expects for there to be two columns. The first column will have individual ids and the second has status where cases are indicated by a 1 and control are indicated by a 0.",  # noqa: E501
-    ),
+    output: Path = OUTPUT_OPTION,
+    min_cm: int = MIN_CM_OPTION,
+    step: int = STEP_OPTION,
+    max_check: int = MAX_CHECK_OPTION,
+    case_file: Optional[Path] = CASE_FILE_OPTION,
     segment_overlap: OverlapOptions = typer.Option(
         OverlapOptions.CONTAINS.value,
         "--segment-overlap",
         help="Indicates if the user wants the gene to contain the whole target region or if it just needs to overlap the segment.",  # noqa: E501
     ),
-    phenotype_description_file: Optional[Path] = typer.Option(
-        None,
-        "-d",
-        "--descriptions",
-        help="tab delimited text file that has descriptions for each phecode. this file should have two columns called phecode and phenotype",  # noqa: E501
-    ),
-    max_network_size: int = typer.Option(
-        30, "--max-network-size", help="maximum network size allowed"
-    ),
-    minimum_connected_thres: float = typer.Option(
-        0.5,
-        "--min-connected-threshold",
-        help="minimum connectedness ratio required for the network",
-    ),
-    min_network_size: int = typer.Option(
-        2,
-        "--min-network-size",
-        help="This argument sets the minimun network size that we allow. All networks smaller than this size will be filtered out. If the user wishes to keep all networks they can set this to 0",  # noqa: E501
-    ),
-    segment_dist_threshold: float = typer.Option(
-        0.2,
-        "--segment-distribution-threshold",
-        help="Threshold to filter the network length to remove hub individuals",
+    phenotype_description_file: Optional[Path] = DESCRIPTIONS_OPTION,
+    max_network_size: int = MAX_NETWORK_SIZE_OPTION,
+    minimum_connected_thres: float = MIN_CONNECTED_THRESHOLD_OPTION,
+    min_network_size: int = MIN_NETWORK_SIZE_OPTION,
+    segment_dist_threshold: float = SEGMENT_DISTRIBUTION_THRESHOLD_OPTION,
+    hub_threshold: float = HUB_THRESHOLD_OPTION,
+    json_path: Path = JSON_CONFIG_OPTION,
+    recluster: bool = RECLUSTER_OPTION,
+    verbose: int = VERBOSE_OPTION,
+    log_to_console: bool = LOG_TO_CONSOLE_OPTION,
+    log_filename: str = LOG_FILENAME_OPTION,
+    stream: bool = typer.Option(
+        False,
+        "--stream",
+        help="Pass networks to the plugins as soon as they are finalized instead of waiting for all of the reclustering to finish. Only plugins that support streaming are run incrementally.",  # noqa: E501
+        is_flag=True,
     ),
-    hub_threshold: float = typer.Option(
-        0.01,
-        "--hub-threshold",
-        help="Threshold to determine what percentage of hubs to keep",
+    permutations: Optional[int] = typer.Option(
+        None,
+        "--permutations",
+        help="Maximum number of permutations performed for each network by the permutation_pvalues plugin. This value overrides the value in the config file.",  # noqa: E501
     ),
-    json_path: Path = typer.Option(
+    workers: Optional[int] = typer.Option(
         None,
-        "--json-config",
-        "-j",
-        help="path to the json config file",
-        callback=check_json_path,
+        "--workers",
+        help="Number of worker processes that plugins can use. This value overrides the value in the config file. If there is more than one worker then the networks of each round of reclustering are also reclustered in parallel.",  # noqa: E501
     ),
-    recluster: bool = typer.Option(
-        True,
-        help="whether or not the user wishes the program to automically recluster based on things lik hub threshold, max network size and how connected the graph is. ",  # noqa: E501
+    compression: Optional[CompressionOptions] = COMPRESSION_OPTION,
+    phenotype_cache: Optional[Path] = typer.Option(
+        None,
+        "--phenotype-cache",
+        help="Directory used to cache the parsed phenotype file. The cache is reused by later runs as long as the phenotype file has not changed.",  # noqa: E501
     ),
-    verbose: int = typer.Option(
-        0,
-        "--verbose",
-        "-v",
-        help="verbose flag indicating if the user wants more information",
-        count=True,
+    phenotypes: Optional[str] = PHENOTYPES_OPTION,
+    lazy_phenotypes: bool = typer.Option(
+        False,
+        "--lazy-phenotypes",
+        help="Only read the ids from the phenotype file before filtering and then load the phenotype statuses for individuals in the networks. This option is ignored if the --phenotype-cache option is used.",  # noqa: E501
+        is_flag=True,
     ),
-    log_to_console: bool = typer.Option(
+    plugin_threads: Optional[int] = PLUGIN_THREADS_OPTION,
+    sample_dictionary: Optional[Path] = SAMPLE_DICTIONARY_OPTION,
+    checkpoint: bool = typer.Option(
         False,
-        "--log-to-console",
-        help="Optional flag to log to only the console or also a file",
+        "--checkpoint",
+        help="Write checkpoints after filtering the segments, after the first pass of the clustering, and after every round of reclustering. The checkpoint files are written next to the output with the suffix .drive_checkpoint",  # noqa: E501
         is_flag=True,
     ),
-    log_filename: str = typer.Option(
-        "drive.log", "--log-filename", help="Name for the log output file."
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        help="Resume the analysis from the latest stage in the checkpoint of a previous run with the same output prefix. The run fails if the inputs or parameters are different from the previous run. New checkpoints are written as the analysis continues.",  # noqa: E501
+        is_flag=True,
     ),
 ) -> None:
+    """Cluster the IBD segments around a target region"""
+    import drive.factory as factory
+    from drive.api import ClusterParameters, filter_segments
+    from drive.cluster import ReclusterPool, cluster, stream_clusters
+    from drive.models import Data, create_indices
+    from drive.utilities.checkpoint import Checkpoint, checkpoint_key
+
     # getting the programs start time
     start_time = datetime.now()
 
     # creating and configuring the logger and then recording user inputs
-    logger = CustomLogger.create_logger()
-
-    logger.configure(output.parent, log_filename, verbose, log_to_console)
-    # record the input parameters
-    logger.record_inputs(
+    logger = setup_logger(
+        output.parent,
+        log_filename,
+        verbose,
+        log_to_console,
         ibd_file=input_file,
         ibd_program_used=ibd_format,
         gene_target_region=target,
@@ -176,9 +750,18 @@ def main(
         max_network_size=max_network_size,
         minimum_connection_threshold=minimum_connected_thres,
         min_network_size=min_network_size,
-        log_to_console=log_to_console,
-        log_filename=log_filename,
         recluster=recluster,
+        stream=stream,
+        permutations=permutations,
+        workers=workers,
+        compression=compression,
+        phenotype_cache=phenotype_cache,
+        phenotypes=phenotypes,
+        lazy_phenotypes=lazy_phenotypes,
+        plugin_threads=plugin_threads,
+        sample_dictionary=sample_dictionary,
+        checkpoint=checkpoint,
+        resume=resume,
     )
 
     logger.debug(f"Parent directory for log files and output: {output.parent}")
@@ -186,31 +769,21 @@ def main(
     logger.info(f"Analysis start time: {start_time}")
     # we need to load in the phenotype descriptions file to get
     # descriptions of each phenotype
-    if phenotype_description_file:
-        logger.verbose(
-            f"Using the phenotype descriptions file at: {phenotype_description_file}"
-        )
-        desc_dict = load_phenotype_descriptions(phenotype_description_file)
-    else:
-        logger.verbose("No phenotype descriptions provided")
-        desc_dict = {}
+    desc_dict = load_descriptions(phenotype_description_file)
 
     # if the user has provided a phenotype file then we will determine case/control/
     # exclusion counts. Otherwise we return an empty dictionary
-    if case_file:
-        with PhenotypeFileParser(case_file) as phenotype_file:
-            phenotype_counts, cohort_ids = phenotype_file.parse_cases_and_controls()
+    phenotype_list = phenotypes.split(",") if phenotypes else None
 
-            logger.info(
-                f"identified {len(phenotype_counts.keys())} phenotypes within the file {case_file}"  # noqa: E501
-            )
-    else:
-        logger.info(
-            "No phenotype information provided. Only the clustering step of the analysis will be performed"  # noqa: E501
-        )
+    # a cached phenotype file is already quick to load so the statuses
+    # are only loaded lazily if there is no cache
+    lazy_load = case_file is not None and lazy_phenotypes and phenotype_cache is None
+
+    cohort_ids, phenotype_matrix, carrier_store = load_phenotypes(
+        case_file, phenotype_list, phenotype_cache, lazy_load
+    )
 
-        phenotype_counts = {}
-        cohort_ids = []
+    dictionary_obj = load_sample_dictionary(sample_dictionary, cohort_ids)
 
     indices = create_indices(ibd_format.lower())
 
@@ -221,12 +794,54 @@ def main(
 
     logger.debug(f"Identified a target region: {target_gene}")
 
-    filter_obj: IbdFilter = IbdFilter.load_file(input_file, indices, target_gene)
+    parameters = ClusterParameters(
+        min_cm=min_cm,
+        segment_overlap=segment_overlap,
+        step=step,
+        max_recheck=max_check,
+        max_network_size=max_network_size,
+        min_connected_threshold=minimum_connected_thres,
+        min_network_size=min_network_size,
+        segment_distribution_threshold=segment_dist_threshold,
+        hub_threshold=hub_threshold,
+        recluster=recluster,
+    )
+
+    # a run that is resumed also keeps writing checkpoints so that it can be
+    # resumed again if it is stopped before the clustering finishes
+    if checkpoint or resume:
+        run_key = checkpoint_key(
+            input_file,
+            ibd_format,
+            target_gene,
+            parameters,
+            case_file,
+            sample_dictionary,
+        )
+
+        if resume:
+            checkpoint_obj = Checkpoint.resume(output, run_key)
+        else:
+            checkpoint_obj = Checkpoint.create(output, run_key)
+
+        filter_obj = checkpoint_obj.load_filter(indices, target_gene)
+    else:
+        checkpoint_obj = None
+
+        filter_obj = None
 
-    # choosing the proper way to filter the ibd files
-    filter_obj.set_filter(segment_overlap)
+    if filter_obj is None:
+        filter_obj = filter_segments(
+            input_file, indices, target_gene, parameters, cohort_ids, dictionary_obj
+        )
+        if filter_obj is None:
+            logger.info(
+                "No individuals from the analysis cohort share an IBD segment across the provided target region. Please ensure that the target region is correct. Exiting program now."  # noqa: E501
+            )
+            sys.exit(0)
 
-    filter_obj.preprocess(min_cm, cohort_ids)
+        if checkpoint_obj is not None:
+            checkpoint_obj.save_filter(filter_obj)
 
     # We need to invert the hapid_map dictionary so that the
     # integer mappings are keys and the values are the
@@ -234,41 +849,329 @@ def main(
     hapid_inverted = {value: key for key, value in filter_obj.hapid_map.items()}
 
     # creating the object that will handle clustering within the networks
-    cluster_handler = ClusterHandler(
-        minimum_connected_thres,
-        max_network_size,
-        max_check,
-        step,
-        min_network_size,
-        segment_dist_threshold,
-        hub_threshold,
-        hapid_inverted,
-        recluster,
+    cluster_handler = parameters.create_cluster_handler(hapid_inverted)
+
+    if checkpoint_obj is not None:
+        checkpoint_obj.restore_round(cluster_handler)
+
+        round_callback = checkpoint_obj.save_round
+    else:
+        round_callback = None
+
+    # This section will load in the analysis plugins from the config file
+    analysis_plugins, plugin_threads = load_analysis_plugins(json_path, plugin_threads)
+
+    # options from the commandline that plugins can use
+    plugin_options = get_plugin_options(
+        permutations=permutations,
+        workers=workers,
+        compression=compression.value if compression else None,
+        target=target_gene,
     )
 
-    networks = cluster(filter_obj, cluster_handler, indices.cM_indx)
+    ibd_edges = get_ibd_edges(filter_obj, indices)
 
-    # creating the data container that all the plugins can interact with
-    plugin_api = Data(networks, output, phenotype_counts, desc_dict)
+    # the workers that recluster the networks attach to a shared copy of the
+    # edges. The block is unlinked once the analysis finishes or fails
+    if workers is not None and workers > 1 and recluster:
+        recluster_context = ReclusterPool.create(ibd_edges, workers)
+    else:
+        recluster_context = nullcontext()
 
-    logger.debug(f"Data container: {plugin_api}")
+    with recluster_context as recluster_pool:
+        if stream:
+            # the networks are not known before they are streamed so the
+            # statuses are loaded for everyone in the filtered segments
+            if lazy_load:
+                phenotype_matrix = load_network_phenotypes(
+                    case_file,
+                    phenotype_list,
+                    set(filter_obj.ibd_pd[indices.id1_indx]).union(
+                        filter_obj.ibd_pd[indices.id2_indx]
+                    ),
+                )
 
-    # making sure that the output directory is created
-    # This section will load in the analysis plugins and run each plugin
-    with open(json_path, encoding="utf-8") as json_config:
-        config = json.load(json_config)
+            phenotype_counts = get_carriers(phenotype_matrix, carrier_store)
+
+            # creating the data container that all the plugins can interact
+            # with. The networks are passed to the plugins in batches as they
+            # are finalized
+            plugin_api = Data(
+                [],
+                output,
+                phenotype_counts,
+                desc_dict,
+                plugin_options,
+                phenotype_matrix,
+                carrier_store=carrier_store,
+                ibd_edges=ibd_edges,
+            )
+
+            logger.debug(f"Data container: {plugin_api}")
+
+            # the checkpoints need every finalized network so the networks are
+            # only released after they are streamed if there are no checkpoints
+            network_batches = stream_clusters(
+                filter_obj,
+                cluster_handler,
+                indices.cM_indx,
+                retain=checkpoint_obj is not None,
+                round_callback=round_callback,
+                pool=recluster_pool,
+            )
+
+            factory.stream_plugins(
+                analysis_plugins, plugin_api, network_batches, plugin_threads
+            )
+        else:
+            networks = cluster(
+                filter_obj,
+                cluster_handler,
+                indices.cM_indx,
+                round_callback,
+                pool=recluster_pool,
+            )
+
+            if lazy_load:
+                phenotype_matrix = load_network_phenotypes(
+                    case_file,
+                    phenotype_list,
+                    set().union(*[network.members for network in networks]),
+                )
+
+            phenotype_counts = get_carriers(phenotype_matrix, carrier_store)
 
-        factory.load_plugins(config["plugins"])
+            # creating the data container that all the plugins can interact with
+            plugin_api = Data(
+                networks,
+                output,
+                phenotype_counts,
+                desc_dict,
+                plugin_options,
+                phenotype_matrix,
+                carrier_store=carrier_store,
+                ibd_edges=ibd_edges,
+            )
+
+            logger.debug(f"Data container: {plugin_api}")
+
+            # iterating over every plugin and then running the analyze method
+            factory.run_plugins(analysis_plugins, plugin_api, plugin_threads)
+
+    end_time = datetime.now()
+
+    logger.info(
+        f"Analysis finished at {end_time}. Total runtime: {end_time - start_time}"
+    )
+
+
+@app.command("scan")
+def scan(
+    input_file: Path = INPUT_FILE_OPTION,
+    ibd_format: FormatTypes = IBD_FORMAT_OPTION,
+    target: str = typer.Option(
+        ...,
+        "-t",
+        "--target",
+        help="Chromosome to scan or region of the chromosome to scan formatted as chr:start-end",  # noqa: E501
+    ),
+    output: Path = OUTPUT_OPTION,
+    window_size: int = typer.Option(
+        1_000_000, "--window-size", help="width of each window in base pairs", min=1
+    ),
+    window_step: int = typer.Option(
+        500_000,
+        "--window-step",
+        help="distance in base pairs between the start of consecutive windows",
+        min=1,
+    ),
+    min_cm: int = MIN_CM_OPTION,
+    step: int = STEP_OPTION,
+    max_check: int = MAX_CHECK_OPTION,
+    case_file: Optional[Path] = CASE_FILE_OPTION,
+    segment_overlap: OverlapOptions = typer.Option(
+        OverlapOptions.CONTAINS.value,
+        "--segment-overlap",
+        help="Indicates if the segments have to contain the whole window or if they just need to overlap the window.",  # noqa: E501
+    ),
+    phenotype_description_file: Optional[Path] = DESCRIPTIONS_OPTION,
+    max_network_size: int = MAX_NETWORK_SIZE_OPTION,
+    minimum_connected_thres: float = MIN_CONNECTED_THRESHOLD_OPTION,
+    min_network_size: int = MIN_NETWORK_SIZE_OPTION,
+    segment_dist_threshold: float = SEGMENT_DISTRIBUTION_THRESHOLD_OPTION,
+    hub_threshold: float = HUB_THRESHOLD_OPTION,
+    json_path: Path = JSON_CONFIG_OPTION,
+    recluster: bool = RECLUSTER_OPTION,
+    verbose: int = VERBOSE_OPTION,
+    log_to_console: bool = LOG_TO_CONSOLE_OPTION,
+    log_filename: str = LOG_FILENAME_OPTION,
+    compression: Optional[CompressionOptions] = COMPRESSION_OPTION,
+    phenotypes: Optional[str] = PHENOTYPES_OPTION,
+    plugin_threads: Optional[int] = PLUGIN_THREADS_OPTION,
+    incremental: bool = typer.Option(
+        False,
+        "--incremental",
+        help="Cluster each connected component of a window on its own and reuse the networks of components that did not change since the previous window. The networks can differ slightly from clustering the whole window at once.",  # noqa: E501
+        is_flag=True,
+    ),
+    shard: Optional[str] = typer.Option(
+        None,
+        "--shard",
+        help="Only scan one shard of the windows, formatted as number/count such as 1/4. The windows are split into shards with about the same number of segments. Each shard writes its own output files and the 'merge' command combines them once every shard has finished.",  # noqa: E501
+    ),
+    sample_dictionary: Optional[Path] = SAMPLE_DICTIONARY_OPTION,
+) -> None:
+    """Slide a window across a chromosome and cluster the IBD segments in every window"""  # noqa: E501
+    import drive.factory as factory
+    from drive.api import ClusterParameters, filter_segments
+    from drive.cluster import scan_clusters
+    from drive.filters import SlidingWindows
+    from drive.models import Data, create_indices
+    from drive.utilities.shards import shard_name, split_shard_string
 
-        analysis_plugins = [factory.factory_create(item) for item in config["modules"]]
+    start_time = datetime.now()
+
+    # every shard writes to its own files so that shards running on
+    # different nodes never write to the same file
+    if shard is not None:
+        shard_number, shard_count = split_shard_string(shard)
 
-        logger.debug(
-            f"Using plugins: {', '.join([obj.name for obj in analysis_plugins])}"
+        output = output.parent / shard_name(output.name, shard_number, shard_count)
+
+        log_filename = shard_name(
+            log_filename, shard_number, shard_count, Path(log_filename).suffix
         )
 
-        # iterating over every plugin and then running the analyze and write method
-        for analysis_obj in analysis_plugins:
-            analysis_obj.analyze(data=plugin_api)
+    logger = setup_logger(
+        output.parent,
+        log_filename,
+        verbose,
+        log_to_console,
+        ibd_file=input_file,
+        ibd_program_used=ibd_format,
+        scan_region=target,
+        output_prefix=output,
+        window_size=window_size,
+        window_step=window_step,
+        phenotype_description_file=phenotype_description_file,
+        phenotype_file=case_file,
+        minimum_centimorgan_threshold=min_cm,
+        random_walk_step_size=step,
+        max_recheck_times=max_check,
+        max_network_size=max_network_size,
+        minimum_connection_threshold=minimum_connected_thres,
+        min_network_size=min_network_size,
+        recluster=recluster,
+        compression=compression,
+        phenotypes=phenotypes,
+        plugin_threads=plugin_threads,
+        incremental=incremental,
+        shard=shard,
+        sample_dictionary=sample_dictionary,
+    )
+
+    logger.info(f"Analysis start time: {start_time}")
+
+    desc_dict = load_descriptions(phenotype_description_file)
+
+    cohort_ids, phenotype_matrix, carrier_store = load_phenotypes(
+        case_file, phenotypes.split(",") if phenotypes else None
+    )
+
+    dictionary_obj = load_sample_dictionary(sample_dictionary, cohort_ids)
+
+    indices = create_indices(ibd_format.lower())
+
+    scan_target, whole_chromosome = split_scan_region(target)
+
+    parameters = ClusterParameters(
+        min_cm=min_cm,
+        segment_overlap=segment_overlap,
+        step=step,
+        max_recheck=max_check,
+        max_network_size=max_network_size,
+        min_connected_threshold=minimum_connected_thres,
+        min_network_size=min_network_size,
+        segment_distribution_threshold=segment_dist_threshold,
+        hub_threshold=hub_threshold,
+        recluster=recluster,
+    )
+
+    # the ibd file is only read and filtered once. Every segment that
+    # overlaps the scanned region is kept and the windows then select
+    # their segments from the sorted segments
+    filter_obj = filter_segments(
+        input_file,
+        indices,
+        scan_target,
+        parameters.update(segment_overlap=OverlapOptions.OVERLAPS.value),
+        cohort_ids,
+        dictionary_obj,
+    )
+
+    if filter_obj is None:
+        logger.info(
+            "No individuals from the analysis cohort share an IBD segment across the provided scan region. Please ensure that the scan region is correct. Exiting program now."  # noqa: E501
+        )
+        sys.exit(0)
+
+    windows = SlidingWindows.from_filter(
+        filter_obj,
+        indices,
+        window_size,
+        window_step,
+        parameters.segment_overlap,
+        None if whole_chromosome else scan_target,
+    )
+
+    if shard is not None:
+        windows = windows.shard(shard_number, shard_count)
+
+    analysis_plugins, plugin_threads = load_analysis_plugins(json_path, plugin_threads)
+
+    # the networks of every window are written as a single run so the
+    # target is the region that the windows of this scan or shard cover
+    plugin_options = get_plugin_options(
+        compression=compression.value if compression else None,
+        shard=(shard_number, shard_count) if shard is not None else None,
+        target=windows.scanned_region(),
+    )
+
+    plugin_api = Data(
+        [],
+        output,
+        get_carriers(phenotype_matrix, carrier_store),
+        desc_dict,
+        plugin_options,
+        phenotype_matrix,
+        carrier_store=carrier_store,
+    )
+
+    summary_path = output.parent / (output.name + ".drive_scan_summary.txt")
+
+    logger.debug(f"Writing the scan summary to {summary_path}")
+
+    with open(summary_path, "w", encoding="utf-8") as summary_file:
+        network_batches = scan_network_batches(
+            # every window is clustered with a new handler because the
+            # handler keeps track of the networks that are being reclustered
+            scan_clusters(
+                windows,
+                parameters.create_cluster_handler,
+                indices.cM_indx,
+                incremental,
+            ),
+            plugin_api,
+            indices,
+            summary_file,
+        )
+
+        factory.stream_plugins(
+            analysis_plugins,
+            plugin_api,
+            network_batches,
+            plugin_threads,
+        )
 
     end_time = datetime.now()
 
@@ -277,5 +1180,207 @@ def main(
     )
 
 
+@app.command("merge")
+def merge(
+    output: Path = typer.Option(
+        ...,
+        "-o",
+        "--output",
+        help="output file prefix that was used for the sharded runs. The merged files are written with this prefix",  # noqa: E501
+    ),
+    shards: int = typer.Option(
+        ..., "--shards", help="number of shards that the runs were split into", min=1
+    ),
+    database: Optional[Path] = typer.Option(
+        None,
+        "--database",
+        help="database that the sqlite_writer plugin was configured with. By default the shard databases are expected in the output directory as drive_results.shard_{number}_of_{count}.sqlite",  # noqa: E501
+    ),
+    verbose: int = typer.Option(
+        0,
+        "--verbose",
+        "-v",
+        help="verbose flag indicating if the user wants more information",
+        count=True,
+    ),
+    log_to_console: bool = typer.Option(
+        False,
+        "--log-to-console",
+        help="Optional flag to log to only the console or also a file",
+        is_flag=True,
+    ),
+    log_filename: str = typer.Option(
+        "drive.log", "--log-filename", help="Name for the log output file."
+    ),
+) -> None:
+    """Combine the output files and databases of sharded scans into one output"""
+    from drive.plugins.sqlite_writer import DEFAULT_DATABASE_NAME, merge_databases
+    from drive.utilities.shards import merge_shard_outputs, shard_name
+
+    logger = CustomLogger.create_logger()
+
+    logger.configure(output.parent, log_filename, verbose, log_to_console)
+
+    logger.record_inputs(
+        output_prefix=output,
+        shards=shards,
+        database=database,
+        log_to_console=log_to_console,
+        log_filename=log_filename,
+    )
+
+    merged_paths = merge_shard_outputs(output, shards)
+
+    logger.info(
+        f"Merged the output of {shards} shards into the files: {', '.join(map(str, merged_paths))}"  # noqa: E501
+    )
+
+    if database is None:
+        database = output.parent / DEFAULT_DATABASE_NAME
+
+    shard_databases = [
+        database.parent / shard_name(database.name, number, shards, database.suffix)
+        for number in range(1, shards + 1)
+    ]
+
+    missing_databases = [path for path in shard_databases if not path.exists()]
+    # the sqlite_writer plugin is optional so there is only an error if
+    # some of the shards wrote a database
+    if len(missing_databases) == shards:
+        logger.verbose(f"No shard databases were found for the database {database}")
+    elif missing_databases:
+        raise FileNotFoundError(
+            f"The shard databases {', '.join(map(str, missing_databases))} were not found"  # noqa: E501
+        )
+    else:
+        run_id = merge_databases(shard_databases, database, output)
+
+        logger.info(f"Merged the shard databases into run {run_id} of {database}")
+
+
+@app.command("serve")
+def serve(
+    input_files: List[Path] = typer.Option(
+        ...,
+        "-i",
+        "--input",
+        help="IBD input file. The option can be repeated to load several files or chromosomes",  # noqa: E501
+    ),
+    ibd_format: FormatTypes = IBD_FORMAT_OPTION,
+    host: str = typer.Option(
+        "127.0.0.1", "--host", help="address that the HTTP server listens on"
+    ),
+    port: int = typer.Option(8000, "--port", help="port that the HTTP server uses"),
+    socket_path: Optional[Path] = typer.Option(
+        None,
+        "--socket",
+        help="Path to a Unix socket to listen on instead of the HTTP port.",
+    ),
+    workers: int = typer.Option(
+        4,
+        "--workers",
+        help="Number of requests that are answered at the same time",
+        min=1,
+    ),
+    min_cm: int = typer.Option(
+        3, "-m", "--min-cm", help="default minimum centimorgan threshold."
+    ),
+    step: int = STEP_OPTION,
+    max_check: int = MAX_CHECK_OPTION,
+    case_file: Optional[Path] = CASE_FILE_OPTION,
+    segment_overlap: OverlapOptions = typer.Option(
+        OverlapOptions.CONTAINS.value,
+        "--segment-overlap",
+        help="Indicates if the user wants the gene to contain the whole target region or if it just needs to overlap the segment.",  # noqa: E501
+    ),
+    phenotype_description_file: Optional[Path] = DESCRIPTIONS_OPTION,
+    max_network_size: int = MAX_NETWORK_SIZE_OPTION,
+    minimum_connected_thres: float = MIN_CONNECTED_THRESHOLD_OPTION,
+    min_network_size: int = MIN_NETWORK_SIZE_OPTION,
+    segment_dist_threshold: float = SEGMENT_DISTRIBUTION_THRESHOLD_OPTION,
+    hub_threshold: float = HUB_THRESHOLD_OPTION,
+    recluster: bool = RECLUSTER_OPTION,
+    phenotypes: Optional[str] = PHENOTYPES_OPTION,
+    sample_dictionary: Optional[Path] = typer.Option(
+        None,
+        "--sample-dictionary",
+        help="Directory with the sample dictionary of the project. The networks in the responses also have the stable codes of their members and haplotypes. New samples are appended to the dictionary when the server starts.",  # noqa: E501
+    ),
+    verbose: int = VERBOSE_OPTION,
+    log_to_console: bool = LOG_TO_CONSOLE_OPTION,
+    log_filename: str = LOG_FILENAME_OPTION,
+) -> None:
+    """Load the IBD segments into memory once and answer clustering requests for targets over HTTP"""  # noqa: E501
+    from drive.api import Session
+    from drive.utilities.server import QueryServer, UnixQueryServer
+
+    start_time = datetime.now()
+
+    logger = setup_logger(
+        Path.cwd(),
+        log_filename,
+        verbose,
+        log_to_console,
+        ibd_files=input_files,
+        ibd_program_used=ibd_format,
+        host=host,
+        port=port,
+        socket=socket_path,
+        workers=workers,
+        phenotype_description_file=phenotype_description_file,
+        phenotype_file=case_file,
+        minimum_centimorgan_threshold=min_cm,
+        random_walk_step_size=step,
+        max_recheck_times=max_check,
+        max_network_size=max_network_size,
+        minimum_connection_threshold=minimum_connected_thres,
+        min_network_size=min_network_size,
+        recluster=recluster,
+        phenotypes=phenotypes,
+        sample_dictionary=sample_dictionary,
+    )
+
+    session = Session.load(
+        input_files,
+        ibd_format,
+        case_file,
+        phenotype_description_file,
+        phenotypes.split(",") if phenotypes else None,
+        sample_dictionary,
+        min_cm=min_cm,
+        segment_overlap=segment_overlap,
+        step=step,
+        max_recheck=max_check,
+        max_network_size=max_network_size,
+        min_connected_threshold=minimum_connected_thres,
+        min_network_size=min_network_size,
+        segment_distribution_threshold=segment_dist_threshold,
+        hub_threshold=hub_threshold,
+        recluster=recluster,
+    )
+
+    logger.verbose(f"Loaded the chromosomes {session.chromosomes}")
+
+    if socket_path is not None:
+        server = UnixQueryServer(socket_path, session, workers)
+
+        address = f"the Unix socket {socket_path}"
+    else:
+        server = QueryServer((host, port), session, workers)
+
+        address = f"http://{host}:{server.server_address[1]}"
+
+    logger.info(
+        f"Loaded the data in {datetime.now() - start_time}. Answering requests at {address} with {workers} workers"  # noqa: E501
+    )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Stopping the server")
+    finally:
+        server.server_close()
+
+
 if __name__ == "__main__":
     app()
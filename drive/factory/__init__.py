@@ -1,3 +1,4 @@
 from .factory import create as factory_create
 from .factory import register as factory_register
-from .loader import load_plugins
+from .loader import discover_plugins, load_plugins
+from .runner import run_plugins, stream_plugins
@@ -1,4 +1,10 @@
-from typing import Any, Callable, Protocol
+import inspect
+import time
+from typing import Any, Callable, List, Protocol
+
+from drive.log import CustomLogger
+
+logger = CustomLogger.get_logger(__name__)
 
 
 class PluginNotFound(Exception):
@@ -23,14 +29,89 @@ class AnalysisObj(Protocol):
         """
 
 
+class StreamingAnalysisObj(AnalysisObj, Protocol):
+    """Interface defining an analysis object that can consume
+    networks as they are produced by the clustering"""
+
+    streaming: bool
+
+    def process(self, networks: List[Any], data: Any) -> None:
+        """
+        Method that will analyze a batch of networks as soon as the
+        networks have been finalized
+        """
+
+    def finish(self, data: Any) -> None:
+        """
+        Method that is called once every batch of networks has been
+        processed
+        """
+
+
+class EntryPoint(Protocol):
+    """Interface of the entry points from importlib.metadata"""
+
+    name: str
+    value: str
+
+    def load(self) -> Any:
+        """import the module and return the object the entry point refers to"""
+
+
 analyze_obj_creation_funcs: dict[str, Callable[..., AnalysisObj]] = {}
 
+# plugins that have been discovered but not imported yet
+plugin_entry_points: dict[str, EntryPoint] = {}
+
 
 def register(plugin_name: str, creation_func: Callable[..., AnalysisObj]) -> None:
     """registers the AnalysisObj plugin"""
     analyze_obj_creation_funcs[plugin_name] = creation_func
 
 
+def register_entry_point(plugin_name: str, entry_point: EntryPoint) -> None:
+    """registers the metadata of a plugin so that it can be imported the
+    first time it is created. Plugins that are already registered are
+    not replaced
+
+    Parameters
+    ----------
+    plugin_name : str
+        name of the plugin. This name will be in the json file
+
+    entry_point : EntryPoint
+        entry point that refers to either the initialize function of the
+        plugin module or to the plugin class
+    """
+    if plugin_name not in analyze_obj_creation_funcs:
+        plugin_entry_points.setdefault(plugin_name, entry_point)
+
+
+def _load_entry_point(plugin_name: str) -> None:
+    """import the plugin from its entry point and register it
+
+    Parameters
+    ----------
+    plugin_name : str
+        name of the plugin to import
+    """
+    entry_point = plugin_entry_points.pop(plugin_name)
+
+    start = time.perf_counter()
+
+    plugin_obj = entry_point.load()
+    # the entry point can refer to the plugin class or to the initialize
+    # function of the plugin module that registers the class
+    if inspect.isclass(plugin_obj):
+        register(plugin_name, plugin_obj)
+    else:
+        plugin_obj()
+
+    logger.debug(
+        f"Imported the plugin {plugin_name} from {entry_point.value} in {time.perf_counter() - start:.3f} seconds"  # noqa: E501
+    )
+
+
 def unregister(plugin_name: str) -> None:
     """function that will unregister the plugin
 
@@ -41,12 +122,20 @@ def unregister(plugin_name: str) -> None:
     """
     analyze_obj_creation_funcs.pop(plugin_name, None)
 
+    plugin_entry_points.pop(plugin_name, None)
+
 
 def create(arguments: dict[str, Any]) -> AnalysisObj:
     args_copy = arguments.copy()
 
     plugin_type: str = args_copy.pop("name")
 
+    if (
+        plugin_type not in analyze_obj_creation_funcs
+        and plugin_type in plugin_entry_points
+    ):
+        _load_entry_point(plugin_type)
+
     try:
         creation_func = analyze_obj_creation_funcs[plugin_type]
         return creation_func(**args_copy)
@@ -1,7 +1,31 @@
 """File used to load in the different plugins"""
 
 import importlib
-from typing import Protocol
+import time
+from importlib.metadata import EntryPoint, entry_points
+from typing import List, Protocol
+
+from drive.log import CustomLogger
+
+from .factory import register_entry_point
+
+logger = CustomLogger.get_logger(__name__)
+
+# entry point group that packages use to provide plugins
+PLUGIN_GROUP = "drive.plugins"
+
+# plugins that come with DRIVE. These are the same as the entry points in
+# the pyproject.toml file so that the plugins can still be found when DRIVE
+# is run from the repository without being installed
+BUNDLED_PLUGINS = {
+    "pvalues": "drive.plugins.pvalues:initialize",
+    "network_writer": "drive.plugins.network_writer:initialize",
+    "permutation_pvalues": "drive.plugins.permutation_pvalues:initialize",
+    "columnar_writer": "drive.plugins.columnar_writer:initialize",
+    "long_format_writer": "drive.plugins.long_format_writer:initialize",
+    "edge_writer": "drive.plugins.edge_writer:initialize",
+    "sqlite_writer": "drive.plugins.sqlite_writer:initialize",
+}
 
 
 class PluginInterface(Protocol):
@@ -30,6 +54,57 @@ def import_module(name: str) -> PluginInterface:
 def load_plugins(plugins: list[str]) -> None:
     """Calls the initialize method for each plugin"""
     for plugin_name in plugins:
+        start = time.perf_counter()
+
         plugin = import_module(plugin_name)
 
         plugin.initialize()
+
+        logger.debug(
+            f"Imported and initialized the plugin module {plugin_name} in {time.perf_counter() - start:.3f} seconds"  # noqa: E501
+        )
+
+
+def discover_plugins(group: str = PLUGIN_GROUP) -> List[str]:
+    """Register the plugins that installed packages provide through entry
+    points. Only the names of the plugins are registered. The plugin
+    modules are imported the first time the plugin is created. The
+    plugins that come with DRIVE are registered even if DRIVE is not
+    installed
+
+    Parameters
+    ----------
+    group : str
+        entry point group to search
+
+    Returns
+    -------
+    List[str]
+        returns the names of the plugins that were found
+    """
+    start = time.perf_counter()
+
+    all_entry_points = entry_points()
+    # python versions before 3.10 return a dictionary of groups
+    if hasattr(all_entry_points, "select"):
+        plugin_entry_points = all_entry_points.select(group=group)
+    else:
+        plugin_entry_points = all_entry_points.get(group, [])
+
+    names = []
+
+    for entry_point in plugin_entry_points:
+        register_entry_point(entry_point.name, entry_point)
+
+        names.append(entry_point.name)
+
+    if group == PLUGIN_GROUP:
+        for name, value in BUNDLED_PLUGINS.items():
+            if name not in names:
+                register_entry_point(name, EntryPoint(name, value, group))
+
+    logger.debug(
+        f"Found the plugins {', '.join(names) or 'None'} in the entry point group {group} in {time.perf_counter() - start:.3f} seconds"  # noqa: E501
+    )
+
+    return names
@@ -0,0 +1,373 @@
+"""Module that runs the analysis plugins either once all of the networks
+have been identified or as the networks are streamed from the clustering.
+
+Plugins can declare which attributes of the Data container they read and
+write with the class attributes reads and writes. The runner uses these
+declarations to build a dependency graph where a plugin waits for every
+earlier plugin in the config file that writes an attribute it uses, or
+that uses an attribute it writes. Plugins that don't depend on each other
+can then be run at the same time in a thread pool. Plugins that don't
+declare their attributes wait for every earlier plugin and every later
+plugin waits for them so they always run in the order of the config
+file."""
+
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from drive.log import CustomLogger
+from drive.models import Data_Interface, Network_Interface
+
+from .factory import AnalysisObj
+
+logger = CustomLogger.get_logger(__name__)
+
+
+def is_streaming(plugin: AnalysisObj) -> bool:
+    """Determine if the plugin can consume networks incrementally
+
+    Parameters
+    ----------
+    plugin : AnalysisObj
+        plugin object created by the factory
+
+    Returns
+    -------
+    bool
+        returns True if the plugin declares the streaming attribute
+        and has both a process and a finish method
+    """
+    return (
+        getattr(plugin, "streaming", False)
+        and callable(getattr(plugin, "process", None))
+        and callable(getattr(plugin, "finish", None))
+    )
+
+
+def declared_fields(
+    plugin: AnalysisObj,
+) -> Optional[Tuple[Set[str], Set[str]]]:
+    """Get the attributes of the Data container that the plugin reads and
+    writes
+
+    Parameters
+    ----------
+    plugin : AnalysisObj
+        plugin object created by the factory
+
+    Returns
+    -------
+    Optional[Tuple[Set[str], Set[str]]]
+        returns a tuple where the first element is the set of attributes
+        that the plugin reads and the second element is the set of
+        attributes that the plugin writes. Returns None if the plugin
+        doesn't declare the reads and writes attributes
+    """
+    reads = getattr(plugin, "reads", None)
+
+    writes = getattr(plugin, "writes", None)
+
+    if reads is None or writes is None:
+        return None
+
+    return set(reads), set(writes)
+
+
+def build_dependencies(plugins: List[AnalysisObj]) -> List[Set[int]]:
+    """Determine which earlier plugins each plugin has to wait for
+
+    Parameters
+    ----------
+    plugins : List[AnalysisObj]
+        list of plugins in the order of the config file
+
+    Returns
+    -------
+    List[Set[int]]
+        returns a list with the indices of the plugins that have to
+        finish before each plugin can start
+    """
+    fields = [declared_fields(plugin) for plugin in plugins]
+
+    dependencies: List[Set[int]] = []
+
+    for indx, current in enumerate(fields):
+        dependencies.append(set())
+
+        for earlier_indx, earlier in enumerate(fields[:indx]):
+            if current is None or earlier is None:
+                dependencies[indx].add(earlier_indx)
+                continue
+
+            reads, writes = current
+
+            earlier_reads, earlier_writes = earlier
+
+            if earlier_writes & (reads | writes) or writes & earlier_reads:
+                dependencies[indx].add(earlier_indx)
+
+    return dependencies
+
+
+def run_graph(
+    plugins: List[AnalysisObj],
+    dependencies: List[Set[int]],
+    call: Callable[[AnalysisObj], None],
+    executor: Optional[ThreadPoolExecutor] = None,
+    timings: Optional[Dict[int, float]] = None,
+) -> None:
+    """Call a method of every plugin once the plugins it depends on have
+    finished
+
+    Parameters
+    ----------
+    plugins : List[AnalysisObj]
+        list of plugins in the order of the config file
+
+    dependencies : List[Set[int]]
+        indices of the plugins that each plugin has to wait for. This is
+        the list returned by build_dependencies
+
+    call : Callable[[AnalysisObj], None]
+        function that runs the plugin such as a function that calls the
+        analyze method of the plugin
+
+    executor : Optional[ThreadPoolExecutor]
+        thread pool that independent plugins are run in. If no value is
+        provided then the plugins are run one at a time in the order of
+        the config file
+
+    timings : Optional[Dict[int, float]]
+        dictionary that the wall time of each plugin is added to. The
+        keys are the indices of the plugins
+    """
+    if timings is None:
+        timings = {}
+
+    def timed_call(indx: int) -> None:
+        start = time.perf_counter()
+
+        call(plugins[indx])
+
+        timings[indx] = timings.get(indx, 0.0) + time.perf_counter() - start
+
+    if executor is None:
+        for indx in range(len(plugins)):
+            timed_call(indx)
+        return
+
+    finished: Set[int] = set()
+
+    running: Dict[Future, int] = {}
+
+    waiting = list(range(len(plugins)))
+
+    while waiting or running:
+        for indx in [indx for indx in waiting if dependencies[indx] <= finished]:
+            waiting.remove(indx)
+
+            running[executor.submit(timed_call, indx)] = indx
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            finished.add(running.pop(future))
+            # an error in one plugin stops the analysis after the plugins
+            # that are already running have finished
+            if future.exception() is not None:
+                wait(running)
+                raise future.exception()
+
+
+def log_timings(plugins: List[AnalysisObj], timings: Dict[int, float]) -> None:
+    """Log the wall time of each plugin
+
+    Parameters
+    ----------
+    plugins : List[AnalysisObj]
+        list of plugins in the order of the config file
+
+    timings : Dict[int, float]
+        dictionary where the keys are the indices of the plugins and the
+        values are the wall times in seconds
+    """
+    for indx, plugin in enumerate(plugins):
+        if indx in timings:
+            logger.verbose(f"{plugin.name} ran for {timings[indx]:.3f} seconds")
+
+
+def split_streaming_plugins(
+    plugins: List[AnalysisObj],
+) -> Tuple[List[AnalysisObj], List[AnalysisObj]]:
+    """Split the plugins into the ones that can be streamed and the
+    ones that need all of the networks. Plugins are run in the order
+    of the config file so only the leading streaming plugins can be
+    streamed. Every plugin after the first batch only plugin has to
+    wait for all of the networks.
+
+    Parameters
+    ----------
+    plugins : List[AnalysisObj]
+        list of plugins in the order that they should be run
+
+    Returns
+    -------
+    Tuple[List[AnalysisObj], List[AnalysisObj]]
+        returns a tuple where the first element is the list of plugins
+        that will be streamed and the second element is the list of
+        plugins that will be run once clustering is finished
+    """
+    for indx, plugin in enumerate(plugins):
+        if not is_streaming(plugin):
+            return plugins[:indx], plugins[indx:]
+
+    return plugins, []
+
+
+def run_plugins(
+    plugins: List[AnalysisObj], data: Data_Interface, threads: int = 1
+) -> None:
+    """Run each plugin on all of the networks. Plugins that don't depend on
+    each other are run at the same time if more than one thread is used
+
+    Parameters
+    ----------
+    plugins : List[AnalysisObj]
+        list of plugins in the order that they should be run
+
+    data : Data_Interface
+        data container that has the networks and the phenotype
+        information
+
+    threads : int
+        number of plugins that can be run at the same time. If the value
+        is 1 then the plugins are run one at a time in the order of the
+        config file
+    """
+    timings: Dict[int, float] = {}
+
+    dependencies = build_dependencies(plugins)
+
+    logger.debug(f"Plugin dependencies: {dependencies}")
+
+    executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+
+    try:
+        run_graph(
+            plugins,
+            dependencies,
+            lambda plugin: plugin.analyze(data=data),
+            executor,
+            timings,
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    log_timings(plugins, timings)
+
+
+def process_batch(
+    plugin: AnalysisObj, networks: List[Network_Interface], data: Data_Interface
+) -> None:
+    """Pass a batch of networks to a streaming plugin
+
+    Parameters
+    ----------
+    plugin : AnalysisObj
+        streaming plugin that processes the batch
+
+    networks : List[Network_Interface]
+        networks in the batch
+
+    data : Data_Interface
+        data container that has the phenotype information
+    """
+    plugin.process(networks, data)
+
+
+def stream_plugins(
+    plugins: List[AnalysisObj],
+    data: Data_Interface,
+    network_batches: Iterable[List[Network_Interface]],
+    threads: int = 1,
+) -> None:
+    """Pass each batch of networks to the streaming plugins as soon as
+    the batch is finalized. Plugins that can not consume networks
+    incrementally are run after the clustering is finished.
+
+    Parameters
+    ----------
+    plugins : List[AnalysisObj]
+        list of plugins in the order that they should be run
+
+    data : Data_Interface
+        data container that has the phenotype information. The
+        networks attribute will be filled in with all of the networks
+        if there are plugins that can not be streamed.
+
+    network_batches : Iterable[List[Network_Interface]]
+        iterable of network batches such as the generator returned by
+        drive.cluster.stream_clusters
+
+    threads : int
+        number of plugins that can process a batch at the same time. Every
+        plugin finishes a batch before the next batch is processed
+    """
+    streamed, remaining = split_streaming_plugins(plugins)
+
+    logger.debug(
+        f"Streaming networks to the plugins: {', '.join([obj.name for obj in streamed])}"  # noqa: E501
+    )
+
+    dependencies = build_dependencies(streamed)
+
+    timings: Dict[int, float] = {}
+
+    executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+
+    collected_networks: List[Network_Interface] = []
+
+    try:
+        for networks in network_batches:
+            # the batch is bound to the call so that a plugin can't see a
+            # later batch if the graph returns before every plugin finishes
+            run_graph(
+                streamed,
+                dependencies,
+                partial(process_batch, networks=networks, data=data),
+                executor,
+                timings,
+            )
+            # we only need to hold onto the networks if there are plugins
+            # that have to see every network at once
+            if remaining:
+                collected_networks.extend(networks)
+
+        run_graph(
+            streamed,
+            dependencies,
+            lambda plugin: plugin.finish(data),
+            executor,
+            timings,
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    log_timings(streamed, timings)
+
+    if remaining:
+        logger.debug(
+            f"Running the plugins: {', '.join([obj.name for obj in remaining])} after clustering finished"  # noqa: E501
+        )
+
+        data.networks = collected_networks
+
+        run_plugins(remaining, data, threads)
@@ -1 +1,3 @@
-from .filter import IbdFilter
+from .filter import IbdFilter, NoSegmentsError
+from .segment_index import ChromosomeSegments, SegmentIndex
+from .window import SlidingWindows, WindowFilter
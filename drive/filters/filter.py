@@ -3,14 +3,26 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Callable, Dict, Iterator, List, Optional, TypeVar
 
+import numpy as np
 from pandas import DataFrame, concat, read_csv
 
 from drive.log import CustomLogger
-from drive.models import FileIndices, Genes, OverlapOptions
+from drive.models import FileIndices, Genes, OverlapOptions, SampleDictionary
 
 logger = CustomLogger.get_logger(__name__)
 
-# we are going to create two exception class for the vertex
+
+class NoSegmentsError(Exception):
+    """
+    Error that is raised if no individuals from the analysis cohort
+    share an IBD segment across the target region
+    """
+
+    def __init__(self, target_gene: Genes) -> None:
+        super().__init__(
+            f"No individuals from the analysis cohort share an IBD segment across the target region {target_gene.chr}:{target_gene.start}-{target_gene.end}"  # noqa: E501
+        )
+
 
 T = TypeVar("T", bound="IbdFilter")
 
@@ -27,6 +39,7 @@ class IbdFilter:
     hapid_map: Dict[str, int] = field(default_factory=dict)
     all_haplotypes: List[str] = field(default_factory=list)
     haplotype_id: int = 0
+    sample_dictionary: Optional[SampleDictionary] = None
 
     @classmethod
     def load_file(
@@ -34,6 +47,7 @@ class IbdFilter:
         ibd_file: Path,
         indices: FileIndices,
         target_gene: Genes,
+        sample_dictionary: Optional[SampleDictionary] = None,
     ) -> T:
         """Factory method that returns the IBDFilter model
         This method makes sure that the ibd file exists
@@ -55,6 +69,11 @@ class IbdFilter:
             chromosome, the gene start position, and the
             gene end position.
 
+        sample_dictionary : Optional[SampleDictionary]
+            persistent dictionary used to give the samples and
+            haplotypes stable codes. If no dictionary is provided
+            then only the idnum columns are created
+
         Returns
         -------
         IbdFilter
@@ -72,7 +91,12 @@ class IbdFilter:
 
         input_file_chunks = read_csv(ibd_file, sep="\t", header=None, chunksize=100_100)
 
-        return cls(input_file_chunks, indices, target_gene)
+        return cls(
+            input_file_chunks,
+            indices,
+            target_gene,
+            sample_dictionary=sample_dictionary,
+        )
 
     def _generate_map(self, chunk_data: DataFrame) -> None:
         """Method that will generate the dictionary that maps hapibd to integers
@@ -288,6 +312,33 @@ class IbdFilter:
 
         self.ibd_vs = concat([self.ibd_vs, id2_df])
 
+    def _add_stable_codes(self) -> None:
+        """Add the codes from the sample dictionary to the segments and
+        vertices. The idnums are numbered from 0 for every run because the
+        clustering uses them as the vertices of the graph so the codes are
+        added as the columns hapcode1 and hapcode2 in ibd_pd and samplecode
+        and hapcode in ibd_vs. Samples and haplotypes that are not in the
+        dictionary yet are added to it"""
+        sample_codes = self.sample_dictionary.samples.add(self.ibd_vs["IID"])
+
+        haplotype_codes = self.sample_dictionary.haplotypes.add(self.ibd_vs["hapID"])
+
+        self.ibd_vs["samplecode"] = sample_codes
+
+        self.ibd_vs["hapcode"] = haplotype_codes
+
+        idnum_codes = np.full(self.haplotype_id, -1, dtype=np.int32)
+
+        idnum_codes[self.ibd_vs["idnum"].to_numpy()] = haplotype_codes
+
+        self.ibd_pd["hapcode1"] = idnum_codes[self.ibd_pd["idnum1"].to_numpy()]
+
+        self.ibd_pd["hapcode2"] = idnum_codes[self.ibd_pd["idnum2"].to_numpy()]
+
+        logger.verbose(
+            f"Added the stable codes for {len(sample_codes)} haplotypes from the sample dictionary at {self.sample_dictionary.directory}"  # noqa: E501
+        )
+
     def _filter_for_cohort(
         self, chunk: DataFrame, cohort_ids: Optional[List[str]] = None
     ) -> DataFrame:
@@ -360,17 +411,13 @@ class IbdFilter:
 
     def _check_empty_dataframes(self) -> None:
         """Check if the provided dataframe is empty. If it is
-        then it raises an error and exits the program"""
+        then it raises a NoSegmentsError"""
         if self.ibd_pd.empty:
-            logger.info(
-                "No individuals from the analysis cohort share an IBD segment across the provided target region. Please ensure that the target region is correct. Exiting program now."  # noqa: E501
-            )
-            sys.exit(0)
+            raise NoSegmentsError(self.target_gene)
 
     def preprocess(
         self,
         min_centimorgan: int,
-        target_overlap_style: OverlapOptions,
         cohort_ids: Optional[List[str]] = None,
     ) -> None:
         """Method that will filter the ibd file.
@@ -385,6 +432,11 @@ class IbdFilter:
         cohort_ids : List[str]
             Lists of ids that make up the cohort. The ibd_file
             will be filtered to only this list.
+
+        Raises
+        ------
+        NoSegmentsError
+            raises a NoSegmentsError if no segments passed the filters
         """
         for chunk in self.ibd_file:
             cohort_restricted_chunk = self._filter_for_cohort(chunk, cohort_ids)
@@ -427,3 +479,6 @@ class IbdFilter:
 
         self.ibd_pd.reset_index(drop=True, inplace=True)
         self.ibd_vs = self.ibd_vs.drop_duplicates().sort_values(by="idnum")
+
+        if self.sample_dictionary is not None:
+            self._add_stable_codes()
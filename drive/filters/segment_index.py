@@ -0,0 +1,276 @@
+"""Module with an in memory index of the IBD segments of one or more
+chromosomes. The segments of each chromosome are kept in the order of the
+ibd file and their positions are also sorted by the start position so that
+the segments around a target can be found with a binary search instead of
+reading the ibd file again for every target"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from pandas import DataFrame, concat, read_csv
+
+from drive.log import CustomLogger
+from drive.models import FileIndices, Genes
+
+logger = CustomLogger.get_logger(__name__)
+
+
+@dataclass
+class ChromosomeSegments:
+    """IBD segments of one chromosome. The segments are kept in the order of
+    the ibd file so that the filter numbers the haplotypes the same way as
+    the cluster command. The start and end positions are also stored sorted
+    by the start position to find the segments around a target"""
+
+    segments: DataFrame
+    order: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    max_length: int
+
+    @classmethod
+    def from_segments(
+        cls, segments: DataFrame, indices: FileIndices
+    ) -> "ChromosomeSegments":
+        """Sort the positions of the segments
+
+        Parameters
+        ----------
+        segments : DataFrame
+            segments of one chromosome in the order of the ibd file
+
+        indices : FileIndices
+            object with the indices of the columns in the ibd file
+
+        Returns
+        -------
+        ChromosomeSegments
+            returns the segments with the sorted positions
+        """
+        segments = segments.reset_index(drop=True)
+
+        starts = segments[indices.str_indx].to_numpy()
+
+        ends = segments[indices.end_indx].to_numpy()
+
+        order = np.argsort(starts, kind="stable")
+
+        return cls(
+            segments,
+            order,
+            starts[order],
+            ends[order],
+            int((ends - starts).max()) if len(starts) else 0,
+        )
+
+    def select(self, start: int, end: int) -> DataFrame:
+        """Find every segment that overlaps the region. The segments that
+        contain or overlap a target are always a subset of these segments
+
+        Parameters
+        ----------
+        start : int
+            start position of the region
+
+        end : int
+            end position of the region
+
+        Returns
+        -------
+        DataFrame
+            returns the segments in the order of the ibd file
+        """
+        # no segment that starts before start - max_length can reach the
+        # region so only the segments between the two bounds are checked
+        lower = np.searchsorted(self.starts, start - self.max_length, "left")
+
+        upper = np.searchsorted(self.starts, end, "right")
+
+        overlapping = self.ends[lower:upper] >= start
+
+        rows = np.sort(self.order[lower:upper][overlapping])
+
+        return self.segments.iloc[rows]
+
+    def __len__(self) -> int:
+        return self.segments.shape[0]
+
+
+@dataclass
+class SegmentIndex:
+    """Segments of every chromosome that was loaded into memory"""
+
+    indices: FileIndices
+    chromosomes: Dict[int, ChromosomeSegments] = field(default_factory=dict)
+
+    @classmethod
+    def from_segments(
+        cls,
+        segments: Iterable[DataFrame],
+        indices: FileIndices,
+        cohort_ids: Optional[List[str]] = None,
+    ) -> "SegmentIndex":
+        """Split the segments by chromosome
+
+        Parameters
+        ----------
+        segments : Iterable[DataFrame]
+            chunks of segments in the format of the ibd program without a
+            header. Each chunk can have one or more chromosomes
+
+        indices : FileIndices
+            object with the indices of the columns in the segments
+
+        cohort_ids : Optional[List[str]]
+            ids of the individuals in the cohort. Only the segments shared
+            by two individuals in the cohort are kept. If no ids are
+            provided then every segment is kept
+
+        Returns
+        -------
+        SegmentIndex
+            returns the segments of each chromosome
+        """
+        chunks = []
+
+        for chunk in segments:
+            # the cohort is the same for every target so the segments are
+            # only restricted to the cohort once
+            if cohort_ids:
+                chunk = chunk[
+                    chunk[indices.id1_indx].isin(cohort_ids)
+                    & chunk[indices.id2_indx].isin(cohort_ids)
+                ]
+
+            chunks.append(chunk)
+
+        combined = concat(chunks, ignore_index=True) if chunks else DataFrame()
+
+        chromosomes = {}
+
+        if not combined.empty:
+            for chromosome, chromosome_segments in combined.groupby(
+                indices.chr_indx, sort=True
+            ):
+                chromosomes[chromosome] = ChromosomeSegments.from_segments(
+                    chromosome_segments, indices
+                )
+
+                logger.info(
+                    f"Loaded {len(chromosomes[chromosome])} segments for chromosome {chromosome}"  # noqa: E501
+                )
+
+        return cls(indices, chromosomes)
+
+    @classmethod
+    def load(
+        cls,
+        ibd_files: List[Path],
+        indices: FileIndices,
+        cohort_ids: Optional[List[str]] = None,
+    ) -> "SegmentIndex":
+        """Read the ibd files and split the segments by chromosome
+
+        Parameters
+        ----------
+        ibd_files : List[Path]
+            ibd files to load. Each file can have one or more chromosomes
+
+        indices : FileIndices
+            object with the indices of the columns in the ibd files
+
+        cohort_ids : Optional[List[str]]
+            ids of the individuals in the cohort. Only the segments shared
+            by two individuals in the cohort are kept. If no ids are
+            provided then every segment is kept
+
+        Returns
+        -------
+        SegmentIndex
+            returns the segments of each chromosome
+
+        Raises
+        ------
+        FileNotFoundError
+            raises a FileNotFoundError if one of the files doesn't exist
+        """
+        for ibd_file in ibd_files:
+            if not ibd_file.is_file():
+                raise FileNotFoundError(f"The file, {ibd_file}, was not found")
+
+        def read_chunks() -> Iterable[DataFrame]:
+            for ibd_file in ibd_files:
+                logger.verbose(f"Reading in the ibd input file at {ibd_file}")
+
+                yield from read_csv(ibd_file, sep="\t", header=None, chunksize=100_100)
+
+        return cls.from_segments(read_chunks(), indices, cohort_ids)
+
+    def select(self, target: Genes) -> DataFrame:
+        """Find every segment that overlaps the target
+
+        Parameters
+        ----------
+        target : Genes
+            target region
+
+        Returns
+        -------
+        DataFrame
+            returns the segments in the order of the ibd file
+
+        Raises
+        ------
+        ValueError
+            raises a ValueError if the chromosome of the target was not
+            loaded
+        """
+        chromosome_segments = self.chromosomes.get(target.chr)
+
+        if chromosome_segments is None:
+            raise ValueError(
+                f"The chromosome {target.chr} was not loaded. The loaded chromosomes are {', '.join(map(str, self.chromosomes))}"  # noqa: E501
+            )
+
+        return chromosome_segments.select(target.start, target.end)
+
+    def haplotype_ids(self) -> List[str]:
+        """create the haplotype id of both haplotypes in every segment the
+        same way that the filter does"""
+        haplotypes = []
+
+        for chromosome_segments in self.chromosomes.values():
+            segments = chromosome_segments.segments[
+                [
+                    self.indices.id1_indx,
+                    self.indices.hap1_indx,
+                    self.indices.id2_indx,
+                    self.indices.hap2_indx,
+                ]
+            ].copy()
+
+            self.indices.get_haplotype_id(
+                segments, self.indices.id1_indx, self.indices.hap1_indx, "hapid1"
+            )
+
+            self.indices.get_haplotype_id(
+                segments, self.indices.id2_indx, self.indices.hap2_indx, "hapid2"
+            )
+
+            haplotypes.extend(segments[["hapid1", "hapid2"]].to_numpy().ravel())
+
+        return haplotypes
+
+    def sample_ids(self) -> List[str]:
+        """ids of every individual in a segment"""
+        return [
+            sample
+            for chromosome_segments in self.chromosomes.values()
+            for sample in chromosome_segments.segments[
+                [self.indices.id1_indx, self.indices.id2_indx]
+            ]
+            .to_numpy()
+            .ravel()
+        ]
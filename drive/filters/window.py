@@ -0,0 +1,398 @@
+"""Module that sweeps a window across the IBD segments of a chromosome so that
+every window can be clustered without filtering the ibd file again"""
+
+import heapq
+import sys
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from pandas import DataFrame, factorize
+
+from drive.log import CustomLogger
+from drive.models import FileIndices, Genes, OverlapOptions
+
+from .filter import IbdFilter
+
+logger = CustomLogger.get_logger(__name__)
+
+
+@dataclass
+class WindowFilter:
+    """Filter object for the segments in a single window. This object has the
+    same ibd_pd, ibd_vs, and hapid_map attributes as the IbdFilter so that it
+    can be passed to the clustering. The changed_haplotypes attribute has the
+    haplotypes of every segment that was added or removed since the previous
+    window. It is None for the first window"""
+
+    window: Genes
+    ibd_pd: DataFrame = field(default_factory=DataFrame)
+    ibd_vs: DataFrame = field(default_factory=DataFrame)
+    hapid_map: Dict[str, int] = field(default_factory=dict)
+    changed_haplotypes: Optional[Set[str]] = None
+
+    @property
+    def label(self) -> str:
+        """label of the window formatted like chromosome:start-end"""
+        return f"{self.window.chr}:{self.window.start}-{self.window.end}"
+
+
+@dataclass
+class SlidingWindows:
+    """Class that steps a window across a region of a chromosome. The segments
+    are sorted by their start position once and the segments in the current
+    window are kept as the window advances. Segments enter the window in the
+    order of their start position and leave the window in the order of their
+    end position so each segment is only added and removed once. The segments
+    of each window keep the order of the ibd file and the haplotypes are
+    numbered the same way that the IbdFilter numbers them so that a window
+    is clustered the same way as a run that targets the window"""
+
+    segments: DataFrame
+    vertices: DataFrame
+    region: Genes
+    window_size: int
+    step_size: int
+    segment_overlap: OverlapOptions
+    start_indx: int
+    end_indx: int
+    window_range: Optional[Tuple[int, int]] = None
+
+    @classmethod
+    def from_filter(
+        cls,
+        filter_obj: IbdFilter,
+        indices: FileIndices,
+        window_size: int,
+        step_size: int,
+        segment_overlap: OverlapOptions,
+        region: Optional[Genes] = None,
+    ) -> "SlidingWindows":
+        """Create the sliding windows from the segments that passed the
+        filters
+
+        Parameters
+        ----------
+        filter_obj : IbdFilter
+            filter object that has already been preprocessed with a filter
+            that keeps every segment that overlaps the scanned region
+
+        indices : FileIndices
+            object with the indices of the columns in the ibd file
+
+        window_size : int
+            width of each window in base pairs
+
+        step_size : int
+            distance in base pairs between the start of consecutive windows
+
+        segment_overlap : OverlapOptions
+            whether segments have to contain the whole window or just
+            overlap the window
+
+        region : Optional[Genes]
+            region that is scanned. If no region is provided then the whole
+            chromosome of the target_gene of the filter object is scanned
+            from the start of the first segment to the end of the last segment
+
+        Returns
+        -------
+        SlidingWindows
+            returns the initialized SlidingWindows object
+
+        Raises
+        ------
+        ValueError
+            raises a ValueError if the window size or step size are not
+            positive integers
+        """
+        if window_size <= 0 or step_size <= 0:
+            raise ValueError(
+                f"Expected the window size and step size to be positive integers. Instead the window size was {window_size} and the step size was {step_size}"  # noqa: E501
+            )
+
+        chromosome = filter_obj.target_gene.chr
+
+        ibd_pd = filter_obj.ibd_pd
+
+        segments = ibd_pd[ibd_pd[indices.chr_indx] == chromosome].reset_index(drop=True)
+
+        if region is None:
+            region = Genes(
+                chromosome,
+                int(segments[indices.str_indx].min()),
+                int(segments[indices.end_indx].max()),
+            )
+
+        vertices = filter_obj.ibd_vs.drop_duplicates(subset="hapID").set_index(
+            "hapID", drop=False
+        )
+
+        logger.verbose(
+            f"Scanning {segments.shape[0]} segments with a window size of {window_size} and a step size of {step_size}"  # noqa: E501
+        )
+
+        return cls(
+            segments,
+            vertices,
+            region,
+            window_size,
+            step_size,
+            segment_overlap,
+            indices.str_indx,
+            indices.end_indx,
+        )
+
+    def window_positions(self) -> Iterator[Tuple[int, int]]:
+        """Generate the start and end position of each window. The windows
+        start at the beginning of the region and stop once a window reaches
+        the end of the region
+
+        Yields
+        ------
+        Tuple[int, int]
+            start and end position of the window
+        """
+        window_start = int(self.region.start)
+
+        while True:
+            window_end = window_start + self.window_size
+
+            yield window_start, window_end
+
+            if window_end >= self.region.end:
+                break
+
+            window_start += self.step_size
+
+    def _create_window(self, window: Genes, rows: List[int]) -> WindowFilter:
+        """Create the filter object for the window
+
+        Parameters
+        ----------
+        window : Genes
+            chromosome, start position, and end position of the window
+
+        rows : List[int]
+            sorted rows of the segments dataframe that are in the window
+
+        Returns
+        -------
+        WindowFilter
+            returns the filter object with the segments and the haplotypes
+            in the window
+        """
+        if not rows:
+            return WindowFilter(window)
+
+        ibd_pd = self.segments.iloc[rows].reset_index(drop=True)
+
+        # the haplotypes are numbered in the order that they first appear
+        # in the segments, alternating between hapid1 and hapid2 of each
+        # segment, which is the order that the IbdFilter uses
+        idnums, haplotypes = factorize(ibd_pd[["hapid1", "hapid2"]].to_numpy().ravel())
+
+        ibd_pd["idnum1"] = idnums[0::2]
+
+        ibd_pd["idnum2"] = idnums[1::2]
+
+        ibd_vs = self.vertices.loc[haplotypes].reset_index(drop=True)
+
+        ibd_vs["idnum"] = np.arange(len(haplotypes))
+
+        hapid_map = {haplotype: indx for indx, haplotype in enumerate(haplotypes)}
+
+        return WindowFilter(window, ibd_pd, ibd_vs, hapid_map)
+
+    def _sweep(self) -> Iterator[Tuple[int, int, Set[int], Set[int], Set[int]]]:
+        """Sweep the window across the region. Segments are added to the
+        active set once they start before the window boundary and are
+        removed from a heap ordered by end position once they end before
+        the window boundary
+
+        Yields
+        ------
+        Tuple[int, int, Set[int], Set[int], Set[int]]
+            start and end position of the window, the rows of the segments
+            in the window, and the rows that were added and removed since
+            the previous window. The active set is updated in place so it
+            has to be copied if it is kept
+        """
+        # the segments are visited in order of their start position
+        order = np.argsort(self.segments[self.start_indx].to_numpy(), kind="stable")
+
+        starts = self.segments[self.start_indx].to_numpy()[order]
+
+        ends = self.segments[self.end_indx].to_numpy()
+
+        contains = self.segment_overlap == "contains"
+
+        next_segment = 0
+
+        active: Set[int] = set()
+
+        ending: List[Tuple[int, int]] = []
+
+        for window_start, window_end in self.window_positions():
+            # when the segments have to contain the window they have to start
+            # before the window and end after it. Otherwise they only have to
+            # start before the window ends and end after the window starts
+            add_before, remove_before = (
+                (window_start, window_end) if contains else (window_end, window_start)
+            )
+
+            add_until = int(np.searchsorted(starts, add_before, side="right"))
+
+            added = set(order[next_segment:add_until].tolist())
+
+            for row in added:
+                active.add(row)
+
+                heapq.heappush(ending, (ends[row], row))
+
+            next_segment = max(next_segment, add_until)
+
+            removed = set()
+
+            while ending and ending[0][0] < remove_before:
+                _, row = heapq.heappop(ending)
+
+                active.discard(row)
+
+                removed.add(row)
+
+            yield window_start, window_end, active, added, removed
+
+    def segment_counts(self) -> List[int]:
+        """Count the segments in each window without creating the windows
+
+        Returns
+        -------
+        List[int]
+            returns the number of segments in each window
+        """
+        return [len(active) for _, _, active, _, _ in self._sweep()]
+
+    def shard(self, shard_number: int, shard_count: int) -> "SlidingWindows":
+        """Split the windows into contiguous shards that have about the same
+        number of segments and return the windows of one shard. Each window
+        costs the number of segments in the window plus one so that shards
+        of windows without segments are also balanced. The shards only depend
+        on the segments and the window parameters so shards that are run
+        separately with the same inputs never share a window
+
+        Parameters
+        ----------
+        shard_number : int
+            1-based number of the shard to return
+
+        shard_count : int
+            total number of shards
+
+        Returns
+        -------
+        SlidingWindows
+            returns a copy of the object that only yields the windows of the
+            shard
+
+        Raises
+        ------
+        ValueError
+            raises a ValueError if the shard number is not between 1 and the
+            shard count
+        """
+        if not 1 <= shard_number <= shard_count:
+            raise ValueError(
+                f"Expected the shard number to be between 1 and {shard_count}. Instead the shard number was {shard_number}"  # noqa: E501
+            )
+
+        segment_counts = np.array(self.segment_counts())
+
+        cumulative_cost = np.cumsum(segment_counts + 1)
+
+        # each shard ends after the first window where the cumulative cost
+        # reaches the shard's share of the total cost
+        boundaries = [0]
+
+        for number in range(1, shard_count):
+            share = cumulative_cost[-1] * number / shard_count
+
+            boundaries.append(
+                int(np.searchsorted(cumulative_cost, share, side="left")) + 1
+            )
+
+        boundaries.append(len(cumulative_cost))
+
+        window_range = (boundaries[shard_number - 1], boundaries[shard_number])
+
+        logger.verbose(
+            f"Shard {shard_number} of {shard_count} has {window_range[1] - window_range[0]} of the {len(segment_counts)} windows with {segment_counts[window_range[0]:window_range[1]].sum()} segments in total"  # noqa: E501
+        )
+
+        return replace(self, window_range=window_range)
+
+    def scanned_region(self) -> Genes:
+        """Determine the region that the windows cover. If the windows are
+        sharded then the region only covers the windows of the shard
+
+        Returns
+        -------
+        Genes
+            returns the chromosome, the start of the first window, and the
+            end of the last window. If a shard doesn't have any windows then
+            the whole region is returned
+        """
+        positions = list(self.window_positions())
+
+        first_window, last_window = self.window_range or (0, len(positions))
+
+        positions = positions[first_window:last_window]
+
+        if not positions:
+            return self.region
+
+        return Genes(self.region.chr, positions[0][0], positions[-1][1])
+
+    def __iter__(self) -> Iterator[WindowFilter]:
+        """Create the filter object of each window. If the windows are
+        sharded then only the windows of the shard are created but the
+        sweep still starts at the beginning of the region
+
+        Yields
+        ------
+        WindowFilter
+            filter object with the segments of each window. Windows without
+            segments have empty dataframes
+        """
+        first_window, last_window = self.window_range or (0, sys.maxsize)
+
+        hapid1 = self.segments["hapid1"].to_numpy()
+
+        hapid2 = self.segments["hapid2"].to_numpy()
+
+        for window_number, (
+            window_start,
+            window_end,
+            active,
+            added,
+            removed,
+        ) in enumerate(self._sweep()):
+            if window_number >= last_window:
+                break
+            elif window_number < first_window:
+                continue
+
+            window = self._create_window(
+                Genes(self.region.chr, window_start, window_end), sorted(active)
+            )
+
+            # segments that were added and removed in the same step were
+            # never in a window so they don't change anything
+            if window_number != first_window:
+                changed_rows = list(added.symmetric_difference(removed))
+
+                window.changed_haplotypes = set(hapid1[changed_rows]).union(
+                    hapid2[changed_rows]
+                )
+
+            yield window
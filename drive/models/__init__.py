@@ -1,5 +1,66 @@
-from .choices import FormatTypes, LogLevel, OverlapOptions
-from .data_container import Data, Data_Interface
-from .generate_indices import FileIndices, create_indices
-from .networks import Network, Network_Interface
-from .types import Filter, Genes
+"""Models used throughout DRIVE. Most of these modules import numpy, scipy,
+or pandas so the classes are only imported from their modules the first
+time that they are accessed. This keeps modules like the cli, that only
+need the choices enums, from paying for those imports at startup."""
+
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .carrier_store import CarrierStore
+    from .choices import CompressionOptions, FormatTypes, LogLevel, OverlapOptions
+    from .data_container import Data, Data_Interface
+    from .generate_indices import FileIndices, create_indices
+    from .incidence import NetworkCounts, PhenotypeIncidence
+    from .networks import Network, Network_Interface
+    from .phenotype_matrix import PhenotypeCarriers, PhenotypeMatrix
+    from .shared_edges import SharedEdges, SharedEdgesHandle
+    from .sample_dictionary import IdDictionary, SampleDictionary
+    from .types import Filter, Genes
+
+# mapping of each exported name to the module that defines it
+_EXPORTS = {
+    "CarrierStore": ".carrier_store",
+    "CompressionOptions": ".choices",
+    "FormatTypes": ".choices",
+    "LogLevel": ".choices",
+    "OverlapOptions": ".choices",
+    "Data": ".data_container",
+    "Data_Interface": ".data_container",
+    "FileIndices": ".generate_indices",
+    "create_indices": ".generate_indices",
+    "NetworkCounts": ".incidence",
+    "PhenotypeIncidence": ".incidence",
+    "Network": ".networks",
+    "Network_Interface": ".networks",
+    "PhenotypeCarriers": ".phenotype_matrix",
+    "PhenotypeMatrix": ".phenotype_matrix",
+    "SharedEdges": ".shared_edges",
+    "SharedEdgesHandle": ".shared_edges",
+    "IdDictionary": ".sample_dictionary",
+    "SampleDictionary": ".sample_dictionary",
+    "Filter": ".types",
+    "Genes": ".types",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> Any:
+    """import the module that defines the name the first time the name is
+    accessed and then store it on the package so later lookups are
+    normal attribute lookups"""
+    module_name = _EXPORTS.get(name)
+
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(import_module(module_name, __name__), name)
+
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()).union(_EXPORTS))
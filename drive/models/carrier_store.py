@@ -0,0 +1,278 @@
+"""Module with a bit packed store of the phenotype statuses. The cases and
+the excluded individuals are stored as two individuals x phenotypes bit
+matrices that can be memory mapped from disk. Each row of the matrices
+is one individual so the statuses of the individuals in the networks can
+be read without reading the statuses of the whole cohort."""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from .phenotype_matrix import (
+    CASE,
+    CONTROL,
+    EXCLUDED,
+    PhenotypeCarriers,
+    PhenotypeMatrix,
+)
+
+T = TypeVar("T", bound="CarrierStore")
+
+
+@dataclass
+class CarrierStore:
+    """Class that holds the bit packed case and exclusion matrices along
+    with the number of cases, controls, and excluded individuals in the
+    cohort for each phenotype. Individuals that are neither cases nor
+    excluded are controls. The columns attribute maps each phenotype to
+    its bit in the packed rows so that a subset of the phenotypes can be
+    used without repacking the matrices"""
+
+    samples: List[str]
+    phenotypes: List[str]
+    cases: np.ndarray = field(repr=False)
+    excluded: np.ndarray = field(repr=False)
+    counts: np.ndarray = field(repr=False)
+    columns: np.ndarray = field(repr=False)
+    _sample_indices: Optional[Dict[str, int]] = field(
+        default=None, init=False, repr=False
+    )
+
+    def __str__(self) -> str:
+        """Custom string message used for debugging"""
+        return f"CarrierStore: individuals={len(self.samples)}, phenotypes={len(self.phenotypes)}"  # noqa: E501
+
+    @classmethod
+    def from_matrix(
+        cls, phenotype_matrix: PhenotypeMatrix, block_size: int = 10_000
+    ) -> T:
+        """Factory method that packs the status matrix of the
+        PhenotypeFileParser. The matrix is packed in blocks of individuals
+        so that only one block of booleans is in memory at a time
+
+        Parameters
+        ----------
+        phenotype_matrix : PhenotypeMatrix
+            individuals x phenotypes status matrix
+
+        block_size : int
+            number of individuals packed at a time
+
+        Returns
+        -------
+        CarrierStore
+            returns the bit packed store
+        """
+        status = phenotype_matrix.status
+
+        phenotype_count = len(phenotype_matrix.phenotypes)
+
+        packed_shape = (status.shape[0], (phenotype_count + 7) // 8)
+
+        cases = np.zeros(packed_shape, dtype=np.uint8)
+
+        excluded = np.zeros(packed_shape, dtype=np.uint8)
+
+        for start in range(0, status.shape[0], block_size):
+            block = np.asarray(status[start : start + block_size])
+
+            cases[start : start + block_size] = np.packbits(block == CASE, axis=1)
+
+            excluded[start : start + block_size] = np.packbits(
+                block == EXCLUDED, axis=1
+            )
+
+        status_counts = phenotype_matrix.status_counts()
+
+        counts = np.array(
+            [status_counts[phenotype] for phenotype in phenotype_matrix.phenotypes],
+            dtype=np.int64,
+        ).reshape(phenotype_count, 3)
+
+        return cls(
+            list(phenotype_matrix.samples),
+            list(phenotype_matrix.phenotypes),
+            cases,
+            excluded,
+            counts.T.copy(),
+            np.arange(phenotype_count, dtype=np.int64),
+        )
+
+    @property
+    def sample_indices(self) -> Dict[str, int]:
+        """Dictionary mapping each id to its row in the packed matrices"""
+        if self._sample_indices is None:
+            self._sample_indices = {
+                sample: indx for indx, sample in enumerate(self.samples)
+            }
+
+        return self._sample_indices
+
+    def status_counts(self) -> Dict[str, Tuple[int, int, int]]:
+        """Return the number of cases, controls, and excluded individuals in
+        the cohort for every phenotype
+
+        Returns
+        -------
+        Dict[str, Tuple[int, int, int]]
+            returns a dictionary where the keys are the phenotypes and
+            the values are tuples with the case count, the control count,
+            and the excluded count
+        """
+        return {
+            phenotype: counts
+            for phenotype, counts in zip(
+                self.phenotypes, map(tuple, self.counts.T.tolist())
+            )
+        }
+
+    def select(self, phenotypes: Optional[List[str]] = None) -> "CarrierStore":
+        """Create a store with only some of the phenotypes. The packed
+        matrices are shared with the original store
+
+        Parameters
+        ----------
+        phenotypes : Optional[List[str]]
+            phenotypes to keep. If no value is provided then the store is
+            returned unchanged
+
+        Returns
+        -------
+        CarrierStore
+            returns a CarrierStore with the phenotypes in the order of the
+            original store
+
+        Raises
+        ------
+        ValueError
+            raises a value error if one of the phenotypes is not in the
+            store
+        """
+        if phenotypes is None:
+            return self
+
+        missing = set(phenotypes).difference(self.phenotypes)
+
+        if missing:
+            raise ValueError(
+                f"The phenotypes {', '.join(sorted(missing))} were not found in the carrier store"  # noqa: E501
+            )
+
+        requested = set(phenotypes)
+
+        indices = [
+            indx
+            for indx, phenotype in enumerate(self.phenotypes)
+            if phenotype in requested
+        ]
+
+        return CarrierStore(
+            self.samples,
+            [self.phenotypes[indx] for indx in indices],
+            self.cases,
+            self.excluded,
+            self.counts[:, indices],
+            self.columns[indices],
+        )
+
+    def _unpack(self, packed: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """unpack the bits of the selected phenotypes for the rows"""
+        bits = np.unpackbits(np.asarray(packed[rows]), axis=1)
+
+        return bits[:, self.columns].astype(bool)
+
+    def rows(self, individuals: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        """Read the statuses of some of the individuals. Only the rows of
+        these individuals are read from the packed matrices
+
+        Parameters
+        ----------
+        individuals : Iterable[str]
+            ids of the individuals. Individuals that are not in the store
+            are skipped
+
+        Returns
+        -------
+        Tuple[List[str], np.ndarray]
+            returns a tuple where the first element is the list of ids
+            that were found in the store and the second element is the
+            individuals x phenotypes int8 status matrix for these ids
+        """
+        rows = np.array(
+            sorted(
+                {
+                    self.sample_indices[grid]
+                    for grid in individuals
+                    if grid in self.sample_indices
+                }
+            ),
+            dtype=np.int64,
+        )
+
+        status = np.full((len(rows), len(self.phenotypes)), CONTROL, dtype=np.int8)
+
+        if len(rows):
+            status[self._unpack(self.cases, rows)] = CASE
+            status[self._unpack(self.excluded, rows)] = EXCLUDED
+
+        return [self.samples[indx] for indx in rows.tolist()], status
+
+    def to_matrix(self, individuals: Optional[Iterable[str]] = None) -> PhenotypeMatrix:
+        """Unpack the store into a status matrix
+
+        Parameters
+        ----------
+        individuals : Optional[Iterable[str]]
+            ids of the individuals to unpack. If no value is provided then
+            every individual is unpacked
+
+        Returns
+        -------
+        PhenotypeMatrix
+            returns the individuals x phenotypes int8 status matrix. The
+            counts from the whole cohort are stored with the matrix
+        """
+        samples, status = self.rows(
+            self.samples if individuals is None else individuals
+        )
+
+        return PhenotypeMatrix(samples, self.phenotypes, status, self.status_counts())
+
+    def column(self, phenotype: str) -> np.ndarray:
+        """Return the status of every individual for the phenotype
+
+        Parameters
+        ----------
+        phenotype : str
+            name of the phenotype
+
+        Returns
+        -------
+        np.ndarray
+            returns an int8 array with the status of each individual in
+            the order of the samples attribute
+        """
+        bit = self.columns[self.phenotypes.index(phenotype)]
+
+        byte, shift = divmod(int(bit), 8)
+
+        status = np.full(len(self.samples), CONTROL, dtype=np.int8)
+
+        status[(self.cases[:, byte] >> (7 - shift)) & 1 == 1] = CASE
+        status[(self.excluded[:, byte] >> (7 - shift)) & 1 == 1] = EXCLUDED
+
+        return status
+
+    def carriers(self) -> PhenotypeCarriers:
+        """Create a dictionary like view of the store that only creates the
+        sets of cases, controls, and excluded individuals for a phenotype
+        when the phenotype is accessed
+
+        Returns
+        -------
+        PhenotypeCarriers
+            returns a read only mapping from each phenotype to the sets of
+            cases, controls, and excluded individuals
+        """
+        return PhenotypeCarriers(self)
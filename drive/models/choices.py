@@ -21,3 +21,11 @@ class OverlapOptions(str, Enum):
 
     CONTAINS = "contains"
     OVERLAPS = "overlaps"
+
+
+class CompressionOptions(str, Enum):
+    """Enum defining the compression options for the output files"""
+
+    NONE = "none"
+    GZIP = "gzip"
+    ZSTD = "zstd"
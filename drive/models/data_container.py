@@ -1,8 +1,14 @@
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Protocol
+from typing import Any, Dict, List, Optional, Protocol, Tuple
 
+from pandas import DataFrame
+
+from .carrier_store import CarrierStore
+from .incidence import NetworkCounts, PhenotypeIncidence
 from .networks import Network_Interface
+from .phenotype_matrix import PhenotypeMatrix
 
 
 class Data_Interface(Protocol):
@@ -12,6 +18,32 @@ class Data_Interface(Protocol):
     output_path: Path
     carriers: Dict[str, Dict[str, List[str]]]
     phenotype_descriptions: Dict[str, Dict[str, str]]
+    options: Dict[str, Any]
+    phenotype_matrix: Optional[PhenotypeMatrix]
+    phenotype_incidence: Optional[PhenotypeIncidence]
+    network_counts: Optional[NetworkCounts]
+    status_counts: Optional[Dict[str, Tuple[int, int, int]]]
+    carrier_store: Optional[CarrierStore]
+    ibd_edges: Optional[DataFrame]
+
+    def count_statuses(self) -> Dict[str, Tuple[int, int, int]]:
+        """Count the number of cases, controls, and excluded individuals in
+        the cohort for every phenotype"""
+        ...
+
+    def count_phenotypes(
+        self, networks: Optional[List[Network_Interface]] = None
+    ) -> NetworkCounts:
+        """Count the number of cases and excluded individuals in each network
+        for every phenotype"""
+        ...
+
+    def get_network_counts(
+        self, networks: Optional[List[Network_Interface]] = None
+    ) -> NetworkCounts:
+        """Return the counts of the networks and reuse the counts that were
+        already calculated for the same networks"""
+        ...
 
 
 @dataclass
@@ -22,3 +54,130 @@ class Data:
     output_path: Path
     carriers: Dict[str, Dict[str, List[str]]]
     phenotype_descriptions: Dict[str, Dict[str, str]]
+    options: Dict[str, Any] = field(default_factory=dict)
+    phenotype_matrix: Optional[PhenotypeMatrix] = None
+    phenotype_incidence: Optional[PhenotypeIncidence] = None
+    network_counts: Optional[NetworkCounts] = None
+    status_counts: Optional[Dict[str, Tuple[int, int, int]]] = None
+    carrier_store: Optional[CarrierStore] = None
+    ibd_edges: Optional[DataFrame] = None
+    # the counts are filled in lazily so the lock keeps plugins that run
+    # in different threads from counting at the same time
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+
+    def count_statuses(self) -> Dict[str, Tuple[int, int, int]]:
+        """Count the number of cases, controls, and excluded individuals in
+        the cohort for every phenotype. The counts are taken from the carrier
+        store or the status matrix if either is available so that the
+        carrier sets don't have to be created. The counts are stored in the
+        status_counts attribute. This method is thread safe.
+
+        Returns
+        -------
+        Dict[str, Tuple[int, int, int]]
+            returns a dictionary where the keys are the phenotypes and
+            the values are tuples with the case count, the control count,
+            and the excluded count
+        """
+        with self._lock:
+            return self._count_statuses()
+
+    def _count_statuses(self) -> Dict[str, Tuple[int, int, int]]:
+        """fill in the status_counts attribute if it is empty"""
+        if self.status_counts is None and self.carrier_store is not None:
+            self.status_counts = self.carrier_store.status_counts()
+        elif self.status_counts is None and self.phenotype_matrix is not None:
+            self.status_counts = self.phenotype_matrix.status_counts()
+        elif self.status_counts is None:
+            self.status_counts = {
+                phenotype: (
+                    len(statuses.get("cases")),
+                    len(statuses.get("controls")),
+                    len(statuses.get("excluded", [])),
+                )
+                for phenotype, statuses in self.carriers.items()
+            }
+
+        return self.status_counts
+
+    def count_phenotypes(
+        self, networks: Optional[List[Network_Interface]] = None
+    ) -> NetworkCounts:
+        """Count the number of cases and excluded individuals in each network
+        for every phenotype. The counts are stored in the network_counts
+        attribute so that other plugins can reuse them. This method is
+        thread safe.
+
+        Parameters
+        ----------
+        networks : Optional[List[Network_Interface]]
+            list of networks to count. If no value is provided then the
+            networks attribute is used. When networks are streamed to
+            the plugins this will be the current batch of networks
+
+        Returns
+        -------
+        NetworkCounts
+            returns the networks x phenotypes count matrices
+        """
+        if networks is None:
+            networks = self.networks
+
+        with self._lock:
+            self.network_counts = self._count_phenotypes(networks)
+
+            return self.network_counts
+
+    def _count_phenotypes(self, networks: List[Network_Interface]) -> NetworkCounts:
+        """build the incidence matrices if needed and count the phenotypes
+        in the networks"""
+        # the carrier store only unpacks the statuses for the members of
+        # these networks so the incidence matrices are rebuilt every time
+        if self.carrier_store is not None:
+            self.phenotype_incidence = PhenotypeIncidence.from_store(
+                self.carrier_store,
+                set().union(*[network.members for network in networks]),
+            )
+        # the incidence matrices are built directly from the status matrix
+        # if the parser provided one
+        elif self.phenotype_incidence is None and self.phenotype_matrix is not None:
+            self.phenotype_incidence = PhenotypeIncidence.from_matrix(
+                self.phenotype_matrix
+            )
+        elif self.phenotype_incidence is None:
+            self.phenotype_incidence = PhenotypeIncidence.from_carriers(self.carriers)
+
+        return self.phenotype_incidence.count(networks)
+
+    def get_network_counts(
+        self, networks: Optional[List[Network_Interface]] = None
+    ) -> NetworkCounts:
+        """Return the number of cases and excluded individuals in each network
+        for every phenotype. The counts in the network_counts attribute are
+        reused if they were calculated for the same networks, such as by the
+        pvalues plugin, otherwise the networks are counted. This method is
+        thread safe.
+
+        Parameters
+        ----------
+        networks : Optional[List[Network_Interface]]
+            list of networks to count. If no value is provided then the
+            networks attribute is used
+
+        Returns
+        -------
+        NetworkCounts
+            returns the networks x phenotypes count matrices
+        """
+        if networks is None:
+            networks = self.networks
+
+        clst_ids = [network.clst_id for network in networks]
+
+        with self._lock:
+            if self.network_counts is None or self.network_counts.clst_ids != clst_ids:
+                self.network_counts = self._count_phenotypes(networks)
+
+            return self.network_counts
@@ -0,0 +1,198 @@
+"""Module with the sparse incidence matrices used to count how many
+cases and excluded individuals are in each network for every
+phenotype. The counts are calculated as a sparse matrix product instead
+of intersecting the members of each network with each phenotype."""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, TypeVar, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .carrier_store import CarrierStore
+from .networks import Network_Interface
+from .phenotype_matrix import CASE, EXCLUDED, PhenotypeMatrix
+
+T = TypeVar("T", bound="PhenotypeIncidence")
+
+
+@dataclass
+class NetworkCounts:
+    """Class that holds the number of cases and excluded individuals in
+    each network for each phenotype. Rows are networks in the order of
+    clst_ids and columns are phenotypes in the order of phenotypes. The
+    Pvalues plugin fills in the pvalues matrix where phenotypes that could
+    not be tested are NaN"""
+
+    # the ids are numbers for the cluster command and strings that start
+    # with the window for the scan command
+    clst_ids: List[Union[int, float, str]]
+    phenotypes: List[str]
+    network_sizes: np.ndarray
+    case_counts: csr_matrix
+    excluded_counts: csr_matrix
+    pvalues: Optional[np.ndarray] = None
+
+
+@dataclass
+class PhenotypeIncidence:
+    """Class that holds individuals x phenotypes boolean matrices for
+    the cases and the excluded individuals of each phenotype"""
+
+    individuals: Dict[str, int]
+    phenotypes: List[str]
+    cases: csr_matrix
+    excluded: csr_matrix
+
+    @classmethod
+    def from_carriers(cls, carriers: Dict[str, Dict[str, Set[str]]]) -> T:
+        """Factory method that builds the incidence matrices from the
+        dictionary returned by the PhenotypeFileParser
+
+        Parameters
+        ----------
+        carriers : Dict[str, Dict[str, Set[str]]]
+            Dictionary where the keys are phenotypes and the values are
+            dictionaries with the cases, controls, and exclusions.
+
+        Returns
+        -------
+        PhenotypeIncidence
+            returns the incidence matrices for the cases and the
+            excluded individuals
+        """
+        phenotypes = list(carriers.keys())
+
+        individuals: Dict[str, int] = {}
+
+        matrices = []
+
+        for status in ["cases", "excluded"]:
+            rows: List[int] = []
+            columns: List[int] = []
+
+            for column, phenotype in enumerate(phenotypes):
+                grids = carriers[phenotype].get(status, [])
+
+                rows.extend(
+                    individuals.setdefault(grid, len(individuals)) for grid in grids
+                )
+                columns.extend([column] * len(grids))
+
+            matrices.append((rows, columns))
+
+        shape = (len(individuals), len(phenotypes))
+
+        cases, excluded = [
+            csr_matrix(
+                (np.ones(len(rows), dtype=np.int32), (rows, columns)), shape=shape
+            )
+            for rows, columns in matrices
+        ]
+
+        return cls(individuals, phenotypes, cases, excluded)
+
+    @classmethod
+    def from_matrix(cls, phenotype_matrix: PhenotypeMatrix) -> T:
+        """Factory method that builds the incidence matrices directly from
+        the status matrix of the PhenotypeFileParser
+
+        Parameters
+        ----------
+        phenotype_matrix : PhenotypeMatrix
+            individuals x phenotypes status matrix
+
+        Returns
+        -------
+        PhenotypeIncidence
+            returns the incidence matrices for the cases and the
+            excluded individuals
+        """
+        individuals = {grid: indx for indx, grid in enumerate(phenotype_matrix.samples)}
+
+        return cls(
+            individuals,
+            list(phenotype_matrix.phenotypes),
+            csr_matrix(phenotype_matrix.status == CASE, dtype=np.int32),
+            csr_matrix(phenotype_matrix.status == EXCLUDED, dtype=np.int32),
+        )
+
+    @classmethod
+    def from_store(cls, carrier_store: CarrierStore, individuals: Iterable[str]) -> T:
+        """Factory method that builds the incidence matrices for some of the
+        individuals in the bit packed carrier store. Only the rows of these
+        individuals are unpacked so the size of the matrices depends on the
+        number of individuals and not on the size of the cohort
+
+        Parameters
+        ----------
+        carrier_store : CarrierStore
+            bit packed store of the phenotype statuses
+
+        individuals : Iterable[str]
+            ids of the individuals to include. These are normally the
+            members of the networks being analyzed
+
+        Returns
+        -------
+        PhenotypeIncidence
+            returns the incidence matrices for the cases and the
+            excluded individuals
+        """
+        return cls.from_matrix(carrier_store.to_matrix(individuals))
+
+    def membership_matrix(self, networks: List[Network_Interface]) -> csr_matrix:
+        """Build the networks x individuals matrix where an element is 1
+        if the individual is a member of the network. Members that are
+        not cases or excluded for any phenotype do not contribute to the
+        counts so they are left out of the matrix.
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks. Each network is a row in the matrix
+
+        Returns
+        -------
+        csr_matrix
+            returns the sparse membership matrix
+        """
+        rows: List[int] = []
+        columns: List[int] = []
+
+        for row, network in enumerate(networks):
+            for member in network.members:
+                column = self.individuals.get(member)
+
+                if column is not None:
+                    rows.append(row)
+                    columns.append(column)
+
+        return csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, columns)),
+            shape=(len(networks), len(self.individuals)),
+        )
+
+    def count(self, networks: List[Network_Interface]) -> NetworkCounts:
+        """Count the number of cases and excluded individuals in each
+        network for every phenotype
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks to count the cases and exclusions for
+
+        Returns
+        -------
+        NetworkCounts
+            returns the networks x phenotypes count matrices
+        """
+        membership = self.membership_matrix(networks)
+
+        return NetworkCounts(
+            [network.clst_id for network in networks],
+            self.phenotypes,
+            np.array([len(network.members) for network in networks], dtype=np.int64),
+            (membership @ self.cases).tocsr(),
+            (membership @ self.excluded).tocsr(),
+        )
@@ -0,0 +1,234 @@
+"""Module with the compact representation of the phenotype file. The
+status of every individual for every phenotype is stored in an int8
+matrix instead of in sets of ids."""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Mapping, Optional, Protocol, Set, Tuple
+
+import numpy as np
+
+# values used in the status matrix for each status
+CASE = 1
+CONTROL = 0
+EXCLUDED = -1
+
+
+class StatusColumns(Protocol):
+    """Protocol for objects that can return the status column of each
+    phenotype"""
+
+    samples: List[str]
+    phenotypes: List[str]
+
+    def column(self, phenotype: str) -> np.ndarray:
+        """Return the int8 status of every individual for the phenotype"""
+        ...
+
+
+@dataclass
+class PhenotypeMatrix:
+    """Class that holds an individuals x phenotypes int8 matrix where
+    cases are 1, controls are 0, and excluded individuals are -1. If the
+    matrix only has some of the individuals in the cohort then the counts
+    for the whole cohort are stored in the cohort_counts attribute"""
+
+    samples: List[str]
+    phenotypes: List[str]
+    status: np.ndarray
+    cohort_counts: Optional[Dict[str, Tuple[int, int, int]]] = None
+
+    def __str__(self) -> str:
+        """Custom string message used for debugging"""
+        return f"PhenotypeMatrix: individuals={len(self.samples)}, phenotypes={len(self.phenotypes)}"  # noqa: E501
+
+    def column(self, phenotype: str) -> np.ndarray:
+        """Return the status of every individual for the phenotype
+
+        Parameters
+        ----------
+        phenotype : str
+            name of the phenotype
+
+        Returns
+        -------
+        np.ndarray
+            returns the int8 column of the status matrix
+        """
+        return self.status[:, self.phenotypes.index(phenotype)]
+
+    def counts(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Count the number of cases, controls, and excluded individuals
+        for every phenotype
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            returns a tuple of arrays with the case counts, the control
+            counts, and the excluded counts for each phenotype
+        """
+        return (
+            (self.status == CASE).sum(axis=0),
+            (self.status == CONTROL).sum(axis=0),
+            (self.status == EXCLUDED).sum(axis=0),
+        )
+
+    def status_counts(self) -> Dict[str, Tuple[int, int, int]]:
+        """Count the number of cases, controls, and excluded individuals
+        in the cohort for every phenotype without creating any sets of ids
+
+        Returns
+        -------
+        Dict[str, Tuple[int, int, int]]
+            returns a dictionary where the keys are the phenotypes and
+            the values are tuples with the case count, the control count,
+            and the excluded count
+        """
+        if self.cohort_counts is not None:
+            return dict(self.cohort_counts)
+
+        cases, controls, excluded = self.counts()
+
+        return {
+            phenotype: counts
+            for phenotype, counts in zip(
+                self.phenotypes,
+                zip(cases.tolist(), controls.tolist(), excluded.tolist()),
+            )
+        }
+
+    def select(self, phenotypes: Optional[List[str]] = None) -> "PhenotypeMatrix":
+        """Create a matrix with only some of the phenotypes
+
+        Parameters
+        ----------
+        phenotypes : Optional[List[str]]
+            phenotypes to keep. If no value is provided then the matrix is
+            returned unchanged
+
+        Returns
+        -------
+        PhenotypeMatrix
+            returns a PhenotypeMatrix with the phenotypes in the order of
+            the original matrix
+
+        Raises
+        ------
+        ValueError
+            raises a value error if one of the phenotypes is not in the
+            matrix
+        """
+        if phenotypes is None:
+            return self
+
+        missing = set(phenotypes).difference(self.phenotypes)
+
+        if missing:
+            raise ValueError(
+                f"The phenotypes {', '.join(sorted(missing))} were not found in the phenotype matrix"  # noqa: E501
+            )
+
+        requested = set(phenotypes)
+
+        columns = [
+            indx
+            for indx, phenotype in enumerate(self.phenotypes)
+            if phenotype in requested
+        ]
+
+        selected = [self.phenotypes[indx] for indx in columns]
+
+        cohort_counts = None
+
+        if self.cohort_counts is not None:
+            cohort_counts = {
+                phenotype: self.cohort_counts[phenotype] for phenotype in selected
+            }
+
+        return PhenotypeMatrix(
+            self.samples, selected, self.status[:, columns], cohort_counts
+        )
+
+    def carriers(self) -> "PhenotypeCarriers":
+        """Create a dictionary like view of the matrix that only creates the
+        sets of cases, controls, and excluded individuals for a phenotype
+        when the phenotype is accessed
+
+        Returns
+        -------
+        PhenotypeCarriers
+            returns a read only mapping with the same keys and values as
+            the dictionary from the to_carriers method
+        """
+        return PhenotypeCarriers(self)
+
+    def to_carriers(self) -> Dict[str, Dict[str, Set[str]]]:
+        """Convert the matrix into the dictionary of sets that is
+        returned by PhenotypeFileParser.parse_cases_and_controls
+
+        Returns
+        -------
+        Dict[str, Dict[str, Set[str]]]
+            returns a dictionary where the keys are the phenotypes and
+            the values are dictionaries with sets for the cases, the
+            controls, and the excluded individuals
+        """
+        samples = np.array(self.samples, dtype=object)
+
+        carriers = {}
+
+        for indx, phenotype in enumerate(self.phenotypes):
+            column = self.status[:, indx]
+
+            carriers[phenotype] = {
+                "cases": set(samples[column == CASE].tolist()),
+                "controls": set(samples[column == CONTROL].tolist()),
+                "excluded": set(samples[column == EXCLUDED].tolist()),
+            }
+
+        return carriers
+
+
+@dataclass
+class PhenotypeCarriers(Mapping):
+    """Read only mapping from each phenotype to the sets of cases,
+    controls, and excluded individuals. The sets are built from the status
+    columns the first time that a phenotype is accessed so that wide
+    phenotype files don't have to be converted into sets up front"""
+
+    matrix: StatusColumns = field(repr=False)
+    _carriers: Dict[str, Dict[str, Set[str]]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _phenotypes: Set[str] = field(default_factory=set, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._phenotypes = set(self.matrix.phenotypes)
+
+    def __getitem__(self, phenotype: str) -> Dict[str, Set[str]]:
+        if phenotype not in self._phenotypes:
+            raise KeyError(phenotype)
+
+        if phenotype not in self._carriers:
+            column = np.asarray(self.matrix.column(phenotype))
+
+            samples = self.matrix.samples
+
+            self._carriers[phenotype] = {
+                status_name: {samples[indx] for indx in np.flatnonzero(column == value)}
+                for status_name, value in [
+                    ("cases", CASE),
+                    ("controls", CONTROL),
+                    ("excluded", EXCLUDED),
+                ]
+            }
+
+        return self._carriers[phenotype]
+
+    def __contains__(self, phenotype: object) -> bool:
+        return phenotype in self._phenotypes
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.matrix.phenotypes)
+
+    def __len__(self) -> int:
+        return len(self.matrix.phenotypes)
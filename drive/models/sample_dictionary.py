@@ -0,0 +1,235 @@
+"""Module with a persistent dictionary that gives every sample and haplotype
+a stable int32 code. The ids are stored in append only text files with one
+id per line so the code of an id is its line number. Codes are never
+changed or reused so the codes from different loci, files, and runs can be
+joined on integers. Processes that add ids at the same time take a lock on
+the file so that every id is only added once."""
+
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+from pandas import Index, unique
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - windows doesn't have fcntl
+    fcntl = None
+
+# codes are stored as int32 so the dictionary can't have more ids than this
+MAX_CODE = np.iinfo(np.int32).max
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """hold an exclusive lock on the lock file next to the path while ids
+    are added. The lock is skipped on systems without fcntl"""
+    with open(path.with_name(path.name + ".lock"), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_ids(path: Path, repair: bool = False) -> List[str]:
+    """read the ids from the file. A line without a newline at the end of
+    the file was not finished by the process that wrote it so it is skipped.
+    If repair is True then the unfinished line is also removed from the file
+    so that new ids start on their own line. The file has to be locked to
+    repair it"""
+    if not path.exists():
+        return []
+
+    data = path.read_bytes()
+
+    end = data.rfind(b"\n") + 1
+
+    if repair and end != len(data):
+        with open(path, "r+b") as input_file:
+            input_file.truncate(end)
+
+    return data[:end].decode("utf-8").split("\n")[:-1]
+
+
+def _as_array(ids: Iterable[str]) -> np.ndarray:
+    """convert the ids to an object array. Sets and generators are
+    converted to lists first because numpy doesn't iterate over them"""
+    if not isinstance(ids, (list, tuple, np.ndarray)) and not hasattr(ids, "to_numpy"):
+        ids = list(ids)
+
+    return np.asarray(ids, dtype=object)
+
+
+@dataclass
+class IdDictionary:
+    """Append only mapping between ids and their int32 codes. The code of an
+    id is its position in the ids list"""
+
+    path: Path
+    ids: List[str] = field(default_factory=list, repr=False)
+    _index: Optional[Index] = field(default=None, init=False, repr=False)
+
+    @classmethod
+    def load(cls, path: Union[Path, str]) -> "IdDictionary":
+        """Read the ids that have been added to the file
+
+        Parameters
+        ----------
+        path : Path | str
+            path to the file with one id per line. The file doesn't have to
+            exist yet
+
+        Returns
+        -------
+        IdDictionary
+            returns the dictionary with the ids in the file
+        """
+        path = Path(path)
+
+        return cls(path, _read_ids(path))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def index(self) -> Index:
+        """hash index of the ids that is used to look up the codes"""
+        if self._index is None or len(self._index) != len(self.ids):
+            self._index = Index(self.ids, dtype=object)
+
+        return self._index
+
+    def codes(self, ids: Iterable[str]) -> np.ndarray:
+        """Look up the code of each id
+
+        Parameters
+        ----------
+        ids : Iterable[str]
+            ids to look up
+
+        Returns
+        -------
+        np.ndarray
+            returns an int32 array with the code of each id. Ids that are
+            not in the dictionary have a code of -1
+        """
+        values = _as_array(ids)
+
+        if not self.ids or values.size == 0:
+            return np.full(values.size, -1, dtype=np.int32)
+
+        return self.index.get_indexer(values).astype(np.int32)
+
+    def decode(self, codes: Iterable[int]) -> List[str]:
+        """Find the id of each code
+
+        Parameters
+        ----------
+        codes : Iterable[int]
+            codes returned by the codes or add method
+
+        Returns
+        -------
+        List[str]
+            returns the id for each code
+        """
+        return [self.ids[code] for code in codes]
+
+    def add(self, ids: Iterable[str]) -> np.ndarray:
+        """Add the ids that are not in the dictionary yet and return the
+        code of every id. The file is read again while it is locked so that
+        ids added by other processes keep their codes
+
+        Parameters
+        ----------
+        ids : Iterable[str]
+            ids to add. New ids get codes in the order that they first
+            appear
+
+        Returns
+        -------
+        np.ndarray
+            returns an int32 array with the code of each id
+
+        Raises
+        ------
+        OverflowError
+            raises an OverflowError if there are more ids than fit in an
+            int32 code
+        """
+        values = _as_array(ids)
+
+        codes = self.codes(values)
+
+        if (codes >= 0).all():
+            return codes
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with _locked(self.path):
+            self.ids = _read_ids(self.path, repair=True)
+
+            codes = self.codes(values)
+
+            new_ids = unique(values[codes < 0]).tolist()
+
+            if len(self.ids) + len(new_ids) > MAX_CODE:
+                raise OverflowError(
+                    f"The dictionary at {self.path} can't have more than {MAX_CODE} ids"  # noqa: E501
+                )
+
+            if new_ids:
+                with open(self.path, "a", encoding="utf-8") as output_file:
+                    output_file.write("".join(f"{value}\n" for value in new_ids))
+
+                    output_file.flush()
+
+                    os.fsync(output_file.fileno())
+
+                self.ids.extend(new_ids)
+
+        return self.codes(values)
+
+
+@dataclass
+class SampleDictionary:
+    """Dictionaries for the sample ids and the haplotype ids of a project.
+    The two dictionaries are stored in a directory as samples.txt and
+    haplotypes.txt"""
+
+    directory: Path
+    samples: IdDictionary
+    haplotypes: IdDictionary
+
+    @classmethod
+    def load(cls, directory: Union[Path, str]) -> "SampleDictionary":
+        """Read the dictionaries in the directory
+
+        Parameters
+        ----------
+        directory : Path | str
+            directory with the dictionary files. The directory is created
+            the first time ids are added
+
+        Returns
+        -------
+        SampleDictionary
+            returns the sample and haplotype dictionaries
+        """
+        directory = Path(directory)
+
+        return cls(
+            directory,
+            IdDictionary.load(directory / "samples.txt"),
+            IdDictionary.load(directory / "haplotypes.txt"),
+        )
+
+    def __str__(self) -> str:
+        """Custom string message used for debugging"""
+        return f"SampleDictionary: directory={self.directory}, samples={len(self.samples)}, haplotypes={len(self.haplotypes)}"  # noqa: E501
@@ -0,0 +1,234 @@
+"""Module with a container that keeps the columns of the filtered IBD
+segments in a shared memory block. Worker processes attach to the block
+instead of receiving a copy of the segments. Pickling the container only
+sends the name and layout of the block so the container can be passed as
+an argument to a ProcessPoolExecutor without copying the segments."""
+
+import weakref
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, Mapping, Tuple
+
+import numpy as np
+from pandas import DataFrame
+
+from drive.log import CustomLogger
+
+logger = CustomLogger.get_logger(__name__)
+
+# columns of the ibd_edges dataframe that are copied into the shared memory
+SHARED_EDGE_COLUMNS = ("idnum1", "idnum2", "cm", "start", "end")
+
+# arrays in the block start on a 64 byte boundary so that every dtype is
+# aligned
+_ALIGNMENT = 64
+
+
+@dataclass(frozen=True)
+class SharedEdgesHandle:
+    """Name and layout of the shared memory block. The layout has the
+    name, dtype, shape, and byte offset of every array in the block"""
+
+    name: str
+    layout: Tuple[Tuple[str, str, Tuple[int, ...], int], ...]
+
+
+def _release(block: shared_memory.SharedMemory, owner: bool) -> None:
+    """close the block and remove it if this process created it. The block
+    can't be closed while numpy arrays still use the memory but it is
+    always removed so the memory is freed once those arrays are deleted"""
+    try:
+        block.close()
+    except BufferError:
+        logger.debug(
+            f"The shared memory block {block.name} is still being used so it will be closed when the process exits"  # noqa: E501
+        )
+
+    if owner:
+        try:
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedEdges:
+    """Numpy arrays with the haplotype ids, segment lengths, and positions of
+    the filtered IBD segments that are stored in shared memory. The process
+    that creates the arrays owns the block and removes it when the object
+    is closed, garbage collected, or when the process exits so an error
+    doesn't leave the block behind. Worker processes get read only views of
+    the arrays.
+
+    The arrays are accessed by name, such as shared_edges["idnum1"]. The
+    haplotypes array has the haplotype id of every idnum encoded as bytes"""
+
+    def __init__(
+        self,
+        block: shared_memory.SharedMemory,
+        layout: Tuple[Tuple[str, str, Tuple[int, ...], int], ...],
+        owner: bool,
+    ) -> None:
+        self._block = block
+        self._layout = layout
+        self.owner = owner
+        self._arrays: Dict[str, np.ndarray] = {}
+
+        for name, dtype, shape, offset in layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+            # workers only read the segments
+            if not owner:
+                array.flags.writeable = False
+
+            self._arrays[name] = array
+
+        self._finalizer = weakref.finalize(self, _release, block, owner)
+
+    @classmethod
+    def create(cls, arrays: Mapping[str, np.ndarray]) -> "SharedEdges":
+        """Copy the arrays into a new shared memory block
+
+        Parameters
+        ----------
+        arrays : Mapping[str, np.ndarray]
+            arrays to share where the keys are the names used to access them
+
+        Returns
+        -------
+        SharedEdges
+            returns the object that owns the shared memory block
+        """
+        layout = []
+
+        size = 0
+
+        for name, array in arrays.items():
+            layout.append((name, array.dtype.str, array.shape, size))
+
+            size += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+        # shared memory blocks can't be empty
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+        shared_edges = cls(block, tuple(layout), owner=True)
+
+        for name, array in arrays.items():
+            shared_edges._arrays[name][...] = array
+
+        logger.debug(
+            f"Copied {len(layout)} arrays with a total of {size} bytes into the shared memory block {block.name}"  # noqa: E501
+        )
+
+        return shared_edges
+
+    @classmethod
+    def from_edges(cls, ibd_edges: DataFrame) -> "SharedEdges":
+        """Copy the columns of the segments into shared memory
+
+        Parameters
+        ----------
+        ibd_edges : DataFrame
+            dataframe returned by get_ibd_edges that has the columns hapid1,
+            hapid2, idnum1, idnum2, cm, start, and end
+
+        Returns
+        -------
+        SharedEdges
+            returns the object that owns the shared memory block
+        """
+        arrays = {
+            column: ibd_edges[column].to_numpy() for column in SHARED_EDGE_COLUMNS
+        }
+
+        haplotype_count = (
+            int(max(arrays["idnum1"].max(), arrays["idnum2"].max())) + 1
+            if ibd_edges.shape[0]
+            else 0
+        )
+        # the haplotype id of every idnum so that workers can map the
+        # vertices back to haplotypes without the hapid_map dictionary
+        haplotypes = np.empty(haplotype_count, dtype=object)
+
+        haplotypes[arrays["idnum1"]] = ibd_edges["hapid1"].to_numpy(dtype=object)
+
+        haplotypes[arrays["idnum2"]] = ibd_edges["hapid2"].to_numpy(dtype=object)
+
+        arrays["haplotypes"] = np.char.encode(haplotypes.astype(str), "utf-8")
+
+        return cls.create(arrays)
+
+    @classmethod
+    def attach(cls, handle: SharedEdgesHandle) -> "SharedEdges":
+        """Attach to a shared memory block that another process created
+
+        Parameters
+        ----------
+        handle : SharedEdgesHandle
+            name and layout of the block
+
+        Returns
+        -------
+        SharedEdges
+            returns an object with read only views of the arrays
+
+        Raises
+        ------
+        FileNotFoundError
+            raises a FileNotFoundError if the block has already been removed
+        """
+        block = shared_memory.SharedMemory(name=handle.name)
+
+        return cls(block, handle.layout, owner=False)
+
+    @property
+    def handle(self) -> SharedEdgesHandle:
+        """name and layout of the shared memory block"""
+        return SharedEdgesHandle(self._block.name, self._layout)
+
+    @property
+    def closed(self) -> bool:
+        """whether the shared memory block has been released"""
+        return not self._finalizer.alive
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._arrays[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._arrays)
+
+    def __len__(self) -> int:
+        """number of segments in the shared memory"""
+        return len(self._arrays["idnum1"]) if "idnum1" in self._arrays else 0
+
+    def haplotype_mappings(self) -> Dict[int, str]:
+        """create the dictionary that maps each idnum to its haplotype id
+
+        Returns
+        -------
+        Dict[int, str]
+            returns the same mapping as the inverted hapid_map of the filter
+        """
+        return {
+            idnum: haplotype.decode("utf-8")
+            for idnum, haplotype in enumerate(self._arrays["haplotypes"].tolist())
+        }
+
+    def close(self) -> None:
+        """Release the shared memory block. The block is also removed if
+        this process created it. Arrays taken from the object can't be used
+        after it is closed"""
+        self._arrays = {}
+
+        self._finalizer()
+
+    def __enter__(self) -> "SharedEdges":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def __reduce__(self) -> Tuple[object, Tuple[SharedEdgesHandle]]:
+        # only the handle is pickled so that workers attach to the block
+        return SharedEdges.attach, (self.handle,)
+
+    def __repr__(self) -> str:
+        return f"SharedEdges(name={self._block.name!r}, segments={len(self)}, owner={self.owner})"  # noqa: E501
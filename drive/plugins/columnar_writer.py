@@ -0,0 +1,339 @@
+"""Plugin that writes the networks to a Parquet or Feather file. The
+members and haplotypes are stored as list columns and the counts and
+pvalues are stored as numbers so that the file can be loaded without
+parsing any strings. This plugin requires the optional pyarrow package."""
+
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from drive.factory import factory_register
+from drive.log import CustomLogger
+from drive.models import Data_Interface, Network_Interface
+from drive.utilities.output import TABLE_FORMAT_SUFFIXES, TableWriter
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = CustomLogger.get_logger(__name__)
+
+
+@dataclass
+class ColumnarWriter:
+    """Class that is responsible for writing the networks to a
+    *.drive_networks.parquet or *.drive_networks.feather file. If
+    long_format is true then the phenotype results are also written to a
+    *.drive_phenotype_results file with one row for every network and
+    phenotype that has at least one case in the network"""
+
+    name: str = "ColumnarWriter plugin"
+    file_format: str = "parquet"
+    compression: str = "zstd"
+    long_format: bool = False
+    streaming: ClassVar[bool] = True
+    reads: ClassVar[Tuple[str, ...]] = (
+        "networks",
+        "carriers",
+        "network_counts",
+        "output_path",
+    )
+    writes: ClassVar[Tuple[str, ...]] = (
+        "network_counts",
+        "phenotype_incidence",
+    )
+    _writer: Optional[TableWriter] = field(default=None, init=False, repr=False)
+    _long_writer: Optional[TableWriter] = field(default=None, init=False, repr=False)
+    _phenotypes: List[str] = field(default_factory=list, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if pa is None:
+            raise ImportError(
+                "The columnar_writer plugin requires the pyarrow package. It can be installed with 'pip install pyarrow'"  # noqa: E501
+            )
+
+        if self.file_format not in TABLE_FORMAT_SUFFIXES:
+            raise ValueError(
+                f"The format, {self.file_format}, is not supported by the columnar_writer plugin. Allowed values are {', '.join(TABLE_FORMAT_SUFFIXES)}"  # noqa: E501
+            )
+
+    @staticmethod
+    def _network_schema(phenotypes: List[str]) -> "pa.Schema":
+        """Create the schema of the networks file. The columns have the
+        same names as the columns of the *.drive_networks.txt file
+
+        Parameters
+        ----------
+        phenotypes : List[str]
+            list of all the phenotypes from the Data.carriers attribute
+
+        Returns
+        -------
+        pa.Schema
+            returns the schema for the networks file
+        """
+        fields = [
+            ("clstID", pa.string()),
+            ("n.total", pa.int32()),
+            ("n.haplotype", pa.int32()),
+            ("true.positive.n", pa.int64()),
+            ("true.positive", pa.float64()),
+            ("falst.postive", pa.int64()),
+            ("IDs", pa.list_(pa.string())),
+            ("ID.haplotype", pa.list_(pa.string())),
+        ]
+
+        if phenotypes:
+            fields.extend(
+                [
+                    ("min_pvalue", pa.float64()),
+                    ("min_phenotype", pa.string()),
+                    ("min_phenotype_description", pa.string()),
+                ]
+            )
+
+            for phenotype in phenotypes:
+                fields.extend(
+                    [
+                        (f"{phenotype}_cases_in_network", pa.int32()),
+                        (f"{phenotype}_excluded_in_network", pa.int32()),
+                        (f"{phenotype}_pvalue", pa.float64()),
+                    ]
+                )
+
+        return pa.schema(fields)
+
+    @staticmethod
+    def _long_schema() -> "pa.Schema":
+        """Create the schema of the long format phenotype results file"""
+        return pa.schema(
+            [
+                ("clstID", pa.string()),
+                ("phenotype", pa.string()),
+                ("cases_in_network", pa.int32()),
+                ("excluded_in_network", pa.int32()),
+                ("network_size", pa.int32()),
+                ("pvalue", pa.float64()),
+            ]
+        )
+
+    @staticmethod
+    def _split_min_pvalue(min_pvalue_str: str) -> List[Any]:
+        """split the minimum pvalue string of the Pvalues plugin into a
+        float pvalue, the phenotype, and the description. Missing values
+        are None"""
+        values: List[Any] = (min_pvalue_str.split("\t") + ["N/A"] * 3)[:3]
+
+        values = [None if value == "N/A" else value for value in values]
+
+        if values[0] is not None:
+            values[0] = float(values[0])
+
+        return values
+
+    def _build_tables(
+        self, networks: List[Network_Interface], data: Data_Interface
+    ) -> Dict[str, "pa.Table"]:
+        """Create the arrow tables for a batch of networks
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks in the batch
+
+        data : Data_Interface
+            data container with the case and exclusion counts
+
+        Returns
+        -------
+        Dict[str, pa.Table]
+            returns a dictionary with the networks table and, if
+            long_format is true, the long format phenotype results table
+        """
+        columns: Dict[str, Any] = {
+            "clstID": [str(network.clst_id) for network in networks],
+            "n.total": [len(network.members) for network in networks],
+            "n.haplotype": [len(network.haplotypes) for network in networks],
+            "true.positive.n": [network.true_positive_count for network in networks],
+            "true.positive": [network.true_positive_percent for network in networks],
+            "falst.postive": [network.false_negative_count for network in networks],
+            "IDs": [list(map(str, network.members)) for network in networks],
+            "ID.haplotype": [
+                list(map(str, network.haplotypes)) for network in networks
+            ],
+        }
+
+        tables = {}
+
+        if not self._phenotypes:
+            tables["networks"] = pa.table(
+                columns, schema=self._network_schema(self._phenotypes)
+            )
+
+            return tables
+
+        min_values = [
+            self._split_min_pvalue(network.min_pvalue_str) for network in networks
+        ]
+
+        for indx, column in enumerate(
+            ["min_pvalue", "min_phenotype", "min_phenotype_description"]
+        ):
+            columns[column] = [values[indx] for values in min_values]
+
+        network_counts = data.get_network_counts(networks)
+
+        case_counts = network_counts.case_counts.toarray().astype(np.int32)
+
+        excluded_counts = network_counts.excluded_counts.toarray().astype(np.int32)
+
+        if network_counts.pvalues is not None:
+            pvalues = network_counts.pvalues
+        else:
+            pvalues = np.full(case_counts.shape, np.nan)
+
+        phenotype_indices = {
+            phenotype: indx for indx, phenotype in enumerate(network_counts.phenotypes)
+        }
+
+        for phenotype in self._phenotypes:
+            indx = phenotype_indices[phenotype]
+
+            columns[f"{phenotype}_cases_in_network"] = case_counts[:, indx]
+            columns[f"{phenotype}_excluded_in_network"] = excluded_counts[:, indx]
+            # NaN pvalues are written as nulls
+            columns[f"{phenotype}_pvalue"] = pa.array(
+                pvalues[:, indx], from_pandas=True
+            )
+
+        tables["networks"] = pa.table(
+            columns, schema=self._network_schema(self._phenotypes)
+        )
+
+        if self.long_format:
+            rows, indices = np.nonzero(case_counts)
+
+            clst_ids = np.array(columns["clstID"], dtype=object)
+
+            phenotypes = np.array(network_counts.phenotypes, dtype=object)
+
+            tables["long"] = pa.table(
+                {
+                    "clstID": clst_ids[rows],
+                    "phenotype": phenotypes[indices],
+                    "cases_in_network": case_counts[rows, indices],
+                    "excluded_in_network": excluded_counts[rows, indices],
+                    "network_size": network_counts.network_sizes[rows].astype(np.int32),
+                    "pvalue": pa.array(pvalues[rows, indices], from_pandas=True),
+                },
+                schema=self._long_schema(),
+            )
+
+        return tables
+
+    def _open(self, data: Data_Interface) -> None:
+        """open the output files if they have not already been opened
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path and the carriers
+            for each phenotype
+        """
+        if self._writer is not None:
+            return
+
+        self._phenotypes = list(data.carriers.keys())
+
+        suffix = TABLE_FORMAT_SUFFIXES[self.file_format]
+
+        network_file_output = data.output_path.parent / (
+            data.output_path.name + ".drive_networks" + suffix
+        )
+
+        logger.debug(
+            f"The output in the columnar_writer plugin is being written to: {network_file_output}"  # noqa: E501
+        )
+
+        self._writer = TableWriter(
+            network_file_output,
+            self._network_schema(self._phenotypes),
+            self.file_format,
+            self.compression,
+        )
+
+        if self.long_format and self._phenotypes:
+            long_file_output = data.output_path.parent / (
+                data.output_path.name + ".drive_phenotype_results" + suffix
+            )
+
+            logger.debug(
+                f"The long format phenotype results are being written to: {long_file_output}"  # noqa: E501
+            )
+
+            self._long_writer = TableWriter(
+                long_file_output,
+                self._long_schema(),
+                self.file_format,
+                self.compression,
+            )
+
+    def process(self, networks: List[Network_Interface], data: Data_Interface) -> None:
+        """write a batch of networks to the output files
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks that will be written to the output files
+
+        data : Data_Interface
+            data container that has the output path and the carriers
+            for each phenotype
+        """
+        self._open(data)
+
+        if not networks:
+            return
+
+        tables = self._build_tables(networks, data)
+
+        self._writer.write(tables["networks"])
+
+        if self._long_writer is not None:
+            self._long_writer.write(tables["long"])
+
+    def finish(self, data: Data_Interface) -> None:
+        """close the output files. The files are still created if there
+        were no networks to write
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path and the carriers
+            for each phenotype
+        """
+        self._open(data)
+
+        self._writer.close()
+
+        if self._long_writer is not None:
+            self._long_writer.close()
+
+        self._writer = None
+        self._long_writer = None
+
+    def analyze(self, **kwargs) -> None:
+        """main function of the plugin that will write all of the
+        networks to the columnar file"""
+
+        data: Data_Interface = kwargs["data"]
+
+        self.process(data.networks, data)
+
+        self.finish(data)
+
+
+def initialize() -> None:
+    factory_register("columnar_writer", ColumnarWriter)
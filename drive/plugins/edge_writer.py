@@ -0,0 +1,311 @@
+"""Plugin that writes the IBD segments shared within each network to a
+Parquet or Feather file. The segments of every network in a batch are
+found with one pass over index arrays built from the filtered segments so
+the IBD file doesn't have to be read again. This plugin requires the
+optional pyarrow package."""
+
+from dataclasses import dataclass, field
+from typing import ClassVar, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from drive.factory import factory_register
+from drive.log import CustomLogger
+from drive.models import Data_Interface, Network_Interface
+from drive.utilities.output import TABLE_FORMAT_SUFFIXES, TableWriter
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+logger = CustomLogger.get_logger(__name__)
+
+
+@dataclass
+class EdgeIndex:
+    """Arrays that map each haplotype to the segments where it is the first
+    haplotype. Haplotypes are stored as integer codes so that the segments
+    of a batch of networks can be gathered without comparing strings"""
+
+    haplotypes: pd.Index
+    codes1: np.ndarray
+    codes2: np.ndarray
+    order: np.ndarray
+    offsets: np.ndarray
+
+    @classmethod
+    def from_edges(cls, ibd_edges: pd.DataFrame) -> "EdgeIndex":
+        """Factory method that builds the index from the filtered segments
+
+        Parameters
+        ----------
+        ibd_edges : pd.DataFrame
+            dataframe with the columns hapid1 and hapid2 for every segment
+
+        Returns
+        -------
+        EdgeIndex
+            returns the index of the segments
+        """
+        edge_count = ibd_edges.shape[0]
+
+        codes, haplotypes = pd.factorize(
+            np.concatenate(
+                [ibd_edges["hapid1"].to_numpy(), ibd_edges["hapid2"].to_numpy()]
+            )
+        )
+
+        codes1, codes2 = codes[:edge_count], codes[edge_count:]
+
+        order = np.argsort(codes1, kind="stable")
+
+        offsets = np.searchsorted(
+            codes1[order], np.arange(len(haplotypes) + 1), side="left"
+        )
+
+        return cls(pd.Index(haplotypes), codes1, codes2, order, offsets)
+
+    def network_edges(self, networks: List[Network_Interface]) -> tuple:
+        """Find the segments where both haplotypes are in the same network
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks in the batch
+
+        Returns
+        -------
+        tuple
+            returns a tuple with the row of each segment in the edges
+            dataframe and the index of the network that the segment is in.
+            The segments are sorted by network
+        """
+        network_indices = np.repeat(
+            np.arange(len(networks)),
+            [len(network.haplotypes) for network in networks],
+        )
+
+        member_codes = self.haplotypes.get_indexer(
+            [haplotype for network in networks for haplotype in network.haplotypes]
+        )
+
+        found = member_codes >= 0
+
+        member_codes, network_indices = member_codes[found], network_indices[found]
+
+        # gathering every segment where a member is the first haplotype
+        starts = self.offsets[member_codes]
+
+        lengths = self.offsets[member_codes + 1] - starts
+
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + (
+            np.arange(lengths.sum())
+        )
+
+        rows = self.order[positions]
+
+        row_networks = np.repeat(network_indices, lengths)
+
+        # keeping the segments where the second haplotype is in the same
+        # network. A haplotype can be in more than one network so each
+        # membership is encoded as a single integer key and looked up
+        network_count = len(networks)
+
+        member_keys = np.sort(member_codes * network_count + network_indices)
+
+        edge_keys = self.codes2[rows] * network_count + row_networks
+
+        key_positions = np.minimum(
+            np.searchsorted(member_keys, edge_keys), len(member_keys) - 1
+        )
+
+        within = member_keys[key_positions] == edge_keys
+
+        rows, row_networks = rows[within], row_networks[within]
+
+        # sorting so the segments of each network are next to each other
+        sort_order = np.lexsort((rows, row_networks))
+
+        return rows[sort_order], row_networks[sort_order]
+
+
+@dataclass
+class EdgeWriter:
+    """Class that is responsible for writing the IBD segments shared
+    between the members of each network to a
+    *.drive_network_edges.parquet or *.drive_network_edges.feather file"""
+
+    name: str = "EdgeWriter plugin"
+    file_format: str = "parquet"
+    compression: str = "zstd"
+    streaming: ClassVar[bool] = True
+    reads: ClassVar[Tuple[str, ...]] = ("networks", "ibd_edges", "output_path")
+    writes: ClassVar[Tuple[str, ...]] = ()
+    _writer: Optional[TableWriter] = field(default=None, init=False, repr=False)
+    _index: Optional[EdgeIndex] = field(default=None, init=False, repr=False)
+    _indexed_edges: Optional[pd.DataFrame] = field(default=None, init=False, repr=False)
+    _edges_written: int = field(default=0, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if pa is None:
+            raise ImportError(
+                "The edge_writer plugin requires the pyarrow package. It can be installed with 'pip install pyarrow'"  # noqa: E501
+            )
+
+        if self.file_format not in TABLE_FORMAT_SUFFIXES:
+            raise ValueError(
+                f"The format, {self.file_format}, is not supported by the edge_writer plugin. Allowed values are {', '.join(TABLE_FORMAT_SUFFIXES)}"  # noqa: E501
+            )
+
+    @staticmethod
+    def _schema() -> "pa.Schema":
+        """Create the schema of the edges file"""
+        return pa.schema(
+            [
+                ("clstID", pa.string()),
+                ("hapID1", pa.string()),
+                ("hapID2", pa.string()),
+                ("cm", pa.float64()),
+                ("start", pa.int64()),
+                ("end", pa.int64()),
+            ]
+        )
+
+    def _open(self, data: Data_Interface) -> None:
+        """open the output file if this has not already been done
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path and the filtered
+            segments
+
+        Raises
+        ------
+        ValueError
+            raises a value error if the data container doesn't have the
+            filtered segments
+        """
+        if self._writer is not None:
+            return
+
+        if data.ibd_edges is None:
+            raise ValueError(
+                "The edge_writer plugin requires the IBD segments used in the clustering but they were not provided in the ibd_edges attribute"  # noqa: E501
+            )
+
+        output_file = data.output_path.parent / (
+            data.output_path.name
+            + ".drive_network_edges"
+            + TABLE_FORMAT_SUFFIXES[self.file_format]
+        )
+
+        logger.debug(
+            f"The output in the edge_writer plugin is being written to: {output_file}"
+        )
+
+        self._writer = TableWriter(
+            output_file, self._schema(), self.file_format, self.compression
+        )
+
+    def _get_index(self, data: Data_Interface) -> EdgeIndex:
+        """return the index of the segments. The index is rebuilt if the
+        segments in the data container were replaced, which happens between
+        the windows of a scan
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the filtered segments
+
+        Returns
+        -------
+        EdgeIndex
+            returns the index of the segments in the ibd_edges attribute
+        """
+        if self._index is None or self._indexed_edges is not data.ibd_edges:
+            self._index = EdgeIndex.from_edges(data.ibd_edges)
+
+            self._indexed_edges = data.ibd_edges
+
+        return self._index
+
+    def process(self, networks: List[Network_Interface], data: Data_Interface) -> None:
+        """write the segments for a batch of networks
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks in the batch
+
+        data : Data_Interface
+            data container that has the output path and the filtered
+            segments
+        """
+        self._open(data)
+
+        if not networks:
+            return
+
+        rows, network_indices = self._get_index(data).network_edges(networks)
+
+        edges = data.ibd_edges.iloc[rows]
+
+        clst_ids = np.array(
+            [str(network.clst_id) for network in networks], dtype=object
+        )
+
+        table = pa.table(
+            {
+                "clstID": clst_ids[network_indices],
+                "hapID1": edges["hapid1"].astype(str).to_numpy(dtype=object),
+                "hapID2": edges["hapid2"].astype(str).to_numpy(dtype=object),
+                "cm": edges["cm"].to_numpy(dtype=np.float64),
+                "start": edges["start"].to_numpy(dtype=np.int64),
+                "end": edges["end"].to_numpy(dtype=np.int64),
+            },
+            schema=self._schema(),
+        )
+
+        self._writer.write(table)
+
+        self._edges_written += len(rows)
+
+    def finish(self, data: Data_Interface) -> None:
+        """close the output file. The file is still created if there were
+        no networks to write
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path and the filtered
+            segments
+        """
+        self._open(data)
+
+        self._writer.close()
+
+        logger.verbose(
+            f"Wrote {self._edges_written} IBD segments in the edge_writer plugin"
+        )
+
+        self._writer = None
+        self._index = None
+        self._indexed_edges = None
+        self._edges_written = 0
+
+    def analyze(self, **kwargs) -> None:
+        """main function of the plugin that will write the segments of
+        every network"""
+
+        data: Data_Interface = kwargs["data"]
+
+        self.process(data.networks, data)
+
+        self.finish(data)
+
+
+def initialize() -> None:
+    factory_register("edge_writer", EdgeWriter)
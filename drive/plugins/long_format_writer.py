@@ -0,0 +1,201 @@
+from dataclasses import dataclass, field
+from typing import ClassVar, List, Optional, TextIO, Tuple, Union
+
+import numpy as np
+
+from drive.factory import factory_register
+from drive.log import CustomLogger
+from drive.models import Data_Interface, Network_Interface, NetworkCounts
+from drive.utilities.output import BackgroundWriter, add_compression_suffix, open_output
+
+logger = CustomLogger.get_logger(__name__)
+
+
+@dataclass
+class LongFormatWriter:
+    """Class that is responsible for creating the
+    *.drive_phenotype_results.txt file. The file has one row for each
+    network and phenotype where the network has at least min_cases cases
+    and, if a pvalue_threshold is provided, the pvalue is less than or
+    equal to the threshold. Phenotypes that could not be tested are only
+    written if there is no threshold"""
+
+    name: str = "LongFormatWriter plugin"
+    min_cases: int = 1
+    pvalue_threshold: Optional[float] = None
+    compression: str = "none"
+    background: bool = False
+    streaming: ClassVar[bool] = True
+    reads: ClassVar[Tuple[str, ...]] = (
+        "networks",
+        "carriers",
+        "network_counts",
+        "phenotype_descriptions",
+        "options",
+        "output_path",
+    )
+    writes: ClassVar[Tuple[str, ...]] = (
+        "network_counts",
+        "phenotype_incidence",
+    )
+    _output: Optional[Union[TextIO, BackgroundWriter]] = field(
+        default=None, init=False, repr=False
+    )
+    _rows_written: int = field(default=0, init=False, repr=False)
+
+    def _select(self, network_counts: NetworkCounts) -> tuple:
+        """Find the networks and phenotypes that should be written
+
+        Parameters
+        ----------
+        network_counts : NetworkCounts
+            networks x phenotypes count matrices for the batch
+
+        Returns
+        -------
+        tuple
+            returns a tuple with the row indices, the column indices, the
+            case counts, the excluded counts, and the pvalues of every
+            network and phenotype that passes the filters
+        """
+        # only the nonzero elements of the sparse case counts are checked
+        # so the time doesn't depend on the number of empty cells
+        case_counts = network_counts.case_counts.tocoo()
+
+        keep = case_counts.data >= max(self.min_cases, 1)
+
+        rows = case_counts.row[keep]
+        columns = case_counts.col[keep]
+        cases = case_counts.data[keep]
+
+        if network_counts.pvalues is not None:
+            pvalues = network_counts.pvalues[rows, columns]
+        else:
+            pvalues = np.full(len(rows), np.nan)
+
+        if self.pvalue_threshold is not None:
+            keep = pvalues <= self.pvalue_threshold
+
+            rows, columns, cases, pvalues = (
+                rows[keep],
+                columns[keep],
+                cases[keep],
+                pvalues[keep],
+            )
+
+        excluded = np.asarray(network_counts.excluded_counts[rows, columns]).ravel()
+
+        return rows, columns, cases, excluded, pvalues
+
+    def _open(self, data: Data_Interface) -> Union[TextIO, BackgroundWriter]:
+        """open the output file and write the header line if the file
+        has not already been opened
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path
+
+        Returns
+        -------
+        TextIO | BackgroundWriter
+            returns the opened output file
+        """
+        if self._output is None:
+            compression = data.options.get("compression") or self.compression
+
+            output_file = add_compression_suffix(
+                data.output_path.parent
+                / (data.output_path.name + ".drive_phenotype_results.txt"),
+                compression,
+            )
+
+            logger.debug(
+                f"The output in the long_format_writer plugin is being written to: {output_file}"  # noqa: E501
+            )
+
+            self._output = open_output(
+                output_file, compression, background=self.background
+            )
+
+            _ = self._output.write(
+                "clstID\tphenotype\tphenotype_description\tcases_in_network\texcluded_in_network\tnetwork_size\tpvalue\n"  # noqa: E501
+            )
+
+        return self._output
+
+    def process(self, networks: List[Network_Interface], data: Data_Interface) -> None:
+        """write the phenotype results for a batch of networks
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks in the batch
+
+        data : Data_Interface
+            data container that has the output path, the carriers for
+            each phenotype, and the phenotype descriptions
+        """
+        output = self._open(data)
+
+        if not data.carriers or not networks:
+            return
+
+        network_counts = data.get_network_counts(networks)
+
+        rows, columns, cases, excluded, pvalues = self._select(network_counts)
+
+        clst_ids = [str(network.clst_id) for network in networks]
+
+        descriptions = [
+            data.phenotype_descriptions.get(phenotype, {}).get("phenotype", "N/A")
+            for phenotype in network_counts.phenotypes
+        ]
+
+        lines = [
+            f"{clst_ids[row]}\t{network_counts.phenotypes[column]}\t{descriptions[column]}\t{case_count}\t{excluded_count}\t{network_counts.network_sizes[row]}\t{'N/A' if np.isnan(pvalue) else pvalue}\n"  # noqa: E501
+            for row, column, case_count, excluded_count, pvalue in zip(
+                rows.tolist(),
+                columns.tolist(),
+                cases.tolist(),
+                excluded.tolist(),
+                pvalues.tolist(),
+            )
+        ]
+
+        if lines:
+            output.write("".join(lines))
+
+        self._rows_written += len(lines)
+
+    def finish(self, data: Data_Interface) -> None:
+        """close the output file. The header is still written if there
+        were no networks to write
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path
+        """
+        self._open(data).close()
+
+        logger.verbose(
+            f"Wrote {self._rows_written} phenotype results in the long_format_writer plugin"  # noqa: E501
+        )
+
+        self._output = None
+        self._rows_written = 0
+
+    def analyze(self, **kwargs) -> None:
+        """main function of the plugin that will write the phenotype
+        results for every network"""
+
+        data: Data_Interface = kwargs["data"]
+
+        self.process(data.networks, data)
+
+        self.finish(data)
+
+
+def initialize() -> None:
+    factory_register("long_format_writer", LongFormatWriter)
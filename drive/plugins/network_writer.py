@@ -1,9 +1,14 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import ClassVar, List, Optional, TextIO, Tuple, Union
 
 from drive.factory import factory_register
 from drive.log import CustomLogger
 from drive.models import Data_Interface, Network_Interface
+from drive.utilities.output import (
+    BackgroundWriter,
+    add_compression_suffix,
+    open_output,
+)
 
 logger = CustomLogger.get_logger(__name__)
 
@@ -11,9 +16,27 @@ logger = CustomLogger.get_logger(__name__)
 @dataclass
 class NetworkWriter:
     """Class that is responsible for creating the *_networks.
-    txt file from the information provided"""
+    txt file from the information provided. The file can be compressed
+    with gzip or zstd by setting compression to 'gzip' or 'zstd' and the
+    compression can be done in a background thread by setting background
+    to true"""
 
     name: str = "NetworkWriter plugin"
+    compression: str = "none"
+    background: bool = False
+    buffer_size: int = 1 << 22
+    streaming: ClassVar[bool] = True
+    reads: ClassVar[Tuple[str, ...]] = (
+        "networks",
+        "carriers",
+        "options",
+        "output_path",
+    )
+    writes: ClassVar[Tuple[str, ...]] = ()
+    _output: Optional[Union[TextIO, BackgroundWriter]] = field(
+        default=None, init=False, repr=False
+    )
+    _phenotypes: List[str] = field(default_factory=list, init=False, repr=False)
 
     @staticmethod
     def _form_header(phenotypes: List[str]) -> str:
@@ -41,8 +64,12 @@ class NetworkWriter:
             # for each phenotype we are going to create 4 columns for the number
             # of cases in the network, the number of excluded individuals in the
             # network, and the pvalue for the phenotype
-            for column in phenotypes:
-                header_str += f"\t{column + '_cases_in_network'}\t{column + '_excluded_in_network'}\t{column + '_pvalue'}"  # noqa: E501
+            header_str += "".join(
+                [
+                    f"\t{column}_cases_in_network\t{column}_excluded_in_network\t{column}_pvalue"  # noqa: E501
+                    for column in phenotypes
+                ]
+            )
 
             return header_str + "\n"
 
@@ -68,18 +95,120 @@ class NetworkWriter:
         str
             returns a string formatted for the output file
         """
-        # fill in the initial few columns of the output string
-        output_str = f"{network.clst_id}\t{len(network.members)}\t{len(network.haplotypes)}\t{network.true_positive_count}\t{network.true_positive_percent:.4f}\t{network.false_negative_count}\t{','.join(network.members)}\t{','.join(network.haplotypes)}"  # noqa: E501
+        # the columns are joined once instead of concatenating the string
+        # for every phenotype
+        columns = [
+            str(network.clst_id),
+            str(len(network.members)),
+            str(len(network.haplotypes)),
+            str(network.true_positive_count),
+            f"{network.true_positive_percent:.4f}",
+            str(network.false_negative_count),
+            ",".join(network.members),
+            ",".join(network.haplotypes),
+        ]
 
-        if not phenotypes:
-            return output_str + "\n"
-        else:
-            output_str += f"\t{network.min_pvalue_str}"
+        if phenotypes:
+            columns.append(str(network.min_pvalue_str))
+
+            pvalues = network.pvalues
+
+            columns.extend([str(pvalues[phenotype]) for phenotype in phenotypes])
+
+        return "\t".join(columns) + "\n"
+
+    def _open(self, data: Data_Interface) -> TextIO:
+        """open the output file and write the header line if the file
+        has not already been opened
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path and the carriers
+            for each phenotype
+
+        Returns
+        -------
+        TextIO
+            returns the opened output file
+        """
+        if self._output is None:
+            # creating the full output path for the output file
+            # the compression from the commandline takes precedence over
+            # the value in the config file
+            compression = data.options.get("compression") or self.compression
+
+            network_file_output = add_compression_suffix(
+                data.output_path.parent
+                / (data.output_path.name + ".drive_networks.txt"),
+                compression,
+            )
+
+            logger.debug(
+                f"The output in the network_writer plugin is being written to: {network_file_output}"  # noqa: E501
+            )
 
-            for phenotype in phenotypes:
-                output_str += f"\t{network.pvalues[phenotype]}"
+            # we are going to pull out the phenotypes into a list so that we
+            # are guarenteed to maintain order as we are creating the rows
+            self._phenotypes = list(data.carriers.keys())
 
-            return output_str + "\n"
+            self._output = open_output(
+                network_file_output, compression, background=self.background
+            )
+
+            _ = self._output.write(NetworkWriter._form_header(self._phenotypes))
+
+        return self._output
+
+    def process(self, networks: List[Network_Interface], data: Data_Interface) -> None:
+        """write a batch of networks to the output file
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks that will be written to the output file
+
+        data : Data_Interface
+            data container that has the output path and the carriers
+            for each phenotype
+        """
+        networks_output = self._open(data)
+        # the rows are collected into a buffer that is written once it
+        # reaches the buffer size so there are only a few large writes
+        buffer: List[str] = []
+        buffered_size = 0
+
+        for network in networks:
+            network_info_str = NetworkWriter._create_network_info_str(
+                network, self._phenotypes
+            )
+
+            buffer.append(network_info_str)
+
+            buffered_size += len(network_info_str)
+
+            if buffered_size >= self.buffer_size:
+                networks_output.write("".join(buffer))
+
+                buffer = []
+                buffered_size = 0
+
+        if buffer:
+            networks_output.write("".join(buffer))
+
+    def finish(self, data: Data_Interface) -> None:
+        """close the output file. The header is still written if there
+        were no networks to write
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path and the carriers
+            for each phenotype
+        """
+        self._open(data).close()
+
+        self._output = None
 
     def analyze(self, **kwargs) -> None:
         """main function of the plugin that will create the
@@ -88,31 +217,9 @@ class NetworkWriter:
 
         data: Data_Interface = kwargs["data"]
 
-        # creating the full output path for the output file
-        network_file_output = data.output_path.parent / (
-            data.output_path.name + ".drive_networks.txt"
-        )  # noqa: E501
-
-        logger.debug(
-            f"The output in the network_writer plugin is being written to: {network_file_output}"  # noqa: E501
-        )
-
-        # we are going to pull out the phenotypes into a list so that we
-        # are guarenteed to maintain order as we are creating the rows
-        phenotypes = list(data.carriers.keys())
-
-        with open(network_file_output, "w", encoding="utf-8") as networks_output:
-            header_str = NetworkWriter._form_header(phenotypes)
-            # iterate over each network and pull out the appropriate
-            # information into strings
-            _ = networks_output.write(header_str)
-
-            for network in data.networks:
-                network_info_str = NetworkWriter._create_network_info_str(
-                    network, phenotypes
-                )
+        self.process(data.networks, data)
 
-                networks_output.write(network_info_str)
+        self.finish(data)
 
 
 def initialize() -> None:
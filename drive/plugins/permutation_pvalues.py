@@ -0,0 +1,389 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import ClassVar, Dict, List, Optional, TextIO, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from drive.factory import factory_register
+from drive.log import CustomLogger
+from drive.models import Data_Interface, Network_Interface
+
+logger = CustomLogger.get_logger(__name__)
+
+
+def permute_phenotype(
+    membership: csr_matrix,
+    observed: np.ndarray,
+    case_count: int,
+    cohort_size: int,
+    permutations: int,
+    min_exceedances: int,
+    block_size: int,
+    seed: np.random.SeedSequence,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Permute the case labels of a phenotype across the cohort and count
+    how often each network has at least as many cases as observed.
+
+    Only the labels of the network members matter so instead of shuffling
+    the whole cohort we draw the number of cases among the members from
+    the hypergeometric distribution and then randomly decide which members
+    are the cases. This is the same as permuting the labels of the whole
+    cohort. Networks stop being permuted once they reach min_exceedances
+    exceedances because they are clearly null.
+
+    Parameters
+    ----------
+    membership : csr_matrix
+        networks x members matrix where an element is 1 if the member is
+        in the network. Excluded individuals are not in the matrix
+
+    observed : np.ndarray
+        number of cases observed in each network
+
+    case_count : int
+        number of cases in the cohort
+
+    cohort_size : int
+        number of cases and controls in the cohort
+
+    permutations : int
+        maximum number of permutations to perform
+
+    min_exceedances : int
+        number of exceedances after which a network is no longer
+        permuted
+
+    block_size : int
+        number of permutations that are evaluated together
+
+    seed : np.random.SeedSequence
+        seed for the random number generator
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        returns a tuple where the first element is the number of
+        exceedances for each network and the second element is the number
+        of permutations performed for each network
+    """
+    rng = np.random.default_rng(seed)
+
+    network_count, member_count = membership.shape
+
+    sample_size = min(member_count, cohort_size)
+
+    exceedances = np.zeros(network_count, dtype=np.int64)
+    performed = np.zeros(network_count, dtype=np.int64)
+
+    active = np.ones(network_count, dtype=bool)
+
+    completed = 0
+
+    while completed < permutations and active.any():
+        block = min(block_size, permutations - completed)
+        # number of cases among the network members in each permutation
+        drawn = rng.hypergeometric(
+            case_count, cohort_size - case_count, sample_size, block
+        )
+        # members are cases if their random key is one of the drawn
+        # smallest keys in the permutation
+        keys = rng.random((member_count, block))
+
+        cutoffs = np.sort(keys, axis=0)[np.maximum(drawn - 1, 0), np.arange(block)]
+
+        labels = (keys <= cutoffs) & (drawn > 0)
+
+        active_indices = np.flatnonzero(active)
+
+        counts = membership[active_indices] @ labels.astype(np.int32)
+
+        exceedances[active_indices] += (
+            counts >= observed[active_indices, np.newaxis]
+        ).sum(axis=1)
+
+        performed[active_indices] += block
+
+        completed += block
+
+        active &= exceedances < min_exceedances
+
+    return exceedances, performed
+
+
+@dataclass
+class PermutationPvalues:
+    """Class that is responsible for determining empirical pvalues for
+    each network by permuting the case labels across the cohort"""
+
+    name: str = "Permutation pvalue plugin"
+    permutations: Optional[int] = None
+    workers: Optional[int] = None
+    min_exceedances: int = 10
+    block_size: int = 100
+    seed: Optional[int] = None
+    streaming: ClassVar[bool] = True
+    reads: ClassVar[Tuple[str, ...]] = (
+        "networks",
+        "carriers",
+        "network_counts",
+        "phenotype_incidence",
+        "options",
+        "output_path",
+    )
+    writes: ClassVar[Tuple[str, ...]] = (
+        "network_counts",
+        "phenotype_incidence",
+        "status_counts",
+    )
+    _output: Optional[TextIO] = field(default=None, init=False, repr=False)
+    _executor: Optional[Executor] = field(default=None, init=False, repr=False)
+    _seed_sequence: Optional[np.random.SeedSequence] = field(
+        default=None, init=False, repr=False
+    )
+
+    def _configure(self, data: Data_Interface) -> None:
+        """Determine the permutation budget and the number of workers.
+        Values given on the commandline take precedence over the values
+        in the config file.
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the commandline options
+        """
+        self.permutations = (
+            data.options.get("permutations") or self.permutations or 1_000
+        )
+        self.workers = data.options.get("workers") or self.workers or 1
+
+        self._seed_sequence = np.random.SeedSequence(self.seed)
+
+        if self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        logger.verbose(
+            f"Performing up to {self.permutations} permutations for each network using {self.workers} worker(s)"  # noqa: E501
+        )
+
+    def _open(self, data: Data_Interface) -> TextIO:
+        """open the output file and write the header line if the file
+        has not already been opened
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path
+
+        Returns
+        -------
+        TextIO
+            returns the opened output file
+        """
+        if self._output is None:
+            self._configure(data)
+
+            output_file = data.output_path.parent / (
+                data.output_path.name + ".drive_permutation_pvalues.txt"
+            )
+
+            logger.debug(
+                f"The output in the permutation_pvalues plugin is being written to: {output_file}"  # noqa: E501
+            )
+
+            self._output = open(output_file, "w", encoding="utf-8")
+
+            _ = self._output.write(
+                "clstID\tphenotype\tcases_in_network\tnetwork_size\tpermutations\texceedances\tempirical_pvalue\n"  # noqa: E501
+            )
+
+        return self._output
+
+    @staticmethod
+    def _build_membership(
+        networks: List[Network_Interface], data: Data_Interface
+    ) -> Tuple[csr_matrix, csr_matrix]:
+        """Build the networks x members matrix for every individual in the
+        networks and the members x phenotypes matrix of excluded
+        individuals
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks in the current batch
+
+        data : Data_Interface
+            data container with the phenotype incidence matrices
+
+        Returns
+        -------
+        Tuple[csr_matrix, csr_matrix]
+            returns the membership matrix and the excluded matrix
+        """
+        member_indices: Dict[str, int] = {}
+
+        rows: List[int] = []
+        columns: List[int] = []
+
+        for row, network in enumerate(networks):
+            for member in network.members:
+                rows.append(row)
+                columns.append(member_indices.setdefault(member, len(member_indices)))
+
+        membership = csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, columns)),
+            shape=(len(networks), len(member_indices)),
+        )
+
+        incidence = data.phenotype_incidence
+
+        excluded_rows = []
+        excluded_members = []
+
+        for member, indx in member_indices.items():
+            incidence_indx = incidence.individuals.get(member)
+
+            if incidence_indx is not None:
+                excluded_rows.append(incidence_indx)
+                excluded_members.append(indx)
+
+        excluded = csr_matrix(
+            (len(member_indices), len(incidence.phenotypes)), dtype=np.int32
+        )
+
+        if excluded_rows:
+            reorder = csr_matrix(
+                (
+                    np.ones(len(excluded_rows), dtype=np.int32),
+                    (excluded_members, excluded_rows),
+                ),
+                shape=(len(member_indices), len(incidence.individuals)),
+            )
+            excluded = (reorder @ incidence.excluded).tocsr()
+
+        return membership, excluded
+
+    def process(self, networks: List[Network_Interface], data: Data_Interface) -> None:
+        """Determine the empirical pvalues for a batch of networks
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks that the pvalues will be calculated for
+
+        data : Data_Interface
+            data container that has the carriers for each phenotype
+        """
+        output = self._open(data)
+
+        if not data.carriers or not networks:
+            return
+
+        network_counts = data.get_network_counts(networks)
+
+        membership, excluded = self._build_membership(networks, data)
+
+        case_counts = network_counts.case_counts.tocsc()
+
+        excluded_counts = network_counts.excluded_counts.toarray()
+
+        columns: List[int] = []
+        tested_rows: List[np.ndarray] = []
+        arguments: List[tuple] = []
+
+        status_counts = data.count_statuses()
+
+        for column, phenotype in enumerate(network_counts.phenotypes):
+            case_count, control_count, _ = status_counts[phenotype]
+
+            # networks without cases always have a pvalue of 1 so they
+            # don't need to be permuted
+            observed = case_counts[:, column].toarray().ravel()
+
+            tested = np.flatnonzero(observed)
+
+            if tested.size == 0 or control_count == 0:
+                continue
+
+            included_members = np.flatnonzero(
+                excluded[:, column].toarray().ravel() == 0
+            )
+
+            columns.append(column)
+            tested_rows.append(tested)
+            arguments.append(
+                (
+                    membership[tested][:, included_members],
+                    observed[tested],
+                    case_count,
+                    case_count + control_count,
+                    self.permutations,
+                    self.min_exceedances,
+                    self.block_size,
+                    self._seed_sequence.spawn(1)[0],
+                )
+            )
+
+        if self._executor is not None and arguments:
+            results = self._executor.map(permute_phenotype, *zip(*arguments))
+        else:
+            results = (permute_phenotype(*task) for task in arguments)
+
+        for column, tested, task, (exceedances, performed) in zip(
+            columns, tested_rows, arguments, results
+        ):
+            phenotype = network_counts.phenotypes[column]
+            # networks that stopped early use the sequential estimate
+            # h / l from Besag and Clifford. Otherwise the pvalue is
+            # (exceedances + 1) / (permutations + 1)
+            pvalues = np.where(
+                exceedances >= self.min_exceedances,
+                exceedances / np.maximum(performed, 1),
+                (exceedances + 1) / (performed + 1),
+            )
+
+            network_sizes = (
+                network_counts.network_sizes[tested] - excluded_counts[tested, column]
+            )
+
+            for row, cases, size, perms, exceed, pvalue in zip(
+                tested.tolist(),
+                task[1].tolist(),
+                network_sizes.tolist(),
+                performed.tolist(),
+                exceedances.tolist(),
+                pvalues.tolist(),
+            ):
+                output.write(
+                    f"{networks[row].clst_id}\t{phenotype}\t{cases}\t{size}\t{perms}\t{exceed}\t{pvalue}\n"  # noqa: E501
+                )
+
+    def finish(self, data: Data_Interface) -> None:
+        """close the output file and shutdown the worker pool
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path
+        """
+        self._open(data).close()
+
+        self._output = None
+
+        if self._executor is not None:
+            self._executor.shutdown()
+
+            self._executor = None
+
+    def analyze(self, **kwargs) -> None:
+        """main function of the plugin that will determine the empirical
+        pvalues for every network and write them to a file"""
+        data: Data_Interface = kwargs["data"]
+
+        self.process(data.networks, data)
+
+        self.finish(data)
+
+
+def initialize() -> None:
+    factory_register("permutation_pvalues", PermutationPvalues)
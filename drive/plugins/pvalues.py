@@ -1,11 +1,12 @@
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+from dataclasses import dataclass, field
+from typing import ClassVar, Dict, List, Tuple
 
-from factory import factory_register
-from log import CustomLogger
-from models import Data_Interface, Network_Interface
-from numpy import float64
-from scipy.stats import binomtest
+import numpy as np
+
+from drive.factory import factory_register
+from drive.log import CustomLogger
+from drive.models import Data_Interface, Network_Interface, NetworkCounts
+from drive.utilities.binomial import BinomialCache
 
 logger = CustomLogger.get_logger(__name__)
 
@@ -15,208 +16,180 @@ class Pvalues:
     """Class that is responsible for determining the pvalues for each network"""
 
     name: str = "Pvalue plugin"
+    cache_size: int = 100_000
+    streaming: ClassVar[bool] = True
+    reads: ClassVar[Tuple[str, ...]] = (
+        "networks",
+        "carriers",
+        "phenotype_descriptions",
+    )
+    writes: ClassVar[Tuple[str, ...]] = (
+        "networks",
+        "network_counts",
+        "phenotype_incidence",
+        "status_counts",
+    )
+    _cache: BinomialCache = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._cache = BinomialCache(self.cache_size)
 
     @staticmethod
-    def _determine_pvalue(
-        phenotype: str,
-        phenotype_percent: int,
-        carriers_count: int,
-        network_size: int,
-    ) -> float64:
-        """Function that will determine the pvalue for each network
-        Returns
-        float
-            Returns the calculated pvalue
-        """
-        # the probability is 1 if the carrier count is zero because it is chances of finding
-        # 0 or higher which is everyone
-        if carriers_count == 0:
-            logger.debug(f"carrier count = 0 therefore pvalue for {phenotype} = 1")
-            return 1
-
-        result = binomtest(carriers_count - 1, network_size, phenotype_percent)
-
-        pvalue = result.pvalue
-
-        logger.debug(f"pvalue for {phenotype} = {pvalue}")
-
-        return pvalue
-
-    @staticmethod
-    def _determine_phenotype_frequency(phenotype_counts: Dict[str, List[str]]) -> float:
-        """calculate the phenotype frequency in the cohort
-
-        Parameters
-        ----------
-        phenotype_counts : Dict[str, List[str]]
-            Dictionary that has list for individuals who are
-            cases, controls, or exclusions.
-
-        Returns
-        -------
-        float
-            returns the phenotype frequency as a float
-        """
-
-        # We need to first check if there are even controls in the file
-        phenotype_frequency = len(phenotype_counts.get("cases")) / (
-            len(phenotype_counts.get("controls"))
-            + len(phenotype_counts.get("cases"))
-            + len(phenotype_counts.get("excluded", []))
-        )
-
-        logger.verbose(
-            f"Identified {len(phenotype_counts.get('cases'))} cases and {len(phenotype_counts.get('controls'))} giving a phenotype frequency of {phenotype_frequency}"
-        )
-
-        return phenotype_frequency
-
-    @staticmethod
-    def _get_carriers_in_network(
-        phenotype_counts: Dict[str, List[str]], network: Network_Interface
-    ) -> int:
-        """determine the number of individual cases that are
-        also in the network
+    def _determine_phenotype_frequencies(
+        phenotypes: List[str], status_counts: Dict[str, Tuple[int, int, int]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """calculate the frequency of every phenotype in the cohort once
+        so that it can be reused for every network
 
         Parameters
         ----------
-        phenotype_counts : Dict[str, List[str]]
-            Dictionary that has list for individuals who are
-            cases, controls, or exclusions.
+        phenotypes : List[str]
+            list of phenotypes in the order of the output columns
 
-        network : Network_Interface
-            Network object with information about members of
-            the networks and what haplotypes are in the network
+        status_counts : Dict[str, Tuple[int, int, int]]
+            Dictionary where the keys are phenotypes and the values are
+            tuples with the number of cases, controls, and exclusions.
 
         Returns
         -------
-        int
-            returns the number of carriers in the network
+        Tuple[np.ndarray, np.ndarray]
+            returns a tuple where the first element is an array of the
+            phenotype frequencies and the second element is a boolean
+            array indicating which phenotypes have controls. Phenotypes
+            without controls can not be tested.
         """
-        # determine the number of carriers in the network
+        frequencies = np.zeros(len(phenotypes), dtype=np.float64)
 
-        return len(network.members.intersection(phenotype_counts.get("cases")))
+        has_controls = np.zeros(len(phenotypes), dtype=bool)
 
-    def _remove_exclusions(
-        phenotype_counts: Dict[str, List[str]], network: Network_Interface
-    ) -> Tuple[int, int]:
-        """determine size of network after removing excluded
-        individuals
+        for indx, phenotype in enumerate(phenotypes):
+            case_count, control_count, excluded_count = status_counts[phenotype]
 
-        Parameters
-        ----------
-        phenotype_counts : Dict[str, List[str]]
-            Dictionary that has list for individuals who are
-            cases, controls, or exclusions.
+            if control_count != 0:
+                has_controls[indx] = True
 
-        network : Network_Interface
-            Network object with information about members of
-            the networks and what haplotypes are in the network
+                frequencies[indx] = case_count / (
+                    control_count + case_count + excluded_count
+                )
 
-        Returns
-        -------
-        Tuple[int, int]
-            returns the number of individuals in the network,
-            not counting those individuals classified as
-            excluded in the phenotype_counts dictionary. Also
-            returns the number of individuals excluded.
-        """
+                logger.verbose(
+                    f"Identified {case_count} cases and {control_count} giving a phenotype frequency of {frequencies[indx]}"  # noqa: E501
+                )
 
-        return (
-            len(network.members.difference(phenotype_counts.get("excluded"))),
-            len(network.members.intersection(phenotype_counts.get("excluded"))),
-        )
+        return frequencies, has_controls
 
-    def _gather_network_information(
-        self,
-        network: Network_Interface,
-        cohort_carriers: dict[str, Dict[str, List[str]]],
-    ) -> tuple[str, str, Dict[str, str]]:
-        """Function that will determine information about how many
-        carriers are in each network, the percentage, the IIDs of
-        the carriers in the network, and use this to calculate the
-        pvalue for the network. The function keeps track of the
-        smallest non-zero pvalue and returns it or NA
+    @staticmethod
+    def _gather_batch_information(
+        network_counts: NetworkCounts,
+        status_counts: Dict[str, Tuple[int, int, int]],
+        cache: BinomialCache,
+    ) -> List[Tuple[str, str, Dict[str, str]]]:
+        """Determine the pvalues for every network and every phenotype at
+        once. This method gives the same results as calling
+        _gather_network_information for each network but the pvalues
+        are evaluated over whole arrays.
 
         Parameters
         ----------
-        carriers_list : dict[str, list[str]]
-            Dictionary that has all the carriers in list for each phenotype of interest
+        network_counts : NetworkCounts
+            networks x phenotypes matrices with the number of cases and
+            excluded individuals in each network
 
-        network : Network
-            Network object attributes for iids, pairs, and haplotypes
+        status_counts : Dict[str, Tuple[int, int, int]]
+            Dictionary where the keys are phenotypes and the values are
+            tuples with the number of cases, controls, and exclusions.
 
-        phenotype_percentages : dict[str, float]
-            dictionary where the keys are phecode strings and the values are the phecode
-            frequencies in the population
+        cache : BinomialCache
+            cache of previously calculated pvalues
 
         Returns
         -------
-        Tuple[str, str, Dict[str, str]]
-            returns a tuple where the first element is the string of the
-            minimum phenotype code. The second value is the description
-            of the minimum phenotype. The third value is a dictionary
+        List[Tuple[str, str, Dict[str, str]]]
+            returns a list with a tuple for each network. The first
+            element of the tuple is the minimum pvalue, the second is
+            the minimum phenotype, and the third element is a dictionary
             that for each phenotype has a string with the number of
             cases, number of excluded individuals, and the p-values.
         """
-        # setting null values for the output string and the cur_min_phecode string.
-        # Also setting a value of 1 for the cur_min_pvalue because this will be the
-        # largest pvalue possible
+        phenotypes = network_counts.phenotypes
 
-        cur_min_pvalue = 1
+        frequencies, has_controls = Pvalues._determine_phenotype_frequencies(
+            phenotypes, status_counts
+        )
 
-        cur_min_phenotype = ""
+        case_counts = network_counts.case_counts.toarray()
 
-        phenotype_pvalues = {}
+        excluded_counts = network_counts.excluded_counts.toarray()
 
-        # iterating over each phenotype
-        for phenotype, phenotype_counts in cohort_carriers.items():
-            # if there are no controls then we can't do the
-            # stats and should just return a string of N/A for all values
-            if len(phenotype_counts.get("controls")) == 0:
-                phenotype_pvalues[phenotype] = "N/A\tN/A\tN/A"
-            else:
-                phenotype_freq = Pvalues._determine_phenotype_frequency(
-                    phenotype_counts
-                )
+        # the network size after removing the excluded individuals is
+        # the number of trials for the binomial test
+        effective_sizes = network_counts.network_sizes[:, np.newaxis] - excluded_counts
 
-                num_carriers_in_network = Pvalues._get_carriers_in_network(
-                    phenotype_counts, network
-                )
+        # the pvalue is 1 if there are no carriers because it is the
+        # chance of finding 0 or higher which is everyone
+        tested = (case_counts > 0) & has_controls[np.newaxis, :]
 
-                (
-                    network_size_after_exclusions,
-                    excluded_count,
-                ) = Pvalues._remove_exclusions(phenotype_counts, network)
-
-                # calling the sub function that determines the pvalue
-                pvalue: float = Pvalues._determine_pvalue(
-                    phenotype,
-                    phenotype_freq,
-                    num_carriers_in_network,
-                    network_size_after_exclusions,
-                )
+        pvalues = np.ones(case_counts.shape, dtype=np.float64)
 
-                # Next two lines create the string and then concats it to the output_str
-                phenotype_str = f"{num_carriers_in_network}\t{excluded_count}\t{pvalue}"
+        rows, columns = np.nonzero(tested)
 
-                phenotype_pvalues[phenotype] = phenotype_str
+        pvalues[rows, columns] = cache.pvalues(
+            case_counts[rows, columns] - 1,
+            effective_sizes[rows, columns],
+            frequencies[columns],
+        )
 
-                # Now we will see if the phecode is lower then the cur_min_pvalue. If it is then
-                # we will change the cur_min_pvalue and we will update the cur_min_phecode
-                if pvalue < cur_min_pvalue and pvalue != 0:
-                    cur_min_pvalue = pvalue
+        # the numeric pvalues are stored with the counts so that other
+        # plugins don't have to parse the output strings. Phenotypes
+        # without controls can't be tested so their pvalues are NaN
+        network_counts.pvalues = np.where(has_controls[np.newaxis, :], pvalues, np.nan)
 
-                    cur_min_phenotype = phenotype
+        # the minimum pvalue has to be non zero and smaller than 1.
+        # argmin returns the first phenotype when there are ties which is
+        # the same phenotype that the sequential comparison would keep
+        candidate_pvalues = np.where(
+            tested & (pvalues != 0) & (pvalues < 1), pvalues, np.inf
+        )
 
-        # if a minimum phecode is identified then we need to create a string, otherwise we
-        # use N/A's
-        if not cur_min_phenotype:
-            cur_min_phenotype = "N/A"
-            cur_min_pvalue = "N/A"
+        if phenotypes:
+            min_indices = np.argmin(candidate_pvalues, axis=1).tolist()
+        else:
+            min_indices = [0] * len(network_counts.clst_ids)
+
+        network_information = []
+
+        for row, (case_row, excluded_row, pvalue_row, tested_row) in enumerate(
+            zip(
+                case_counts.tolist(),
+                excluded_counts.tolist(),
+                pvalues.tolist(),
+                tested.tolist(),
+            )
+        ):
+            phenotype_pvalues = {}
+
+            for indx, phenotype in enumerate(phenotypes):
+                if not has_controls[indx]:
+                    phenotype_pvalues[phenotype] = "N/A\tN/A\tN/A"
+                elif tested_row[indx]:
+                    phenotype_pvalues[
+                        phenotype
+                    ] = f"{case_row[indx]}\t{excluded_row[indx]}\t{pvalue_row[indx]}"
+                else:
+                    phenotype_pvalues[
+                        phenotype
+                    ] = f"{case_row[indx]}\t{excluded_row[indx]}\t1"
+
+            min_indx = min_indices[row]
+
+            if phenotypes and np.isfinite(candidate_pvalues[row, min_indx]):
+                network_information.append(
+                    (pvalue_row[min_indx], phenotypes[min_indx], phenotype_pvalues)
+                )
+            else:
+                network_information.append(("N/A", "N/A", phenotype_pvalues))
 
-        # return the pvalue_output string first and either a tuple of N/As or the min pvalue/min_phecode
-        return cur_min_pvalue, cur_min_phenotype, phenotype_pvalues
+        return network_information
 
     @staticmethod
     def _get_descriptions(
@@ -243,20 +216,32 @@ class Pvalues:
 
         return desc_dict.get("phenotype", "N/A")
 
-    def analyze(self, **kwargs) -> None:
-        # this is the DataHolder model. We will use the networks, the
-        # affected_inds, and the phenotype_prevalances attribute
-        data: Data_Interface = kwargs["data"]
+    def process(self, networks: List[Network_Interface], data: Data_Interface) -> None:
+        """Determine the pvalues for a batch of networks
 
-        if data.carriers:
-            for network in data.networks:
-                # Determining the pvalues for the network
-                (
-                    min_pvalue_str,
-                    min_phenotype_code,
-                    phenotype_pvalues,
-                ) = self._gather_network_information(network, data.carriers)
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks that the pvalues will be calculated for
 
+        data : Data_Interface
+            data container that has the carriers for each phenotype and
+            the phenotype descriptions
+        """
+        if data.carriers and networks:
+            # the case and exclusion counts are stored in the data
+            # container so that other plugins can reuse them
+            network_counts = data.count_phenotypes(networks)
+
+            network_information = self._gather_batch_information(
+                network_counts, data.count_statuses(), self._cache
+            )
+
+            for network, (
+                min_pvalue_str,
+                min_phenotype_code,
+                phenotype_pvalues,
+            ) in zip(networks, network_information):
                 min_phecode_description = self._get_descriptions(
                     data.phenotype_descriptions, min_phenotype_code
                 )
@@ -272,6 +257,20 @@ class Pvalues:
                 # pvalues
                 network.pvalues = phenotype_pvalues
 
+    def finish(self, data: Data_Interface) -> None:
+        """The pvalues are attached to each network as it is processed
+        so the only thing left to do is record how useful the cache was"""
+        logger.debug(f"{self._cache}")
+
+    def analyze(self, **kwargs) -> None:
+        # this is the DataHolder model. We will use the networks, the
+        # affected_inds, and the phenotype_prevalances attribute
+        data: Data_Interface = kwargs["data"]
+
+        self.process(data.networks, data)
+
+        self.finish(data)
+
 
 def initialize() -> None:
     factory_register("pvalues", Pvalues)
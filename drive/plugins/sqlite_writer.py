@@ -0,0 +1,477 @@
+"""Plugin that writes the networks, the members of each network, and the
+phenotype results to a SQLite database. Every run is appended to the same
+database so that questions like which networks an individual is in across
+all of the loci can be answered with an indexed query such as:
+
+    SELECT runs.locus, networks.clst_id
+    FROM memberships
+    JOIN networks USING (network_id)
+    JOIN runs USING (run_id)
+    WHERE memberships.individual = 'ID1'
+"""
+
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import ClassVar, List, Optional, Tuple
+
+import numpy as np
+
+from drive.factory import factory_register
+from drive.log import CustomLogger
+from drive.models import Data_Interface, Network_Interface
+from drive.utilities.shards import shard_name
+
+logger = CustomLogger.get_logger(__name__)
+
+# default name of the database that is created in the output directory
+DEFAULT_DATABASE_NAME = "drive_results.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    output TEXT NOT NULL,
+    locus TEXT,
+    chromosome TEXT,
+    start INTEGER,
+    end INTEGER,
+    created TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS networks (
+    network_id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    clst_id TEXT NOT NULL,
+    n_total INTEGER,
+    n_haplotype INTEGER,
+    true_positive_n INTEGER,
+    true_positive REAL,
+    false_negative_n INTEGER,
+    haplotypes TEXT
+);
+CREATE TABLE IF NOT EXISTS memberships (
+    network_id INTEGER NOT NULL REFERENCES networks (network_id),
+    individual TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS phenotype_results (
+    network_id INTEGER NOT NULL REFERENCES networks (network_id),
+    phenotype TEXT NOT NULL,
+    cases_in_network INTEGER,
+    excluded_in_network INTEGER,
+    pvalue REAL
+);
+CREATE INDEX IF NOT EXISTS runs_locus ON runs (chromosome, start, end);
+CREATE INDEX IF NOT EXISTS networks_run ON networks (run_id);
+CREATE INDEX IF NOT EXISTS memberships_individual ON memberships (individual);
+CREATE INDEX IF NOT EXISTS memberships_network ON memberships (network_id);
+CREATE INDEX IF NOT EXISTS phenotype_results_phenotype
+    ON phenotype_results (phenotype, pvalue);
+CREATE INDEX IF NOT EXISTS phenotype_results_network
+    ON phenotype_results (network_id);
+"""
+
+
+@dataclass
+class SqliteWriter:
+    """Class that is responsible for appending the results of the run to
+    a SQLite database. All of the rows from a run are inserted in a single
+    transaction so a run that fails leaves the database unchanged. If no
+    database path is provided then the database is created in the output
+    directory as drive_results.sqlite. Sharded runs write to a separate
+    database for each shard, such as drive_results.shard_1_of_4.sqlite, so
+    that the shards never share a database file"""
+
+    name: str = "SqliteWriter plugin"
+    database: Optional[str] = None
+    streaming: ClassVar[bool] = True
+    reads: ClassVar[Tuple[str, ...]] = (
+        "networks",
+        "carriers",
+        "network_counts",
+        "options",
+        "output_path",
+    )
+    writes: ClassVar[Tuple[str, ...]] = (
+        "network_counts",
+        "phenotype_incidence",
+    )
+    _connection: Optional[sqlite3.Connection] = field(
+        default=None, init=False, repr=False
+    )
+    _run_id: Optional[int] = field(default=None, init=False, repr=False)
+    _next_network_id: int = field(default=1, init=False, repr=False)
+
+    def _database_path(self, data: Data_Interface) -> Path:
+        """return the path to the database file"""
+        if self.database is not None:
+            database_path = Path(self.database)
+        else:
+            database_path = data.output_path.parent / DEFAULT_DATABASE_NAME
+
+        shard = data.options.get("shard")
+
+        if shard is not None:
+            database_path = database_path.parent / shard_name(
+                database_path.name, *shard, database_path.suffix
+            )
+
+        return database_path
+
+    def _open(self, data: Data_Interface) -> sqlite3.Connection:
+        """open the database, create the tables if they don't exist, and
+        start the transaction for this run
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path and the target region
+
+        Returns
+        -------
+        sqlite3.Connection
+            returns the connection to the database
+        """
+        if self._connection is not None:
+            return self._connection
+
+        database_path = self._database_path(data)
+
+        logger.debug(
+            f"The output in the sqlite_writer plugin is being written to: {database_path}"  # noqa: E501
+        )
+
+        # transactions are handled explicitly so that every insert from
+        # the run is committed at once
+        self._connection = sqlite3.connect(database_path, isolation_level=None)
+
+        self._connection.executescript(SCHEMA)
+
+        # taking the write lock at the start of the run so that two runs
+        # writing to the same database can't interleave their network ids
+        self._connection.execute("BEGIN IMMEDIATE")
+
+        target = data.options.get("target")
+
+        cursor = self._connection.execute(
+            "INSERT INTO runs (output, locus, chromosome, start, end, created) VALUES (?, ?, ?, ?, ?, ?)",  # noqa: E501
+            (
+                str(data.output_path),
+                f"{target.chr}:{target.start}-{target.end}" if target else None,
+                str(target.chr) if target else None,
+                int(target.start) if target else None,
+                int(target.end) if target else None,
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+
+        self._run_id = cursor.lastrowid
+
+        (max_network_id,) = self._connection.execute(
+            "SELECT MAX(network_id) FROM networks"
+        ).fetchone()
+
+        self._next_network_id = (max_network_id or 0) + 1
+
+        return self._connection
+
+    def _phenotype_rows(
+        self,
+        networks: List[Network_Interface],
+        network_ids: List[int],
+        data: Data_Interface,
+    ) -> List[tuple]:
+        """Create the rows of the phenotype_results table for every network
+        and phenotype where there is at least one case in the network
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks in the batch
+
+        network_ids : List[int]
+            database id of each network
+
+        data : Data_Interface
+            data container that has the carriers of each phenotype
+
+        Returns
+        -------
+        List[tuple]
+            returns a list of rows for the executemany call
+        """
+        network_counts = data.get_network_counts(networks)
+
+        case_counts = network_counts.case_counts.tocoo()
+
+        rows, columns, cases = case_counts.row, case_counts.col, case_counts.data
+
+        excluded = np.asarray(network_counts.excluded_counts[rows, columns]).ravel()
+
+        if network_counts.pvalues is not None:
+            pvalues = network_counts.pvalues[rows, columns]
+        else:
+            pvalues = np.full(len(rows), np.nan)
+
+        return [
+            (
+                network_ids[row],
+                network_counts.phenotypes[column],
+                case_count,
+                excluded_count,
+                None if np.isnan(pvalue) else pvalue,
+            )
+            for row, column, case_count, excluded_count, pvalue in zip(
+                rows.tolist(),
+                columns.tolist(),
+                cases.tolist(),
+                excluded.tolist(),
+                pvalues.tolist(),
+            )
+        ]
+
+    def process(self, networks: List[Network_Interface], data: Data_Interface) -> None:
+        """insert the rows for a batch of networks
+
+        Parameters
+        ----------
+        networks : List[Network_Interface]
+            list of networks in the batch
+
+        data : Data_Interface
+            data container that has the output path, the target region,
+            and the carriers of each phenotype
+        """
+        connection = self._open(data)
+
+        if not networks:
+            return
+
+        network_ids = list(
+            range(self._next_network_id, self._next_network_id + len(networks))
+        )
+
+        self._next_network_id += len(networks)
+
+        try:
+            connection.executemany(
+                "INSERT INTO networks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        network_id,
+                        self._run_id,
+                        str(network.clst_id),
+                        len(network.members),
+                        len(network.haplotypes),
+                        network.true_positive_count,
+                        network.true_positive_percent,
+                        network.false_negative_count,
+                        ",".join(map(str, network.haplotypes)),
+                    )
+                    for network_id, network in zip(network_ids, networks)
+                ],
+            )
+
+            connection.executemany(
+                "INSERT INTO memberships VALUES (?, ?)",
+                [
+                    (network_id, str(member))
+                    for network_id, network in zip(network_ids, networks)
+                    for member in network.members
+                ],
+            )
+
+            if data.carriers:
+                connection.executemany(
+                    "INSERT INTO phenotype_results VALUES (?, ?, ?, ?, ?)",
+                    self._phenotype_rows(networks, network_ids, data),
+                )
+        except sqlite3.Error:
+            self._rollback()
+            raise
+
+    def _rollback(self) -> None:
+        """roll back the transaction and close the connection"""
+        if self._connection is not None:
+            self._connection.execute("ROLLBACK")
+            self._connection.close()
+
+        self._connection = None
+        self._run_id = None
+
+    def finish(self, data: Data_Interface) -> None:
+        """commit the transaction and close the database
+
+        Parameters
+        ----------
+        data : Data_Interface
+            data container that has the output path and the target region
+        """
+        connection = self._open(data)
+
+        connection.execute("COMMIT")
+
+        connection.close()
+
+        logger.verbose(
+            f"Wrote the results of run {self._run_id} to the database {self._database_path(data)}"  # noqa: E501
+        )
+
+        self._connection = None
+        self._run_id = None
+
+    def analyze(self, **kwargs) -> None:
+        """main function of the plugin that will write every network to
+        the database"""
+
+        data: Data_Interface = kwargs["data"]
+
+        self.process(data.networks, data)
+
+        self.finish(data)
+
+
+def merge_databases(
+    shard_databases: List[Path], database: Path, output: Path
+) -> Optional[int]:
+    """Combine the latest run of every shard database into a single run of
+    another database. The networks are given new ids that continue from
+    the ids already in the database and every row is inserted in one
+    transaction
+
+    Parameters
+    ----------
+    shard_databases : List[Path]
+        database of each shard in the order of the shards
+
+    database : Path
+        database that the merged run is appended to. The database is
+        created if it doesn't exist
+
+    output : Path
+        output prefix that is recorded for the merged run
+
+    Returns
+    -------
+    Optional[int]
+        returns the run id of the merged run or None if none of the shard
+        databases had a run
+    """
+    shard_runs = []
+
+    for shard_database in shard_databases:
+        with closing(
+            sqlite3.connect(f"file:{shard_database}?mode=ro", uri=True)
+        ) as shard:
+            shard_runs.append(
+                shard.execute(
+                    "SELECT run_id, chromosome, start, end FROM runs ORDER BY run_id DESC LIMIT 1"  # noqa: E501
+                ).fetchone()
+            )
+
+    runs = [run for run in shard_runs if run is not None]
+
+    if not runs:
+        logger.warning("None of the shard databases had any runs to merge")
+        return None
+
+    chromosomes = {run[1] for run in runs}
+    # the merged run covers the loci of all of the shards if they are on
+    # the same chromosome
+    if len(chromosomes) == 1 and None not in chromosomes:
+        chromosome = chromosomes.pop()
+        start = min(run[2] for run in runs)
+        end = max(run[3] for run in runs)
+        locus = f"{chromosome}:{start}-{end}"
+    else:
+        chromosome, start, end, locus = None, None, None, None
+
+    connection = sqlite3.connect(database, isolation_level=None)
+
+    try:
+        connection.executescript(SCHEMA)
+
+        connection.execute("BEGIN IMMEDIATE")
+
+        try:
+            run_id = connection.execute(
+                "INSERT INTO runs (output, locus, chromosome, start, end, created) VALUES (?, ?, ?, ?, ?, ?)",  # noqa: E501
+                (
+                    str(output),
+                    locus,
+                    chromosome,
+                    start,
+                    end,
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            ).lastrowid
+
+            (max_network_id,) = connection.execute(
+                "SELECT MAX(network_id) FROM networks"
+            ).fetchone()
+
+            network_offset = max_network_id or 0
+
+            for shard_database, shard_run in zip(shard_databases, shard_runs):
+                if shard_run is None:
+                    continue
+
+                with closing(
+                    sqlite3.connect(f"file:{shard_database}?mode=ro", uri=True)
+                ) as shard:
+                    (shard_min_id, shard_max_id) = shard.execute(
+                        "SELECT MIN(network_id), MAX(network_id) FROM networks WHERE run_id = ?",  # noqa: E501
+                        (shard_run[0],),
+                    ).fetchone()
+
+                    if shard_min_id is None:
+                        continue
+                    # the networks of a run have consecutive ids so they
+                    # only need to be shifted to come after the previous
+                    # shard
+                    shift = network_offset - shard_min_id + 1
+
+                    connection.executemany(
+                        "INSERT INTO networks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            (row[0] + shift, run_id, *row[1:])
+                            for row in shard.execute(
+                                "SELECT network_id, clst_id, n_total, n_haplotype, true_positive_n, true_positive, false_negative_n, haplotypes FROM networks WHERE run_id = ? ORDER BY network_id",  # noqa: E501
+                                (shard_run[0],),
+                            )
+                        ),
+                    )
+
+                    for table, column_count in [
+                        ("memberships", 2),
+                        ("phenotype_results", 5),
+                    ]:
+                        connection.executemany(
+                            f"INSERT INTO {table} VALUES ({', '.join(['?'] * column_count)})",  # noqa: E501
+                            (
+                                (row[0] + shift, *row[1:])
+                                for row in shard.execute(
+                                    f"SELECT {table}.* FROM {table} JOIN networks USING (network_id) WHERE networks.run_id = ?",  # noqa: E501
+                                    (shard_run[0],),
+                                )
+                            ),
+                        )
+
+                    network_offset = shard_max_id + shift
+
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+    finally:
+        connection.close()
+
+    logger.verbose(
+        f"Merged {len(runs)} shard runs into run {run_id} of the database {database}"
+    )
+
+    return run_id
+
+
+def initialize() -> None:
+    factory_register("sqlite_writer", SqliteWriter)
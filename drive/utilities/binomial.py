@@ -0,0 +1,319 @@
+"""Module with a vectorized version of the two-sided binomial test. The
+results match scipy.stats.binomtest element for element but the
+probabilities are evaluated over whole arrays instead of one test at a
+time. The BinomialCache class memoizes the pvalues for both single tests
+and arrays of tests."""
+
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+# relative error used by scipy when comparing probabilities in the two
+# sided test
+RERR = 1 + 1e-7
+
+
+def _binary_search(
+    func: Callable[[np.ndarray], np.ndarray],
+    target: np.ndarray,
+    lo: np.ndarray,
+    hi: np.ndarray,
+) -> np.ndarray:
+    """Vectorized version of the binary search scipy uses to find the
+    position on the opposite side of the mode where the tail
+    probability starts
+
+    Parameters
+    ----------
+    func : Callable[[np.ndarray], np.ndarray]
+        function that is ascending between lo and hi for every element
+
+    target : np.ndarray
+        value being searched for in each element
+
+    lo : np.ndarray
+        lower end of the range to search for each element
+
+    hi : np.ndarray
+        higher end of the range to search for each element
+
+    Returns
+    -------
+    np.ndarray
+        returns the index i for each element such that
+        func(i) <= target < func(i+1)
+    """
+    lo = lo.copy()
+    hi = hi.copy()
+
+    result = np.zeros(lo.shape, dtype=np.int64)
+    found = np.zeros(lo.shape, dtype=bool)
+
+    active = lo < hi
+
+    while active.any():
+        mid = lo + (hi - lo) // 2
+
+        midval = func(mid)
+
+        less = active & (midval < target)
+        greater = active & (midval > target)
+        equal = active & ~less & ~greater
+
+        lo = np.where(less, mid + 1, lo)
+        hi = np.where(greater, mid - 1, hi)
+
+        result[equal] = mid[equal]
+        found |= equal
+
+        active &= ~equal & (lo < hi)
+
+    remaining = ~found
+
+    result[remaining] = np.where(
+        func(lo)[remaining] <= target[remaining], lo[remaining], lo[remaining] - 1
+    )
+
+    return result
+
+
+def binomtest_pvalues(k: np.ndarray, n: np.ndarray, p: np.ndarray) -> np.ndarray:
+    """Calculate the two-sided binomial test pvalue for every element of
+    the input arrays. Each element gives the same value as
+    scipy.stats.binomtest(k, n, p).pvalue
+
+    Parameters
+    ----------
+    k : np.ndarray
+        number of successes for each test
+
+    n : np.ndarray
+        number of trials for each test. Every value has to be
+        positive
+
+    p : np.ndarray
+        hypothesized probability of success for each test
+
+    Returns
+    -------
+    np.ndarray
+        returns a float array with the pvalue of each test
+    """
+    # scipy.stats is slow to import so it is only imported when pvalues
+    # are calculated
+    from scipy.stats import binom
+
+    k, n, p = np.broadcast_arrays(
+        np.asarray(k, dtype=np.int64),
+        np.asarray(n, dtype=np.int64),
+        np.asarray(p, dtype=np.float64),
+    )
+
+    pvalues = np.ones(k.shape, dtype=np.float64)
+
+    if k.size == 0:
+        return pvalues
+
+    d = binom.pmf(k, n, p)
+
+    expected = p * n
+
+    # tests where k is below the expected value have to find the
+    # cutoff in the upper tail
+    lower = k < expected
+
+    if lower.any():
+        nl, pl, dl = n[lower], p[lower], d[lower]
+
+        ix = _binary_search(
+            lambda x: -binom.pmf(x, nl, pl),
+            -dl * RERR,
+            np.ceil(pl * nl).astype(np.int64),
+            nl,
+        )
+
+        y = nl - ix + (dl * RERR == binom.pmf(ix, nl, pl)).astype(np.int64)
+
+        pvalues[lower] = binom.cdf(k[lower], nl, pl) + binom.sf(nl - y, nl, pl)
+
+    # tests where k is above the expected value have to find the cutoff
+    # in the lower tail
+    upper = k > expected
+
+    if upper.any():
+        nu, pu, du = n[upper], p[upper], d[upper]
+
+        ix = _binary_search(
+            lambda x: binom.pmf(x, nu, pu),
+            du * RERR,
+            np.zeros(nu.shape, dtype=np.int64),
+            np.floor(pu * nu).astype(np.int64),
+        )
+
+        y = ix + 1
+
+        pvalues[upper] = binom.cdf(y - 1, nu, pu) + binom.sf(k[upper] - 1, nu, pu)
+
+    # tests where k == n*p keep the pvalue of 1
+    return np.minimum(pvalues, 1.0)
+
+
+class BinomialCache:
+    """Bounded least recently used cache of binomial test pvalues. Many
+    networks share the same number of carriers, network size, and
+    phenotype frequency so the pvalues only have to be calculated once
+    for each combination. The cache can be used for single tests and
+    for arrays of tests."""
+
+    def __init__(self, maxsize: int = 100_000) -> None:
+        """Initialize the BinomialCache class.
+
+        Parameters
+        ----------
+        maxsize : int
+            maximum number of pvalues to keep in the cache. The least
+            recently used pvalue is removed once the cache is full.
+        """
+        self.maxsize: int = maxsize
+        self.hits: int = 0
+        self.misses: int = 0
+        self._pvalues: OrderedDict[Tuple[int, int, float], float] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._pvalues)
+
+    def __str__(self) -> str:
+        """Custom string message used for debugging"""
+        total = self.hits + self.misses
+
+        hit_rate = self.hits / total if total else 0.0
+
+        return f"BinomialCache: hits={self.hits}, misses={self.misses}, hit_rate={hit_rate:.4f}, size={len(self)}, maxsize={self.maxsize}"  # noqa: E501
+
+    def _get(self, key: Tuple[int, int, float]) -> Optional[float]:
+        """return the cached pvalue and mark it as recently used"""
+        pvalue = self._pvalues.get(key)
+
+        if pvalue is not None:
+            self._pvalues.move_to_end(key)
+
+        return pvalue
+
+    def _put(self, key: Tuple[int, int, float], pvalue: float) -> None:
+        """add the pvalue to the cache and evict the least recently used
+        pvalue if the cache is full"""
+        if self.maxsize <= 0:
+            return
+
+        self._pvalues[key] = pvalue
+
+        if len(self._pvalues) > self.maxsize:
+            self._pvalues.popitem(last=False)
+
+    def pvalue(self, k: int, n: int, p: float) -> float:
+        """Determine the pvalue for a single two-sided binomial test
+
+        Parameters
+        ----------
+        k : int
+            number of successes
+
+        n : int
+            number of trials
+
+        p : float
+            hypothesized probability of success
+
+        Returns
+        -------
+        float
+            returns the same pvalue as scipy.stats.binomtest(k, n, p)
+        """
+        key = (int(k), int(n), float(p))
+
+        pvalue = self._get(key)
+
+        if pvalue is None:
+            self.misses += 1
+
+            from scipy.stats import binomtest
+
+            pvalue = binomtest(*key).pvalue
+
+            self._put(key, pvalue)
+        else:
+            self.hits += 1
+
+        return pvalue
+
+    def pvalues(self, k: np.ndarray, n: np.ndarray, p: np.ndarray) -> np.ndarray:
+        """Determine the pvalue for every element of the input arrays.
+        Only the combinations that are not in the cache are evaluated
+        and they are evaluated together with binomtest_pvalues.
+
+        Parameters
+        ----------
+        k : np.ndarray
+            number of successes for each test
+
+        n : np.ndarray
+            number of trials for each test
+
+        p : np.ndarray
+            hypothesized probability of success for each test
+
+        Returns
+        -------
+        np.ndarray
+            returns a float array with the pvalue of each test
+        """
+        k, n, p = np.broadcast_arrays(
+            np.asarray(k, dtype=np.int64),
+            np.asarray(n, dtype=np.int64),
+            np.asarray(p, dtype=np.float64),
+        )
+
+        if k.size == 0:
+            return np.ones(k.shape, dtype=np.float64)
+
+        # we only need to look up each unique combination once
+        unique_tests, inverse = np.unique(
+            np.column_stack((k.ravel(), n.ravel(), p.ravel())),
+            axis=0,
+            return_inverse=True,
+        )
+
+        keys = [
+            (int(test_k), int(test_n), test_p)
+            for test_k, test_n, test_p in unique_tests.tolist()
+        ]
+
+        unique_pvalues = np.empty(len(keys), dtype=np.float64)
+
+        missing = []
+
+        for indx, key in enumerate(keys):
+            pvalue = self._get(key)
+
+            if pvalue is None:
+                missing.append(indx)
+            else:
+                unique_pvalues[indx] = pvalue
+
+        if missing:
+            missing_tests = unique_tests[missing]
+
+            missing_pvalues = binomtest_pvalues(
+                missing_tests[:, 0], missing_tests[:, 1], missing_tests[:, 2]
+            )
+
+            unique_pvalues[missing] = missing_pvalues
+
+            for indx, pvalue in zip(missing, missing_pvalues.tolist()):
+                self._put(keys[indx], pvalue)
+
+        self.misses += len(missing)
+        self.hits += k.size - len(missing)
+
+        return unique_pvalues[inverse.ravel()].reshape(k.shape)
@@ -0,0 +1,556 @@
+"""Module with the checkpoints of the cluster command. The filtered segments
+and vertices are written after the filter and the state of the cluster
+handler is written after the first pass of the clustering and after every
+round of reclustering. The checkpoints are stored as .npz files next to the
+output with a small json manifest. The manifest has a key made from the
+ibd file, the target, the phenotype file, and the clustering parameters so
+a run is only resumed from a checkpoint that was written with the same
+inputs."""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from pandas import DataFrame
+
+from drive.cluster import ClusterHandler
+from drive.filters import IbdFilter
+from drive.log import CustomLogger
+from drive.models import FileIndices, Genes, Network, Network_Interface
+from drive.utilities.parser.phenotype_cache import cache_key
+
+logger = CustomLogger.get_logger(__name__)
+
+# version of the checkpoint layout. Bumping this value invalidates old
+# checkpoints
+CHECKPOINT_VERSION = 1
+
+# suffix added to the output prefix for the checkpoint files
+CHECKPOINT_SUFFIX = ".drive_checkpoint"
+
+
+def checkpoint_key(
+    ibd_file: Union[Path, str],
+    ibd_format: str,
+    target: Genes,
+    parameters: Any,
+    case_file: Optional[Union[Path, str]] = None,
+    sample_dictionary: Optional[Union[Path, str]] = None,
+) -> Dict[str, Any]:
+    """Create the key that identifies the inputs of a run
+
+    Parameters
+    ----------
+    ibd_file : Path | str
+        path to the ibd file
+
+    ibd_format : str
+        name of the program that created the ibd file
+
+    target : Genes
+        target region
+
+    parameters : ClusterParameters
+        parameters used to filter and cluster the segments
+
+    case_file : Optional[Path | str]
+        path to the phenotype file. The samples in the file restrict the
+        segments that are kept by the filter
+
+    sample_dictionary : Optional[Path | str]
+        directory with the sample dictionary that the stable codes come from
+
+    Returns
+    -------
+    Dict[str, Any]
+        returns a dictionary with the checkpoint version, the key of each
+        input file, the target, and the parameters. The files are keyed by
+        their path, size, modification time, and a hash of the start and
+        end of the file
+    """
+    return {
+        "version": CHECKPOINT_VERSION,
+        "ibd_file": cache_key(ibd_file),
+        "ibd_format": ibd_format.lower(),
+        "target": [int(target.chr), int(target.start), int(target.end)],
+        "parameters": asdict(parameters),
+        "case_file": cache_key(case_file) if case_file is not None else None,
+        "sample_dictionary": str(Path(sample_dictionary).resolve())
+        if sample_dictionary is not None
+        else None,
+    }
+
+
+def _key_digest(key: Dict[str, Any]) -> str:
+    """digest of the key that is stored in the manifest and the checkpoint
+    files so that a manifest is never paired with the files of another run"""
+    return hashlib.blake2b(
+        json.dumps(key, sort_keys=True).encode(), digest_size=8
+    ).hexdigest()
+
+
+def _frame_to_arrays(
+    frame: DataFrame, name: str
+) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """Split the dataframe into one array per column. String columns are
+    stored as fixed width unicode arrays so that the file can be read
+    without pickle
+
+    Parameters
+    ----------
+    frame : DataFrame
+        dataframe to store
+
+    name : str
+        name used as the prefix of the arrays
+
+    Returns
+    -------
+    Tuple[Dict[str, np.ndarray], Dict[str, Any]]
+        returns the arrays and a description of the dataframe with the
+        column labels and which columns were converted from objects
+    """
+    arrays = {}
+
+    object_columns = []
+
+    for position, column in enumerate(frame.columns):
+        values = frame[column].to_numpy()
+
+        if values.dtype == object:
+            values = values.astype(str)
+
+            object_columns.append(position)
+
+        arrays[f"{name}.{position}"] = values
+
+    return arrays, {"columns": list(frame.columns), "object_columns": object_columns}
+
+
+def _frame_from_arrays(
+    arrays: Any, name: str, description: Dict[str, Any]
+) -> DataFrame:
+    """Create the dataframe from the arrays written by _frame_to_arrays"""
+    columns = {}
+
+    for position, column in enumerate(description["columns"]):
+        values = arrays[f"{name}.{position}"]
+
+        if position in description["object_columns"]:
+            values = values.astype(object)
+
+        columns[column] = values
+
+    return DataFrame(columns, columns=description["columns"])
+
+
+def _network_attributes(finalized: bool) -> List[str]:
+    """attributes of the networks that are stored as arrays. The members of
+    finalized networks are the haplotype ids without the phase so they are
+    created again from the haplotypes"""
+    if finalized:
+        return ["haplotypes", "false_negative_edges"]
+
+    return ["members", "haplotypes", "false_negative_edges"]
+
+
+def _networks_to_arrays(
+    networks: List[Network_Interface], name: str, finalized: bool
+) -> Tuple[Dict[str, np.ndarray], List[Dict[str, Any]]]:
+    """Store the lists of each network as a single flat array and an array
+    of offsets
+
+    Parameters
+    ----------
+    networks : List[Network_Interface]
+        networks to store
+
+    name : str
+        name used as the prefix of the arrays
+
+    finalized : bool
+        whether the networks are finalized. The members and haplotypes of
+        networks that still have to be reclustered are integer vertex ids
+
+    Returns
+    -------
+    Tuple[Dict[str, np.ndarray], List[Dict[str, Any]]]
+        returns the arrays and the cluster id and edge counts of each
+        network
+    """
+    arrays = {}
+
+    for attribute in _network_attributes(finalized):
+        values = [list(getattr(network, attribute)) for network in networks]
+
+        arrays[f"{name}.{attribute}"] = np.array(
+            [value for network_values in values for value in network_values]
+        )
+
+        arrays[f"{name}.{attribute}.offsets"] = np.cumsum(
+            [0] + [len(network_values) for network_values in values], dtype=np.int64
+        )
+
+    records = [
+        {
+            "clst_id": network.clst_id,
+            "true_positive_count": int(network.true_positive_count),
+            "true_positive_percent": float(network.true_positive_percent),
+            "false_negative_count": int(network.false_negative_count),
+        }
+        for network in networks
+    ]
+
+    return arrays, records
+
+
+def _networks_from_arrays(
+    arrays: Any, name: str, records: List[Dict[str, Any]], finalized: bool
+) -> List[Network_Interface]:
+    """Create the networks from the arrays written by _networks_to_arrays"""
+    values = {}
+
+    for attribute in _network_attributes(finalized):
+        flat_values = arrays[f"{name}.{attribute}"].tolist()
+
+        offsets = arrays[f"{name}.{attribute}.offsets"].tolist()
+
+        values[attribute] = [
+            flat_values[start:end] for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    if finalized:
+        # the set is created from the haplotypes in the same way as the
+        # ClusterHandler so the members are written in the same order as a
+        # run without checkpoints
+        values["members"] = [
+            {haplotype[:-2] for haplotype in haplotypes}
+            for haplotypes in values["haplotypes"]
+        ]
+
+    return [
+        Network(
+            record["clst_id"],
+            record["true_positive_count"],
+            record["true_positive_percent"],
+            values["false_negative_edges"][indx],
+            record["false_negative_count"],
+            values["members"][indx],
+            values["haplotypes"][indx],
+        )
+        for indx, record in enumerate(records)
+    ]
+
+
+@dataclass
+class Checkpoint:
+    """Checkpoint files of a single run. The manifest lists the stages that
+    have been completed. Every round of the clustering replaces the file of
+    the previous round because a run is always resumed from the latest
+    completed stage"""
+
+    prefix: Path
+    key: Dict[str, Any]
+    stages: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def digest(self) -> str:
+        """digest of the key of the run"""
+        return _key_digest(self.key)
+
+    @property
+    def manifest_path(self) -> Path:
+        """path to the json manifest"""
+        return Path(f"{self.prefix}{CHECKPOINT_SUFFIX}.json")
+
+    def _stage_path(self, stage: str) -> Path:
+        """path to the file of the stage"""
+        return Path(f"{self.prefix}{CHECKPOINT_SUFFIX}.{stage}.npz")
+
+    @classmethod
+    def create(cls, prefix: Union[Path, str], key: Dict[str, Any]) -> "Checkpoint":
+        """Start a new checkpoint. The files from a previous checkpoint with
+        the same prefix are removed
+
+        Parameters
+        ----------
+        prefix : Path | str
+            output prefix of the run
+
+        key : Dict[str, Any]
+            key returned by checkpoint_key
+
+        Returns
+        -------
+        Checkpoint
+            returns a checkpoint without any completed stages
+        """
+        checkpoint = cls(Path(prefix), key)
+
+        checkpoint.manifest_path.unlink(missing_ok=True)
+
+        for old_file in checkpoint.prefix.parent.glob(
+            f"{checkpoint.prefix.name}{CHECKPOINT_SUFFIX}.*.npz"
+        ):
+            old_file.unlink(missing_ok=True)
+
+        return checkpoint
+
+    @classmethod
+    def resume(cls, prefix: Union[Path, str], key: Dict[str, Any]) -> "Checkpoint":
+        """Read the checkpoint of a previous run. If there is no checkpoint
+        then a new checkpoint is started
+
+        Parameters
+        ----------
+        prefix : Path | str
+            output prefix of the run
+
+        key : Dict[str, Any]
+            key returned by checkpoint_key for the current run
+
+        Returns
+        -------
+        Checkpoint
+            returns the checkpoint with the stages that the previous run
+            completed
+
+        Raises
+        ------
+        ValueError
+            raises a ValueError if the checkpoint was written by a run with
+            different inputs or parameters
+        """
+        checkpoint = cls(Path(prefix), key)
+
+        if not checkpoint.manifest_path.exists():
+            logger.warning(
+                f"No checkpoint was found at {checkpoint.manifest_path}. The analysis will start from the beginning"  # noqa: E501
+            )
+            return cls.create(prefix, key)
+
+        with open(checkpoint.manifest_path, encoding="utf-8") as manifest_file:
+            manifest = json.load(manifest_file)
+
+        if manifest.get("digest") != checkpoint.digest:
+            changed = sorted(
+                name
+                for name in set(key).union(manifest.get("key", {}))
+                if key.get(name) != manifest.get("key", {}).get(name)
+            )
+
+            raise ValueError(
+                f"The checkpoint at {checkpoint.manifest_path} was written by a run with different inputs or parameters. The values of {', '.join(changed)} have changed. Run the command without --resume to start over"  # noqa: E501
+            )
+
+        checkpoint.stages = manifest["stages"]
+
+        logger.info(
+            f"Resuming from the checkpoint at {checkpoint.manifest_path}. Completed stages: {', '.join(checkpoint.stages) or 'none'}"  # noqa: E501
+        )
+
+        return checkpoint
+
+    def _write_stage(
+        self, stage: str, arrays: Dict[str, np.ndarray], header: Dict[str, Any]
+    ) -> None:
+        """write the arrays of a stage and then add the stage to the
+        manifest. Both files are written to a temporary file and moved into
+        place so a run that is killed while writing leaves the previous
+        checkpoint intact"""
+        stage_path = self._stage_path(stage)
+
+        tmp_path = stage_path.with_name(f".{stage_path.name}.{os.getpid()}.tmp")
+
+        header = {"digest": self.digest, **header}
+
+        try:
+            with open(tmp_path, "wb") as output_file:
+                np.savez_compressed(
+                    output_file, header=np.array(json.dumps(header)), **arrays
+                )
+
+            os.replace(tmp_path, stage_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        self.stages[stage] = stage_path.name
+
+        manifest = {"digest": self.digest, "key": self.key, "stages": self.stages}
+
+        tmp_path = self.manifest_path.with_name(
+            f".{self.manifest_path.name}.{os.getpid()}.tmp"
+        )
+
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as output_file:
+                json.dump(manifest, output_file)
+
+            os.replace(tmp_path, self.manifest_path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    def _read_stage(self, stage: str) -> Tuple[Any, Dict[str, Any]]:
+        """read the arrays and the header of a stage"""
+        arrays = np.load(self.prefix.parent / self.stages[stage])
+
+        header = json.loads(str(arrays["header"]))
+
+        if header.get("digest") != self.digest:
+            raise ValueError(
+                f"The checkpoint file {self.stages[stage]} does not belong to the manifest at {self.manifest_path}"  # noqa: E501
+            )
+
+        return arrays, header
+
+    def save_filter(self, filter_obj: IbdFilter) -> None:
+        """Write the segments, vertices, and haplotype mappings of the filter
+
+        Parameters
+        ----------
+        filter_obj : IbdFilter
+            filter after the segments have been filtered
+        """
+        edge_arrays, edges = _frame_to_arrays(filter_obj.ibd_pd, "edges")
+
+        vertex_arrays, vertices = _frame_to_arrays(filter_obj.ibd_vs, "vertices")
+
+        self._write_stage(
+            "filter",
+            {
+                **edge_arrays,
+                **vertex_arrays,
+                "haplotypes": np.array(list(filter_obj.hapid_map), dtype=str),
+                "idnums": np.fromiter(filter_obj.hapid_map.values(), dtype=np.int64),
+            },
+            {"edges": edges, "vertices": vertices},
+        )
+
+        logger.verbose(
+            f"Wrote the filtered segments to the checkpoint {self.stages['filter']}"
+        )
+
+    def load_filter(self, indices: FileIndices, target: Genes) -> Optional[IbdFilter]:
+        """Create the filter from the checkpoint
+
+        Parameters
+        ----------
+        indices : FileIndices
+            object with the indices of the columns in the ibd file
+
+        target : Genes
+            target region
+
+        Returns
+        -------
+        Optional[IbdFilter]
+            returns a filter with the segments, vertices, and haplotype
+            mappings from the checkpoint or None if the filter stage has not
+            been completed
+        """
+        if "filter" not in self.stages:
+            return None
+
+        arrays, header = self._read_stage("filter")
+
+        with arrays:
+            filter_obj = IbdFilter(
+                iter([]),
+                indices,
+                target,
+                ibd_pd=_frame_from_arrays(arrays, "edges", header["edges"]),
+                ibd_vs=_frame_from_arrays(arrays, "vertices", header["vertices"]),
+                hapid_map=dict(
+                    zip(arrays["haplotypes"].tolist(), arrays["idnums"].tolist())
+                ),
+            )
+
+        logger.info(
+            f"Loaded {filter_obj.ibd_pd.shape[0]} filtered IBD segments from the checkpoint"  # noqa: E501
+        )
+
+        return filter_obj
+
+    def save_round(self, cluster_obj: ClusterHandler) -> None:
+        """Write the state of the cluster handler after a round of the
+        clustering. The networks that have been finalized and the networks
+        that still have to be reclustered are stored. This method is passed
+        to the clustering as the round_callback
+
+        Parameters
+        ----------
+        cluster_obj : ClusterHandler
+            handler after the first pass or a round of reclustering
+        """
+        final_arrays, final_records = _networks_to_arrays(
+            cluster_obj.final_clusters, "final", finalized=True
+        )
+
+        recheck_arrays, recheck_records = _networks_to_arrays(
+            cluster_obj.recheck_clsts.get(cluster_obj.check_times, []),
+            "recheck",
+            finalized=False,
+        )
+
+        self._write_stage(
+            "round",
+            {**final_arrays, **recheck_arrays},
+            {
+                "completed_rounds": cluster_obj.completed_rounds,
+                "check_times": cluster_obj.check_times,
+                "network_count": cluster_obj.network_count,
+                "final": final_records,
+                "recheck": recheck_records,
+            },
+        )
+
+        logger.verbose(
+            f"Wrote the networks from clustering round {cluster_obj.completed_rounds} to the checkpoint"  # noqa: E501
+        )
+
+    def restore_round(self, cluster_obj: ClusterHandler) -> bool:
+        """Restore the state of the cluster handler from the most recent
+        round in the checkpoint
+
+        Parameters
+        ----------
+        cluster_obj : ClusterHandler
+            new handler for the filtered segments
+
+        Returns
+        -------
+        bool
+            returns True if a round was restored or False if the checkpoint
+            doesn't have any rounds
+        """
+        if "round" not in self.stages:
+            return False
+
+        arrays, header = self._read_stage("round")
+
+        with arrays:
+            cluster_obj.final_clusters = _networks_from_arrays(
+                arrays, "final", header["final"], finalized=True
+            )
+
+            cluster_obj.recheck_clsts = {
+                header["check_times"]: _networks_from_arrays(
+                    arrays, "recheck", header["recheck"], finalized=False
+                )
+            }
+
+        cluster_obj.check_times = header["check_times"]
+
+        cluster_obj.completed_rounds = header["completed_rounds"]
+
+        cluster_obj.network_count = header["network_count"]
+
+        logger.info(
+            f"Restored {len(cluster_obj.final_clusters)} networks from clustering round {cluster_obj.completed_rounds} of the checkpoint"  # noqa: E501
+        )
+
+        return True
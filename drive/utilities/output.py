@@ -0,0 +1,350 @@
+"""Module with helpers to open output files for the plugins. Files can be
+written as plain text or compressed with gzip or zstd and the compression
+can be done in a background thread so that the main thread can keep
+building rows while the previous rows are compressed. Tables can also be
+written to Parquet or Feather files one batch at a time if the optional
+pyarrow package is installed. Compressed text files can be read back with
+open_input."""
+
+import gzip
+import io
+import queue
+import threading
+from pathlib import Path
+from typing import Any, BinaryIO, Optional, TextIO, Union
+
+from drive.log import CustomLogger
+
+logger = CustomLogger.get_logger(__name__)
+
+# file suffixes for each compression type
+COMPRESSION_SUFFIXES = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+
+# file suffixes for each of the supported columnar formats
+TABLE_FORMAT_SUFFIXES = {"parquet": ".parquet", "feather": ".feather"}
+
+
+def infer_compression(path: Union[Path, str]) -> str:
+    """Determine the compression type from the suffix of the file
+
+    Parameters
+    ----------
+    path : Path | str
+        path to the output file
+
+    Returns
+    -------
+    str
+        returns 'gzip' for .gz files, 'zstd' for .zst files, and 'none'
+        for every other file
+    """
+    suffix = Path(path).suffix
+
+    for compression, compression_suffix in COMPRESSION_SUFFIXES.items():
+        if compression_suffix and suffix == compression_suffix:
+            return compression
+
+    return "none"
+
+
+def add_compression_suffix(path: Union[Path, str], compression: str) -> Path:
+    """Add the suffix for the compression type to the path if the path
+    doesn't already have it
+
+    Parameters
+    ----------
+    path : Path | str
+        path to the output file
+
+    compression : str
+        compression type. Allowed values are 'none', 'gzip', and 'zstd'
+
+    Returns
+    -------
+    Path
+        returns the path with the compression suffix
+
+    Raises
+    ------
+    ValueError
+        raises a value error if the compression type is not supported
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(
+            f"The compression type, {compression}, is not supported. Allowed values are {', '.join(COMPRESSION_SUFFIXES)}"  # noqa: E501
+        )
+
+    path = Path(path)
+
+    suffix = COMPRESSION_SUFFIXES[compression]
+
+    if suffix and path.suffix != suffix:
+        return path.with_name(path.name + suffix)
+
+    return path
+
+
+def _open_binary(path: Path, compression: str, level: Optional[int]) -> BinaryIO:
+    """open the file as a binary stream that compresses everything written
+    to it"""
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=6 if level is None else level)
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                "Writing zstd compressed output requires the zstandard package. It can be installed with 'pip install zstandard'"  # noqa: E501
+            ) from e
+
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+
+        return compressor.stream_writer(open(path, "wb"), closefd=True)
+    else:
+        return open(path, "wb")
+
+
+class BackgroundWriter:
+    """File like object that encodes the text that is written to it and
+    passes it to a thread that writes it to the underlying binary stream.
+    The queue is bounded so that the main thread waits if it gets too far
+    ahead of the writer thread"""
+
+    def __init__(
+        self, stream: BinaryIO, encoding: str = "utf-8", max_pending: int = 8
+    ) -> None:
+        self._stream = stream
+        self._encoding = encoding
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(max_pending)
+        self._error: Optional[BaseException] = None
+        self.closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """write every chunk from the queue until the sentinel is found"""
+        while True:
+            chunk = self._queue.get()
+
+            if chunk is None:
+                break
+
+            if self._error is None:
+                try:
+                    self._stream.write(chunk)
+                except Exception as e:
+                    self._error = e
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def write(self, text: str) -> int:
+        """Queue the text to be written by the background thread
+
+        Parameters
+        ----------
+        text : str
+            text to write
+
+        Returns
+        -------
+        int
+            returns the number of characters written
+        """
+        self._raise_error()
+
+        self._queue.put(text.encode(self._encoding))
+
+        return len(text)
+
+    def close(self) -> None:
+        """wait for the queued text to be written and then close the
+        underlying stream"""
+        if self.closed:
+            return
+
+        self.closed = True
+
+        self._queue.put(None)
+
+        self._thread.join()
+
+        self._stream.close()
+
+        self._raise_error()
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+def open_output(
+    path: Union[Path, str],
+    compression: Optional[str] = None,
+    background: bool = False,
+    level: Optional[int] = None,
+    encoding: str = "utf-8",
+) -> Union[TextIO, BackgroundWriter]:
+    """Open an output file for writing text
+
+    Parameters
+    ----------
+    path : Path | str
+        path to the output file
+
+    compression : Optional[str]
+        compression type. Allowed values are 'none', 'gzip', and 'zstd'.
+        If no value is provided then the type is determined from the
+        suffix of the path
+
+    background : bool
+        whether the encoding, compression, and writing should be done in
+        a background thread
+
+    level : Optional[int]
+        compression level. By default gzip uses level 6 and zstd uses
+        level 3
+
+    encoding : str
+        text encoding of the file
+
+    Returns
+    -------
+    TextIO | BackgroundWriter
+        returns a file like object with write and close methods
+
+    Raises
+    ------
+    ValueError
+        raises a value error if the compression type is not supported
+    """
+    if compression is None:
+        compression = infer_compression(path)
+
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(
+            f"The compression type, {compression}, is not supported. Allowed values are {', '.join(COMPRESSION_SUFFIXES)}"  # noqa: E501
+        )
+
+    logger.debug(
+        f"Opening the output file {path} with compression={compression} and background={background}"  # noqa: E501
+    )
+
+    if background:
+        return BackgroundWriter(
+            _open_binary(Path(path), compression, level), encoding=encoding
+        )
+
+    if compression == "none":
+        return open(path, "w", encoding=encoding)
+
+    return io.TextIOWrapper(
+        _open_binary(Path(path), compression, level), encoding=encoding
+    )
+
+
+def open_input(
+    path: Union[Path, str], compression: Optional[str] = None, encoding: str = "utf-8"
+) -> TextIO:
+    """Open a text file that was written by open_output for reading
+
+    Parameters
+    ----------
+    path : Path | str
+        path to the file
+
+    compression : Optional[str]
+        compression type. Allowed values are 'none', 'gzip', and 'zstd'.
+        If no value is provided then the type is determined from the
+        suffix of the path
+
+    encoding : str
+        text encoding of the file
+
+    Returns
+    -------
+    TextIO
+        returns a file like object that decompresses the file as it is read
+
+    Raises
+    ------
+    ValueError
+        raises a value error if the compression type is not supported
+    """
+    if compression is None:
+        compression = infer_compression(path)
+
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(
+            f"The compression type, {compression}, is not supported. Allowed values are {', '.join(COMPRESSION_SUFFIXES)}"  # noqa: E501
+        )
+
+    if compression == "gzip":
+        return gzip.open(path, "rt", encoding=encoding)
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                "Reading zstd compressed files requires the zstandard package. It can be installed with 'pip install zstandard'"  # noqa: E501
+            ) from e
+
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(
+                open(path, "rb"), read_across_frames=True, closefd=True
+            ),
+            encoding=encoding,
+        )
+
+    return open(path, "r", encoding=encoding)
+
+
+class TableWriter:
+    """Small wrapper so that Parquet and Feather files can be written
+    one batch at a time with the same interface. pyarrow is only imported
+    when a writer is created because it is an optional dependency"""
+
+    def __init__(
+        self, path: Union[Path, str], schema: Any, file_format: str, compression: str
+    ) -> None:
+        if file_format not in TABLE_FORMAT_SUFFIXES:
+            raise ValueError(
+                f"The format, {file_format}, is not supported. Allowed values are {', '.join(TABLE_FORMAT_SUFFIXES)}"  # noqa: E501
+            )
+
+        try:
+            import pyarrow as pa
+            import pyarrow.ipc as ipc
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError(
+                "Writing Parquet or Feather output requires the pyarrow package. It can be installed with 'pip install pyarrow'"  # noqa: E501
+            ) from e
+
+        if file_format == "parquet":
+            self._writer = pq.ParquetWriter(path, schema, compression=compression)
+        else:
+            self._sink = pa.OSFile(str(path), "wb")
+            self._writer = ipc.new_file(
+                self._sink,
+                schema,
+                options=ipc.IpcWriteOptions(
+                    compression=None if compression == "none" else compression
+                ),
+            )
+
+        self.file_format = file_format
+
+    def write(self, table: Any) -> None:
+        """write a pyarrow table to the file"""
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        """close the writer and the underlying file"""
+        self._writer.close()
+
+        if self.file_format == "feather":
+            self._sink.close()
@@ -1,2 +1,7 @@
 from .case_file_parser import PhenotypeFileParser
 from .phenotype_descriptions_parser import load_phenotype_descriptions
+from .phenotype_cache import (
+    load_carrier_store,
+    load_phenotype_matrix,
+    load_sample_ids,
+)
@@ -2,17 +2,27 @@
 ecodings, separators, and by handling multiple errors."""
 
 import gzip
+from itertools import product
 from logging import Logger
 from pathlib import Path
-from typing import Dict, List, Set, Tuple, TypeVar, Union
+from typing import Dict, Iterable, List, Optional, Set, Tuple, TypeVar, Union
+
+import numpy as np
+from pandas import factorize, read_csv
 
 from drive.log import CustomLogger
+from drive.models import PhenotypeMatrix
+from drive.models.phenotype_matrix import CASE, CONTROL, EXCLUDED
 
 logger: Logger = CustomLogger.get_logger(__name__)
 
 # creating a type annotation for the PhenotypeFileParser class
 T = TypeVar("T", bound="PhenotypeFileParser")
 
+# values that indicate an individual should be excluded. The comparison
+# is case insensitive
+EXCLUSION_VALUES = ["na", "n/a", "-1", "-1.0", " ", ""]
+
 
 class PhenotypeFileParser:
     """Parser used to read in the phenotype file. This will allow use to account for
@@ -31,6 +41,7 @@ class PhenotypeFileParser:
         FileNotFoundError
         """
         self.individuals: List[str] = []
+        self.status_matrix: Optional[PhenotypeMatrix] = None
         # we are going to make sure the filepath variable is a
         # PosixPath
         filepath = Path(filepath)
@@ -109,112 +120,408 @@ class PhenotypeFileParser:
                 "The was no appropriate separator found for the file. Currently DRIVE supports: ',' or '\t' or '|'"  # noqa: E501
             )
 
-    def _determine_status(
-        self,
-        line: list[str],
-        phenotype_dict: Dict[str, Dict[str, Set[str]]],
-        phenotype_indx: Dict[int, str],
+    def _parse_header(self, header_line: str) -> Tuple[List[str], str]:
+        """Determine the separator and the phenotypes from the header line
+
+        Parameters
+        ----------
+        header_line : str
+            first line of the phenotype file
+
+        Returns
+        -------
+        Tuple[List[str], str]
+            returns a tuple where the first element is the list of
+            phenotypes and the second element is the separator string
+
+        Raises
+        ------
+        ValueError
+            raises a value error if the header line does not have a grid
+            or grids column
+        """
+        separator = PhenotypeFileParser._check_separator(header_line)
+
+        logger.debug(f"Identified the separator, {separator}, in the file: {self.file}")
+
+        if "grid" not in header_line.lower() and "grids" not in header_line.lower():
+            error_msg = "Expected the first line of the phenotype file to have a header line with a column called grid or grids."  # noqa: E501
+
+            logger.critical(error_msg)
+
+            raise ValueError(error_msg)
+
+        return header_line.strip("\n").split(separator)[1:], separator
+
+    def _warn_unrecognized(
+        self, value: str, count: int, grid: str, phenotype: str
     ) -> None:
-        """Add the individual to the appropriate case/ control/exclusion list.
+        """Log a warning for a value that is not a recognized status
 
         Parameters
         ----------
-        line: List[str]
-            list of individuals status for each phenotype in the file
-
-        phenotype_dict : Dict[str, Dict[str, Set[str]]]
-
-            returns a tuple with three elements. The first element is a
-            dictionary where the keys are phenotypes. Values are
-            dictionaries where the keys are 'cases' or 'controls' or
-            'excluded' and values are list of ids. The second element is
-            a dictionary that maps the index of the phenotype in the
-            header line to the phenotype name. The third element is the
-            separator string
+        value : str
+            value that was not recognized
+
+        count : int
+            number of times the value was found in the block
+
+        grid : str
+            id of the first individual with the value
+
+        phenotype : str
+            phenotype of the first occurrence of the value
         """
-        # pull out the correct grid id
-        grid_id = line[0]
-        # we need to keep track of the total list of grids used in the
-        # analysis
-        self.individuals.append(grid_id)
+        logger.warning(
+            f"The status, {value}, was not recognized for {count} value(s) in the phenotype file. The first was for individual {grid} and phenotype {phenotype}. These individuals will be added to the exclusion list but it is recommended that the user checks to ensure that this is not a typo in the phenotype file."  # noqa: E501
+        )
+
+    def _classify_numeric_block(
+        self, grids: np.ndarray, values: np.ndarray, phenotypes: List[str]
+    ) -> np.ndarray:
+        """Determine the status of every value in a block of the file that
+        was read in as numbers. Cases are 1, controls are 0, and missing
+        values or -1 are exclusions.
 
-        # go through each value in the file
-        for indx, value in enumerate(line[1:]):
-            phenotype_mapping = phenotype_indx.get(indx)
+        Parameters
+        ----------
+        grids : np.ndarray
+            ids of the individuals in the block
 
+        values : np.ndarray
+            float individuals x phenotypes matrix of the block. Missing
+            values are NaN
+
+        phenotypes : List[str]
+            list of the phenotypes in the file
+
+        Returns
+        -------
+        np.ndarray
+            returns the int8 status matrix for the block
+        """
+        status = np.full(values.shape, EXCLUDED, dtype=np.int8)
+
+        status[values == 1] = CASE
+        status[values == 0] = CONTROL
+
+        unrecognized = ~(
+            np.isnan(values) | (values == 1) | (values == 0) | (values == -1)
+        )
+
+        if unrecognized.any():
+            rows, columns = np.nonzero(unrecognized)
+
+            self._warn_unrecognized(
+                values[rows[0], columns[0]],
+                len(rows),
+                grids[rows[0]],
+                phenotypes[columns[0]],
+            )
+
+        return status
+
+    def _classify_string_block(
+        self, grids: np.ndarray, values: np.ndarray, phenotypes: List[str]
+    ) -> np.ndarray:
+        """Determine the status of every value in a block of the file that
+        was read in as strings. Each unique string is only classified
+        once.
+
+        Parameters
+        ----------
+        grids : np.ndarray
+            ids of the individuals in the block
+
+        values : np.ndarray
+            individuals x phenotypes matrix of strings
+
+        phenotypes : List[str]
+            list of the phenotypes in the file
+
+        Returns
+        -------
+        np.ndarray
+            returns the int8 status matrix for the block
+        """
+        codes, uniques = factorize(values.ravel())
+
+        codes = codes.reshape(values.shape)
+        # missing values get a code of -1 so the last element of the
+        # lookup table is an exclusion
+        lookup = np.full(len(uniques) + 1, EXCLUDED, dtype=np.int8)
+
+        for indx, value in enumerate(uniques.tolist()):
             if value == "1" or value == "1.0":
-                phenotype_dict[phenotype_mapping]["cases"].add(grid_id)
+                lookup[indx] = CASE
             elif value == "0" or value == "0.0":
-                phenotype_dict[phenotype_mapping]["controls"].add(grid_id)
-            # we are going to excluded on values na, n/a, -1, -1.
-            # 0, "", " " to try to catch different values
-            elif value.lower() in ["na", "n/a", "-1", "-1.0", " ", ""]:
-                phenotype_dict[phenotype_mapping]["excluded"].add(grid_id)
-            else:
-                logger.warning(
-                    f"The status for individual, {grid_id}, was not recognized. The status found in the file was {value} for phenotype {phenotype_mapping}. This individual will be added to the exclusion list but it is recommended that the user checks to ensure that this is not a typo in the phenotype file."  # noqa: E501
+                lookup[indx] = CONTROL
+            elif value.lower() not in EXCLUSION_VALUES:
+                rows, columns = np.nonzero(codes == indx)
+
+                self._warn_unrecognized(
+                    value, len(rows), grids[rows[0]], phenotypes[columns[0]]
                 )
-                phenotype_dict[phenotype_mapping]["excluded"].append(grid_id)
 
-    def _create_phenotype_dictionary(
+        return lookup[codes]
+
+    def _read_blocks(
         self,
-        header_line: str,
-    ) -> Tuple[Dict[str, Dict[str, Set[str]]], Dict[int, str], str]:
-        """Function that will generate a dictionary where the keys are
-        phenotypes and the values list of cases/exclusions/controls
+        phenotypes: List[str],
+        separator: str,
+        chunksize: int,
+        numeric: bool,
+        selected: List[str],
+        individuals: Optional[Set[str]] = None,
+    ) -> Tuple[List[str], List[np.ndarray], np.ndarray]:
+        """Read the body of the phenotype file in blocks of rows and
+        classify each block
 
         Parameters
         ----------
-        header_line : str
-            line from the phenotype file
+        phenotypes : List[str]
+            list of the phenotypes in the file
+
+        separator : str
+            separator used in the file
+
+        chunksize : int
+            number of individuals read in each block
+
+        numeric : bool
+            whether the phenotype columns should be read in as numbers
+            or as strings
+
+        selected : List[str]
+            phenotypes that are read in. The other columns are skipped
+
+        individuals : Optional[Set[str]]
+            ids of the individuals whose statuses are kept. If no value
+            is provided then every individual is kept
 
         Returns
         -------
-        Tuple[Dict[str, Dict[str, Set[str]]], Dict[int, str], str]
-            returns a tuple with three elements. The first element is a
-            dictionary where the keys are phenotypes. Values are
-            dictionaries where the keys are 'cases' or 'controls' or
-            'excluded' and values are list of ids. The second element is
-            a dictionary that maps the index of the phenotype in the
-            header line to the phenotype name. The third element is the
-            separator string
+        Tuple[List[str], List[np.ndarray], np.ndarray]
+            returns a tuple where the first element is the list of ids
+            that were kept, the second element is a list with the int8
+            status matrix of each block, and the third element is a
+            3 x phenotypes array with the number of cases, controls, and
+            excluded individuals in the whole cohort
         """
+        if numeric:
+            dtypes = {phenotype: np.float32 for phenotype in selected}
+            # the missing values are case sensitive when pandas reads the
+            # file so we need every combination of upper and lower case
+            na_values = [
+                "".join(characters)
+                for value in EXCLUSION_VALUES
+                if not value.startswith("-")
+                for characters in product(*[{c.lower(), c.upper()} for c in value])
+            ]
+            classify_block = self._classify_numeric_block
+        else:
+            dtypes = {phenotype: str for phenotype in selected}
+            na_values = None
+            classify_block = self._classify_string_block
+
+        dtypes["grids"] = str
+
+        samples: List[str] = []
+
+        blocks = []
+
+        cohort_counts = np.zeros((3, len(selected)), dtype=np.int64)
+
+        for block in read_csv(
+            self.opened_file,
+            sep=separator,
+            header=None,
+            names=["grids"] + phenotypes,
+            usecols=["grids"] + selected,
+            dtype=dtypes,
+            na_values=na_values,
+            keep_default_na=False,
+            na_filter=numeric,
+            chunksize=chunksize,
+        ):
+            grids = block["grids"].to_numpy()
+
+            self.individuals.extend(grids.tolist())
+
+            status = classify_block(grids, block[selected].to_numpy(), selected)
+
+            # the cohort counts are needed for the phenotype frequencies
+            # even if only some of the individuals are kept
+            for row, value in enumerate([CASE, CONTROL, EXCLUDED]):
+                cohort_counts[row] += (status == value).sum(axis=0)
+
+            if individuals is not None:
+                kept = np.fromiter(
+                    (grid in individuals for grid in grids),
+                    dtype=bool,
+                    count=len(grids),
+                )
 
-        # determining what the appropriate separator should be
-        separator = PhenotypeFileParser._check_separator(header_line)
+                grids = grids[kept]
 
-        logger.debug(f"Identified the separator, {separator}, in the file: {self.file}")
+                status = status[kept]
 
-        # raise an error if there is no header line, otherwise determine all the
-        # phenotypes
-        if "grid" not in header_line.lower() and "grids" not in header_line.lower():
-            error_msg = "Expected the first line of the phenotype file to have a header line with a column called grid or grids."  # noqa: E501
+            samples.extend(grids.tolist())
+
+            blocks.append(status)
+
+        return samples, blocks, cohort_counts
+
+    def _select_phenotypes(
+        self, phenotypes: List[str], requested: Optional[List[str]]
+    ) -> List[str]:
+        """Determine which phenotypes should be read from the file
+
+        Parameters
+        ----------
+        phenotypes : List[str]
+            list of the phenotypes in the file
+
+        requested : Optional[List[str]]
+            phenotypes that the user asked for. If no value is provided
+            then every phenotype is read
+
+        Returns
+        -------
+        List[str]
+            returns the requested phenotypes in the order of the file
+
+        Raises
+        ------
+        ValueError
+            raises a value error if a requested phenotype is not in the
+            file
+        """
+        if requested is None:
+            return phenotypes
+
+        missing = set(requested).difference(phenotypes)
+
+        if missing:
+            error_msg = f"The phenotypes {', '.join(sorted(missing))} were not found in the phenotype file {self.file}"  # noqa: E501
 
             logger.critical(error_msg)
 
             raise ValueError(error_msg)
+
+        requested_set = set(requested)
+
+        return [phenotype for phenotype in phenotypes if phenotype in requested_set]
+
+    def parse_sample_ids(self) -> List[str]:
+        """Read only the id column of the phenotype file. This is used to
+        restrict the analysis to the cohort without reading the statuses
+
+        Returns
+        -------
+        List[str]
+            returns a list of all grids from the file
+        """
+        _, separator = self._parse_header(self.opened_file.readline())
+
+        grids = read_csv(
+            self.opened_file,
+            sep=separator,
+            header=None,
+            usecols=[0],
+            dtype=str,
+            keep_default_na=False,
+            na_filter=False,
+        )[0]
+
+        self.individuals = grids.tolist()
+
+        logger.debug(f"Read {len(self.individuals)} ids from the file {self.file}")
+
+        return self.individuals
+
+    def parse_status_matrix(
+        self,
+        chunksize: int = 10_000,
+        individuals: Optional[Iterable[str]] = None,
+        phenotypes: Optional[List[str]] = None,
+    ) -> PhenotypeMatrix:
+        """Read the phenotype file in blocks of rows and classify every
+        value as a case, control, or exclusion with vectorized
+        operations. The phenotype columns are first read in as numbers
+        and if the file has values that are not numbers then the file
+        is read again with the phenotype columns as strings.
+
+        Parameters
+        ----------
+        chunksize : int
+            number of individuals read in each block
+
+        individuals : Optional[Iterable[str]]
+            ids of the individuals whose statuses are kept. The case,
+            control, and exclusion counts of each phenotype still use
+            every individual in the file. If no value is provided then
+            every individual is kept
+
+        phenotypes : Optional[List[str]]
+            phenotypes that are read from the file. If no value is
+            provided then every phenotype is read
+
+        Returns
+        -------
+        PhenotypeMatrix
+            returns the individuals x phenotypes int8 status matrix. The
+            matrix is also stored in the status_matrix attribute
+        """
+        file_phenotypes, separator = self._parse_header(self.opened_file.readline())
+
+        logger.debug(
+            f"Identified {len(file_phenotypes)} phenotypes in the file {self.file}"
+        )
+
+        selected = self._select_phenotypes(file_phenotypes, phenotypes)
+
+        if individuals is not None:
+            individuals = set(individuals)
+
+        try:
+            samples, blocks, cohort_counts = self._read_blocks(
+                file_phenotypes, separator, chunksize, True, selected, individuals
+            )
+        except ValueError:
+            logger.debug(
+                f"Found status values that were not numbers in the file {self.file}. Reading the phenotype columns as strings instead."  # noqa: E501
+            )
+            self.individuals = []
+
+            self.opened_file.seek(0)
+
+            _ = self.opened_file.readline()
+
+            samples, blocks, cohort_counts = self._read_blocks(
+                file_phenotypes, separator, chunksize, False, selected, individuals
+            )
+
+        if blocks:
+            status = np.vstack(blocks)
         else:
-            split_line_phenotypes = header_line.strip("\n").split(separator)[1:]
-
-        # creating a dictionary that will map an index position to a
-        # phecode
-        phenotype_indx = {}
-        # creating a dictionary to keep track of who are cases and
-        # controls
-        phenotype_dict = {}
-
-        # build each dictionary
-        for indx, phenotype in enumerate(split_line_phenotypes):
-            phenotype_indx[indx] = phenotype
-            phenotype_dict[phenotype] = {
-                "cases": set(),
-                "controls": set(),
-                "excluded": set(),
+            status = np.zeros((0, len(selected)), dtype=np.int8)
+
+        self.status_matrix = PhenotypeMatrix(samples, selected, status)
+
+        # if only some individuals were kept then the counts from the
+        # whole cohort have to be stored with the matrix
+        if individuals is not None:
+            self.status_matrix.cohort_counts = {
+                phenotype: counts
+                for phenotype, counts in zip(
+                    selected, map(tuple, cohort_counts.T.tolist())
+                )
             }
 
-        logger.debug(f"Phenotype index dictionary:\n {phenotype_indx}")
-        logger.debug(f"Phenotype counts dictionary: \n {phenotype_dict}")
-        return phenotype_dict, phenotype_indx, separator
+        logger.debug(f"{self.status_matrix}")
+
+        return self.status_matrix
 
     def parse_cases_and_controls(
         self,
@@ -230,17 +537,6 @@ class PhenotypeFileParser:
             element is a list of all grids from the file to be used as a
             cohort
         """
+        phenotype_matrix = self.parse_status_matrix()
 
-        (
-            phenotype_dict,
-            phenotype_indx_mappings,
-            separator,
-        ) = self._create_phenotype_dictionary(self.opened_file.readline())
-
-        for line in self.opened_file:
-            # we need to first check if there is a header row
-            split_line = line.strip("\n").split(separator)
-
-            self._determine_status(split_line, phenotype_dict, phenotype_indx_mappings)
-
-        return phenotype_dict, self.individuals
+        return phenotype_matrix.to_carriers(), self.individuals
@@ -0,0 +1,360 @@
+"""Module with an on-disk cache of the parsed phenotype file. The bit
+packed case and exclusion matrices of the CarrierStore are stored as .npy
+files that can be memory mapped and the sample ids, phenotype names, and
+status counts are stored in a small json header. The cache is
+keyed by the path, size, modification time, and a hash of the phenotype
+file so that it is only reused while the file is unchanged."""
+
+import hashlib
+import json
+import os
+from logging import Logger
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from drive.log import CustomLogger
+from drive.models import CarrierStore, PhenotypeMatrix
+
+from .case_file_parser import PhenotypeFileParser
+
+logger: Logger = CustomLogger.get_logger(__name__)
+
+# version of the cache layout. Bumping this value invalidates old caches
+CACHE_VERSION = 2
+
+# number of bytes read from the start and the end of the file for the hash
+HASH_SAMPLE_SIZE = 1 << 20
+
+
+def _hash_file(filepath: Path, size: int) -> str:
+    """Hash the first and last megabyte of the file along with its size.
+    Hashing the whole file would cost as much as parsing it so the
+    modification time and size are relied on to catch edits in the middle
+    of the file
+
+    Parameters
+    ----------
+    filepath : Path
+        path to the phenotype file
+
+    size : int
+        size of the file in bytes
+
+    Returns
+    -------
+    str
+        returns the hex digest of the hash
+    """
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+
+    with open(filepath, "rb") as input_file:
+        digest.update(input_file.read(HASH_SAMPLE_SIZE))
+
+        if size > HASH_SAMPLE_SIZE:
+            input_file.seek(max(size - HASH_SAMPLE_SIZE, HASH_SAMPLE_SIZE))
+            digest.update(input_file.read())
+
+    return digest.hexdigest()
+
+
+def cache_key(filepath: Union[Path, str]) -> Dict[str, Any]:
+    """Create the key that identifies the current version of the phenotype
+    file
+
+    Parameters
+    ----------
+    filepath : Path | str
+        path to the phenotype file
+
+    Returns
+    -------
+    Dict[str, Any]
+        returns a dictionary with the cache version, the resolved path,
+        the size, the modification time in nanoseconds, and the hash of
+        the file
+    """
+    filepath = Path(filepath).resolve()
+
+    stats = filepath.stat()
+
+    return {
+        "version": CACHE_VERSION,
+        "path": str(filepath),
+        "size": stats.st_size,
+        "mtime_ns": stats.st_mtime_ns,
+        "hash": _hash_file(filepath, stats.st_size),
+    }
+
+
+def _cache_prefix(filepath: Path, cache_dir: Path, key: Dict[str, Any]) -> Path:
+    """Return the prefix of the cache files for the phenotype file. The name
+    contains a digest of the path so that files with the same name in
+    different directories do not collide"""
+    path_digest = hashlib.blake2b(key["path"].encode(), digest_size=8).hexdigest()
+
+    return cache_dir / f"{filepath.name}.{path_digest}"
+
+
+def _key_digest(key: Dict[str, Any]) -> str:
+    """digest of the cache key that is used in the names of the matrix files
+    so that a header is never paired with the matrices of another version
+    of the phenotype file"""
+    return hashlib.blake2b(
+        json.dumps(key, sort_keys=True).encode(), digest_size=8
+    ).hexdigest()
+
+
+def _atomic_write(path: Path, write_func: Callable[[Any], Any]) -> None:
+    """write to a temporary file and then move it into place so that
+    concurrent runs never read a partially written cache"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    try:
+        with open(tmp_path, "wb") as output_file:
+            write_func(output_file)
+
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def read_cache(
+    filepath: Union[Path, str], cache_dir: Union[Path, str]
+) -> Optional[CarrierStore]:
+    """Load the cached carrier store for the phenotype file if the cache
+    exists and the file has not changed since it was written
+
+    Parameters
+    ----------
+    filepath : Path | str
+        path to the phenotype file
+
+    cache_dir : Path | str
+        directory that the cache files are stored in
+
+    Returns
+    -------
+    Optional[CarrierStore]
+        returns the cached CarrierStore with memory mapped bit matrices or
+        None if there is no valid cache
+    """
+    filepath = Path(filepath)
+
+    key = cache_key(filepath)
+
+    cache_dir = Path(cache_dir)
+
+    header_path = Path(f"{_cache_prefix(filepath, cache_dir, key)}.json")
+
+    if not header_path.exists():
+        logger.debug(f"No phenotype cache found for the file {filepath}")
+        return None
+
+    try:
+        with open(header_path, encoding="utf-8") as header_file:
+            header = json.load(header_file)
+
+        if header.get("key") != key:
+            logger.debug(f"The phenotype cache for the file {filepath} is out of date")
+            return None
+
+        cases = np.load(cache_dir / header["cases"], mmap_mode="r")
+
+        excluded = np.load(cache_dir / header["excluded"], mmap_mode="r")
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(
+            f"Unable to read the phenotype cache at {header_path}. The phenotype file will be parsed again. Error: {e}"  # noqa: E501
+        )
+        return None
+
+    packed_shape = (len(header["samples"]), (len(header["phenotypes"]) + 7) // 8)
+
+    if cases.shape != packed_shape or excluded.shape != packed_shape:
+        logger.warning(
+            f"The phenotype cache at {header_path} does not match its header. The phenotype file will be parsed again."  # noqa: E501
+        )
+        return None
+
+    return CarrierStore(
+        header["samples"],
+        header["phenotypes"],
+        cases,
+        excluded,
+        np.array(header["counts"], dtype=np.int64).reshape(3, -1),
+        np.arange(len(header["phenotypes"]), dtype=np.int64),
+    )
+
+
+def write_cache(
+    filepath: Union[Path, str], cache_dir: Union[Path, str], store: CarrierStore
+) -> None:
+    """Write the bit matrices and the json header for the phenotype file
+
+    Parameters
+    ----------
+    filepath : Path | str
+        path to the phenotype file
+
+    cache_dir : Path | str
+        directory that the cache files are stored in. The directory is
+        created if it does not exist
+
+    store : CarrierStore
+        bit packed statuses of every phenotype in the phenotype file
+    """
+    filepath = Path(filepath)
+
+    cache_dir = Path(cache_dir)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    key = cache_key(filepath)
+
+    prefix = _cache_prefix(filepath, cache_dir, key)
+
+    digest = _key_digest(key)
+
+    header = {
+        "key": key,
+        "samples": list(store.samples),
+        "phenotypes": list(store.phenotypes),
+        "counts": store.counts.tolist(),
+        "cases": f"{prefix.name}.{digest}.cases.npy",
+        "excluded": f"{prefix.name}.{digest}.excluded.npy",
+    }
+
+    # the matrices are written before the header so that a header never
+    # points to matrices that don't exist yet
+    _atomic_write(
+        cache_dir / header["cases"], lambda output: np.save(output, store.cases)
+    )
+
+    _atomic_write(
+        cache_dir / header["excluded"], lambda output: np.save(output, store.excluded)
+    )
+
+    _atomic_write(
+        Path(f"{prefix}.json"),
+        lambda output: output.write(json.dumps(header).encode("utf-8")),
+    )
+
+    # removing the matrices from older versions of the phenotype file
+    for old_matrix in cache_dir.glob(f"{prefix.name}.*.npy"):
+        if old_matrix.name not in (header["cases"], header["excluded"]):
+            old_matrix.unlink(missing_ok=True)
+
+    logger.verbose(f"Wrote the phenotype cache to {prefix}.json")
+
+
+def load_carrier_store(
+    filepath: Union[Path, str],
+    cache_dir: Optional[Union[Path, str]] = None,
+    phenotypes: Optional[List[str]] = None,
+) -> CarrierStore:
+    """Load the bit packed statuses for the phenotype file. If a cache
+    directory is provided then a valid cache is memory mapped instead of
+    parsing the file and the cache is written after the file is parsed
+
+    Parameters
+    ----------
+    filepath : Path | str
+        path to the phenotype file
+
+    cache_dir : Optional[Path | str]
+        directory that the cache files are stored in. If no value is
+        provided then the file is always parsed
+
+    phenotypes : Optional[List[str]]
+        phenotypes to load. If no value is provided then every phenotype
+        is loaded
+
+    Returns
+    -------
+    CarrierStore
+        returns the bit packed store of the phenotype statuses
+    """
+    if cache_dir is None:
+        with PhenotypeFileParser(filepath) as phenotype_file:
+            return CarrierStore.from_matrix(
+                phenotype_file.parse_status_matrix(phenotypes=phenotypes)
+            )
+
+    store = read_cache(filepath, cache_dir)
+
+    if store is not None:
+        logger.verbose(f"Loaded the phenotype file {filepath} from the cache")
+        return store.select(phenotypes)
+
+    with PhenotypeFileParser(filepath) as phenotype_file:
+        store = CarrierStore.from_matrix(phenotype_file.parse_status_matrix())
+
+    try:
+        write_cache(filepath, cache_dir, store)
+    except OSError as e:
+        logger.warning(
+            f"Unable to write the phenotype cache to the directory {cache_dir}. Error: {e}"  # noqa: E501
+        )
+
+    return store.select(phenotypes)
+
+
+def load_phenotype_matrix(
+    filepath: Union[Path, str],
+    cache_dir: Optional[Union[Path, str]] = None,
+    phenotypes: Optional[List[str]] = None,
+    individuals: Optional[Iterable[str]] = None,
+) -> PhenotypeMatrix:
+    """Load the status matrix for the phenotype file. If a cache directory
+    is provided then a valid cache is used instead of parsing the file and
+    the cache is written after the file is parsed
+
+    Parameters
+    ----------
+    filepath : Path | str
+        path to the phenotype file
+
+    cache_dir : Optional[Path | str]
+        directory that the cache files are stored in. If no value is
+        provided then the file is always parsed
+
+    phenotypes : Optional[List[str]]
+        phenotypes to load. If no value is provided then every phenotype
+        is loaded
+
+    individuals : Optional[Iterable[str]]
+        ids of the individuals whose statuses are loaded. The counts of
+        each phenotype still come from the whole cohort. If no value is
+        provided then every individual is loaded
+
+    Returns
+    -------
+    PhenotypeMatrix
+        returns the individuals x phenotypes int8 status matrix
+    """
+    if cache_dir is None:
+        with PhenotypeFileParser(filepath) as phenotype_file:
+            return phenotype_file.parse_status_matrix(
+                individuals=individuals, phenotypes=phenotypes
+            )
+
+    return load_carrier_store(filepath, cache_dir, phenotypes).to_matrix(individuals)
+
+
+def load_sample_ids(filepath: Union[Path, str]) -> List[str]:
+    """Read only the ids of the individuals in the phenotype file
+
+    Parameters
+    ----------
+    filepath : Path | str
+        path to the phenotype file
+
+    Returns
+    -------
+    List[str]
+        returns a list of all grids from the file
+    """
+    with PhenotypeFileParser(filepath) as phenotype_file:
+        return phenotype_file.parse_sample_ids()
@@ -0,0 +1,336 @@
+"""Module with the query server used by the 'drive serve' command. The
+server answers requests with a Session so the segments, the phenotype
+statuses, and the sample dictionary are loaded once and reused by every
+request. Requests are answered over localhost HTTP or a Unix socket by a
+pool of worker threads that share the session"""
+
+import json
+import os
+import socketserver
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+from pandas import isna
+
+from drive.api import ClusterParameters, Results, Session
+from drive.log import CustomLogger
+from drive.utilities.targets import split_target_string
+
+logger = CustomLogger.get_logger(__name__)
+
+
+def _parse_bool(value: Union[str, bool]) -> bool:
+    """convert a query string value such as true or 0 to a boolean"""
+    if isinstance(value, bool):
+        return value
+
+    if str(value).lower() in ("true", "1", "yes"):
+        return True
+    elif str(value).lower() in ("false", "0", "no"):
+        return False
+
+    raise ValueError(
+        f"Expected a boolean value. Instead the value {value} was provided"
+    )
+
+
+# parameters that a request can provide and the function that converts the
+# value from the query string. The names match the options of the cluster
+# command
+QUERY_PARAMETERS: Dict[str, Callable[[Any], Any]] = {
+    parameter.name: _parse_bool if parameter.type is bool else parameter.type
+    for parameter in fields(ClusterParameters)
+}
+
+
+def convert_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the values of the parameters from the query string or json
+    body to the types of the ClusterParameters
+
+    Parameters
+    ----------
+    parameters : Dict[str, Any]
+        parameters of the request without the target
+
+    Returns
+    -------
+    Dict[str, Any]
+        returns the converted parameters
+
+    Raises
+    ------
+    ValueError
+        raises a ValueError if a parameter doesn't exist or if its value
+        can't be converted
+    """
+    unknown = sorted(set(parameters).difference(QUERY_PARAMETERS))
+
+    if unknown:
+        raise ValueError(
+            f"Unknown parameters: {', '.join(unknown)}. Allowed parameters are target, {', '.join(QUERY_PARAMETERS)}"  # noqa: E501
+        )
+
+    converted = {}
+
+    for name, value in parameters.items():
+        try:
+            converted[name] = QUERY_PARAMETERS[name](value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(
+                f"The value {value} of the parameter {name} is not valid"
+            ) from e
+
+    return converted
+
+
+def results_to_json(results: Results, runtime: float) -> Dict[str, Any]:
+    """Convert the results of a target to a dictionary that can be written
+    as json
+
+    Parameters
+    ----------
+    results : Results
+        networks and pvalues of the target
+
+    runtime : float
+        number of seconds it took to analyze the target
+
+    Returns
+    -------
+    Dict[str, Any]
+        returns a dictionary with the target, the number of segments and
+        haplotypes that passed the filter, and the networks. Each network
+        has the counts and pvalues of the phenotypes with a case in the
+        network
+    """
+    phenotypes: Dict[int, Dict[str, Any]] = {}
+
+    for network_index, phenotype, cases, excluded, pvalue in zip(
+        results.pvalues["network_index"].tolist(),
+        results.pvalues["phenotype"].tolist(),
+        results.pvalues["cases_in_network"].tolist(),
+        results.pvalues["excluded_in_network"].tolist(),
+        results.pvalues["pvalue"].tolist(),
+    ):
+        phenotypes.setdefault(network_index, {})[phenotype] = {
+            "cases": int(cases),
+            "excluded": int(excluded),
+            "pvalue": None if np.isnan(pvalue) else float(pvalue),
+        }
+
+    networks = []
+
+    for network_index, record in enumerate(results.networks.to_dict("records")):
+        network = {
+            "clst_id": record["clstID"],
+            "true_positive_count": int(record["true.positive.n"]),
+            "true_positive_percent": float(record["true.positive"]),
+            "false_negative_count": int(record["falst.postive"]),
+            "members": record["IDs"],
+            "haplotypes": record["ID.haplotype"],
+        }
+
+        if "member_codes" in record:
+            network["member_codes"] = record["member_codes"]
+
+            network["haplotype_codes"] = record["haplotype_codes"]
+
+        if "min_pvalue" in record:
+            # pandas stores the missing values of the table as NaN
+            for column in ["min_pvalue", "min_phenotype", "min_phenotype_description"]:
+                network[column] = None if isna(record[column]) else record[column]
+
+            network["phenotypes"] = phenotypes.get(network_index, {})
+
+        networks.append(network)
+
+    return {
+        "target": f"{results.target.chr}:{results.target.start}-{results.target.end}",
+        "segments": results.segment_count,
+        "haplotypes": results.haplotype_count,
+        "networks": networks,
+        "runtime": runtime,
+    }
+
+
+def session_status(session: Session) -> Dict[str, Any]:
+    """Describe the data that the session loaded
+
+    Parameters
+    ----------
+    session : Session
+        session used by the server
+
+    Returns
+    -------
+    Dict[str, Any]
+        returns the number of segments of each chromosome, the number of
+        phenotypes, and the default parameters
+    """
+    return {
+        "chromosomes": {
+            str(chromosome): len(segments)
+            for chromosome, segments in session.segment_index.chromosomes.items()
+        },
+        "phenotypes": len(session.phenotype_incidence.phenotypes)
+        if session.phenotype_incidence is not None
+        else 0,
+        "defaults": {
+            parameter.name: getattr(session.parameters, parameter.name)
+            for parameter in fields(ClusterParameters)
+        },
+    }
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """Handler for the endpoints of the server. GET /cluster?target=... and
+    POST /cluster with a json body cluster the segments around a target and
+    GET /status describes the loaded data. Every response is json"""
+
+    server_version = "DRIVE"
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        """write the body as json"""
+        content = json.dumps(body).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+
+        self.wfile.write(content)
+
+    def _answer(self, parameters: Dict[str, Any]) -> None:
+        """run the request and send the result or the error"""
+        path = urlsplit(self.path).path.rstrip("/")
+
+        session: Session = self.server.session
+
+        try:
+            if path == "/status":
+                self._send_json(200, session_status(session))
+            elif path == "/cluster":
+                if "target" not in parameters:
+                    raise ValueError("Expected the request to have a target")
+
+                target = split_target_string(str(parameters.pop("target")))
+
+                start_time = time.perf_counter()
+
+                results = session.run(target, **convert_parameters(parameters))
+
+                self._send_json(
+                    200, results_to_json(results, time.perf_counter() - start_time)
+                )
+            else:
+                self._send_json(404, {"error": f"Unknown endpoint {path}"})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.critical(f"The request {self.path} failed: {e!r}")
+
+            self._send_json(500, {"error": str(e)})
+
+    def do_GET(self) -> None:
+        parameters = {
+            name: values[-1]
+            for name, values in parse_qs(urlsplit(self.path).query).items()
+        }
+
+        self._answer(parameters)
+
+    def do_POST(self) -> None:
+        parameters: Dict[str, Any] = {
+            name: values[-1]
+            for name, values in parse_qs(urlsplit(self.path).query).items()
+        }
+
+        length = int(self.headers.get("Content-Length", 0))
+
+        if length:
+            try:
+                body = json.loads(self.rfile.read(length))
+            except json.JSONDecodeError as e:
+                self._send_json(400, {"error": f"The request body is not json: {e}"})
+                return
+
+            if not isinstance(body, dict):
+                self._send_json(400, {"error": "Expected the body to be a json object"})
+                return
+
+            parameters.update(body)
+
+        self._answer(parameters)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # the client address isn't included because Unix sockets don't
+        # have one
+        logger.debug(format % args)
+
+
+class _WorkerPoolMixIn:
+    """Mix-in that answers each connection in a pool of worker threads so
+    that the number of requests answered at the same time is bounded"""
+
+    def __init__(self, *args: Any, workers: int = 1, **kwargs: Any) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="drive-serve"
+        )
+
+        super().__init__(*args, **kwargs)
+
+    def _process_request_thread(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def process_request(self, request, client_address) -> None:
+        self.executor.submit(self._process_request_thread, request, client_address)
+
+    def server_close(self) -> None:
+        super().server_close()
+
+        self.executor.shutdown(wait=True)
+
+
+class QueryServer(_WorkerPoolMixIn, HTTPServer):
+    """HTTP server that answers the requests with a pool of worker threads"""
+
+    def __init__(
+        self, address: Tuple[str, int], session: Session, workers: int = 1
+    ) -> None:
+        self.session = session
+
+        super().__init__(address, QueryRequestHandler, workers=workers)
+
+
+class UnixQueryServer(_WorkerPoolMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix socket that answers the requests with a pool of
+    worker threads. A socket file left behind by a previous server is
+    replaced and the socket file is removed when the server is closed"""
+
+    def __init__(self, path: Path, session: Session, workers: int = 1) -> None:
+        self.session = session
+
+        self.socket_path = path
+
+        if path.exists() and stat.S_ISSOCK(path.stat().st_mode):
+            path.unlink()
+
+        super().__init__(str(path), QueryRequestHandler, workers=workers)
+
+    def server_close(self) -> None:
+        super().server_close()
+
+        if self.socket_path.exists():
+            os.unlink(self.socket_path)
@@ -0,0 +1,286 @@
+"""Module with helpers to name the output of sharded runs and to combine the
+output of every shard once all of the shards have finished. Each shard
+writes its files with the label shard_{number}_of_{count} after the output
+prefix so that shards running on different nodes never write to the same
+file"""
+
+import glob
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from drive.log import CustomLogger
+
+from .output import TABLE_FORMAT_SUFFIXES, TableWriter, open_input, open_output
+
+logger = CustomLogger.get_logger(__name__)
+
+
+def split_shard_string(shard: str) -> Tuple[int, int]:
+    """Split the shard argument into the shard number and the number of
+    shards
+
+    Parameters
+    ----------
+    shard : str
+        shard formatted as number/count where the number starts at 1
+
+    Returns
+    -------
+    Tuple[int, int]
+        returns the shard number and the number of shards
+
+    Raises
+    ------
+    ValueError
+        raises a ValueError if the shard is not formatted correctly or if
+        the shard number is not between 1 and the number of shards
+    """
+    match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", shard)
+
+    if match is None:
+        raise ValueError(
+            f"Expected the shard to be formatted as number/count, such as 1/4. Instead the value {shard} was provided"  # noqa: E501
+        )
+
+    shard_number, shard_count = int(match.group(1)), int(match.group(2))
+
+    if not 1 <= shard_number <= shard_count:
+        raise ValueError(
+            f"Expected the shard number to be between 1 and the number of shards. Instead the shard {shard} was provided"  # noqa: E501
+        )
+
+    return shard_number, shard_count
+
+
+def shard_name(
+    name: str, shard_number: int, shard_count: int, extension: str = ""
+) -> str:
+    """Add the shard label to a file name or output prefix
+
+    Parameters
+    ----------
+    name : str
+        file name or output prefix
+
+    shard_number : int
+        1-based number of the shard
+
+    shard_count : int
+        total number of shards
+
+    extension : str
+        extension of the file. The label is added before the extension if
+        the name ends with it
+
+    Returns
+    -------
+    str
+        returns the name with the shard label such as
+        prefix.shard_1_of_4 or drive.shard_1_of_4.log
+    """
+    if extension and name.endswith(extension):
+        name = name[: -len(extension)]
+    else:
+        extension = ""
+
+    return f"{name}.shard_{shard_number}_of_{shard_count}{extension}"
+
+
+def find_shard_files(output: Path, shard_count: int) -> Dict[str, List[Path]]:
+    """Find the output files of every shard
+
+    Parameters
+    ----------
+    output : Path
+        output prefix that was used for the sharded runs
+
+    shard_count : int
+        total number of shards
+
+    Returns
+    -------
+    Dict[str, List[Path]]
+        returns a dictionary where the keys are the suffixes of the output
+        files, such as .drive_networks.txt, and the values are the files of
+        each shard in the order of the shards
+
+    Raises
+    ------
+    FileNotFoundError
+        raises a FileNotFoundError if a shard doesn't have any output files
+        or doesn't have a file that the other shards have
+    """
+    shard_files: List[Dict[str, Path]] = []
+
+    for shard_number in range(1, shard_count + 1):
+        prefix = shard_name(output.name, shard_number, shard_count)
+
+        files = {
+            path.name[len(prefix) :]: path
+            for path in sorted(
+                output.parent.glob(glob.escape(prefix) + ".*"),
+            )
+        }
+
+        if not files:
+            raise FileNotFoundError(
+                f"No output files were found for shard {shard_number} of {shard_count} with the prefix {output.parent / prefix}"  # noqa: E501
+            )
+
+        shard_files.append(files)
+
+    suffixes = sorted(set().union(*shard_files))
+
+    missing = [
+        f"shard {shard_number} is missing the {suffix} file"
+        for shard_number, files in enumerate(shard_files, start=1)
+        for suffix in suffixes
+        if suffix not in files
+    ]
+
+    if missing:
+        raise FileNotFoundError(
+            f"The shards do not have the same output files: {', '.join(missing)}"
+        )
+
+    return {suffix: [files[suffix] for files in shard_files] for suffix in suffixes}
+
+
+def merge_text_files(paths: List[Path], output_path: Path) -> None:
+    """Concatenate tab delimited files that have the same header. The header
+    is only written once and the compression of the merged file is
+    determined from its suffix
+
+    Parameters
+    ----------
+    paths : List[Path]
+        files to merge in the order that they are written
+
+    output_path : Path
+        path to the merged file
+
+    Raises
+    ------
+    ValueError
+        raises a ValueError if the files have different headers
+    """
+    header: Optional[str] = None
+
+    with open_output(output_path) as output_file:
+        for path in paths:
+            with open_input(path) as input_file:
+                file_header = input_file.readline()
+                # files without a header are empty so there is nothing
+                # to copy
+                if not file_header:
+                    continue
+
+                if header is None:
+                    header = file_header
+
+                    output_file.write(header)
+                elif file_header != header:
+                    raise ValueError(
+                        f"Expected the file {path} to have the same header as the other shards"  # noqa: E501
+                    )
+
+                shutil.copyfileobj(input_file, output_file)
+
+
+def merge_table_files(paths: List[Path], output_path: Path, file_format: str) -> None:
+    """Concatenate Parquet or Feather files that have the same schema. One
+    file is read at a time so the merged table is never held in memory
+
+    Parameters
+    ----------
+    paths : List[Path]
+        files to merge in the order that they are written
+
+    output_path : Path
+        path to the merged file
+
+    file_format : str
+        format of the files. Allowed values are parquet and feather
+
+    Raises
+    ------
+    ValueError
+        raises a ValueError if the files have different schemas
+    """
+    try:
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "Merging Parquet or Feather output requires the pyarrow package. It can be installed with 'pip install pyarrow'"  # noqa: E501
+        ) from e
+
+    read_table = pq.read_table if file_format == "parquet" else feather.read_table
+
+    writer: Optional[TableWriter] = None
+
+    try:
+        for path in paths:
+            table = read_table(path)
+
+            if writer is None:
+                schema = table.schema
+
+                writer = TableWriter(output_path, schema, file_format, "zstd")
+            elif not table.schema.equals(schema):
+                raise ValueError(
+                    f"Expected the file {path} to have the same columns as the other shards"  # noqa: E501
+                )
+
+            writer.write(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def merge_shard_outputs(output: Path, shard_count: int) -> List[Path]:
+    """Combine the output files of every shard into one file for each type
+    of output. The files are concatenated in the order of the shards. The
+    cluster ids are already unique across shards because they start with
+    the window that they were found in
+
+    Parameters
+    ----------
+    output : Path
+        output prefix that was used for the sharded runs. The merged files
+        are written with this prefix
+
+    shard_count : int
+        total number of shards
+
+    Returns
+    -------
+    List[Path]
+        returns the paths of the merged files
+    """
+    merged_paths = []
+
+    for suffix, paths in find_shard_files(output, shard_count).items():
+        merged_path = output.parent / (output.name + suffix)
+
+        logger.verbose(f"Merging {len(paths)} shard files into {merged_path}")
+
+        file_format = next(
+            (
+                file_format
+                for file_format, format_suffix in TABLE_FORMAT_SUFFIXES.items()
+                if suffix.endswith(format_suffix)
+            ),
+            None,
+        )
+
+        if file_format is not None:
+            merge_table_files(paths, merged_path, file_format)
+        else:
+            merge_text_files(paths, merged_path)
+
+        merged_paths.append(merged_path)
+
+    return merged_paths
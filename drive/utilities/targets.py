@@ -0,0 +1,79 @@
+"""Module with the functions that parse the target regions provided by the
+user. The functions only import the Genes type when they are called so that
+the cli can import them without importing pandas"""
+
+import re
+import sys
+from typing import TYPE_CHECKING, Tuple
+
+if TYPE_CHECKING:
+    from drive.models import Genes
+
+
+def split_target_string(chromo_pos_str: str) -> "Genes":
+    """Function that will split the target string provided by the user.
+
+    Parameters
+    ----------
+    chromo_pos_str : str
+        String that has the region of interest in base pairs.
+        This string will look like 10:1234-1234 where the
+        first number is the chromosome number, then the start
+        position, and then the end position of the region of
+        interest.
+
+    Returns
+    -------
+    Genes
+        returns a namedtuple that has the chromosome number,
+        the start position, and the end position
+
+    Raises
+    ------
+    ValueError
+        raises a value error if the string was formatted any
+        other way than chromosome:start_position-end_position.
+        Also raises a value error if the start position is
+        larger than the end position
+    """
+    split_str = re.split(":|-", chromo_pos_str)
+
+    if len(split_str) != 3:
+        error_msg = f"Expected the gene position string to be formatted like chromosome:start_position-end_position. Instead it was formatted as {chromo_pos_str}"  # noqa: E501
+
+        raise ValueError(error_msg)
+
+    integer_split_str = [int(value) for value in split_str]
+
+    if integer_split_str[1] > integer_split_str[2]:
+        raise ValueError(
+            f"expected the start position of the target string to be <= the end position. Instead the start position was {integer_split_str[1]} and the end position was {integer_split_str[2]}"  # noqa: E501
+        )
+
+    from drive.models import Genes
+
+    return Genes(*integer_split_str)
+
+
+def split_scan_region(region: str) -> Tuple["Genes", bool]:
+    """Split the region provided to the scan command. The region can either
+    be a chromosome or a region formatted like chromosome:start-end
+
+    Parameters
+    ----------
+    region : str
+        chromosome number or region of the chromosome to scan
+
+    Returns
+    -------
+    Tuple[Genes, bool]
+        returns the target used to filter the ibd file and whether the
+        whole chromosome is scanned. If the whole chromosome is scanned
+        then the target spans every position of the chromosome
+    """
+    if ":" in region:
+        return split_target_string(region), False
+
+    from drive.models import Genes
+
+    return Genes(int(region), 0, sys.maxsize), True
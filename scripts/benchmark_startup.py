@@ -0,0 +1,136 @@
+"""Script that measures how long it takes to start the DRIVE cli. The
+import time of the drive.drive module is measured with python -X
+importtime and the wall time of 'drive --help' is measured by running it
+in a new interpreter. The --check flag makes the script exit with an
+error if any of the heavy analysis dependencies are imported at startup.
+
+Usage:
+    python scripts/benchmark_startup.py --repeat 5 --top 15 --check
+"""
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# modules that should only be imported once the analysis starts
+HEAVY_MODULES = ["pandas", "numpy", "scipy", "igraph", "pyarrow", "zstandard"]
+
+# format of each line written by python -X importtime
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int, int]]:
+    """Parse the output of python -X importtime
+
+    Parameters
+    ----------
+    stderr : str
+        standard error of the interpreter
+
+    Returns
+    -------
+    Dict[str, Tuple[int, int, int]]
+        returns a dictionary where the keys are the module names and the
+        values are tuples with the self time in microseconds, the
+        cumulative time in microseconds, and the nesting level
+    """
+    modules = {}
+
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+
+            modules[name] = (int(self_us), int(cumulative_us), (len(indent) - 1) // 2)
+
+    return modules
+
+
+def measure_imports(module: str) -> Dict[str, Tuple[int, int, int]]:
+    """import the module in a new interpreter with -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return parse_importtime(result.stderr)
+
+
+def measure_help() -> float:
+    """return the wall time in seconds of running 'drive --help'"""
+    start = time.perf_counter()
+
+    subprocess.run(
+        [sys.executable, "-m", "drive.drive", "--help"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        check=True,
+    )
+
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+
+    parser.add_argument(
+        "--module", default="drive.drive", help="module that the cli is defined in"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="number of times to run each benchmark"
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="number of slowest imports to show"
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="exit with an error if a heavy dependency is imported at startup",
+    )
+
+    args = parser.parse_args()
+
+    runs = [measure_imports(args.module) for _ in range(args.repeat)]
+
+    import_times = [run[args.module][1] / 1_000 for run in runs]
+
+    help_times = [measure_help() * 1_000 for _ in range(args.repeat)]
+
+    print(f"import {args.module}: median {statistics.median(import_times):.1f} ms")
+    print(f"drive --help: median {statistics.median(help_times):.1f} ms")
+
+    print("\nslowest imports (cumulative ms) from the last run:")
+
+    slowest: List[Tuple[str, Tuple[int, int, int]]] = sorted(
+        runs[-1].items(), key=lambda item: item[1][1], reverse=True
+    )
+
+    for name, (_, cumulative_us, level) in slowest[: args.top]:
+        print(f"{cumulative_us / 1_000:10.1f}  {'  ' * level}{name}")
+
+    heavy = sorted(
+        {name.split(".")[0] for name in runs[-1] if name.split(".")[0] in HEAVY_MODULES}
+    )
+
+    if heavy:
+        print(f"\nheavy modules imported at startup: {', '.join(heavy)}")
+
+        if args.check:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
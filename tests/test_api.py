@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append("./drive")
+
+import drive
+from drive.api import ClusterParameters, Session, cluster_segments, filter_segments
+from drive.filters import ChromosomeSegments, IbdFilter, NoSegmentsError
+from drive.models import Genes
+from drive.models.generate_indices import HapIBD
+
+hapibd = HapIBD()
+
+
+@pytest.fixture()
+def segments() -> pd.DataFrame:
+    """Randomly generated segments in the hapibd format"""
+    rng = np.random.default_rng(11)
+
+    segment_count = 400
+
+    starts = rng.integers(0, 900_000, segment_count)
+
+    return pd.DataFrame(
+        {
+            0: [f"ID{value}" for value in rng.integers(0, 40, segment_count)],
+            1: rng.integers(1, 3, segment_count),
+            2: [f"ID{value}" for value in rng.integers(40, 80, segment_count)],
+            3: rng.integers(1, 3, segment_count),
+            4: 10,
+            5: starts,
+            6: starts + rng.integers(1_000, 300_000, segment_count),
+            7: rng.uniform(1, 10, segment_count),
+        }
+    )
+
+
+@pytest.fixture()
+def phenotype_file(tmp_path: Path) -> Path:
+    """Phenotype file with two phenotypes for the individuals in the segments"""
+    rng = np.random.default_rng(3)
+
+    phenotype_path = tmp_path / "phenotypes.txt"
+
+    pd.DataFrame(
+        {
+            "grid": [f"ID{value}" for value in range(80)],
+            "P1": rng.integers(0, 2, 80),
+            "P2": rng.integers(0, 2, 80),
+        }
+    ).to_csv(phenotype_path, sep="\t", index=False)
+
+    return phenotype_path
+
+
+@pytest.mark.unit
+def test_select_finds_overlapping_segments(segments: pd.DataFrame) -> None:
+    """Check that the segments selected with the sorted positions are the segments that overlap the region in the order of the file"""  # noqa: E501
+    chromosome_segments = ChromosomeSegments.from_segments(segments, hapibd)
+
+    error_list = []
+
+    for start, end in [(0, 10), (250_000, 260_000), (500_000, 800_000), (2, 1)]:
+        selected = chromosome_segments.select(start, end)
+
+        expected = segments[(segments[5] <= end) & (segments[6] >= start)]
+
+        if selected.index.tolist() != expected.index.tolist():
+            error_list.append(
+                f"Expected {expected.shape[0]} segments in the order of the file for the region {start}-{end}. Instead {selected.shape[0]} segments were selected"  # noqa: E501
+            )
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("segment_overlap", ["contains", "overlaps"])
+def test_session_matches_cluster_command(
+    segments: pd.DataFrame, phenotype_file: Path, segment_overlap: str
+) -> None:
+    """Check that the session and the run function find the same networks as filtering and clustering the whole file"""  # noqa: E501
+    target = Genes(10, 400_000, 410_000)
+
+    parameters = ClusterParameters(segment_overlap=segment_overlap)
+
+    filter_obj = filter_segments(iter([segments.copy()]), hapibd, target, parameters)
+
+    networks = cluster_segments(filter_obj, parameters)
+
+    expected = [
+        (network.clst_id, sorted(network.members), sorted(network.haplotypes))
+        for network in networks
+    ]
+
+    session = Session.load(
+        segments, cases=phenotype_file, segment_overlap=segment_overlap
+    )
+
+    error_list = []
+
+    for name, results in [
+        ("session", session.run("10:400000-410000")),
+        (
+            "run",
+            drive.run(
+                segments,
+                target,
+                cases=phenotype_file,
+                segment_overlap=segment_overlap,
+            ),
+        ),
+    ]:
+        found = [
+            (row["clstID"], row["IDs"], row["ID.haplotype"])
+            for _, row in results.networks.iterrows()
+        ]
+
+        if found != expected:
+            error_list.append(
+                f"Expected the {name} to find the networks {expected}. Instead the networks were {found}"  # noqa: E501
+            )
+
+        if results.segment_count != filter_obj.ibd_pd.shape[0]:
+            error_list.append(
+                f"Expected the {name} to find {filter_obj.ibd_pd.shape[0]} segments. Instead there were {results.segment_count}"  # noqa: E501
+            )
+
+        if results.pvalues.empty or not set(results.pvalues["clstID"]).issubset(
+            results.networks["clstID"]
+        ):
+            error_list.append(f"Expected the {name} to have pvalues for the networks")
+
+        if results.networks["min_pvalue"].isna().all():
+            error_list.append(f"Expected the {name} to have minimum pvalues")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_session_targets_without_segments(segments: pd.DataFrame) -> None:
+    """Check that targets without segments have empty results and that invalid targets and parameters raise a ValueError"""  # noqa: E501
+    session = Session.load(segments)
+
+    results = session.run((10, 5_000_000, 5_000_100))
+
+    assert results.networks.empty and results.pvalues.empty
+
+    with pytest.raises(ValueError):
+        session.run("11:1-2")
+
+    with pytest.raises(ValueError):
+        session.run("10:1-2", random_walk=3)
+
+    with pytest.raises(ValueError):
+        session.run("10:1-2", segment_overlap="inside")
+
+
+@pytest.mark.unit
+def test_filter_without_segments(segments: pd.DataFrame) -> None:
+    """Check that the filter raises a NoSegmentsError instead of exiting if no segments are around the target and that filter_segments returns None"""  # noqa: E501
+    target = Genes(10, 5_000_000, 5_000_100)
+
+    filter_obj = IbdFilter(iter([segments.copy()]), hapibd, target)
+
+    filter_obj.set_filter("overlaps")
+
+    with pytest.raises(NoSegmentsError):
+        filter_obj.preprocess(3)
+
+    assert (
+        filter_segments(iter([segments.copy()]), hapibd, target, ClusterParameters())
+        is None
+    )
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from scipy.stats import binomtest
+
+from drive.utilities.binomial import BinomialCache, binomtest_pvalues
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("frequency", [0.0, 0.01, 0.1, 0.25, 1 / 3, 0.5, 0.75])
+def test_binomtest_pvalues_match_scipy(frequency: float) -> None:
+    """Check that the vectorized binomial test gives the same pvalues as scipy.stats.binomtest."""
+    network_sizes = np.array([n for n in range(1, 40) for _ in range(n)])
+    carriers = np.array([k for n in range(1, 40) for k in range(n)])
+
+    pvalues = binomtest_pvalues(carriers, network_sizes, frequency)
+
+    expected = [
+        binomtest(k, n, frequency).pvalue
+        for k, n in zip(carriers.tolist(), network_sizes.tolist())
+    ]
+
+    assert pvalues.tolist() == expected
+
+
+@pytest.mark.unit
+def test_binomtest_pvalues_empty_input() -> None:
+    """Check that the vectorized binomial test returns an empty array for empty inputs."""
+    pvalues = binomtest_pvalues(np.array([]), np.array([]), np.array([]))
+
+    assert pvalues.shape == (0,)
+
+
+@pytest.mark.unit
+def test_binomial_cache_counts_hits_and_misses() -> None:
+    """Check that repeated tests are read from the cache for both the scalar and array methods."""
+    cache = BinomialCache()
+
+    first = cache.pvalue(1, 10, 0.1)
+
+    pvalues = cache.pvalues(np.array([1, 1, 2]), np.array([10, 10, 10]), 0.1)
+
+    error_list = []
+
+    if pvalues.tolist() != [first, first, binomtest(2, 10, 0.1).pvalue]:
+        error_list.append(
+            f"Expected the cached pvalues to match scipy.stats.binomtest. Instead they were {pvalues.tolist()}"
+        )
+
+    if (cache.hits, cache.misses) != (2, 2):
+        error_list.append(
+            f"Expected the cache to have 2 hits and 2 misses. Instead there were {cache.hits} hits and {cache.misses} misses"
+        )
+
+    assert not error_list, "errors occured:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_binomial_cache_is_bounded() -> None:
+    """Check that the cache evicts pvalues once it reaches the maximum size."""
+    cache = BinomialCache(maxsize=2)
+
+    cache.pvalues(np.array([0, 1, 2]), 10, 0.1)
+
+    assert len(cache) == 2
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append("./drive")
+
+from drive.api import ClusterParameters, filter_segments
+from drive.cluster import ClusterHandler, cluster
+from drive.models import Genes
+from drive.models.generate_indices import HapIBD
+from drive.utilities.checkpoint import Checkpoint, checkpoint_key
+
+hapibd = HapIBD()
+
+target = Genes(10, 400_000, 410_000)
+
+# networks with more than 4 haplotypes are reclustered so that the clustering
+# has more than one round
+parameters = ClusterParameters(max_network_size=4, min_connected_threshold=0.9)
+
+
+class StoppedRun(Exception):
+    """raised to stop the clustering after a round"""
+
+
+@pytest.fixture()
+def ibd_file(tmp_path: Path) -> Path:
+    """Randomly generated segments in the hapibd format"""
+    rng = np.random.default_rng(11)
+
+    segment_count = 400
+
+    starts = rng.integers(0, 900_000, segment_count)
+
+    ibd_path = tmp_path / "segments.ibd.gz"
+
+    pd.DataFrame(
+        {
+            0: [f"ID{value}" for value in rng.integers(0, 40, segment_count)],
+            1: rng.integers(1, 3, segment_count),
+            2: [f"ID{value}" for value in rng.integers(40, 80, segment_count)],
+            3: rng.integers(1, 3, segment_count),
+            4: 10,
+            5: starts,
+            6: starts + rng.integers(1_000, 300_000, segment_count),
+            7: rng.uniform(1, 10, segment_count),
+        }
+    ).to_csv(ibd_path, sep="\t", header=False, index=False)
+
+    return ibd_path
+
+
+def create_handler(filter_obj) -> ClusterHandler:
+    """create the cluster handler for the filter"""
+    return parameters.create_cluster_handler(
+        {value: key for key, value in filter_obj.hapid_map.items()}
+    )
+
+
+def describe(networks) -> list:
+    """values of the networks that are compared between runs"""
+    return [
+        (
+            network.clst_id,
+            list(network.members),
+            network.haplotypes,
+            network.true_positive_count,
+            network.false_negative_edges,
+        )
+        for network in networks
+    ]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("stop_round", [0, 1])
+def test_resume_matches_uninterrupted_run(
+    ibd_file: Path, tmp_path: Path, stop_round: int
+) -> None:
+    """Check that a run that is stopped after the filter or after a round of the clustering finds the same networks when it is resumed"""  # noqa: E501
+    filter_obj = filter_segments(ibd_file, hapibd, target, parameters)
+
+    handler = create_handler(filter_obj)
+
+    expected = describe(cluster(filter_obj, handler, hapibd.cM_indx))
+
+    assert handler.completed_rounds > 1, "Expected the segments to be reclustered"
+
+    prefix = tmp_path / "output"
+
+    key = checkpoint_key(ibd_file, "hapibd", target, parameters)
+
+    checkpoint = Checkpoint.create(prefix, key)
+
+    filter_obj = filter_segments(ibd_file, hapibd, target, parameters)
+
+    checkpoint.save_filter(filter_obj)
+
+    def stop_after_round(cluster_obj: ClusterHandler) -> None:
+        if cluster_obj.completed_rounds > stop_round:
+            raise StoppedRun()
+
+        checkpoint.save_round(cluster_obj)
+
+    with pytest.raises(StoppedRun):
+        cluster(
+            filter_obj, create_handler(filter_obj), hapibd.cM_indx, stop_after_round
+        )
+
+    resumed = Checkpoint.resume(prefix, key)
+
+    resumed_filter = resumed.load_filter(hapibd, target)
+
+    resumed_handler = create_handler(resumed_filter)
+
+    error_list = []
+
+    if resumed.restore_round(resumed_handler) != (stop_round > 0):
+        error_list.append(
+            f"Expected a round to be restored only if the run was stopped after a round. The run was stopped after round {stop_round}"  # noqa: E501
+        )
+
+    if resumed_handler.completed_rounds != stop_round:
+        error_list.append(
+            f"Expected the handler to have completed {stop_round} rounds. Instead it completed {resumed_handler.completed_rounds}"  # noqa: E501
+        )
+
+    found = describe(
+        cluster(resumed_filter, resumed_handler, hapibd.cM_indx, resumed.save_round)
+    )
+
+    if found != expected:
+        error_list.append(
+            f"Expected the resumed run to find the networks {expected}. Instead the networks were {found}"  # noqa: E501
+        )
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_resume_checks_the_inputs(ibd_file: Path, tmp_path: Path) -> None:
+    """Check that a checkpoint is only resumed by a run with the same inputs and parameters"""  # noqa: E501
+    prefix = tmp_path / "output"
+
+    key = checkpoint_key(ibd_file, "hapibd", target, parameters)
+
+    # a run without a checkpoint starts from the beginning
+    assert Checkpoint.resume(prefix, key).stages == {}
+
+    checkpoint = Checkpoint.create(prefix, key)
+
+    checkpoint.save_filter(filter_segments(ibd_file, hapibd, target, parameters))
+
+    assert list(Checkpoint.resume(prefix, key).stages) == ["filter"]
+
+    for changed_key in [
+        checkpoint_key(ibd_file, "hapibd", target, parameters.update(min_cm=5)),
+        checkpoint_key(ibd_file, "hapibd", Genes(10, 1, 2), parameters),
+        checkpoint_key(ibd_file, "ilash", target, parameters),
+    ]:
+        with pytest.raises(ValueError):
+            Checkpoint.resume(prefix, changed_key)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.models import Data, Network, PhenotypeMatrix
+from drive.plugins.pvalues import Pvalues
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from drive.plugins.columnar_writer import ColumnarWriter
+
+phenotype_matrix = PhenotypeMatrix(
+    ["ID1", "ID2", "ID3", "ID4", "ID5"],
+    ["pheno_1", "pheno_2"],
+    np.array([[1, 0], [1, 0], [0, 1], [-1, 0], [0, 0]], dtype=np.int8),
+)
+
+
+def create_networks():
+    return [
+        Network(0, 2, 1.0, [], 0, {"ID1", "ID2", "ID4"}, ["ID1.1", "ID2.1", "ID4.2"]),
+        Network("1.1", 1, 1.0, [], 0, {"ID3", "ID5"}, ["ID3.1", "ID5.1"]),
+    ]
+
+
+@pytest.mark.unit
+def test_columnar_writer_numeric_columns(tmp_path) -> None:
+    """Check that the members are written as lists and the counts and pvalues are written as numbers"""
+    data = Data(
+        create_networks(),
+        tmp_path / "test",
+        phenotype_matrix.carriers(),
+        {},
+        phenotype_matrix=phenotype_matrix,
+    )
+
+    Pvalues().analyze(data=data)
+
+    ColumnarWriter(long_format=True).analyze(data=data)
+
+    table = pq.read_table(tmp_path / "test.drive_networks.parquet").to_pydict()
+
+    long_table = pq.read_table(
+        tmp_path / "test.drive_phenotype_results.parquet"
+    ).to_pydict()
+
+    error_list = []
+
+    if table["clstID"] != ["0", "1.1"]:
+        error_list.append(f"Unexpected cluster ids: {table['clstID']}")
+    if sorted(table["IDs"][0]) != ["ID1", "ID2", "ID4"]:
+        error_list.append(f"Expected the members to be a list. Found {table['IDs'][0]}")
+    if table["pheno_1_cases_in_network"] != [2, 0]:
+        error_list.append(
+            f"Expected the case counts [2, 0]. Found {table['pheno_1_cases_in_network']}"  # noqa: E501
+        )
+    if table["pheno_1_pvalue"][1] != 1.0:
+        error_list.append("Expected a pvalue of 1 for a network without cases")
+    if not isinstance(table["pheno_1_pvalue"][0], float):
+        error_list.append("Expected the pvalues to be written as numbers")
+    if sorted(zip(long_table["clstID"], long_table["phenotype"])) != [
+        ("0", "pheno_1"),
+        ("1.1", "pheno_2"),
+    ]:
+        error_list.append(
+            "Expected one long format row for each network and phenotype with a case"
+        )
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.models import Data, Network
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+from drive.plugins.edge_writer import EdgeWriter
+
+ibd_edges = pd.DataFrame(
+    {
+        "hapid1": ["ID1.1", "ID2.1", "ID1.1", "ID3.1", "ID5.1", "ID2.1"],
+        "hapid2": ["ID2.1", "ID4.2", "ID3.1", "ID5.1", "ID6.2", "ID1.1"],
+        "start": [100, 200, 300, 400, 500, 600],
+        "end": [1100, 1200, 1300, 1400, 1500, 1600],
+        "cm": [5.0, 6.0, 7.0, 8.0, 9.0, 10.0],
+    }
+)
+
+
+@pytest.mark.unit
+def test_edge_writer_only_writes_segments_within_networks(tmp_path) -> None:
+    """Check that only the segments where both haplotypes are in the same network are written"""  # noqa: E501
+    networks = [
+        Network(0, 2, 1.0, [], 0, {"ID1", "ID2", "ID4"}, ["ID1.1", "ID2.1", "ID4.2"]),
+        Network("1.1", 1, 1.0, [], 0, {"ID3", "ID5"}, ["ID3.1", "ID5.1"]),
+        # haplotypes can be in more than one network
+        Network(2, 1, 1.0, [], 0, {"ID1", "ID3"}, ["ID1.1", "ID3.1"]),
+    ]
+
+    data = Data(networks, tmp_path / "test", {}, {}, ibd_edges=ibd_edges)
+
+    EdgeWriter().analyze(data=data)
+
+    table = pq.read_table(tmp_path / "test.drive_network_edges.parquet").to_pydict()
+
+    edges = list(zip(table["clstID"], table["hapID1"], table["hapID2"], table["cm"]))
+
+    assert edges == [
+        ("0", "ID1.1", "ID2.1", 5.0),
+        ("0", "ID2.1", "ID4.2", 6.0),
+        ("0", "ID2.1", "ID1.1", 10.0),
+        ("1.1", "ID3.1", "ID5.1", 8.0),
+        ("2", "ID1.1", "ID3.1", 7.0),
+    ], f"Unexpected segments written to the edges file: {edges}"
@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.factory import discover_plugins, factory
+
+
+@dataclass
+class EntryPointPlugin:
+    name: str = "entry point test plugin"
+    threshold: float = 0.5
+
+    def analyze(self, **kwargs) -> None:
+        pass
+
+
+@dataclass
+class FakeEntryPoint:
+    name: str
+    value: str
+    loads: int = 0
+
+    def load(self):
+        self.loads += 1
+        return EntryPointPlugin
+
+
+@pytest.mark.unit
+def test_entry_point_plugins_are_imported_on_first_use() -> None:
+    """Check that plugins from entry points are only loaded when they are created"""  # noqa: E501
+    used = FakeEntryPoint("used_test_plugin", "tests:EntryPointPlugin")
+
+    unused = FakeEntryPoint("unused_test_plugin", "tests:EntryPointPlugin")
+
+    factory.register_entry_point(used.name, used)
+
+    factory.register_entry_point(unused.name, unused)
+
+    try:
+        plugin = factory.create({"name": "used_test_plugin", "threshold": 0.1})
+
+        second_plugin = factory.create({"name": "used_test_plugin"})
+    finally:
+        factory.unregister(used.name)
+        factory.unregister(unused.name)
+
+    error_list = []
+
+    if not isinstance(plugin, EntryPointPlugin) or plugin.threshold != 0.1:
+        error_list.append(f"Expected the plugin to be created. Instead got {plugin}")
+    if not isinstance(second_plugin, EntryPointPlugin):
+        error_list.append("Expected the registered plugin to be reused")
+    if used.loads != 1:
+        error_list.append(
+            f"Expected the entry point to be loaded once not {used.loads}"
+        )
+    if unused.loads != 0:
+        error_list.append("Expected the unused entry point to never be loaded")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_unknown_plugin_raises_error() -> None:
+    """Check that creating a plugin that was never registered raises a PluginNotFound error"""  # noqa: E501
+    with pytest.raises(factory.PluginNotFound):
+        factory.create({"name": "missing_test_plugin"})
+
+
+@pytest.mark.unit
+def test_bundled_plugins_are_discovered() -> None:
+    """Check that the plugins that come with DRIVE are found without listing them in the config file"""  # noqa: E501
+    discover_plugins()
+
+    plugin = factory.create({"name": "network_writer"})
+
+    assert (
+        type(plugin).__name__ == "NetworkWriter"
+    ), f"Expected the network_writer plugin to be created. Instead got {plugin}"
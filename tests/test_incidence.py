@@ -0,0 +1,124 @@
+import numpy as np
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.models import CarrierStore, Network, PhenotypeIncidence, PhenotypeMatrix
+
+carriers = {
+    "pheno_1": {"cases": {"ID1", "ID2"}, "controls": {"ID3"}, "excluded": {"ID4"}},
+    "pheno_2": {"cases": {"ID3"}, "controls": {"ID1", "ID2"}, "excluded": set()},
+}
+
+networks = [
+    Network(0, 1, 1.0, [], 0, {"ID1", "ID2", "ID4"}, []),
+    Network(1, 1, 1.0, [], 0, {"ID3", "ID5"}, []),
+]
+
+
+@pytest.mark.unit
+def test_incidence_case_counts() -> None:
+    """Check that the sparse matrix product gives the number of cases in each network."""
+    counts = PhenotypeIncidence.from_carriers(carriers).count(networks)
+
+    assert counts.case_counts.toarray().tolist() == [[2, 0], [0, 1]]
+
+
+@pytest.mark.unit
+def test_incidence_excluded_counts() -> None:
+    """Check that the sparse matrix product gives the number of excluded individuals in each network."""
+    counts = PhenotypeIncidence.from_carriers(carriers).count(networks)
+
+    error_list = []
+
+    if counts.excluded_counts.toarray().tolist() != [[1, 0], [0, 0]]:
+        error_list.append(
+            f"Expected the excluded counts to be [[1, 0], [0, 0]]. Instead they were {counts.excluded_counts.toarray().tolist()}"
+        )
+
+    if counts.network_sizes.tolist() != [3, 2]:
+        error_list.append(
+            f"Expected the network sizes to be [3, 2]. Instead they were {counts.network_sizes.tolist()}"
+        )
+
+    assert not error_list, "errors occured:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_lazy_carriers_match_carriers() -> None:
+    """Check that the lazy carrier mapping gives the same sets and counts as converting the whole matrix"""
+    matrix = PhenotypeMatrix(
+        ["ID1", "ID2", "ID3", "ID4"],
+        ["pheno_1", "pheno_2"],
+        np.array([[1, 0], [1, 0], [0, 1], [-1, 0]], dtype=np.int8),
+    )
+
+    lazy_carriers = matrix.carriers()
+
+    error_list = []
+
+    if dict(lazy_carriers) != matrix.to_carriers():
+        error_list.append(
+            "Expected the lazy carriers to match the output of to_carriers"
+        )
+
+    if matrix.status_counts() != {"pheno_1": (2, 1, 1), "pheno_2": (1, 3, 0)}:
+        error_list.append(f"Unexpected status counts: {matrix.status_counts()}")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_carrier_store_matches_matrix() -> None:
+    """Check that the bit packed store gives the same statuses, counts, and incidence as the status matrix"""
+    rng = np.random.default_rng(1)
+
+    samples = [f"ID{indx}" for indx in range(50)]
+
+    phenotypes = [f"pheno_{indx}" for indx in range(13)]
+
+    matrix = PhenotypeMatrix(
+        samples,
+        phenotypes,
+        rng.integers(-1, 2, size=(len(samples), len(phenotypes))).astype(np.int8),
+    )
+
+    store = CarrierStore.from_matrix(matrix, block_size=16)
+
+    subset = ["pheno_12", "pheno_3", "pheno_8"]
+
+    network_list = [
+        Network(0, 1, 1.0, [], 0, {"ID1", "ID7", "ID30"}, []),
+        Network(1, 1, 1.0, [], 0, {"ID2", "ID49", "ID_missing"}, []),
+    ]
+
+    error_list = []
+
+    if not (store.to_matrix().status == matrix.status).all():
+        error_list.append("Expected the unpacked store to match the status matrix")
+
+    if store.status_counts() != matrix.status_counts():
+        error_list.append("Expected the store counts to match the matrix counts")
+
+    if not (store.column("pheno_8") == matrix.column("pheno_8")).all():
+        error_list.append("Expected the column from the store to match the matrix")
+
+    if not (
+        store.select(subset).to_matrix().status == matrix.select(subset).status
+    ).all():
+        error_list.append("Expected the selected store to match the selected matrix")
+
+    store_counts = PhenotypeIncidence.from_store(
+        store, {"ID1", "ID7", "ID30", "ID2", "ID49"}
+    ).count(
+        network_list
+    )  # noqa: E501
+    matrix_counts = PhenotypeIncidence.from_matrix(matrix).count(network_list)
+
+    if (store_counts.case_counts != matrix_counts.case_counts).nnz:
+        error_list.append(
+            "Expected the case counts of the store and the matrix to match"
+        )  # noqa: E501
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
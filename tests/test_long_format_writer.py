@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.models import Data, Network, PhenotypeMatrix
+from drive.plugins.long_format_writer import LongFormatWriter
+from drive.plugins.pvalues import Pvalues
+
+# the extra controls outside of the networks make pheno_1 enriched in the
+# first network while pheno_2 is not enriched in the second network
+phenotype_matrix = PhenotypeMatrix(
+    ["ID1", "ID2", "ID3", "ID4", "ID5"] + [f"ID{indx}" for indx in range(6, 26)],
+    ["pheno_1", "pheno_2"],
+    np.array(
+        [[1, 0], [1, 0], [0, 1], [-1, 0], [0, 1]] + [[0, 1]] * 20,
+        dtype=np.int8,
+    ),
+)
+
+
+def create_data(output_path) -> Data:
+    networks = [
+        Network(0, 2, 1.0, [], 0, {"ID1", "ID2", "ID4"}, ["ID1.1", "ID2.1", "ID4.2"]),
+        Network("1.1", 1, 1.0, [], 0, {"ID3", "ID5"}, ["ID3.1", "ID5.1"]),
+    ]
+
+    data = Data(
+        networks,
+        output_path,
+        phenotype_matrix.carriers(),
+        {"pheno_1": {"phenotype": "first phenotype"}},
+        phenotype_matrix=phenotype_matrix,
+    )
+
+    Pvalues().analyze(data=data)
+
+    return data
+
+
+def read_rows(filepath) -> list:
+    with open(filepath, encoding="utf-8") as input_file:
+        return [line.strip().split("\t") for line in input_file]
+
+
+@pytest.mark.unit
+def test_long_format_writer_only_writes_networks_with_cases(tmp_path) -> None:
+    """Check that there is one row for each network and phenotype with a case in the network"""  # noqa: E501
+    data = create_data(tmp_path / "test")
+
+    LongFormatWriter().analyze(data=data)
+
+    rows = read_rows(tmp_path / "test.drive_phenotype_results.txt")
+
+    error_list = []
+
+    if rows[0][:4] != [
+        "clstID",
+        "phenotype",
+        "phenotype_description",
+        "cases_in_network",
+    ]:
+        error_list.append(f"Unexpected header line: {rows[0]}")
+    if [row[:2] for row in rows[1:]] != [["0", "pheno_1"], ["1.1", "pheno_2"]]:
+        error_list.append(f"Unexpected networks and phenotypes: {rows[1:]}")
+    if rows[1][2:6] != ["first phenotype", "2", "1", "3"]:
+        error_list.append(f"Unexpected counts for the first network: {rows[1]}")
+    if rows[2][2] != "N/A":
+        error_list.append("Expected N/A for a phenotype without a description")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_long_format_writer_pvalue_threshold(tmp_path) -> None:
+    """Check that rows with a pvalue above the threshold are not written"""
+    data = create_data(tmp_path / "test")
+
+    pvalues = data.network_counts.pvalues
+
+    LongFormatWriter(pvalue_threshold=float(pvalues[0, 0])).analyze(data=data)
+
+    rows = read_rows(tmp_path / "test.drive_phenotype_results.txt")
+
+    assert [row[:2] for row in rows[1:]] == [
+        ["0", "pheno_1"]
+    ], f"Expected only the first network to pass the threshold. Found {rows[1:]}"
@@ -0,0 +1,82 @@
+import gzip
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.utilities.output import (
+    BackgroundWriter,
+    add_compression_suffix,
+    infer_compression,
+    open_output,
+)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "filename,expected",
+    [("out.txt", "none"), ("out.txt.gz", "gzip"), ("out.txt.zst", "zstd")],
+)
+def test_infer_compression(filename: str, expected: str) -> None:
+    """Check that the compression type is determined from the file suffix"""
+    assert infer_compression(filename) == expected
+
+
+@pytest.mark.unit
+def test_add_compression_suffix() -> None:
+    """Check that the suffix is only added if the path doesn't already have it"""
+    error_list = []
+
+    if add_compression_suffix("out.txt", "gzip").name != "out.txt.gz":
+        error_list.append("Expected the .gz suffix to be added")
+    if add_compression_suffix("out.txt.gz", "gzip").name != "out.txt.gz":
+        error_list.append("Expected the .gz suffix to not be added twice")
+    if add_compression_suffix("out.txt", "none").name != "out.txt":
+        error_list.append("Expected no suffix for uncompressed files")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_unsupported_compression(tmp_path) -> None:
+    """Check that an unsupported compression type raises a ValueError"""
+    with pytest.raises(ValueError):
+        open_output(tmp_path / "out.txt", "bzip2")
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("background", [False, True])
+def test_gzip_output(tmp_path, background: bool) -> None:
+    """Check that text written to a gzip file, with or without the background thread, can be read back"""
+    output_path = tmp_path / "out.txt.gz"
+
+    lines = [f"line_{indx}\tvalue\n" for indx in range(1000)]
+
+    output = open_output(output_path, background=background)
+
+    if background:
+        assert isinstance(output, BackgroundWriter)
+
+    for line in lines:
+        output.write(line)
+
+    output.close()
+
+    with gzip.open(output_path, "rt") as input_file:
+        assert input_file.read() == "".join(lines)
+
+
+@pytest.mark.unit
+def test_zstd_output(tmp_path) -> None:
+    """Check that text written to a zstd file can be read back"""
+    zstandard = pytest.importorskip("zstandard")
+
+    output_path = tmp_path / "out.txt.zst"
+
+    with open_output(output_path, background=True) as output:
+        output.write("clstID\tn.total\n0\t2\n")
+
+    with open(output_path, "rb") as input_file:
+        text = zstandard.ZstdDecompressor().stream_reader(input_file).read()
+
+    assert text.decode("utf-8") == "clstID\tn.total\n0\t2\n"
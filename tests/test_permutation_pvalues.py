@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from scipy.sparse import csr_matrix
+
+from drive.plugins.permutation_pvalues import permute_phenotype
+
+# two networks of 10 members out of a cohort of 100 individuals with 10 cases
+membership = csr_matrix(np.array([[1] * 10 + [0] * 5, [0] * 5 + [1] * 10]))
+
+
+@pytest.mark.unit
+def test_permute_phenotype_stops_null_networks_early() -> None:
+    """Check that networks with many exceedances stop being permuted before the budget is used."""
+    exceedances, performed = permute_phenotype(
+        membership,
+        np.array([1, 10]),
+        10,
+        100,
+        5_000,
+        10,
+        100,
+        np.random.SeedSequence(1),
+    )
+
+    error_list = []
+
+    if performed[0] >= 5_000 or exceedances[0] < 10:
+        error_list.append(
+            f"Expected the null network to stop early. Instead it was permuted {performed[0]} times with {exceedances[0]} exceedances"
+        )
+
+    if performed[1] != 5_000:
+        error_list.append(
+            f"Expected the enriched network to use the full budget of 5000 permutations. Instead it was permuted {performed[1]} times"
+        )
+
+    assert not error_list, "errors occured:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_permute_phenotype_is_reproducible() -> None:
+    """Check that the permutations are reproducible for the same seed."""
+    first = permute_phenotype(
+        membership, np.array([2, 3]), 10, 100, 500, 10, 100, np.random.SeedSequence(7)
+    )
+    second = permute_phenotype(
+        membership, np.array([2, 3]), 10, 100, 500, 10, 100, np.random.SeedSequence(7)
+    )
+
+    assert np.array_equal(first[0], second[0]) and np.array_equal(first[1], second[1])
@@ -1,9 +1,12 @@
+import gzip
+import os
 import pytest
 import sys
 
 sys.path.append("./drive")
 
-from drive.utilities.parser import PhenotypeFileParser
+from drive.utilities.parser import PhenotypeFileParser, load_phenotype_matrix
+from drive.utilities.parser.phenotype_cache import read_cache
 
 
 @pytest.mark.unit
@@ -150,3 +153,177 @@ def test_multiple_phenotype_counts() -> None:
             )
 
         assert not error_list, "errors occured:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_status_matrix_counts() -> None:
+    """Check that the status matrix has the same case/control/exclusion counts as the dictionary of sets."""
+    with PhenotypeFileParser(
+        "./tests/test_inputs/test_multiple_phenotype_file.txt"
+    ) as parser:
+        phenotype_matrix = parser.parse_status_matrix()
+
+    case_counts, control_counts, exclusion_counts = phenotype_matrix.counts()
+
+    assert (
+        case_counts.tolist() == [8, 7]
+        and control_counts.tolist() == [84, 88]
+        and exclusion_counts.tolist() == [8, 5]
+    )
+
+
+@pytest.mark.unit
+def test_gzipped_phenotype_file(tmp_path) -> None:
+    """Check that the PhenotypeFileParser gives the same results for a gzipped phenotype file."""
+    gzipped_file = tmp_path / "test_phenotype_file.txt.gz"
+
+    with open("./tests/test_inputs/test_phenotype_file.txt", "rb") as input_file:
+        with gzip.open(gzipped_file, "wb") as output_file:
+            output_file.write(input_file.read())
+
+    with PhenotypeFileParser("./tests/test_inputs/test_phenotype_file.txt") as parser:
+        expected_counts, expected_ids = parser.parse_cases_and_controls()
+
+    with PhenotypeFileParser(gzipped_file) as parser:
+        phenotype_counts, cohort_ids = parser.parse_cases_and_controls()
+
+    assert phenotype_counts == expected_counts and cohort_ids == expected_ids
+
+
+@pytest.mark.unit
+def test_unrecognized_status_is_excluded(tmp_path) -> None:
+    """Check that status values that are not recognized are added to the exclusion list."""
+    phenotype_file = tmp_path / "unrecognized_status.txt"
+
+    phenotype_file.write_text("grid,status\nID1,1\nID2,0\nID3,case\nID4,NA\n")
+
+    with PhenotypeFileParser(phenotype_file) as parser:
+        phenotype_counts, _ = parser.parse_cases_and_controls()
+
+    assert phenotype_counts["status"] == {
+        "cases": {"ID1"},
+        "controls": {"ID2"},
+        "excluded": {"ID3", "ID4"},
+    }
+
+
+@pytest.mark.unit
+def test_phenotype_cache_round_trip(tmp_path) -> None:
+    """Check that the cached carrier store unpacks to the parsed matrix"""
+    pheno_file = tmp_path / "phenotypes.txt"
+
+    pheno_file.write_text("grids\tpheno1\tpheno2\nID1\t1\t0\nID2\t0\tNA\nID3\t1\t1\n")
+
+    cache_dir = tmp_path / "cache"
+
+    assert read_cache(pheno_file, cache_dir) is None
+
+    parsed = load_phenotype_matrix(pheno_file, cache_dir)
+
+    cached_store = read_cache(pheno_file, cache_dir)
+
+    error_list = []
+
+    if cached_store is None:
+        error_list.append("Expected the cache to be written after parsing the file")
+    else:
+        cached = cached_store.to_matrix()
+
+        if cached.samples != parsed.samples:
+            error_list.append(
+                f"Expected the samples {parsed.samples} but found {cached.samples}"
+            )  # noqa: E501
+        if cached.phenotypes != parsed.phenotypes:
+            error_list.append(
+                f"Expected the phenotypes {parsed.phenotypes} but found {cached.phenotypes}"
+            )  # noqa: E501
+        if not (cached.status == parsed.status).all():
+            error_list.append(
+                "Expected the cached status matrix to match the parsed matrix"
+            )  # noqa: E501
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_phenotype_cache_invalidated(tmp_path) -> None:
+    """Check that the cache is not used after the phenotype file changes"""
+    pheno_file = tmp_path / "phenotypes.txt"
+
+    pheno_file.write_text("grids\tpheno1\nID1\t1\nID2\t0\n")
+
+    cache_dir = tmp_path / "cache"
+
+    _ = load_phenotype_matrix(pheno_file, cache_dir)
+
+    pheno_file.write_text("grids\tpheno1\nID1\t1\nID2\t1\nID3\t0\n")
+
+    # making sure the modification time changes even on coarse filesystems
+    stats = pheno_file.stat()
+    os.utime(pheno_file, ns=(stats.st_atime_ns, stats.st_mtime_ns + 1_000_000_000))
+
+    assert read_cache(pheno_file, cache_dir) is None
+
+    matrix = load_phenotype_matrix(pheno_file, cache_dir)
+
+    assert matrix.samples == ["ID1", "ID2", "ID3"]
+
+
+@pytest.mark.unit
+def test_restricted_status_matrix(tmp_path) -> None:
+    """Check that restricting the individuals and phenotypes keeps the counts from the whole cohort"""
+    pheno_file = tmp_path / "phenotypes.txt"
+
+    pheno_file.write_text(
+        "grids\tpheno1\tpheno2\tpheno3\nID1\t1\t0\t1\nID2\t0\tNA\t1\nID3\t1\t1\t0\n"
+    )
+
+    with PhenotypeFileParser(pheno_file) as parser:
+        matrix = parser.parse_status_matrix(
+            individuals={"ID2", "ID3"}, phenotypes=["pheno3", "pheno1"]
+        )
+
+    error_list = []
+
+    if matrix.samples != ["ID2", "ID3"]:
+        error_list.append(
+            f"Expected the samples ID2 and ID3 but found {matrix.samples}"
+        )  # noqa: E501
+    if matrix.phenotypes != ["pheno1", "pheno3"]:
+        error_list.append(
+            f"Expected the phenotypes pheno1 and pheno3 in file order but found {matrix.phenotypes}"
+        )  # noqa: E501
+    if matrix.status.tolist() != [[0, 1], [1, 0]]:
+        error_list.append(f"Unexpected status matrix: {matrix.status.tolist()}")
+    if matrix.status_counts() != {"pheno1": (2, 1, 0), "pheno3": (2, 1, 0)}:
+        error_list.append(
+            f"Expected the counts from the whole cohort but found {matrix.status_counts()}"
+        )  # noqa: E501
+    if parser.individuals != ["ID1", "ID2", "ID3"]:
+        error_list.append(
+            f"Expected every id in the cohort but found {parser.individuals}"
+        )  # noqa: E501
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_missing_requested_phenotype() -> None:
+    """Check that the parser raises a ValueError if a requested phenotype is not in the file"""
+    with pytest.raises(ValueError):
+        with PhenotypeFileParser(
+            "./tests/test_inputs/test_phenotype_file.txt"
+        ) as parser:
+            parser.parse_status_matrix(phenotypes=["not_a_phenotype"])
+
+
+@pytest.mark.unit
+def test_parse_sample_ids() -> None:
+    """Check that only reading the ids gives the same cohort as parsing the whole file"""
+    with PhenotypeFileParser("./tests/test_inputs/test_phenotype_file.txt") as parser:
+        _, cohort = parser.parse_cases_and_controls()
+
+    with PhenotypeFileParser("./tests/test_inputs/test_phenotype_file.txt") as parser:
+        sample_ids = parser.parse_sample_ids()
+
+    assert sample_ids == cohort
@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional, Tuple
+import pytest
+import sys
+import threading
+
+sys.path.append("./drive")
+
+from drive.factory.runner import (
+    build_dependencies,
+    run_plugins,
+    split_streaming_plugins,
+    stream_plugins,
+)
+from drive.models import Data
+from drive.plugins.columnar_writer import ColumnarWriter
+from drive.plugins.network_writer import NetworkWriter
+from drive.plugins.permutation_pvalues import PermutationPvalues
+from drive.plugins.pvalues import Pvalues
+from drive.plugins.sqlite_writer import SqliteWriter
+
+
+@dataclass
+class StreamingPlugin:
+    name: str = "streaming test plugin"
+    streaming: bool = True
+    seen: List[int] = field(default_factory=list)
+    finished: bool = False
+
+    def process(self, networks, data) -> None:
+        self.seen.extend(networks)
+
+    def finish(self, data) -> None:
+        self.finished = True
+
+    def analyze(self, **kwargs) -> None:
+        self.process(kwargs["data"].networks, kwargs["data"])
+        self.finish(kwargs["data"])
+
+
+@dataclass
+class BatchPlugin:
+    name: str = "batch test plugin"
+    seen: List[int] = field(default_factory=list)
+
+    def analyze(self, **kwargs) -> None:
+        self.seen.extend(kwargs["data"].networks)
+
+
+@pytest.mark.unit
+def test_split_streaming_plugins() -> None:
+    """Check that only the plugins before the first batch plugin are streamed."""
+    first, batch, last = StreamingPlugin(), BatchPlugin(), StreamingPlugin()
+
+    streamed, remaining = split_streaming_plugins([first, batch, last])
+
+    assert streamed == [first] and remaining == [batch, last]
+
+
+@pytest.mark.unit
+def test_stream_plugins_sees_every_network() -> None:
+    """Check that streaming and batch plugins both see every network in the batches."""
+    streaming, batch = StreamingPlugin(), BatchPlugin()
+
+    data = Data([], Path("test_output"), {}, {})
+
+    stream_plugins([streaming, batch], data, iter([[1, 2], [], [3]]))
+
+    error_list = []
+
+    if streaming.seen != [1, 2, 3] or not streaming.finished:
+        error_list.append(
+            f"Expected the streaming plugin to see the networks [1, 2, 3] and be finished. Instead it saw {streaming.seen}"
+        )
+
+    if batch.seen != [1, 2, 3]:
+        error_list.append(
+            f"Expected the batch plugin to see the networks [1, 2, 3]. Instead it saw {batch.seen}"
+        )
+
+    assert not error_list, "errors occured:\n{}".format("\n".join(error_list))
+
+
+@dataclass
+class DeclaredPlugin:
+    name: str
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+    barrier: Optional[threading.Barrier] = None
+    ran: bool = False
+
+    def analyze(self, **kwargs) -> None:
+        if self.barrier is not None:
+            # both plugins have to reach the barrier at the same time
+            self.barrier.wait(timeout=5)
+        self.ran = True
+
+
+@pytest.mark.unit
+def test_build_dependencies() -> None:
+    """Check that plugins only wait for earlier plugins that use the same data and that undeclared plugins wait for everything"""  # noqa: E501
+    plugins = [
+        DeclaredPlugin("pvalues", ("networks",), ("networks", "network_counts")),
+        DeclaredPlugin("writer 1", ("networks", "network_counts")),
+        DeclaredPlugin("writer 2", ("networks", "network_counts")),
+        BatchPlugin(),
+        DeclaredPlugin("writer 3", ("ibd_edges",)),
+    ]
+
+    dependencies = build_dependencies(plugins)
+
+    assert dependencies == [
+        set(),
+        {0},
+        {0},
+        {0, 1, 2},
+        {3},
+    ], f"Unexpected dependencies between the plugins: {dependencies}"
+
+
+@pytest.mark.unit
+def test_run_plugins_runs_independent_plugins_concurrently() -> None:
+    """Check that two plugins without shared data are run at the same time when more than one thread is used"""  # noqa: E501
+    barrier = threading.Barrier(2)
+
+    first = DeclaredPlugin("writer 1", ("networks",), barrier=barrier)
+
+    second = DeclaredPlugin("writer 2", ("networks",), barrier=barrier)
+
+    data = Data([], Path("test_output"), {}, {})
+
+    run_plugins([first, second], data, threads=2)
+
+    assert first.ran and second.ran, "Expected both plugins to run"
+
+
+@pytest.mark.unit
+def test_plugins_that_count_phenotypes_declare_the_counts() -> None:
+    """Check that the writers wait for the pvalues plugin and that the plugins that count the phenotypes aren't run at the same time"""  # noqa: E501
+    dependencies = build_dependencies(
+        [
+            Pvalues(),
+            NetworkWriter(),
+            ColumnarWriter(),
+            SqliteWriter(),
+            PermutationPvalues(),
+        ]
+    )
+
+    assert dependencies == [
+        set(),
+        {0},
+        {0},
+        {0, 2},
+        {0, 2, 3},
+    ], f"Unexpected dependencies between the plugins: {dependencies}"
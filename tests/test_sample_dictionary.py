@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.filters import IbdFilter
+from drive.models import Genes, SampleDictionary
+from drive.models.generate_indices import HapIBD
+
+hapibd = HapIBD()
+
+segments = pd.DataFrame(
+    {
+        0: ["ID1", "ID1", "ID2", "ID4"],
+        1: [1, 2, 1, 1],
+        2: ["ID2", "ID3", "ID3", "ID5"],
+        3: [1, 1, 2, 2],
+        4: 10,
+        5: [100, 150, 2_000, 2_100],
+        6: [500, 600, 3_000, 3_200],
+        7: [5.0, 4.0, 6.0, 7.0],
+    }
+)
+
+
+@pytest.mark.unit
+def test_codes_are_stable(tmp_path) -> None:
+    """Check that ids keep their codes when the dictionary is loaded again and new ids are appended"""  # noqa: E501
+    dictionary = SampleDictionary.load(tmp_path / "dictionary")
+
+    first_codes = dictionary.samples.add(["ID3", "ID1", "ID3"])
+
+    reloaded = SampleDictionary.load(tmp_path / "dictionary")
+
+    second_codes = reloaded.samples.add(["ID2", "ID1"])
+
+    error_list = []
+
+    if first_codes.tolist() != [0, 1, 0]:
+        error_list.append(f"Unexpected codes for the first ids: {first_codes}")
+    if second_codes.tolist() != [2, 1]:
+        error_list.append(f"Unexpected codes after reloading: {second_codes}")
+    if reloaded.samples.codes(["ID3", "ID9"]).tolist() != [0, -1]:
+        error_list.append("Expected ids that were never added to have a code of -1")
+    if reloaded.samples.decode([2, 0]) != ["ID2", "ID3"]:
+        error_list.append("Expected the codes to be decoded to the original ids")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_unfinished_line_is_removed(tmp_path) -> None:
+    """Check that an id that was only partially written is ignored and removed before new ids are added"""  # noqa: E501
+    (tmp_path / "samples.txt").write_text("ID1\nID2\nID", encoding="utf-8")
+
+    dictionary = SampleDictionary.load(tmp_path)
+
+    error_list = []
+
+    if dictionary.samples.ids != ["ID1", "ID2"]:
+        error_list.append(f"Unexpected ids: {dictionary.samples.ids}")
+
+    dictionary.samples.add(["ID3"])
+
+    if (tmp_path / "samples.txt").read_text(encoding="utf-8") != "ID1\nID2\nID3\n":
+        error_list.append("Expected the unfinished line to be replaced")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_filter_adds_stable_codes(tmp_path) -> None:
+    """Check that two regions get the same code for a haplotype even though their idnums are numbered separately"""  # noqa: E501
+    filters = []
+
+    for target in [Genes(10, 200, 300), Genes(10, 2_500, 2_600)]:
+        filter_obj = IbdFilter(
+            iter([segments.copy()]),
+            hapibd,
+            target,
+            sample_dictionary=SampleDictionary.load(tmp_path),
+        )
+
+        filter_obj.set_filter("contains")
+
+        filter_obj.preprocess(3)
+
+        filters.append(filter_obj)
+
+    dictionary = SampleDictionary.load(tmp_path)
+
+    error_list = []
+
+    for filter_obj in filters:
+        for column in ["hapid1", "hapid2"]:
+            decoded = dictionary.haplotypes.decode(
+                filter_obj.ibd_pd[column.replace("hapid", "hapcode")]
+            )
+
+            if decoded != filter_obj.ibd_pd[column].tolist():
+                error_list.append(f"Expected the {column} codes to match the ids")
+
+        if not np.array_equal(
+            dictionary.samples.decode(filter_obj.ibd_vs["samplecode"]),
+            filter_obj.ibd_vs["IID"].to_numpy(),
+        ):
+            error_list.append("Expected the sample codes to match the sample ids")
+
+    first_codes = dict(zip(filters[0].ibd_vs["hapID"], filters[0].ibd_vs["hapcode"]))
+
+    second_codes = dict(zip(filters[1].ibd_vs["hapID"], filters[1].ibd_vs["hapcode"]))
+
+    if first_codes["ID2.1"] != second_codes["ID2.1"]:
+        error_list.append("Expected ID2.1 to have the same code in both regions")
+    if filters[1].hapid_map["ID2.1"] != 0:
+        error_list.append("Expected the idnums of every region to start at 0")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
@@ -0,0 +1,97 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import threading
+import urllib.request
+from pathlib import Path
+
+sys.path.append("./drive")
+
+from drive.api import Session
+from drive.utilities.server import QueryServer
+
+
+@pytest.fixture()
+def segments() -> pd.DataFrame:
+    """Randomly generated segments in the hapibd format"""
+    rng = np.random.default_rng(11)
+
+    segment_count = 400
+
+    starts = rng.integers(0, 900_000, segment_count)
+
+    return pd.DataFrame(
+        {
+            0: [f"ID{value}" for value in rng.integers(0, 40, segment_count)],
+            1: rng.integers(1, 3, segment_count),
+            2: [f"ID{value}" for value in rng.integers(40, 80, segment_count)],
+            3: rng.integers(1, 3, segment_count),
+            4: 10,
+            5: starts,
+            6: starts + rng.integers(1_000, 300_000, segment_count),
+            7: rng.uniform(1, 10, segment_count),
+        }
+    )
+
+
+@pytest.fixture()
+def session(segments: pd.DataFrame, tmp_path: Path) -> Session:
+    """Session loaded from the segments written to a file"""
+    ibd_file = tmp_path / "segments.ibd.gz"
+
+    segments.to_csv(ibd_file, sep="\t", header=False, index=False)
+
+    return Session.load(ibd_file)
+
+
+@pytest.mark.unit
+def test_server_answers_requests(session: Session) -> None:
+    """Check that the http server answers requests and returns errors for bad requests"""  # noqa: E501
+    server = QueryServer(("127.0.0.1", 0), session, workers=2)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+
+    thread.start()
+
+    address = f"http://127.0.0.1:{server.server_address[1]}"
+
+    error_list = []
+
+    try:
+        with urllib.request.urlopen(
+            f"{address}/cluster?target=10:400000-410000&segment_overlap=overlaps"
+        ) as response:
+            body = json.load(response)
+
+        expected = session.run("10:400000-410000", segment_overlap="overlaps")
+
+        if [network["haplotypes"] for network in body["networks"]] != list(
+            expected.networks["ID.haplotype"]
+        ):
+            error_list.append(
+                "Expected the server to return the same networks as the query"
+            )
+
+        for path, status in [
+            ("/cluster?target=11:1-2", 400),
+            ("/cluster?target=10:1-2&min_cm=a", 400),
+            ("/cluster?target=10:1-2&random_walk=3", 400),
+            ("/unknown", 404),
+        ]:
+            try:
+                urllib.request.urlopen(f"{address}{path}")
+            except urllib.error.HTTPError as e:
+                if e.code != status:
+                    error_list.append(
+                        f"Expected the status {status} for the request {path}. Instead the status was {e.code}"  # noqa: E501
+                    )
+            else:
+                error_list.append(f"Expected the request {path} to fail")
+    finally:
+        server.shutdown()
+
+        server.server_close()
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
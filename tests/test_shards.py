@@ -0,0 +1,81 @@
+import gzip
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.utilities.shards import (
+    merge_shard_outputs,
+    shard_name,
+    split_shard_string,
+)
+
+
+@pytest.mark.unit
+def test_split_shard_string() -> None:
+    """Check that the shard number and the number of shards are parsed"""
+    assert split_shard_string("2/5") == (2, 5)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("shard", ["0/5", "6/5", "2-5", "two/five"])
+def test_invalid_shard_string(shard: str) -> None:
+    """Check that a ValueError is raised if the shard is not a number between 1 and the number of shards"""  # noqa: E501
+    with pytest.raises(ValueError):
+        split_shard_string(shard)
+
+
+@pytest.mark.unit
+def test_shard_name() -> None:
+    """Check that the shard label is added before the extension"""
+    error_list = []
+
+    if shard_name("test", 1, 4) != "test.shard_1_of_4":
+        error_list.append("Expected the label to be added to the end of the prefix")
+    if shard_name("drive.log", 1, 4, ".log") != "drive.shard_1_of_4.log":
+        error_list.append("Expected the label to be added before the extension")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_merge_shard_outputs(tmp_path) -> None:
+    """Check that the files of each shard are concatenated in order with one header"""  # noqa: E501
+    for shard_number in range(1, 3):
+        prefix = tmp_path / shard_name("test", shard_number, 2)
+
+        with gzip.open(f"{prefix}.drive_networks.txt.gz", "wt") as output:
+            output.write(f"clstID\tn.total\n10:{shard_number}_0\t2\n")
+
+        with open(f"{prefix}.drive_scan_summary.txt", "w") as output:
+            output.write(f"chromosome\twindow_start\n10\t{shard_number}\n")
+
+    merged_paths = merge_shard_outputs(tmp_path / "test", 2)
+
+    error_list = []
+
+    if sorted(path.name for path in merged_paths) != [
+        "test.drive_networks.txt.gz",
+        "test.drive_scan_summary.txt",
+    ]:
+        error_list.append(f"Unexpected merged files: {merged_paths}")
+
+    with gzip.open(tmp_path / "test.drive_networks.txt.gz", "rt") as input_file:
+        if input_file.read() != "clstID\tn.total\n10:1_0\t2\n10:2_0\t2\n":
+            error_list.append("Expected the networks of both shards in order")
+
+    with open(tmp_path / "test.drive_scan_summary.txt") as input_file:
+        if input_file.read() != "chromosome\twindow_start\n10\t1\n10\t2\n":
+            error_list.append("Expected the summary rows of both shards in order")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_merge_missing_shard(tmp_path) -> None:
+    """Check that a FileNotFoundError is raised if one of the shards didn't write its output"""  # noqa: E501
+    with open(tmp_path / "test.shard_1_of_2.drive_networks.txt", "w") as output:
+        output.write("clstID\tn.total\n")
+
+    with pytest.raises(FileNotFoundError):
+        merge_shard_outputs(tmp_path / "test", 2)
@@ -0,0 +1,228 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pickle
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.append("./drive")
+
+from drive.api import ClusterParameters, filter_segments
+from drive.cluster import ReclusterPool, cluster
+from drive.models import Genes, SharedEdges
+from drive.models.generate_indices import HapIBD
+
+hapibd = HapIBD()
+
+# networks with more than 4 haplotypes are reclustered so that the clustering
+# has more than one round
+parameters = ClusterParameters(max_network_size=4, min_connected_threshold=0.9)
+
+
+class StoppedRun(Exception):
+    """raised to stop the clustering after a round"""
+
+
+class RecordingExecutor(ProcessPoolExecutor):
+    """process pool that keeps the arguments of every task that is submitted"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.task_args = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.task_args.append(args)
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture()
+def ibd_edges() -> pd.DataFrame:
+    """Segments in the format returned by get_ibd_edges"""
+    return pd.DataFrame(
+        {
+            "hapid1": ["ID1.1", "ID2.1", "ID1.1"],
+            "hapid2": ["ID2.1", "ID3.2", "ID3.2"],
+            "idnum1": [0, 1, 0],
+            "idnum2": [1, 2, 2],
+            "start": [100, 150, 120],
+            "end": [500, 450, 600],
+            "cm": [4.5, 3.2, 6.1],
+        }
+    )
+
+
+@pytest.fixture()
+def ibd_file(tmp_path: Path) -> Path:
+    """Randomly generated segments in the hapibd format"""
+    rng = np.random.default_rng(11)
+
+    segment_count = 400
+
+    starts = rng.integers(0, 900_000, segment_count)
+
+    ibd_path = tmp_path / "segments.ibd.gz"
+
+    pd.DataFrame(
+        {
+            0: [f"ID{value}" for value in rng.integers(0, 40, segment_count)],
+            1: rng.integers(1, 3, segment_count),
+            2: [f"ID{value}" for value in rng.integers(40, 80, segment_count)],
+            3: rng.integers(1, 3, segment_count),
+            4: 10,
+            5: starts,
+            6: starts + rng.integers(1_000, 300_000, segment_count),
+            7: rng.uniform(1, 10, segment_count),
+        }
+    ).to_csv(ibd_path, sep="\t", header=False, index=False)
+
+    return ibd_path
+
+
+def load_filter(ibd_file: Path):
+    """filter the segments around the target and create the cluster handler"""
+    filter_obj = filter_segments(
+        ibd_file, hapibd, Genes(10, 400_000, 410_000), parameters
+    )
+
+    cluster_obj = parameters.create_cluster_handler(
+        {value: key for key, value in filter_obj.hapid_map.items()}
+    )
+
+    return filter_obj, cluster_obj
+
+
+def get_edges(filter_obj) -> pd.DataFrame:
+    """segments of the filter in the format returned by get_ibd_edges"""
+    return filter_obj.ibd_pd.loc[
+        :,
+        [
+            "hapid1",
+            "hapid2",
+            "idnum1",
+            "idnum2",
+            hapibd.str_indx,
+            hapibd.end_indx,
+            hapibd.cM_indx,
+        ],
+    ].rename(
+        columns={hapibd.str_indx: "start", hapibd.end_indx: "end", hapibd.cM_indx: "cm"}
+    )
+
+
+def describe(networks) -> list:
+    """values of the networks that are compared between runs"""
+    return [
+        (
+            network.clst_id,
+            sorted(network.members),
+            network.haplotypes,
+            network.true_positive_count,
+            network.false_negative_edges,
+        )
+        for network in networks
+    ]
+
+
+def total_length(shared_edges: SharedEdges) -> float:
+    """function run in the worker process to check that the shared arrays can be read"""  # noqa: E501
+    return float(shared_edges["cm"].sum())
+
+
+@pytest.mark.unit
+def test_shared_edges_match_segments(ibd_edges: pd.DataFrame) -> None:
+    """Check that the shared arrays have the same values as the segments and that the haplotype ids can be recovered"""  # noqa: E501
+    with SharedEdges.from_edges(ibd_edges) as shared_edges:
+        error_list = []
+
+        for column in ["idnum1", "idnum2", "start", "end", "cm"]:
+            if not np.array_equal(shared_edges[column], ibd_edges[column].to_numpy()):
+                error_list.append(f"Expected the shared {column} column to match")
+
+        if shared_edges.haplotype_mappings() != {0: "ID1.1", 1: "ID2.1", 2: "ID3.2"}:
+            error_list.append(
+                f"Unexpected haplotype mappings: {shared_edges.haplotype_mappings()}"
+            )
+
+        if len(pickle.dumps(shared_edges)) > 1_000:
+            error_list.append("Expected only the handle of the block to be pickled")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_workers_read_shared_edges(ibd_edges: pd.DataFrame) -> None:
+    """Check that a worker process can read the segments from the shared memory"""  # noqa: E501
+    with SharedEdges.from_edges(ibd_edges) as shared_edges:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(total_length, shared_edges).result()
+
+    assert result == pytest.approx(ibd_edges["cm"].sum())
+
+
+@pytest.mark.unit
+def test_recluster_pool_matches_sequential_clustering(ibd_file: Path) -> None:
+    """Check that reclustering in the worker processes gives the same networks as reclustering one network at a time and that the workers attach to the shared block instead of receiving the segments"""  # noqa: E501
+    filter_obj, cluster_obj = load_filter(ibd_file)
+
+    expected = describe(cluster(filter_obj, cluster_obj, hapibd.cM_indx))
+
+    filter_obj, cluster_obj = load_filter(ibd_file)
+
+    shared_edges = SharedEdges.from_edges(get_edges(filter_obj))
+
+    executor = RecordingExecutor(max_workers=2)
+
+    error_list = []
+
+    with ReclusterPool(shared_edges, executor) as pool:
+        networks = describe(cluster(filter_obj, cluster_obj, hapibd.cM_indx, pool=pool))
+
+        if not executor.task_args:
+            error_list.append("Expected some networks to be reclustered by the workers")
+
+        for args in executor.task_args:
+            if any(isinstance(arg, pd.DataFrame) for arg in args):
+                error_list.append("Expected the tasks not to receive a DataFrame")
+
+            if len(pickle.dumps(args)) > 10_000:
+                error_list.append(
+                    f"Expected the task to only pickle the network and the handle of the block. Instead it pickled {len(pickle.dumps(args))} bytes"  # noqa: E501
+                )
+
+            # the workers unpickle the handle and attach to the block
+            with pickle.loads(pickle.dumps(args[-1])) as worker_edges:
+                if worker_edges.owner or worker_edges.handle != shared_edges.handle:
+                    error_list.append(
+                        f"Expected the worker to attach to the block {shared_edges.handle.name}. Instead it received {worker_edges}"  # noqa: E501
+                    )
+
+    if networks != expected:
+        error_list.append(
+            "Expected the networks from the worker processes to match the sequential clustering"  # noqa: E501
+        )
+
+    if not shared_edges.closed:
+        error_list.append("Expected the shared block to be closed with the pool")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_recluster_pool_is_unlinked_when_run_fails(ibd_file: Path) -> None:
+    """Check that the shared block is removed if the clustering raises an error"""  # noqa: E501
+    filter_obj, cluster_obj = load_filter(ibd_file)
+
+    def stop_run(handler) -> None:
+        # the run fails after the workers reclustered the first round
+        if handler.completed_rounds > 1:
+            raise StoppedRun()
+
+    with pytest.raises(StoppedRun):
+        with ReclusterPool.create(get_edges(filter_obj), 2) as pool:
+            handle = pool.shared_edges.handle
+
+            cluster(filter_obj, cluster_obj, hapibd.cM_indx, stop_run, pool=pool)
+
+    with pytest.raises(FileNotFoundError):
+        SharedEdges.attach(handle)
@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+import sqlite3
+import sys
+
+sys.path.append("./drive")
+
+from drive.models import Data, Genes, Network, PhenotypeMatrix
+from drive.plugins.pvalues import Pvalues
+from drive.plugins.sqlite_writer import SqliteWriter, merge_databases
+
+phenotype_matrix = PhenotypeMatrix(
+    ["ID1", "ID2", "ID3", "ID4", "ID5"],
+    ["pheno_1", "pheno_2"],
+    np.array([[1, 0], [1, 0], [0, 1], [-1, 0], [0, 0]], dtype=np.int8),
+)
+
+
+def create_data(output_path, target: Genes) -> Data:
+    networks = [
+        Network(0, 2, 1.0, [], 0, {"ID1", "ID2", "ID4"}, ["ID1.1", "ID2.1", "ID4.2"]),
+        Network("1.1", 1, 1.0, [], 0, {"ID3", "ID5"}, ["ID3.1", "ID5.1"]),
+    ]
+
+    data = Data(
+        networks,
+        output_path,
+        phenotype_matrix.carriers(),
+        {},
+        {"target": target},
+        phenotype_matrix=phenotype_matrix,
+    )
+
+    Pvalues().analyze(data=data)
+
+    return data
+
+
+@pytest.mark.unit
+def test_sqlite_writer_appends_runs(tmp_path) -> None:
+    """Check that the networks from two runs are appended to the same database and can be looked up by individual"""  # noqa: E501
+    for indx, target in enumerate([Genes("10", 100, 200), Genes("11", 300, 400)]):
+        data = create_data(tmp_path / f"test_{indx}", target)
+
+        SqliteWriter().analyze(data=data)
+
+    connection = sqlite3.connect(tmp_path / "drive_results.sqlite")
+
+    loci = connection.execute(
+        "SELECT runs.locus, networks.clst_id FROM memberships JOIN networks USING (network_id) JOIN runs USING (run_id) WHERE memberships.individual = 'ID3' ORDER BY runs.run_id"  # noqa: E501
+    ).fetchall()
+
+    results = connection.execute(
+        "SELECT networks.clst_id, phenotype, cases_in_network, excluded_in_network FROM phenotype_results JOIN networks USING (network_id) WHERE run_id = 1 ORDER BY networks.clst_id"  # noqa: E501
+    ).fetchall()
+
+    connection.close()
+
+    error_list = []
+
+    if loci != [("10:100-200", "1.1"), ("11:300-400", "1.1")]:
+        error_list.append(f"Unexpected networks for the individual ID3: {loci}")
+    if results != [("0", "pheno_1", 2, 1), ("1.1", "pheno_2", 1, 0)]:
+        error_list.append(f"Unexpected phenotype results: {results}")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_merge_shard_databases(tmp_path) -> None:
+    """Check that the networks of every shard database are merged into a single run with new network ids"""  # noqa: E501
+    shard_databases = []
+
+    for shard_number, target in enumerate(
+        [Genes("10", 100, 200), Genes("10", 200, 300)], start=1
+    ):
+        data = create_data(tmp_path / f"test.shard_{shard_number}_of_2", target)
+
+        data.options["shard"] = (shard_number, 2)
+
+        SqliteWriter().analyze(data=data)
+
+        shard_databases.append(
+            tmp_path / f"drive_results.shard_{shard_number}_of_2.sqlite"
+        )
+
+    run_id = merge_databases(
+        shard_databases, tmp_path / "drive_results.sqlite", tmp_path / "test"
+    )
+
+    connection = sqlite3.connect(tmp_path / "drive_results.sqlite")
+
+    runs = connection.execute("SELECT run_id, locus FROM runs").fetchall()
+
+    networks = connection.execute(
+        "SELECT network_id, run_id, clst_id FROM networks ORDER BY network_id"
+    ).fetchall()
+
+    memberships = connection.execute(
+        "SELECT network_id, COUNT(*) FROM memberships GROUP BY network_id"
+    ).fetchall()
+
+    connection.close()
+
+    error_list = []
+
+    if run_id != 1 or runs != [(1, "10:100-300")]:
+        error_list.append(f"Expected one merged run. Instead the runs were {runs}")
+    if networks != [(1, 1, "0"), (2, 1, "1.1"), (3, 1, "0"), (4, 1, "1.1")]:
+        error_list.append(f"Unexpected merged networks: {networks}")
+    if memberships != [(1, 3), (2, 2), (3, 3), (4, 2)]:
+        error_list.append(f"Unexpected merged memberships: {memberships}")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
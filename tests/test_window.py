@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+
+sys.path.append("./drive")
+
+from drive.cluster import ClusterHandler
+from drive.cluster.cluster import ComponentCache
+from drive.filters import IbdFilter, NoSegmentsError, SlidingWindows
+from drive.models import Genes
+from drive.models.generate_indices import HapIBD
+
+hapibd = HapIBD()
+
+
+@pytest.fixture()
+def segments() -> pd.DataFrame:
+    """Randomly generated segments in the hapibd format"""
+    rng = np.random.default_rng(7)
+
+    segment_count = 300
+
+    starts = rng.integers(0, 900_000, segment_count)
+
+    return pd.DataFrame(
+        {
+            0: [f"ID{value}" for value in rng.integers(0, 40, segment_count)],
+            1: rng.integers(1, 3, segment_count),
+            2: [f"ID{value}" for value in rng.integers(40, 80, segment_count)],
+            3: rng.integers(1, 3, segment_count),
+            4: 10,
+            5: starts,
+            6: starts + rng.integers(1_000, 300_000, segment_count),
+            7: rng.uniform(1, 10, segment_count),
+        }
+    )
+
+
+def filter_segments(
+    segments: pd.DataFrame, target: Genes, segment_overlap: str
+) -> IbdFilter:
+    """Filter the segments the same way that the cluster command does. The
+    filter raises an error if there are no segments so an empty filter is
+    returned"""
+    filter_obj = IbdFilter(iter([segments.copy()]), hapibd, target)
+
+    filter_obj.set_filter(segment_overlap)
+
+    try:
+        filter_obj.preprocess(3)
+    except NoSegmentsError:
+        return IbdFilter(iter([]), hapibd, target)
+
+    return filter_obj
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("segment_overlap", ["contains", "overlaps"])
+def test_windows_match_targeted_filter(
+    segments: pd.DataFrame, segment_overlap: str
+) -> None:
+    """Check that every window has the same segments and haplotype ids as filtering the file for the window"""  # noqa: E501
+    scanned = filter_segments(segments, Genes(10, 0, sys.maxsize), "overlaps")
+
+    windows = SlidingWindows.from_filter(
+        scanned, hapibd, 200_000, 75_000, segment_overlap, Genes(10, 0, 1_000_000)
+    )
+
+    error_list = []
+
+    window_count = 0
+
+    for window in windows:
+        window_count += 1
+
+        targeted = filter_segments(segments, window.window, segment_overlap)
+
+        if targeted.ibd_pd.shape[0] != window.ibd_pd.shape[0]:
+            error_list.append(
+                f"Expected {targeted.ibd_pd.shape[0]} segments in the window {window.label}. Instead there were {window.ibd_pd.shape[0]}"  # noqa: E501
+            )
+        elif window.ibd_pd.empty:
+            continue
+        elif not (
+            targeted.ibd_pd[["hapid1", "hapid2", "idnum1", "idnum2"]].values
+            == window.ibd_pd[["hapid1", "hapid2", "idnum1", "idnum2"]].values
+        ).all():
+            error_list.append(
+                f"Expected the segments and haplotype ids in the window {window.label} to be in the same order as the filtered file"  # noqa: E501
+            )
+
+        if targeted.hapid_map != window.hapid_map:
+            error_list.append(
+                f"Expected the haplotype mapping of the window {window.label} to be the same as the filtered file"  # noqa: E501
+            )
+
+    if window_count != 12:
+        error_list.append(f"Expected 12 windows. Instead there were {window_count}")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_invalid_window_size(segments: pd.DataFrame) -> None:
+    """Check that a ValueError is raised if the step size is not positive"""
+    scanned = filter_segments(segments, Genes(10, 0, sys.maxsize), "overlaps")
+
+    with pytest.raises(ValueError):
+        SlidingWindows.from_filter(scanned, hapibd, 200_000, 0, "contains")
+
+
+@pytest.mark.unit
+def test_incremental_clustering_reuses_unchanged_components(
+    segments: pd.DataFrame,
+) -> None:
+    """Check that reusing the networks of unchanged components gives the same networks as clustering every component of each window"""  # noqa: E501
+    scanned = filter_segments(segments, Genes(10, 0, sys.maxsize), "overlaps")
+
+    def create_cluster_obj(haplotype_mappings) -> ClusterHandler:
+        return ClusterHandler(0.5, 30, 5, 3, 2, 0.2, 0.01, haplotype_mappings, True)
+
+    def network_keys(networks) -> list:
+        return sorted(
+            (network.clst_id, tuple(sorted(network.haplotypes))) for network in networks
+        )
+
+    component_cache = ComponentCache(create_cluster_obj)
+
+    error_list = []
+
+    for window in SlidingWindows.from_filter(
+        scanned, hapibd, 100_000, 20_000, "overlaps", Genes(10, 0, 400_000)
+    ):
+        if window.ibd_pd.empty:
+            component_cache.networks = {}
+            continue
+
+        window.ibd_pd = window.ibd_pd.rename(columns={hapibd.cM_indx: "cm"})
+
+        networks = component_cache.cluster_window(window)
+
+        expected = ComponentCache(create_cluster_obj).cluster_window(window)
+
+        if network_keys(networks) != network_keys(expected):
+            error_list.append(
+                f"Expected the networks in the window {window.label} to be the same as clustering every component"  # noqa: E501
+            )
+
+    if component_cache.reused_count == 0:
+        error_list.append("Expected the networks of some components to be reused")
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))
+
+
+@pytest.mark.unit
+def test_shards_cover_every_window(segments: pd.DataFrame) -> None:
+    """Check that the shards split the windows into contiguous groups that together have every window once"""  # noqa: E501
+    scanned = filter_segments(segments, Genes(10, 0, sys.maxsize), "overlaps")
+
+    windows = SlidingWindows.from_filter(
+        scanned, hapibd, 200_000, 75_000, "overlaps", Genes(10, 0, 1_000_000)
+    )
+
+    expected_labels = [window.label for window in windows]
+
+    shard_labels = []
+
+    error_list = []
+
+    for shard_number in range(1, 4):
+        shard_windows = list(windows.shard(shard_number, 3))
+
+        if not shard_windows:
+            error_list.append(f"Expected the shard {shard_number} to have windows")
+        elif shard_windows[0].changed_haplotypes is not None:
+            error_list.append(
+                f"Expected every component of the first window of the shard {shard_number} to be clustered"  # noqa: E501
+            )
+        elif windows.shard(shard_number, 3).scanned_region() != Genes(
+            10, shard_windows[0].window.start, shard_windows[-1].window.end
+        ):
+            error_list.append(
+                f"Expected the shard {shard_number} to cover the region from {shard_windows[0].label} to {shard_windows[-1].label}"  # noqa: E501
+            )
+
+        shard_labels.extend(window.label for window in shard_windows)
+
+    if shard_labels != expected_labels:
+        error_list.append(
+            f"Expected the shards to have the windows {expected_labels}. Instead they had {shard_labels}"  # noqa: E501
+        )
+
+    assert not error_list, "errors occurred:\n{}".format("\n".join(error_list))